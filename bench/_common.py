@@ -0,0 +1,58 @@
+"""
+Общие утилиты для бенчмарков: подготовка окружения бота
+"""
+
+import importlib.util
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+BOT_DIR = Path(__file__).resolve().parent.parent / 'bot'
+
+
+def bootstrap(**overrides):
+    """
+    Подготовить импорт модулей бота
+
+    Добавляет bot/ в sys.path, загружает config (или config.example.py,
+    если config.py не создан) и переопределяет его значения.
+    Вызывать до импорта database/services/handlers.
+
+    Args:
+        overrides: Значения конфигурации, например DATABASE_URL='sqlite+aiosqlite:///...'
+
+    Returns:
+        Модуль config
+    """
+    if str(BOT_DIR) not in sys.path:
+        sys.path.insert(0, str(BOT_DIR))
+
+    for key, value in overrides.items():
+        os.environ[key] = str(value)
+
+    if 'config' not in sys.modules:
+        try:
+            import config  # noqa: F401
+        except ImportError:
+            spec = importlib.util.spec_from_file_location('config', BOT_DIR / 'config.example.py')
+            module = importlib.util.module_from_spec(spec)
+            sys.modules['config'] = module
+            spec.loader.exec_module(module)
+
+    config = sys.modules['config']
+
+    # Логи бенчмарка не должны попадать в рабочий лог бота
+    config.LOG_FILE = Path(tempfile.gettempdir()) / 'blagovest-bench' / 'bot.log'
+    config.LOG_LEVEL = 'WARNING'
+
+    for key, value in overrides.items():
+        setattr(config, key, value)
+
+    return config
+
+
+def temp_sqlite_url(name: str = 'bench.db') -> str:
+    """URL временной SQLite базы для бенчмарка"""
+    directory = Path(tempfile.mkdtemp(prefix='blagovest-bench-'))
+    return f'sqlite+aiosqlite:///{directory / name}'
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк /week и «Детали»: запрос в WordPress против локальной копии
+бронирований services/booking_mirror.py
+
+Режимы:
+    wordpress - каждый вызов идёт в WordPress (без кэша, прежнее поведение)
+    mirror    - копия свежая, ответ только из SQLite
+    stale     - копия устарела: ответ из SQLite, сверка с WordPress в фоне
+    down      - WordPress отвечает 503, копия устарела
+
+Запуск:
+    python3 bench/bench_booking_mirror.py --users 200 --requests 2000 --latency-ms 50
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from _common import bootstrap, temp_sqlite_url
+from stubs import WordPressStub
+
+MODES = ['wordpress', 'mirror', 'stale', 'down']
+
+
+def summarize(latencies: list[float]) -> dict:
+    latencies = sorted(latencies)
+    return {
+        'p50_ms': round(latencies[len(latencies) // 2] * 1000, 3),
+        'p99_ms': round(latencies[int(len(latencies) * 0.99)] * 1000, 3),
+    }
+
+
+async def run(users: int, requests: int, latency_ms: float) -> list[dict]:
+    bootstrap(DATABASE_URL=temp_sqlite_url('mirror.db'), WP_CACHE_TTL=0,
+              WP_RETRY_ATTEMPTS=1, WP_BREAKER_FAILURE_THRESHOLD=10 ** 9)
+
+    from database.db import db
+    from services.wordpress_api import wp_api
+    import services.booking_mirror as mirror_module
+    from services.booking_mirror import booking_mirror
+
+    stub = WordPressStub(latency_ms=latency_ms)
+    await stub.start()
+    wp_api.base_url = stub.base_url
+    await wp_api.init_session()
+    await db.init_db()
+
+    seeded = []
+    for chat_id in range(1, users + 1):
+        seeded.append(await db.create_user(chat_id, f'user{chat_id}', 'customer', chat_id, chat_id,
+                                           f'Ученик {chat_id}', f'customer{chat_id}@example.com'))
+
+    # Первая сверка наполняет копию
+    for user in seeded:
+        await booking_mirror.get_schedule(user, 'week')
+
+    results = []
+    for mode in MODES:
+        mirror_module.MIRROR_MAX_AGE = 300 if mode == 'mirror' else 0
+        if mode == 'down':
+            stub.error_status = 503
+
+        stub.requests.clear()
+        latencies, failures = [], 0
+        started = time.perf_counter()
+
+        for _ in range(requests):
+            user = random.choice(seeded)
+            booking_id = user.chat_id * 10
+
+            request_started = time.perf_counter()
+            if mode == 'wordpress':
+                schedule = await wp_api._fetch_schedule(user.chat_id, period='week')
+                details = await wp_api._fetch_booking(booking_id, user.chat_id)
+            else:
+                schedule = await booking_mirror.get_schedule(user, 'week')
+                details = await booking_mirror.get_booking(user, booking_id)
+            latencies.append(time.perf_counter() - request_started)
+
+            if not schedule.get('success') or not details.get('success'):
+                failures += 1
+
+        elapsed = time.perf_counter() - started
+        while booking_mirror.revalidating:
+            await asyncio.sleep(0.01)
+
+        results.append({
+            'mode': mode,
+            'requests': requests,
+            'failures': failures,
+            'rps': round(requests / elapsed, 1),
+            **summarize(latencies),
+            'backend_requests': sum(stub.requests.values()),
+        })
+
+    await wp_api.close_session()
+    await stub.stop()
+    await db.engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=200, help='Пользователей (у каждого свои уроки)')
+    parser.add_argument('--requests', type=int, default=2000, help='Пар /week + «Детали» в каждом режиме')
+    parser.add_argument('--latency-ms', type=float, default=50.0, help='Задержка ответа заглушки WordPress')
+    parser.add_argument('--json', action='store_true', help='Вывести результат в JSON')
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.users, args.requests, args.latency_ms))
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{args.users} users, {args.requests} × (/week + details), {args.latency_ms} ms backend latency")
+    print(f"{'mode':<11}{'rps':>9}{'p50 ms':>10}{'p99 ms':>10}{'failures':>10}{'backend':>9}")
+    for result in results:
+        print(f"{result['mode']:<11}{result['rps']:>9}{result['p50_ms']:>10}{result['p99_ms']:>10}"
+              f"{result['failures']:>10}{result['backend_requests']:>9}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк сверки очереди напоминаний: периодическая полная сверка
+(/schedule/bulk для всех пользователей) против ленты изменений
+/bookings/changes (services/change_feed.py)
+
+Для каждого числа пользователей замеряются: тик полной сверки, первый
+запуск ленты (полная сверка на CHANGE_FEED_RESYNC_DAYS дней) и тик ленты,
+в котором изменилось --changes бронирований. Проверяется, что перенесённые
+лентой уроки оказались в очереди напоминаний с новым временем.
+
+Запуск:
+    python3 bench/bench_change_feed.py --users 100 500 1000 --changes 10 --latency-ms 20
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from datetime import timedelta
+
+from _common import bootstrap, temp_sqlite_url
+from stubs import WordPressStub, as_webhook_data, make_booking, site_now
+
+
+async def seed_users(db, count: int):
+    for chat_id in range(1, count + 1):
+        await db.create_user(chat_id, f'user{chat_id}', 'customer', chat_id, chat_id,
+                             f'Ученик {chat_id}', f'customer{chat_id}@example.com')
+
+
+async def run(user_counts: list[int], changes: int, latency_ms: float) -> list[dict]:
+    results = []
+
+    for count in user_counts:
+        bootstrap(DATABASE_URL=temp_sqlite_url(f'feed_{count}.db'))
+
+        # Каждый прогон - свежая БД и свежие глобальные экземпляры
+        for module in ('database.db', 'services.wordpress_api', 'services.reminder_engine',
+                       'services.booking_mirror', 'services.scheduler', 'services.change_feed'):
+            sys.modules.pop(module, None)
+
+        from database.db import db
+        from services.wordpress_api import wp_api
+        from services.booking_mirror import booking_mirror
+        from services.scheduler import ReminderScheduler
+        from services.change_feed import ChangeFeedSync
+
+        stub = WordPressStub(latency_ms=latency_ms)
+        await stub.start()
+        wp_api.base_url = stub.base_url
+
+        await db.init_db()
+        await seed_users(db, count)
+        scheduler = ReminderScheduler(bot=None)
+
+        async def apply_change(data: dict):
+            await booking_mirror.apply_event('booking_updated', data)
+            await scheduler.handle_booking_event('booking_updated', data)
+
+        feed = ChangeFeedSync(scheduler, apply_change)
+
+        # Периодическая полная сверка (прежний режим, установившийся тик)
+        await scheduler.sync_reminders()
+        stub.requests.clear()
+        started = time.perf_counter()
+        await scheduler.sync_reminders()
+        full_seconds = time.perf_counter() - started
+        full_requests = sum(stub.requests.values())
+
+        # Первый запуск ленты: курсор и полная сверка на CHANGE_FEED_RESYNC_DAYS дней
+        stub.requests.clear()
+        started = time.perf_counter()
+        await feed.poll()
+        resync_seconds = time.perf_counter() - started
+        resync_requests = sum(stub.requests.values())
+
+        # Тик ленты: --changes уроков перенесены на послезавтра
+        moved_date = (site_now() + timedelta(days=2)).strftime('%Y-%m-%d')
+        for chat_id in range(1, min(changes, count) + 1):
+            booking = make_booking(chat_id * 10, agent_id=1, customer_id=chat_id, start_date=moved_date)
+            stub.changes.append(as_webhook_data(booking, customer_chat_id=chat_id))
+
+        stub.requests.clear()
+        started = time.perf_counter()
+        await feed.poll()
+        feed_seconds = time.perf_counter() - started
+        feed_requests = sum(stub.requests.values())
+
+        moved = [
+            entry for key, entry in scheduler.engine.entries.items()
+            if key[0] == 10 and entry['booking']['start_date'] == moved_date
+        ]
+        if changes and not moved:
+            raise RuntimeError('Moved booking is not rescheduled by the change feed')
+
+        await wp_api.close_session()
+        await stub.stop()
+        await db.engine.dispose()
+
+        results.append({
+            'users': count,
+            'full_sync_s': round(full_seconds, 3),
+            'full_sync_requests': full_requests,
+            'first_feed_resync_s': round(resync_seconds, 3),
+            'first_feed_resync_requests': resync_requests,
+            'feed_tick_s': round(feed_seconds, 3),
+            'feed_tick_requests': feed_requests,
+            'feed_changes': feed.counters['changes'],
+        })
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, nargs='+', default=[100, 500, 1000])
+    parser.add_argument('--changes', type=int, default=10, help='Изменённых бронирований за тик ленты')
+    parser.add_argument('--latency-ms', type=float, default=20.0, help='Задержка заглушки WordPress на запрос')
+    parser.add_argument('--json', action='store_true', help='Вывести результат в JSON')
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.users, args.changes, args.latency_ms))
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'users':>7}{'full sync, s':>14}{'requests':>10}{'1st feed, s':>13}{'requests':>10}"
+          f"{'feed tick, s':>14}{'requests':>10}{'changes':>9}")
+    for result in results:
+        print(f"{result['users']:>7}{result['full_sync_s']:>14}{result['full_sync_requests']:>10}"
+              f"{result['first_feed_resync_s']:>13}{result['first_feed_resync_requests']:>10}"
+              f"{result['feed_tick_s']:>14}{result['feed_tick_requests']:>10}{result['feed_changes']:>9}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк конкурентной записи в SQLite: движок по умолчанию (rollback journal)
+против профиля database/profile.py (WAL, synchronous=NORMAL, busy_timeout)
+
+Писатели имитируют вебхуки и лог уведомлений (короткие транзакции с commit),
+читатели - обработчики команд и планировщик.
+
+Запуск:
+    python3 bench/bench_db_contention.py --writers 8 --readers 4 --seconds 5
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+from _common import bootstrap, temp_sqlite_url
+
+
+async def workload(engine, writers: int, readers: int, seconds: float) -> dict:
+    """Запустить писателей и читателей на seconds секунд"""
+    from sqlalchemy import select, func
+    from sqlalchemy.ext.asyncio import async_sessionmaker, AsyncSession
+    from database.models import Base, NotificationLog, WebhookEvent
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    session_factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    deadline = time.perf_counter() + seconds
+    stats = {'writes': 0, 'reads': 0, 'errors': 0, 'latencies': []}
+
+    async def writer(number: int):
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                async with session_factory() as session:
+                    session.add(WebhookEvent(event_type='booking_updated', booking_id=number, payload='{}'))
+                    session.add(NotificationLog(chat_id=number, notification_type='booking_updated',
+                                                booking_id=number, success=True))
+                    await session.commit()
+                stats['writes'] += 1
+                stats['latencies'].append(time.perf_counter() - started)
+            except Exception:
+                stats['errors'] += 1
+
+    async def reader():
+        while time.perf_counter() < deadline:
+            try:
+                async with session_factory() as session:
+                    await session.execute(select(func.count()).select_from(NotificationLog))
+                    await session.execute(
+                        select(WebhookEvent).where(WebhookEvent.status == 'pending').limit(100)
+                    )
+                stats['reads'] += 1
+            except Exception:
+                stats['errors'] += 1
+
+    await asyncio.gather(
+        *(writer(number) for number in range(writers)),
+        *(reader() for _ in range(readers))
+    )
+    await engine.dispose()
+
+    latencies = sorted(stats['latencies']) or [0.0]
+    return {
+        'writes_per_s': round(stats['writes'] / seconds, 1),
+        'reads_per_s': round(stats['reads'] / seconds, 1),
+        'errors': stats['errors'],
+        'write_p50_ms': round(latencies[len(latencies) // 2] * 1000, 2),
+        'write_p99_ms': round(latencies[int(len(latencies) * 0.99)] * 1000, 2),
+    }
+
+
+async def run(writers: int, readers: int, seconds: float) -> dict:
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from database.profile import create_engine
+
+    default_url = temp_sqlite_url('default.db')
+    profile_url = temp_sqlite_url('profile.db')
+
+    return {
+        'writers': writers,
+        'readers': readers,
+        'default': await workload(create_async_engine(default_url), writers, readers, seconds),
+        'profile': await workload(create_engine(profile_url), writers, readers, seconds),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--writers', type=int, default=8, help='Количество конкурентных писателей')
+    parser.add_argument('--readers', type=int, default=4, help='Количество конкурентных читателей')
+    parser.add_argument('--seconds', type=float, default=5.0, help='Длительность каждого прогона')
+    parser.add_argument('--json', action='store_true', help='Вывести результат в JSON')
+    args = parser.parse_args()
+
+    bootstrap()
+    result = asyncio.run(run(args.writers, args.readers, args.seconds))
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+
+    print(f"{args.writers} writers, {args.readers} readers, {args.seconds} s")
+    print(f"{'engine':>8} {'writes/s':>9} {'reads/s':>8} {'errors':>7} {'p50, ms':>8} {'p99, ms':>8}")
+    for name in ('default', 'profile'):
+        row = result[name]
+        print(f"{name:>8} {row['writes_per_s']:>9} {row['reads_per_s']:>8} {row['errors']:>7} "
+              f"{row['write_p50_ms']:>8} {row['write_p99_ms']:>8}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк конвертации времени бронирований в часовой пояс пользователя:
+прежняя конвертация (strptime + pytz.timezone на каждый вызов) против
+кэша utils.timezones и пакетного convert_bookings_to_timezone
+
+Запуск:
+    python3 bench/bench_formatters.py --bookings 50 --rounds 200
+"""
+
+import argparse
+import json
+import time
+from datetime import datetime, timedelta
+
+from _common import bootstrap
+
+TIMEZONES = ['Europe/Moscow', 'America/New_York', 'Asia/Tokyo', 'Europe/Berlin', 'Asia/Yekaterinburg']
+
+
+def legacy_convert(date_str: str, time_str: str, target_timezone: str, source_timezone: str) -> tuple:
+    """Прежняя реализация convert_datetime_to_timezone без кэша"""
+    import pytz
+
+    naive_dt = datetime.strptime(f"{date_str} {time_str}", "%Y-%m-%d %H:%M")
+    aware_dt = pytz.timezone(source_timezone).localize(naive_dt)
+    converted_dt = aware_dt.astimezone(pytz.timezone(target_timezone))
+    return converted_dt.strftime("%Y-%m-%d"), converted_dt.strftime("%H:%M"), converted_dt.strftime("%Z")
+
+
+def make_week(count: int) -> list[dict]:
+    """Расписание агента на неделю: count уроков по сетке с шагом в час"""
+    start = datetime(2026, 3, 2, 9, 0)
+    bookings = []
+    for i in range(count):
+        lesson = start + timedelta(days=i % 7, hours=i // 7)
+        bookings.append({
+            'id': i + 1,
+            'start_date': lesson.strftime('%Y-%m-%d'),
+            'start_time': lesson.strftime('%H:%M'),
+            'end_time': (lesson + timedelta(minutes=45)).strftime('%H:%M'),
+        })
+    return bookings
+
+
+def measure(function, rounds: int) -> float:
+    """Среднее время одного вызова в микросекундах"""
+    started = time.perf_counter()
+    for _ in range(rounds):
+        function()
+    return (time.perf_counter() - started) / rounds * 1_000_000
+
+
+def run(bookings_count: int, rounds: int) -> dict:
+    config = bootstrap()
+
+    from utils import timezones
+
+    bookings = make_week(bookings_count)
+    source = config.TIMEZONE
+
+    def legacy_week():
+        for timezone in TIMEZONES:
+            for booking in bookings:
+                legacy_convert(booking['start_date'], booking['start_time'], timezone, source)
+                legacy_convert(booking['start_date'], booking['end_time'], timezone, source)
+
+    def cached_week():
+        for timezone in TIMEZONES:
+            for booking in bookings:
+                timezones.format_datetime_with_timezone(booking['start_date'], booking['start_time'], timezone)
+                timezones.format_datetime_with_timezone(booking['start_date'], booking['end_time'], timezone)
+
+    def batch_week():
+        for timezone in TIMEZONES:
+            timezones.convert_bookings_to_timezone(bookings, timezone)
+
+    # Результаты должны совпадать с прежней реализацией
+    for timezone in TIMEZONES:
+        converted = timezones.convert_bookings_to_timezone(bookings, timezone)
+        for booking, actual in zip(bookings, converted):
+            expected = legacy_convert(booking['start_date'], booking['start_time'], timezone, source)
+            assert expected[:2] == (actual['start_date'], actual['start_time']), (booking, timezone)
+
+    timezones._convert_datetime.cache_clear()
+    started = time.perf_counter()
+    cached_week()
+    cold_us = (time.perf_counter() - started) * 1_000_000
+
+    return {
+        'bookings': bookings_count,
+        'timezones': len(TIMEZONES),
+        'legacy_us': round(measure(legacy_week, rounds), 1),
+        'cached_cold_us': round(cold_us, 1),
+        'cached_warm_us': round(measure(cached_week, rounds), 1),
+        'batch_us': round(measure(batch_week, rounds), 1),
+        'cache': timezones.conversion_cache_info(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--bookings', type=int, default=50, help='Уроков в расписании на неделю')
+    parser.add_argument('--rounds', type=int, default=200, help='Повторов каждого замера')
+    parser.add_argument('--json', action='store_true', help='Вывести результат в JSON')
+    args = parser.parse_args()
+
+    result = run(args.bookings, args.rounds)
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+
+    print(f"{result['bookings']} bookings x {result['timezones']} timezones (2 conversions per booking)")
+    print(f"  legacy:       {result['legacy_us']:>10} us")
+    print(f"  cached, cold: {result['cached_cold_us']:>10} us")
+    print(f"  cached, warm: {result['cached_warm_us']:>10} us")
+    print(f"  batch, warm:  {result['batch_us']:>10} us")
+    print(f"  cache: {result['cache']}")
+
+
+if __name__ == '__main__':
+    main()
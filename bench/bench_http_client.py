@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк задержки запросов к WordPress на холодных и тёплых соединениях:
+новая aiohttp.ClientSession на каждый запрос (как прежнее подтверждение
+agent token) против общего клиента services/http_client.py с keep-alive
+
+С --tls заглушка работает по HTTPS с самоподписанным сертификатом
+(нужен openssl), так что в холодный запрос входит TLS handshake.
+
+Запуск:
+    python3 bench/bench_http_client.py --requests 300 --tls
+"""
+
+import argparse
+import asyncio
+import json
+import ssl
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+
+from aiohttp import web
+
+from _common import bootstrap
+
+
+def make_ssl_contexts(directory: Path) -> tuple:
+    """Самоподписанный сертификат для 127.0.0.1: контексты сервера и клиента"""
+    cert, key = directory / 'cert.pem', directory / 'key.pem'
+    subprocess.run(
+        ['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1',
+         '-subj', '/CN=127.0.0.1', '-keyout', str(key), '-out', str(cert)],
+        check=True, capture_output=True
+    )
+
+    server = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+    server.load_cert_chain(cert, key)
+
+    client = ssl.create_default_context(cafile=str(cert))
+    client.check_hostname = False
+    return server, client
+
+
+async def start_stub(ssl_context) -> tuple:
+    """Заглушка /agent-token/confirm"""
+    async def confirm(request: web.Request) -> web.Response:
+        await request.json()
+        return web.json_response({'success': True, 'agent_name': 'Учитель 1'})
+
+    app = web.Application()
+    app.router.add_post('/agent-token/confirm', confirm)
+
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0, ssl_context=ssl_context)
+    await site.start()
+
+    port = site._server.sockets[0].getsockname()[1]
+    scheme = 'https' if ssl_context else 'http'
+    return runner, f'{scheme}://127.0.0.1:{port}'
+
+
+def summarize(latencies: list[float]) -> dict:
+    latencies = sorted(latencies)
+    return {
+        'p50_ms': round(latencies[len(latencies) // 2] * 1000, 3),
+        'p99_ms': round(latencies[int(len(latencies) * 0.99)] * 1000, 3),
+        'mean_ms': round(sum(latencies) / len(latencies) * 1000, 3),
+    }
+
+
+async def run(requests: int, tls: bool) -> dict:
+    bootstrap()
+
+    import aiohttp
+    from services.http_client import http_client
+
+    with tempfile.TemporaryDirectory() as directory:
+        server_ssl, client_ssl = make_ssl_contexts(Path(directory)) if tls else (None, None)
+        runner, base_url = await start_stub(server_ssl)
+
+        url = f'{base_url}/agent-token/confirm'
+        payload = {'token': 'x' * 32, 'telegram_id': 1, 'telegram_data': {'username': 'bench'}}
+
+        # Холодные соединения: новая сессия на каждый запрос
+        cold = []
+        for _ in range(requests):
+            started = time.perf_counter()
+            async with aiohttp.ClientSession() as session:
+                async with session.post(url, json=payload, ssl=client_ssl) as response:
+                    await response.json()
+            cold.append(time.perf_counter() - started)
+
+        # Тёплые соединения: общий клиент
+        session = await http_client.get_session()
+        warm = []
+        for _ in range(requests):
+            started = time.perf_counter()
+            async with session.post(url, json=payload, ssl=client_ssl) as response:
+                await response.json()
+            warm.append(time.perf_counter() - started)
+
+        stats = http_client.stats()
+        await http_client.close()
+        await runner.cleanup()
+
+    return {
+        'requests': requests,
+        'tls': tls,
+        'cold': summarize(cold),
+        'warm': summarize(warm),
+        'warm_connections_created': stats['connections_created'],
+        'warm_connections_reused': stats['connections_reused'],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=300, help='Запросов в каждом режиме')
+    parser.add_argument('--tls', action='store_true', help='HTTPS с самоподписанным сертификатом')
+    parser.add_argument('--json', action='store_true', help='Вывести результат в JSON')
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args.requests, args.tls))
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+
+    print(f"{result['requests']} sequential requests, {'HTTPS' if result['tls'] else 'HTTP'}")
+    for mode in ('cold', 'warm'):
+        print(f"  {mode}: p50 {result[mode]['p50_ms']} ms, p99 {result[mode]['p99_ms']} ms, mean {result[mode]['mean_ms']} ms")
+    print(f"  shared client: {result['warm_connections_created']} connections created, "
+          f"{result['warm_connections_reused']} reused")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,448 @@
+#!/usr/bin/env python3
+"""
+Нагрузочный прогон TelegramBotService целиком против локальных заглушек
+Telegram Bot API и REST API плагина (stubs.py)
+
+Бот запускается как в работе (on_startup, web сервер, очередь вебхуков,
+планировщик), но Bot API и WordPress заменены заглушками с настраиваемой
+задержкой и внедрением ошибок. Сценарии:
+
+    webhooks  - поток вебхуков booking_created: задержка приёма (202),
+                задержка доставки до Telegram и пропускная способность
+    commands  - /today от пользователей и привязка агентов (/api/agent-token
+                + /start <token>) через Dispatcher.feed_update
+    sync      - полная сверка напоминаний и тик ленты изменений
+    reminders - срабатывание напоминаний: отставание от срока и пропускная способность
+
+Отчёт - JSON (p50/p99, пропускная способность, пиковый RSS), который
+можно сравнивать между коммитами: --output new.json --compare old.json
+
+Запуск:
+    python3 bench/bench_load.py --users 500 --webhooks 300 --output load.json
+    python3 bench/bench_load.py --wp-error-rate 0.05 --tg-error-rate 0.02 --tg-error-status 429
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from _common import bootstrap, temp_sqlite_url
+from stubs import TelegramStub, WordPressStub, as_webhook_data, make_booking, site_now
+
+SCENARIOS = ['webhooks', 'commands', 'sync', 'reminders']
+
+WEBHOOK_SECRET = 'bench-secret'
+
+# Агенты занимают отдельный диапазон chat_id
+AGENT_CHAT_BASE = 10_000_000
+
+
+def summarize(latencies: list[float]) -> dict:
+    """p50/p99/max в миллисекундах"""
+    if not latencies:
+        return {'p50_ms': None, 'p99_ms': None, 'max_ms': None}
+    latencies = sorted(latencies)
+    return {
+        'p50_ms': round(latencies[len(latencies) // 2] * 1000, 3),
+        'p99_ms': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000, 3),
+        'max_ms': round(latencies[-1] * 1000, 3),
+    }
+
+
+def peak_rss_mb() -> float:
+    """Пиковый RSS процесса (ru_maxrss в КиБ на Linux)"""
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True, cwd=Path(__file__).parent).stdout.strip()
+    except Exception:
+        return None
+
+
+async def wait_for(condition, timeout: float) -> bool:
+    """Ждать выполнения condition() не дольше timeout секунд"""
+    deadline = time.perf_counter() + timeout
+    while not condition():
+        if time.perf_counter() > deadline:
+            return False
+        await asyncio.sleep(0.01)
+    return True
+
+
+async def seed_users(db, customers: int, agents: int):
+    for chat_id in range(1, customers + 1):
+        await db.create_user(chat_id, f'user{chat_id}', 'customer', chat_id, chat_id,
+                             f'Ученик {chat_id}', f'customer{chat_id}@example.com')
+    for agent_id in range(1, agents + 1):
+        await db.create_user(AGENT_CHAT_BASE + agent_id, f'agent{agent_id}', 'agent', agent_id, agent_id,
+                             f'Учитель {agent_id}', f'agent{agent_id}@example.com')
+
+
+async def scenario_webhooks(args, base_url: str, telegram: TelegramStub) -> dict:
+    """Поток вебхуков booking_created: приём и доставка агенту и клиенту"""
+    import aiohttp
+
+    start_date = (site_now() + timedelta(days=2)).strftime('%Y-%m-%d')
+    events = []
+    for i in range(args.webhooks):
+        booking_id = 1_000_000 + i
+        customer_chat_id = 1 + i % args.users
+        agent_id = 1 + i % args.agents
+        booking = make_booking(booking_id, agent_id=agent_id, customer_id=customer_chat_id,
+                               start_date=start_date, start_time='12:00', end_time='12:45')
+        events.append((booking_id, as_webhook_data(booking, customer_chat_id, AGENT_CHAT_BASE + agent_id)))
+
+    posted_at = {}
+    accept_latencies = []
+    statuses = {}
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async with aiohttp.ClientSession() as session:
+        started = time.perf_counter()
+
+        async def post(index: int, booking_id: int, data: dict):
+            if args.rate:
+                # Равномерный поток с заданной частотой
+                await asyncio.sleep(max(0.0, started + index / args.rate - time.perf_counter()))
+            async with semaphore:
+                request_started = time.perf_counter()
+                posted_at[booking_id] = request_started
+                async with session.post(f'{base_url}/webhook/notification',
+                                        json={'event_type': 'booking_created', 'data': data},
+                                        headers={'X-Webhook-Secret': WEBHOOK_SECRET}) as response:
+                    await response.read()
+                accept_latencies.append(time.perf_counter() - request_started)
+                statuses[response.status] = statuses.get(response.status, 0) + 1
+
+        await asyncio.gather(*(post(i, booking_id, data) for i, (booking_id, data) in enumerate(events)))
+        accept_seconds = time.perf_counter() - started
+
+    # Доставка: оба получателя (агент и клиент) получили сообщение
+    def deliveries() -> dict:
+        delivered = {}
+        for received_at, _, booking_id in telegram.messages:
+            if booking_id in posted_at:
+                delivered.setdefault(booking_id, []).append(received_at)
+        return delivered
+
+    drained = await wait_for(
+        lambda: sum(1 for times in deliveries().values() if len(times) >= 2) >= len(events),
+        args.drain_timeout
+    )
+    delivered = {booking_id: times for booking_id, times in deliveries().items() if len(times) >= 2}
+    delivery_latencies = [max(times) - posted_at[booking_id] for booking_id, times in delivered.items()]
+    finished = max((max(times) for times in delivered.values()), default=started)
+
+    return {
+        'events': len(events),
+        'accepted': statuses.get(202, 0),
+        'statuses': {str(status): count for status, count in sorted(statuses.items())},
+        'accept': summarize(accept_latencies),
+        'accept_rps': round(len(events) / accept_seconds, 1),
+        'delivered': len(delivered),
+        'drained': drained,
+        'delivery': summarize(delivery_latencies),
+        'delivery_events_per_s': round(len(delivered) / (finished - started), 1) if delivered else 0.0,
+        'telegram_messages': len([message for message in telegram.messages if message[2] in posted_at]),
+    }
+
+
+async def scenario_commands(args, service, base_url: str, telegram: TelegramStub) -> dict:
+    """/today от случайных пользователей и привязка агентов по agent token"""
+    import aiohttp
+    from aiogram.types import Update
+
+    update_id = 0
+
+    def message_update(chat_id: int, text: str) -> Update:
+        nonlocal update_id
+        update_id += 1
+        return Update.model_validate({
+            'update_id': update_id,
+            'message': {
+                'message_id': update_id,
+                'date': int(time.time()),
+                'chat': {'id': chat_id, 'type': 'private'},
+                'from': {'id': chat_id, 'is_bot': False, 'first_name': f'User{chat_id}', 'username': f'user{chat_id}'},
+                'text': text,
+            },
+        }, context={'bot': service.bot})
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+    sent_before = len(telegram.messages)
+    errors = {}
+
+    async def feed(update: Update, latencies: list):
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                await service.dp.feed_update(service.bot, update)
+            except Exception as e:
+                # Как при polling: ошибка обработчика не останавливает остальные апдейты
+                errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+            latencies.append(time.perf_counter() - started)
+
+    today_latencies = []
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        feed(message_update(random.randint(1, args.users), '/today'), today_latencies)
+        for _ in range(args.commands)
+    ))
+    today_seconds = time.perf_counter() - started
+
+    # Привязка агента: токен от WordPress, затем /start <token> в Telegram
+    expires_at = (datetime.now(timezone.utc) + timedelta(minutes=15)).isoformat()
+    async with aiohttp.ClientSession() as session:
+        for number in range(args.bindings):
+            async with session.post(f'{base_url}/api/agent-token',
+                                    json={'token': f'bench-token-{number}-{1 + number % args.agents}',
+                                          'agent_id': 1 + number % args.agents, 'expires_at': expires_at},
+                                    headers={'X-Webhook-Secret': WEBHOOK_SECRET}) as response:
+                await response.read()
+
+    binding_latencies = []
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        feed(message_update(20_000_000 + number, f'/start bench-token-{number}-{1 + number % args.agents}'),
+             binding_latencies)
+        for number in range(args.bindings)
+    ))
+    binding_seconds = time.perf_counter() - started
+
+    return {
+        'today': {
+            'commands': args.commands,
+            **summarize(today_latencies),
+            'rps': round(args.commands / today_seconds, 1),
+        },
+        'agent_binding': {
+            'bindings': args.bindings,
+            **summarize(binding_latencies),
+            'rps': round(args.bindings / binding_seconds, 1) if args.bindings else 0.0,
+        },
+        'errors': errors,
+        'telegram_messages': len(telegram.messages) - sent_before,
+    }
+
+
+async def scenario_sync(args, service, wordpress: WordPressStub) -> dict:
+    """Полная сверка напоминаний и тик ленты изменений с --changes бронированиями"""
+    requests_before = sum(wordpress.requests.values())
+    started = time.perf_counter()
+    synced = await service.scheduler.sync_reminders()
+    full_seconds = time.perf_counter() - started
+    full_requests = sum(wordpress.requests.values()) - requests_before
+
+    moved_date = (site_now() + timedelta(days=3)).strftime('%Y-%m-%d')
+    for chat_id in range(1, min(args.changes, args.users) + 1):
+        booking = make_booking(chat_id * 10, agent_id=1, customer_id=chat_id, start_date=moved_date)
+        wordpress.changes.append(as_webhook_data(booking, customer_chat_id=chat_id))
+
+    requests_before = sum(wordpress.requests.values())
+    started = time.perf_counter()
+    await service.change_feed.poll()
+    feed_seconds = time.perf_counter() - started
+
+    return {
+        'full_sync': {'users': args.users + args.agents, 'ok': synced,
+                      'seconds': round(full_seconds, 3), 'wordpress_requests': full_requests},
+        'change_feed_tick': {'changes': args.changes, 'seconds': round(feed_seconds, 3),
+                             'wordpress_requests': sum(wordpress.requests.values()) - requests_before},
+    }
+
+
+async def scenario_reminders(args, service, telegram: TelegramStub) -> dict:
+    """--reminders напоминаний с одним сроком: отставание доставки от срока"""
+    from database.db import db
+    from utils.reminders import get_reminder_offsets
+
+    count = min(args.reminders, args.users)
+    start_date = (site_now() + timedelta(days=1)).strftime('%Y-%m-%d')
+    fire_at = datetime.now(timezone.utc) + timedelta(seconds=2)
+    chat_ids = list(range(1, count + 1))
+
+    for chat_id in chat_ids:
+        minutes_before = get_reminder_offsets(await db.get_settings(chat_id))[0]
+        booking = make_booking(2_000_000 + chat_id, agent_id=1, customer_id=chat_id, start_date=start_date)
+        await service.scheduler.engine.schedule(booking, chat_id, minutes_before,
+                                                fire_at + timedelta(minutes=minutes_before))
+
+    # Срок срабатывания в шкале perf_counter
+    fire_perf = time.perf_counter() + (fire_at - datetime.now(timezone.utc)).total_seconds()
+    sent_before = len(telegram.messages)
+    targets = set(chat_ids)
+
+    def received() -> dict:
+        times = {}
+        for received_at, chat_id, _ in telegram.messages[sent_before:]:
+            if chat_id in targets and received_at >= fire_perf:
+                times.setdefault(chat_id, received_at)
+        return times
+
+    drained = await wait_for(lambda: len(received()) >= count,
+                             max(0.0, fire_perf - time.perf_counter()) + args.drain_timeout)
+    times = received()
+    lags = [received_at - fire_perf for received_at in times.values()]
+
+    return {
+        'reminders': count,
+        'delivered': len(times),
+        'drained': drained,
+        'lag': summarize(lags),
+        'per_s': round(len(times) / max(lags), 1) if lags and max(lags) > 0 else None,
+    }
+
+
+async def run(args) -> dict:
+    bootstrap(
+        DATABASE_URL=temp_sqlite_url('load.db'),
+        BOT_TOKEN='123456789:BENCHBENCHBENCHBENCHBENCHBENCHBENCH',
+        WEBHOOK_SECRET=WEBHOOK_SECRET,
+        TELEGRAM_GLOBAL_RATE=args.telegram_rate,
+        CHANGE_FEED_INTERVAL=3600,
+        TRACE_FILE=Path(tempfile.mkdtemp(prefix='blagovest-bench-')) / 'traces.jsonl',
+    )
+
+    from aiohttp import web
+    import bot as bot_module
+    from database.db import db
+    from services.wordpress_api import wp_api
+
+    wordpress = WordPressStub(latency_ms=args.wp_latency_ms)
+    wordpress.error_rate = args.wp_error_rate
+    telegram = TelegramStub(latency_ms=args.tg_latency_ms, error_rate=args.tg_error_rate,
+                            error_status=args.tg_error_status)
+    await wordpress.start()
+    await telegram.start()
+    wp_api.base_url = wordpress.base_url
+
+    service = bot_module.TelegramBotService()
+    await service.bot.session.close()
+    service.bot.session = telegram.session()
+
+    # Пользователи до запуска: первая сверка ленты охватывает всех
+    await db.init_db()
+    await seed_users(db, args.users, args.agents)
+
+    started = time.perf_counter()
+    await service.on_startup()
+    await service.change_feed.poll()
+    startup_seconds = time.perf_counter() - started
+
+    runner = web.AppRunner(service.app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    base_url = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}"
+
+    report = {
+        'commit': git_commit(),
+        'params': {key: value for key, value in vars(args).items() if key not in ('output', 'compare', 'json')},
+        'startup_seconds': round(startup_seconds, 3),
+        'scenarios': {},
+    }
+
+    try:
+        for scenario in args.scenarios:
+            started = time.perf_counter()
+            if scenario == 'webhooks':
+                result = await scenario_webhooks(args, base_url, telegram)
+            elif scenario == 'commands':
+                result = await scenario_commands(args, service, base_url, telegram)
+            elif scenario == 'sync':
+                result = await scenario_sync(args, service, wordpress)
+            else:
+                result = await scenario_reminders(args, service, telegram)
+            result['seconds'] = round(time.perf_counter() - started, 3)
+            result['peak_rss_mb'] = peak_rss_mb()
+            report['scenarios'][scenario] = result
+    finally:
+        await runner.cleanup()
+        await service.on_shutdown()
+        await telegram.stop()
+        await wordpress.stop()
+
+    report['wordpress_requests'] = dict(wordpress.requests)
+    report['telegram_requests'] = dict(telegram.requests)
+    report['peak_rss_mb'] = peak_rss_mb()
+    return report
+
+
+def flatten(value, prefix: str = '') -> dict:
+    """Числовые значения отчёта с путями вида scenarios.webhooks.accept.p99_ms"""
+    if isinstance(value, dict):
+        result = {}
+        for key, item in value.items():
+            result.update(flatten(item, f'{prefix}.{key}' if prefix else key))
+        return result
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return {prefix: value}
+    return {}
+
+
+def compare(old: dict, new: dict):
+    """Таблица изменений числовых метрик относительно прошлого отчёта"""
+    old_values, new_values = flatten(old.get('scenarios', {})), flatten(new.get('scenarios', {}))
+    old_values['peak_rss_mb'], new_values['peak_rss_mb'] = old.get('peak_rss_mb'), new.get('peak_rss_mb')
+
+    print(f"\n{'metric':<52}{old.get('commit') or 'old':>12}{new.get('commit') or 'new':>12}{'change':>10}")
+    for key in sorted(set(old_values) & set(new_values)):
+        before, after = old_values[key], new_values[key]
+        if before is None or after is None:
+            continue
+        change = f'{(after - before) / before * 100:+.1f}%' if before else '-'
+        print(f'{key:<52}{before:>12}{after:>12}{change:>10}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument('--users', type=int, default=500, help='Клиентов (у каждого свой чат)')
+    parser.add_argument('--agents', type=int, default=50, help='Агентов (у каждого свой чат)')
+    parser.add_argument('--webhooks', type=int, default=300, help='Вебхуков booking_created в потоке')
+    parser.add_argument('--rate', type=float, default=0, help='Вебхуков в секунду (0 - без ограничения)')
+    parser.add_argument('--concurrency', type=int, default=20, help='Одновременных запросов и команд')
+    parser.add_argument('--commands', type=int, default=300, help='Команд /today')
+    parser.add_argument('--bindings', type=int, default=20, help='Привязок агентов по agent token')
+    parser.add_argument('--changes', type=int, default=20, help='Изменений в тике ленты')
+    parser.add_argument('--reminders', type=int, default=200, help='Напоминаний с одним сроком')
+    parser.add_argument('--wp-latency-ms', type=float, default=50.0, help='Задержка заглушки WordPress')
+    parser.add_argument('--wp-error-rate', type=float, default=0.0, help='Доля ответов WordPress 500')
+    parser.add_argument('--tg-latency-ms', type=float, default=30.0, help='Задержка заглушки Bot API')
+    parser.add_argument('--tg-error-rate', type=float, default=0.0, help='Доля ошибок Bot API')
+    parser.add_argument('--tg-error-status', type=int, default=429, help='Код ошибки Bot API (429 - с retry_after)')
+    parser.add_argument('--telegram-rate', type=int, default=30, help='TELEGRAM_GLOBAL_RATE бота')
+    parser.add_argument('--drain-timeout', type=float, default=120, help='Сколько ждать доставки (в секундах)')
+    parser.add_argument('--output', type=Path, help='Сохранить отчёт в JSON файл')
+    parser.add_argument('--compare', type=Path, help='Сравнить с прошлым отчётом')
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    text = json.dumps(report, indent=2, sort_keys=True, ensure_ascii=False)
+
+    if args.output:
+        args.output.write_text(text + '\n', encoding='utf-8')
+    print(text)
+
+    if args.compare:
+        compare(json.loads(args.compare.read_text(encoding='utf-8')), report)
+
+    incomplete = [name for name, result in report['scenarios'].items() if result.get('drained') is False]
+    if incomplete:
+        print(f"Not delivered within --drain-timeout: {', '.join(incomplete)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
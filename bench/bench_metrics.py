@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк стоимости метрик services/metrics.py на горячих путях
+
+Замеряет накладные расходы на один вызов: Histogram.observe, блок
+with histogram.time(), декоратор timed для async функции, сессию БД
+TimedSession против AsyncSession, а также время рендера /metrics.
+
+Запуск:
+    python3 bench/bench_metrics.py --calls 200000
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+from _common import bootstrap, temp_sqlite_url
+
+
+def per_call_us(seconds: float, calls: int) -> float:
+    return round(seconds / calls * 1e6, 3)
+
+
+async def run(calls: int, sessions: int) -> dict:
+    bootstrap(DATABASE_URL=temp_sqlite_url('metrics.db'))
+
+    from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+    from database.db import db, TimedSession
+    from services.metrics import MetricsRegistry, timed
+
+    registry = MetricsRegistry()
+    histogram = registry.histogram('bench_seconds', 'Bench', ('endpoint', 'outcome'))
+    result = {'calls': calls}
+
+    # Пустой цикл - базовая линия
+    started = time.perf_counter()
+    for _ in range(calls):
+        pass
+    baseline = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for i in range(calls):
+        histogram.observe(0.0123, 'schedule', '2xx')
+    result['observe_us'] = per_call_us(time.perf_counter() - started - baseline, calls)
+
+    started = time.perf_counter()
+    for _ in range(calls):
+        with histogram.time('schedule', '2xx'):
+            pass
+    result['timer_block_us'] = per_call_us(time.perf_counter() - started - baseline, calls)
+
+    async def noop():
+        return None
+
+    timed_noop = timed(histogram, 'noop', 'ok')(noop)
+
+    started = time.perf_counter()
+    for _ in range(calls):
+        await noop()
+    plain = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for _ in range(calls):
+        await timed_noop()
+    result['timed_decorator_us'] = per_call_us(time.perf_counter() - started - plain, calls)
+
+    # Сессия БД с простым запросом: AsyncSession против TimedSession
+    from sqlalchemy import text
+    await db.init_db()
+    for name, session_class in (('plain', AsyncSession), ('timed', TimedSession)):
+        factory = async_sessionmaker(db.engine, class_=session_class, expire_on_commit=False)
+        started = time.perf_counter()
+        for _ in range(sessions):
+            async with factory(info={'operation': 'bench'}) as session:
+                await session.execute(text('SELECT 1'))
+        result[f'db_session_{name}_us'] = per_call_us(time.perf_counter() - started, sessions)
+    await db.engine.dispose()
+
+    # Рендер /metrics: 7 гистограмм по 20 сериям
+    for number in range(7):
+        extra = registry.histogram(f'render_{number}_seconds', 'Render', ('label',))
+        for label in range(20):
+            extra.observe(0.01, str(label))
+    started = time.perf_counter()
+    for _ in range(100):
+        body = registry.render()
+    result['render_ms'] = round((time.perf_counter() - started) / 100 * 1000, 3)
+    result['render_bytes'] = len(body)
+
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--calls', type=int, default=200000, help='Вызовов на каждый замер')
+    parser.add_argument('--sessions', type=int, default=2000, help='Сессий БД на каждый вариант')
+    parser.add_argument('--json', action='store_true', help='Вывести результат в JSON')
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args.calls, args.sessions))
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+
+    print(f"{result['calls']} calls per measurement")
+    print(f"  Histogram.observe:      {result['observe_us']} us")
+    print(f"  with histogram.time():  {result['timer_block_us']} us")
+    print(f"  @timed async function:  +{result['timed_decorator_us']} us")
+    print(f"  DB session + SELECT 1:  {result['db_session_plain_us']} us plain, {result['db_session_timed_us']} us timed")
+    print(f"  /metrics render:        {result['render_ms']} ms ({result['render_bytes']} bytes)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк определения получателей события бронирования: прежние запросы
+привязок, пользователей и настроек по одному против db.resolve_recipients
+
+Запуск:
+    python3 bench/bench_recipients.py --bindings 10000 --agents 20
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+from _common import bootstrap, temp_sqlite_url
+
+
+async def seed(db, bindings: int, agents: int):
+    """Создать привязки к агентам, пользователей и их настройки"""
+    from database.models import AgentBinding, User, Settings
+
+    async with db.get_session() as session:
+        for chat_id in range(1, bindings + 1):
+            session.add(AgentBinding(telegram_id=chat_id, agent_id=chat_id % agents + 1))
+            session.add(User(
+                chat_id=chat_id,
+                username=f'user{chat_id}',
+                user_type='agent',
+                wp_user_id=chat_id,
+                latepoint_id=chat_id % agents + 1,
+                name=f'User {chat_id}',
+                email=f'user{chat_id}@example.com',
+            ))
+            session.add(Settings(chat_id=chat_id, notify_on_create=chat_id % 10 != 0))
+        await session.commit()
+
+
+async def legacy_resolve(db, agent_id: int, chat_ids: list[int]) -> list[int]:
+    """Прежний алгоритм: привязки, затем пользователь и настройки по одному запросу"""
+    from sqlalchemy import select
+    from database.models import AgentBinding, User, Settings
+
+    recipients = []
+
+    async with db.get_session() as session:
+        result = await session.execute(select(AgentBinding).where(AgentBinding.agent_id == agent_id))
+        bindings = result.scalars().all()
+
+    for binding in bindings:
+        async with db.get_session() as session:
+            result = await session.execute(select(User).where(User.chat_id == binding.telegram_id))
+            result.scalar_one_or_none()
+        recipients.append(binding.telegram_id)
+
+    for chat_id in chat_ids:
+        if chat_id in recipients:
+            continue
+        async with db.get_session() as session:
+            result = await session.execute(select(Settings).where(Settings.chat_id == chat_id))
+            settings = result.scalar_one_or_none()
+        if settings and settings.notify_on_create:
+            recipients.append(chat_id)
+
+    return recipients
+
+
+async def run(bindings: int, agents: int) -> dict:
+    from sqlalchemy import event
+
+    bootstrap(DATABASE_URL=temp_sqlite_url('recipients.db'))
+
+    from database.db import db
+
+    await db.init_db()
+    await seed(db, bindings, agents)
+
+    queries = {'count': 0}
+
+    @event.listens_for(db.engine.sync_engine, 'before_cursor_execute')
+    def count_query(*args):
+        queries['count'] += 1
+
+    # Явные chat_id: один привязанный аккаунт и один клиент без привязки
+    def webhook_chat_ids(agent_id):
+        return [agent_id, bindings + agent_id]
+
+    started = time.perf_counter()
+    for agent_id in range(1, agents + 1):
+        await legacy_resolve(db, agent_id, webhook_chat_ids(agent_id))
+    legacy_seconds = time.perf_counter() - started
+    legacy_queries = queries['count']
+
+    queries['count'] = 0
+    started = time.perf_counter()
+    for agent_id in range(1, agents + 1):
+        await db.resolve_recipients(agent_id, webhook_chat_ids(agent_id), 'booking_created')
+    resolve_seconds = time.perf_counter() - started
+    resolve_queries = queries['count']
+
+    await db.engine.dispose()
+
+    return {
+        'bindings': bindings,
+        'agents': agents,
+        'legacy_s': round(legacy_seconds, 3),
+        'legacy_queries': legacy_queries,
+        'resolve_s': round(resolve_seconds, 3),
+        'resolve_queries': resolve_queries,
+        'speedup': round(legacy_seconds / resolve_seconds, 1) if resolve_seconds else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--bindings', type=int, default=10000, help='Количество привязок в БД')
+    parser.add_argument('--agents', type=int, default=20, help='Количество агентов (событий)')
+    parser.add_argument('--json', action='store_true', help='Вывести результат в JSON')
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args.bindings, args.agents))
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+
+    print(f"{args.bindings} bindings, {args.agents} events")
+    print(f"  legacy:             {result['legacy_s']:>8} s, {result['legacy_queries']} queries")
+    print(f"  resolve_recipients: {result['resolve_s']:>8} s, {result['resolve_queries']} queries")
+    print(f"  speedup: x{result['speedup']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк тика планировщика напоминаний: прежний опрос расписания каждого
+пользователя против сверки очереди через пакетный /schedule/bulk
+
+Запуск:
+    python3 bench/bench_reminder_tick.py --users 100 500 1000 --latency-ms 20
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from datetime import datetime, timedelta
+
+from _common import bootstrap, temp_sqlite_url
+
+
+async def seed_users(db, count: int):
+    """Создать пользователей с настройками по умолчанию"""
+    from database.models import User, Settings
+
+    async with db.get_session() as session:
+        for chat_id in range(1, count + 1):
+            session.add(User(
+                chat_id=chat_id,
+                username=f'user{chat_id}',
+                user_type='customer',
+                wp_user_id=chat_id,
+                latepoint_id=chat_id,
+                name=f'User {chat_id}',
+                email=f'user{chat_id}@example.com',
+            ))
+            session.add(Settings(chat_id=chat_id))
+        await session.commit()
+
+
+async def legacy_tick(db, wp_api):
+    """Прежний алгоритм: настройки и расписание по одному запросу на пользователя"""
+    import pytz
+    import config
+
+    tz = pytz.timezone(config.TIMEZONE)
+    users = await db.get_all_users()
+    today = datetime.now().strftime('%Y-%m-%d')
+    tomorrow = (datetime.now() + timedelta(days=1)).strftime('%Y-%m-%d')
+
+    for user in users:
+        settings = await db.get_settings(user.chat_id)
+        if not settings or not settings.notify_reminders:
+            continue
+
+        result = await wp_api.get_schedule(user.chat_id, date_from=today, date_to=tomorrow)
+        if not result.get('success'):
+            continue
+
+        for booking in result.get('bookings', []):
+            if await db.check_reminder_sent(booking['id'], user.chat_id):
+                continue
+
+            start = tz.localize(datetime.strptime(f"{booking['start_date']} {booking['start_time']}", "%Y-%m-%d %H:%M"))
+            reminder_time = start - timedelta(minutes=settings.reminder_minutes_before)
+            if reminder_time <= datetime.now(tz) < start:
+                raise RuntimeError('Benchmark bookings must not be due')
+
+
+async def run(user_counts: list[int], latency_ms: float) -> list[dict]:
+    from stubs import WordPressStub
+
+    results = []
+
+    for count in user_counts:
+        config = bootstrap(DATABASE_URL=temp_sqlite_url(f'tick_{count}.db'))
+
+        # Каждый прогон - свежая БД и свежие глобальные экземпляры
+        for module in ('database.db', 'services.wordpress_api', 'services.reminder_engine',
+                       'services.booking_mirror', 'services.scheduler'):
+            sys.modules.pop(module, None)
+
+        from database.db import db
+        from services.wordpress_api import wp_api
+        from services.scheduler import ReminderScheduler
+
+        stub = WordPressStub(latency_ms=latency_ms)
+        await stub.start()
+        wp_api.base_url = stub.base_url
+
+        await db.init_db()
+        await seed_users(db, count)
+        scheduler = ReminderScheduler(bot=None)
+
+        started = time.perf_counter()
+        await legacy_tick(db, wp_api)
+        legacy_seconds = time.perf_counter() - started
+        legacy_requests = sum(stub.requests.values())
+
+        # Первая сверка наполняет очередь, повторные - установившийся режим
+        stub.requests.clear()
+        started = time.perf_counter()
+        await scheduler.sync_reminders()
+        first_sync_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        await scheduler.sync_reminders()
+        sync_seconds = time.perf_counter() - started
+        sync_requests = sum(stub.requests.values()) // 2
+
+        await wp_api.close_session()
+        await stub.stop()
+        await db.engine.dispose()
+
+        results.append({
+            'users': count,
+            'legacy_tick_s': round(legacy_seconds, 3),
+            'legacy_http_requests': legacy_requests,
+            'first_sync_s': round(first_sync_seconds, 3),
+            'sync_s': round(sync_seconds, 3),
+            'sync_http_requests': sync_requests,
+            'chunk_size': getattr(config, 'SCHEDULE_BULK_CHUNK_SIZE', 100),
+        })
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, nargs='+', default=[100, 500, 1000])
+    parser.add_argument('--latency-ms', type=float, default=20.0, help='Задержка заглушки WordPress на запрос')
+    parser.add_argument('--json', action='store_true', help='Вывести результат в JSON')
+    args = parser.parse_args()
+
+    bootstrap()
+    results = asyncio.run(run(args.users, args.latency_ms))
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'users':>7} {'legacy, s':>10} {'requests':>9} {'1st sync, s':>12} {'sync, s':>8} {'requests':>9}")
+    for row in results:
+        print(f"{row['users']:>7} {row['legacy_tick_s']:>10} {row['legacy_http_requests']:>9} "
+              f"{row['first_sync_s']:>12} {row['sync_s']:>8} {row['sync_http_requests']:>9}")
+
+
+if __name__ == '__main__':
+    main()
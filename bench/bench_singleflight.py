@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Нагрузочный бенчмарк объединения одинаковых запросов к WordPress:
+сколько запросов доходит до бэкенда, когда много клиентов одновременно
+запрашивают расписание и детали одних и тех же бронирований
+
+Режимы:
+    direct       - каждый вызов идёт в WordPress (прежнее поведение)
+    singleflight - одновременные одинаковые вызовы объединяются, кэш выключен
+    cached       - single-flight и кэш ответов WP_CACHE_TTL
+
+Запуск:
+    python3 bench/bench_singleflight.py --clients 200 --keys 10 --duration 5 --latency-ms 50
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from _common import bootstrap
+from stubs import WordPressStub
+
+MODES = ['direct', 'singleflight', 'cached']
+
+
+async def client(wp_api, mode: str, keys: int, deadline: float, latencies: list):
+    """Клиент: /today и «Детали» для случайного из keys горячих чатов"""
+    while time.perf_counter() < deadline:
+        chat_id = random.randint(1, keys)
+        booking_id = chat_id * 10
+
+        started = time.perf_counter()
+        if mode == 'direct':
+            await wp_api._fetch_schedule(chat_id, period='today')
+            await wp_api._fetch_booking(booking_id, chat_id)
+        else:
+            await wp_api.get_schedule(chat_id, period='today')
+            await wp_api.get_booking(booking_id, chat_id)
+        latencies.append(time.perf_counter() - started)
+
+
+async def run_mode(mode: str, clients: int, keys: int, duration: float, latency_ms: float) -> dict:
+    from services.wordpress_api import WordPressAPI
+    from utils.cache import TTLCache
+
+    stub = WordPressStub(latency_ms=latency_ms)
+    await stub.start()
+
+    wp_api = WordPressAPI()
+    wp_api.base_url = stub.base_url
+    if mode == 'singleflight':
+        # Записи кэша сразу устаревают - остаётся только объединение запросов
+        wp_api.cache = TTLCache(maxsize=1, ttl=0)
+    await wp_api.init_session()
+
+    latencies = []
+    deadline = time.perf_counter() + duration
+    started = time.perf_counter()
+    await asyncio.gather(*(client(wp_api, mode, keys, deadline, latencies) for _ in range(clients)))
+    elapsed = time.perf_counter() - started
+
+    await wp_api.close_session()
+    await stub.stop()
+
+    backend_requests = sum(stub.requests.values())
+    latencies.sort()
+    return {
+        'mode': mode,
+        'client_rounds': len(latencies),
+        'client_rps': round(len(latencies) / elapsed, 1),
+        'backend_requests': backend_requests,
+        'backend_qps': round(backend_requests / elapsed, 1),
+        'p50_ms': round(latencies[len(latencies) // 2] * 1000, 1) if latencies else None,
+        'p99_ms': round(latencies[int(len(latencies) * 0.99)] * 1000, 1) if latencies else None,
+        'singleflight': wp_api.singleflight.stats()['endpoints'],
+        'cache_hit_rate': wp_api.cache.stats()['hit_rate'],
+    }
+
+
+async def run(clients: int, keys: int, duration: float, latency_ms: float) -> list[dict]:
+    bootstrap()
+    return [await run_mode(mode, clients, keys, duration, latency_ms) for mode in MODES]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clients', type=int, default=200, help='Одновременных клиентов')
+    parser.add_argument('--keys', type=int, default=10, help='Различных чатов (горячих ключей)')
+    parser.add_argument('--duration', type=float, default=5.0, help='Длительность каждого режима, с')
+    parser.add_argument('--latency-ms', type=float, default=50.0, help='Задержка ответа заглушки WordPress')
+    parser.add_argument('--json', action='store_true', help='Вывести результат в JSON')
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.clients, args.keys, args.duration, args.latency_ms))
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{args.clients} clients, {args.keys} hot chats, {args.latency_ms} ms backend latency, {args.duration} s per mode")
+    print(f"{'mode':<14}{'client rps':>12}{'backend qps':>13}{'p50 ms':>9}{'p99 ms':>9}  collapsed")
+    for result in results:
+        collapsed = {endpoint: counters['collapse_rate'] for endpoint, counters in result['singleflight'].items()}
+        print(f"{result['mode']:<14}{result['client_rps']:>12}{result['backend_qps']:>13}"
+              f"{result['p50_ms']:>9}{result['p99_ms']:>9}  {collapsed}")
+
+
+if __name__ == '__main__':
+    main()
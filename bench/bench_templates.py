@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк и сверка шаблонов сообщений: прежние форматтеры на f-строках
+(legacy_formatters.py) против скомпилированных шаблонов utils/templates.py
+
+Для каждого сообщения, набора данных и часового пояса проверяется
+побайтовое совпадение текста, затем замеряется время рендера.
+Завершается с кодом 1, если хоть один вывод отличается.
+
+Запуск:
+    python3 bench/bench_templates.py --rounds 2000
+"""
+
+import argparse
+import json
+import sys
+import time
+
+from _common import bootstrap
+
+TIMEZONES = [None, 'Europe/Moscow', 'Asia/Tokyo', 'America/New_York', 'Asia/Kolkata']
+
+
+def make_bookings() -> list[dict]:
+    """Наборы данных: с Google Meet и без, разные даты и статусы"""
+    base = {
+        'id': 101,
+        'booking_id': 101,
+        'booking_code': 'BK-7Q2M',
+        'status': 'approved',
+        'duration': 45,
+        'start_date': '2026-03-02',
+        'start_time': '09:30',
+        'end_time': '10:15',
+        'agent': {'name': 'Мария Петрова', 'email': 'maria@example.com', 'phone': '+7 900 000-00-01'},
+        'customer': {'name': 'Иван Смирнов', 'email': 'ivan@example.com', 'phone': '+7 900 000-00-02'},
+        'service': {'name': 'Фортепиано'},
+    }
+    return [
+        base,
+        {**base, 'google_meet_url': 'https://meet.google.com/abc-defg-hij'},
+        {**base, 'start_date': '2026-12-31', 'start_time': '23:30', 'end_time': '23:59', 'status': 'pending'},
+    ]
+
+
+CHANGES = [
+    {'start_date': {'old': '2026-03-02', 'new': '2026-03-05'}},
+    {'start_time': {'old': '09:30', 'new': '18:00'}},
+    {'start_date': {'old': '2026-03-02', 'new': '2026-03-05'}, 'start_time': {'old': '09:30', 'new': '01:00'}},
+]
+
+STATUSES = [('pending', 'approved'), ('approved', 'cancelled'), ('approved', 'no_show')]
+
+
+def make_cases(legacy, handler, scheduler, formatters, callbacks) -> list[tuple]:
+    """Пары (название, прежний форматтер, новый форматтер) с данными"""
+    cases = []
+    for number, booking in enumerate(make_bookings()):
+        for timezone in TIMEZONES:
+            suffix = f"#{number} tz={timezone}"
+            cases += [
+                (f"booking_created_agent {suffix}",
+                 lambda b=booking, tz=timezone: legacy.format_booking_created_for_agent(b, tz),
+                 lambda b=booking, tz=timezone: handler.format_booking_created_for_agent(b, tz)),
+                (f"booking_created_customer {suffix}",
+                 lambda b=booking, tz=timezone: legacy.format_booking_created_for_customer(b, tz),
+                 lambda b=booking, tz=timezone: handler.format_booking_created_for_customer(b, tz)),
+                (f"reminder_agent {suffix}",
+                 lambda b=booking, tz=timezone: legacy.format_reminder_for_agent(b, tz),
+                 lambda b=booking, tz=timezone: scheduler.format_reminder_for_agent(b, tz)),
+                (f"reminder_customer {suffix}",
+                 lambda b=booking, tz=timezone: legacy.format_reminder_for_customer(b, tz),
+                 lambda b=booking, tz=timezone: scheduler.format_reminder_for_customer(b, tz)),
+                (f"schedule_agent {suffix}",
+                 lambda b=booking, tz=timezone: legacy.format_booking_for_agent(b, tz),
+                 lambda b=booking, tz=timezone: formatters.format_booking_for_agent(b, tz)),
+                (f"schedule_customer {suffix}",
+                 lambda b=booking, tz=timezone: legacy.format_booking_for_customer(b, tz),
+                 lambda b=booking, tz=timezone: formatters.format_booking_for_customer(b, tz)),
+                (f"schedule_agent_short {suffix}",
+                 lambda b=booking, tz=timezone: legacy.format_booking_for_agent_short(b, tz),
+                 lambda b=booking, tz=timezone: formatters.format_booking_for_agent_short(b, tz)),
+                (f"schedule_customer_short {suffix}",
+                 lambda b=booking, tz=timezone: legacy.format_booking_for_customer_short(b, tz),
+                 lambda b=booking, tz=timezone: formatters.format_booking_for_customer_short(b, tz)),
+            ]
+            for user_type in ('agent', 'customer'):
+                cases.append((
+                    f"booking_details_{user_type} {suffix}",
+                    lambda b=booking, tz=timezone, t=user_type: legacy.format_booking_details(b, t, tz),
+                    lambda b=booking, tz=timezone, t=user_type: callbacks.format_booking_details(b, t, tz),
+                ))
+            for changes in CHANGES:
+                cases += [
+                    (f"booking_updated_agent {suffix} {sorted(changes)}",
+                     lambda b=booking, c=changes, tz=timezone: legacy.format_booking_updated_for_agent(b, c, tz),
+                     lambda b=booking, c=changes, tz=timezone: handler.format_booking_updated_for_agent(b, c, tz)),
+                    (f"booking_updated_customer {suffix} {sorted(changes)}",
+                     lambda b=booking, c=changes, tz=timezone: legacy.format_booking_updated_for_customer(b, c, tz),
+                     lambda b=booking, c=changes, tz=timezone: handler.format_booking_updated_for_customer(b, c, tz)),
+                ]
+            for old_status, new_status in STATUSES:
+                cases += [
+                    (f"status_changed_agent {suffix} {new_status}",
+                     lambda b=booking, o=old_status, n=new_status, tz=timezone: legacy.format_status_changed_for_agent(b, o, n, tz),
+                     lambda b=booking, o=old_status, n=new_status, tz=timezone: handler.format_status_changed_for_agent(b, o, n, tz)),
+                    (f"status_changed_customer {suffix} {new_status}",
+                     lambda b=booking, o=old_status, n=new_status, tz=timezone: legacy.format_status_changed_for_customer(b, o, n, tz),
+                     lambda b=booking, o=old_status, n=new_status, tz=timezone: handler.format_status_changed_for_customer(b, o, n, tz)),
+                ]
+    return cases
+
+
+def measure(functions: list, rounds: int) -> float:
+    """Среднее время рендера одного сообщения в микросекундах"""
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for function in functions:
+            function()
+    return (time.perf_counter() - started) / (rounds * len(functions)) * 1_000_000
+
+
+def run(rounds: int) -> dict:
+    bootstrap()
+
+    import legacy_formatters as legacy
+    from handlers import callbacks
+    from handlers.notifications import NotificationHandler
+    from services.scheduler import ReminderScheduler
+    from utils import formatters
+    from utils.templates import templates
+
+    # Форматтеры не используют состояние обработчиков
+    handler = NotificationHandler.__new__(NotificationHandler)
+    scheduler = ReminderScheduler.__new__(ReminderScheduler)
+
+    started = time.perf_counter()
+    compiled = templates.load()
+    load_ms = (time.perf_counter() - started) * 1000
+
+    cases = make_cases(legacy, handler, scheduler, formatters, callbacks)
+
+    mismatches = []
+    for name, legacy_render, template_render in cases:
+        expected, actual = legacy_render(), template_render()
+        if expected.encode() != actual.encode():
+            mismatches.append({'case': name, 'expected': expected, 'actual': actual})
+
+    # Значения экранируются для HTML, прежние форматтеры этого не делали
+    unsafe = {**make_bookings()[0], 'customer': {'name': 'Bob <b>&', 'email': 'b@example.com', 'phone': '1'}}
+    escaped = 'Bob &lt;b&gt;&amp;' in handler.format_booking_created_for_agent(unsafe)
+
+    return {
+        'templates': compiled,
+        'load_ms': round(load_ms, 2),
+        'cases': len(cases),
+        'mismatches': mismatches,
+        'html_escaped': escaped,
+        'legacy_us': round(measure([case[1] for case in cases], rounds), 2),
+        'templates_us': round(measure([case[2] for case in cases], rounds), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rounds', type=int, default=200, help='Повторов рендера всех сообщений')
+    parser.add_argument('--json', action='store_true', help='Вывести результат в JSON')
+    args = parser.parse_args()
+
+    result = run(args.rounds)
+
+    if args.json:
+        print(json.dumps(result, indent=2, ensure_ascii=False))
+    else:
+        print(f"{result['templates']} templates compiled in {result['load_ms']} ms")
+        print(f"golden: {result['cases'] - len(result['mismatches'])}/{result['cases']} identical")
+        for mismatch in result['mismatches']:
+            print(f"  MISMATCH {mismatch['case']}")
+            print(f"    expected: {mismatch['expected']!r}")
+            print(f"    actual:   {mismatch['actual']!r}")
+        print(f"html escaping: {'ok' if result['html_escaped'] else 'FAILED'}")
+        print(f"  legacy f-strings: {result['legacy_us']:>8} us/message")
+        print(f"  templates:        {result['templates_us']:>8} us/message")
+
+    if result['mismatches'] or not result['html_escaped']:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,441 @@
+"""
+Прежние форматтеры сообщений (до utils/templates.py) - эталон для
+сверки вывода шаблонов в bench_templates.py
+
+Скопированы без изменений из handlers/notifications.py, services/scheduler.py,
+handlers/commands.py и handlers/callbacks.py. Импортировать после bootstrap().
+"""
+
+from utils.timezones import format_datetime_with_timezone
+
+
+def format_booking_created_for_agent(data: dict, user_timezone: str = None) -> str:
+    """Форматирование уведомления о новом бронировании для учителя"""
+    customer = data['customer']
+    service = data['service']
+
+    # Конвертация времени в часовой пояс пользователя
+    start_date = data['start_date']
+    start_time = data['start_time']
+    end_time = data['end_time']
+
+    if user_timezone:
+        start_date, start_time = format_datetime_with_timezone(
+            data['start_date'], data['start_time'], user_timezone
+        )
+        _, end_time = format_datetime_with_timezone(
+            data['start_date'], data['end_time'], user_timezone
+        )
+
+    message = f"""🎵 <b>Новый урок!</b>
+
+👤 <b>Ученик:</b> {customer['name']}
+📧 Email: {customer['email']}
+📱 Телефон: {customer['phone']}
+
+🎵 <b>Инструмент:</b> {service['name']}
+📅 <b>Дата:</b> {start_date}
+🕐 <b>Время:</b> {start_time} - {end_time}
+"""
+
+    if data.get('google_meet_url'):
+        message += f"\n🎥 <b>Google Meet:</b>\n{data['google_meet_url']}"
+
+    message += f"\n\n🆔 Код бронирования: <code>{data['booking_code']}</code>"
+
+    return message
+
+
+def format_booking_created_for_customer(data: dict, user_timezone: str = None) -> str:
+    """Форматирование уведомления о новом бронировании для ученика"""
+    agent = data['agent']
+    service = data['service']
+
+    # Конвертация времени в часовой пояс пользователя
+    start_date = data['start_date']
+    start_time = data['start_time']
+    end_time = data['end_time']
+
+    if user_timezone:
+        start_date, start_time = format_datetime_with_timezone(
+            data['start_date'], data['start_time'], user_timezone
+        )
+        _, end_time = format_datetime_with_timezone(
+            data['start_date'], data['end_time'], user_timezone
+        )
+
+    message = f"""🎵 <b>Урок подтвержден!</b>
+
+👨‍🏫 <b>Учитель:</b> {agent['name']}
+🎵 <b>Инструмент:</b> {service['name']}
+
+📅 <b>Дата:</b> {start_date}
+🕐 <b>Время:</b> {start_time} - {end_time}
+"""
+
+    if data.get('google_meet_url'):
+        message += f"\n🎥 <b>Ссылка на урок:</b>\n{data['google_meet_url']}"
+
+    message += "\n\nЖелаем хорошего урока! 🎶"
+
+    return message
+
+
+def format_booking_updated_for_agent(data: dict, changes: dict, user_timezone: str = None) -> str:
+    """Форматирование уведомления об изменении для учителя"""
+    customer = data['customer']
+
+    message = f"""📝 <b>Изменение в бронировании</b>
+
+👤 <b>Ученик:</b> {customer['name']}
+🎵 <b>Инструмент:</b> {data['service']['name']}
+
+<b>Изменения:</b>
+"""
+
+    if 'start_date' in changes:
+        old_date = changes['start_date']['old']
+        new_date = changes['start_date']['new']
+
+        if user_timezone:
+            # Конвертируем старую и новую даты
+            old_time = changes.get('start_time', {}).get('old', '00:00')
+            new_time = changes.get('start_time', {}).get('new', '00:00')
+            old_date, _ = format_datetime_with_timezone(old_date, old_time, user_timezone)
+            new_date, _ = format_datetime_with_timezone(new_date, new_time, user_timezone)
+
+        message += f"📅 Дата: {old_date} → {new_date}\n"
+
+    if 'start_time' in changes:
+        old_time = changes['start_time']['old']
+        new_time = changes['start_time']['new']
+
+        if user_timezone:
+            # Используем текущую дату или дату из изменений
+            date_for_conversion = changes.get('start_date', {}).get('new', data.get('start_date', '2025-01-01'))
+            _, old_time = format_datetime_with_timezone(date_for_conversion, old_time, user_timezone)
+            _, new_time = format_datetime_with_timezone(date_for_conversion, new_time, user_timezone)
+
+        message += f"🕐 Время начала: {old_time} → {new_time}\n"
+
+    return message
+
+
+def format_booking_updated_for_customer(data: dict, changes: dict, user_timezone: str = None) -> str:
+    """Форматирование уведомления об изменении для ученика"""
+    agent = data['agent']
+
+    message = f"""📝 <b>Изменение в бронировании</b>
+
+👨‍🏫 <b>Учитель:</b> {agent['name']}
+🎵 <b>Инструмент:</b> {data['service']['name']}
+
+<b>Изменения:</b>
+"""
+
+    if 'start_date' in changes:
+        old_date = changes['start_date']['old']
+        new_date = changes['start_date']['new']
+
+        if user_timezone:
+            # Конвертируем старую и новую даты
+            old_time = changes.get('start_time', {}).get('old', '00:00')
+            new_time = changes.get('start_time', {}).get('new', '00:00')
+            old_date, _ = format_datetime_with_timezone(old_date, old_time, user_timezone)
+            new_date, _ = format_datetime_with_timezone(new_date, new_time, user_timezone)
+
+        message += f"📅 Дата: {old_date} → {new_date}\n"
+
+    if 'start_time' in changes:
+        old_time = changes['start_time']['old']
+        new_time = changes['start_time']['new']
+
+        if user_timezone:
+            # Используем текущую дату или дату из изменений
+            date_for_conversion = changes.get('start_date', {}).get('new', data.get('start_date', '2025-01-01'))
+            _, old_time = format_datetime_with_timezone(date_for_conversion, old_time, user_timezone)
+            _, new_time = format_datetime_with_timezone(date_for_conversion, new_time, user_timezone)
+
+        message += f"🕐 Время начала: {old_time} → {new_time}\n"
+
+    if data.get('google_meet_url'):
+        message += f"\n🎥 <b>Ссылка на урок:</b>\n{data['google_meet_url']}"
+
+    return message
+
+
+def format_status_changed_for_agent(data: dict, old_status: str, new_status: str, user_timezone: str = None) -> str:
+    """Форматирование уведомления об изменении статуса для учителя"""
+    customer = data['customer']
+
+    status_emoji = {
+        'approved': '✅',
+        'cancelled': '❌',
+        'pending': '⏳',
+    }
+
+    # Конвертация времени в часовой пояс пользователя
+    start_date = data['start_date']
+    start_time = data['start_time']
+
+    if user_timezone:
+        start_date, start_time = format_datetime_with_timezone(
+            data['start_date'], data['start_time'], user_timezone
+        )
+
+    message = f"""{status_emoji.get(new_status, '📝')} <b>Статус бронирования изменен</b>
+
+👤 <b>Ученик:</b> {customer['name']}
+🎵 <b>Инструмент:</b> {data['service']['name']}
+📅 <b>Дата:</b> {start_date}
+🕐 <b>Время:</b> {start_time}
+
+<b>Статус:</b> {old_status} → {new_status}
+"""
+
+    return message
+
+
+def format_status_changed_for_customer(data: dict, old_status: str, new_status: str, user_timezone: str = None) -> str:
+    """Форматирование уведомления об изменении статуса для ученика"""
+    agent = data['agent']
+
+    status_emoji = {
+        'approved': '✅',
+        'cancelled': '❌',
+        'pending': '⏳',
+    }
+
+    # Конвертация времени в часовой пояс пользователя
+    start_date = data['start_date']
+    start_time = data['start_time']
+
+    if user_timezone:
+        start_date, start_time = format_datetime_with_timezone(
+            data['start_date'], data['start_time'], user_timezone
+        )
+
+    message = f"""{status_emoji.get(new_status, '📝')} <b>Статус бронирования изменен</b>
+
+👨‍🏫 <b>Учитель:</b> {agent['name']}
+🎵 <b>Инструмент:</b> {data['service']['name']}
+📅 <b>Дата:</b> {start_date}
+🕐 <b>Время:</b> {start_time}
+
+<b>Статус:</b> {old_status} → {new_status}
+"""
+
+    return message
+
+
+def format_reminder_for_agent(booking: dict, user_timezone: str = None) -> str:
+    """Форматирование напоминания для учителя"""
+    customer = booking['customer']
+    service = booking['service']
+
+    # Конвертация времени в часовой пояс пользователя
+    start_date = booking['start_date']
+    start_time = booking['start_time']
+    end_time = booking['end_time']
+
+    if user_timezone:
+        start_date, start_time = format_datetime_with_timezone(
+            booking['start_date'], booking['start_time'], user_timezone
+        )
+        _, end_time = format_datetime_with_timezone(
+            booking['start_date'], booking['end_time'], user_timezone
+        )
+
+    message = f"""⏰ <b>Напоминание о предстоящем уроке!</b>
+
+👤 Ученик: {customer['name']}
+🎵 Инструмент: {service['name']}
+
+📅 Дата: {start_date}
+🕐 Время: {start_time} - {end_time}
+
+📧 Email: {customer['email']}
+📱 Телефон: {customer['phone']}
+"""
+
+    if booking.get('google_meet_url'):
+        message += f"\n🎥 Ссылка на урок:\n{booking['google_meet_url']}"
+
+    return message
+
+
+def format_reminder_for_customer(booking: dict, user_timezone: str = None) -> str:
+    """Форматирование напоминания для ученика"""
+    agent = booking['agent']
+    service = booking['service']
+
+    # Конвертация времени в часовой пояс пользователя
+    start_date = booking['start_date']
+    start_time = booking['start_time']
+    end_time = booking['end_time']
+
+    if user_timezone:
+        start_date, start_time = format_datetime_with_timezone(
+            booking['start_date'], booking['start_time'], user_timezone
+        )
+        _, end_time = format_datetime_with_timezone(
+            booking['start_date'], booking['end_time'], user_timezone
+        )
+
+    message = f"""⏰ <b>Напоминание о предстоящем уроке!</b>
+
+👨‍🏫 Учитель: {agent['name']}
+🎵 Инструмент: {service['name']}
+
+📅 Дата: {start_date}
+🕐 Время: {start_time} - {end_time}
+"""
+
+    if booking.get('google_meet_url'):
+        message += f"\n🎥 Ссылка на урок:\n{booking['google_meet_url']}\n\nЖелаем хорошего урока!"
+
+    return message
+
+
+def format_booking_for_agent(booking: dict, user_timezone: str = None) -> str:
+    """Форматирование бронирования для учителя (подробно)"""
+    customer = booking['customer']
+    service = booking['service']
+
+    # Конвертация времени в часовой пояс пользователя
+    start_time = booking['start_time']
+    end_time = booking['end_time']
+
+    if user_timezone:
+        _, start_time = format_datetime_with_timezone(
+            booking['start_date'], booking['start_time'], user_timezone
+        )
+        _, end_time = format_datetime_with_timezone(
+            booking['start_date'], booking['end_time'], user_timezone
+        )
+
+    text = f"""🕐 <b>{start_time} - {end_time}</b>
+👤 Ученик: {customer['name']}
+🎵 Инструмент: {service['name']}
+📧 Email: {customer['email']}
+📱 Телефон: {customer['phone']}"""
+
+    if booking.get('google_meet_url'):
+        text += f"\n🎥 Google Meet: {booking['google_meet_url']}"
+
+    return text
+
+
+def format_booking_for_customer(booking: dict, user_timezone: str = None) -> str:
+    """Форматирование бронирования для ученика (подробно)"""
+    agent = booking['agent']
+    service = booking['service']
+
+    # Конвертация времени в часовой пояс пользователя
+    start_time = booking['start_time']
+    end_time = booking['end_time']
+
+    if user_timezone:
+        _, start_time = format_datetime_with_timezone(
+            booking['start_date'], booking['start_time'], user_timezone
+        )
+        _, end_time = format_datetime_with_timezone(
+            booking['start_date'], booking['end_time'], user_timezone
+        )
+
+    text = f"""🕐 <b>{start_time} - {end_time}</b>
+👨‍🏫 Учитель: {agent['name']}
+🎵 Инструмент: {service['name']}"""
+
+    if booking.get('google_meet_url'):
+        text += f"\n🎥 Google Meet: {booking['google_meet_url']}"
+
+    return text
+
+
+def format_booking_for_agent_short(booking: dict, user_timezone: str = None) -> str:
+    """Форматирование бронирования для учителя (кратко)"""
+    customer = booking['customer']
+
+    # Конвертация времени в часовой пояс пользователя
+    start_time = booking['start_time']
+
+    if user_timezone:
+        _, start_time = format_datetime_with_timezone(
+            booking['start_date'], booking['start_time'], user_timezone
+        )
+
+    return f"  • {start_time} - {customer['name']} ({booking['service']['name']})"
+
+
+def format_booking_for_customer_short(booking: dict, user_timezone: str = None) -> str:
+    """Форматирование бронирования для ученика (кратко)"""
+    agent = booking['agent']
+
+    # Конвертация времени в часовой пояс пользователя
+    start_time = booking['start_time']
+
+    if user_timezone:
+        _, start_time = format_datetime_with_timezone(
+            booking['start_date'], booking['start_time'], user_timezone
+        )
+
+    return f"  • {start_time} - {agent['name']} ({booking['service']['name']})"
+
+
+def format_booking_details(booking: dict, user_type: str, user_timezone: str = None) -> str:
+    """Форматирование деталей бронирования"""
+    # Конвертация времени в часовой пояс пользователя
+    start_date = booking['start_date']
+    start_time = booking['start_time']
+    end_time = booking['end_time']
+
+    if user_timezone:
+        start_date, start_time = format_datetime_with_timezone(
+            booking['start_date'], booking['start_time'], user_timezone
+        )
+        _, end_time = format_datetime_with_timezone(
+            booking['start_date'], booking['end_time'], user_timezone
+        )
+
+    if user_type == 'agent':
+        customer = booking['customer']
+        text = f"""📋 <b>Детали бронирования</b>
+
+🆔 Код: {booking['booking_code']}
+📊 Статус: {booking['status']}
+
+👤 <b>Ученик:</b>
+Имя: {customer['name']}
+📧 Email: {customer['email']}
+📱 Телефон: {customer['phone']}
+
+🎵 <b>Урок:</b>
+Инструмент: {booking['service']['name']}
+📅 Дата: {start_date}
+🕐 Время: {start_time} - {end_time}
+⏱ Длительность: {booking['duration']} мин
+"""
+    else:
+        agent = booking['agent']
+        text = f"""📋 <b>Детали бронирования</b>
+
+🆔 Код: {booking['booking_code']}
+📊 Статус: {booking['status']}
+
+👨‍🏫 <b>Учитель:</b>
+Имя: {agent['name']}
+📧 Email: {agent['email']}
+📱 Телефон: {agent['phone']}
+
+🎵 <b>Урок:</b>
+Инструмент: {booking['service']['name']}
+📅 Дата: {start_date}
+🕐 Время: {start_time} - {end_time}
+⏱ Длительность: {booking['duration']} мин
+"""
+
+    if booking.get('google_meet_url'):
+        text += f"\n🎥 Google Meet:\n{booking['google_meet_url']}"
+
+    return text
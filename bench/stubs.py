@@ -0,0 +1,328 @@
+"""
+Локальные заглушки внешних сервисов для бенчмарков
+"""
+
+import asyncio
+import json
+import random
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+from aiohttp import web
+
+
+def site_now() -> datetime:
+    """Текущее время сайта WordPress (current_time в плагине) - config.TIMEZONE бота"""
+    import pytz
+    import config
+
+    return datetime.now(pytz.timezone(config.TIMEZONE)).replace(tzinfo=None)
+
+
+def make_booking(booking_id: int, agent_id: int, customer_id: int, start_date: str,
+                 start_time: str = '23:00', end_time: str = '23:45') -> dict:
+    """Бронирование в формате format_booking_data плагина"""
+    return {
+        'id': booking_id,
+        'booking_code': f'BENCH{booking_id:06d}',
+        'status': 'approved',
+        'start_date': start_date,
+        'start_time': start_time,
+        'end_time': end_time,
+        'duration': 45,
+        'customer': {
+            'id': customer_id,
+            'name': f'Ученик {customer_id}',
+            'email': f'customer{customer_id}@example.com',
+            'phone': '+70000000000',
+        },
+        'agent': {
+            'id': agent_id,
+            'name': f'Учитель {agent_id}',
+            'email': f'agent{agent_id}@example.com',
+            'phone': '+70000000001',
+        },
+        'service': {'id': 1, 'name': 'Фортепиано'},
+        'google_meet_url': '',
+        'timezone': 'Europe/Moscow',
+    }
+
+
+def as_webhook_data(booking: dict, customer_chat_id=None, agent_chat_id=None) -> dict:
+    """Бронирование в формате вебхука и ленты /bookings/changes (get_booking_data плагина)"""
+    data = {key: value for key, value in booking.items() if key != 'id'}
+    data.update({
+        'booking_id': booking['id'],
+        'agent_id': booking['agent']['id'],
+        'customer_id': booking['customer']['id'],
+        'customer': {**booking['customer'], 'telegram_chat_id': str(customer_chat_id or ''),
+                     'timezone': booking['timezone']},
+        'agent': {**booking['agent'], 'telegram_chat_id': str(agent_chat_id or '')},
+    })
+    return data
+
+
+class WordPressStub:
+    """
+    Заглушка REST API плагина latepoint-telegram
+
+    Каждый chat_id считается клиентом с bookings_per_chat уроками на завтра
+    (позже окна напоминаний, чтобы бенчмарк не отправлял сообщений), у
+    каждого agent_id из agent_ids - столько же своих уроков.
+    Если задан error_status, все запросы получают ответ с этим кодом, а
+    с error_rate - доля запросов получает 500.
+    Лента /bookings/changes отдаёт бронирования из changes (курсор - позиция
+    в списке); при changes_supported = False отвечает 404, как старый плагин.
+    """
+
+    def __init__(self, latency_ms: float = 20.0, bookings_per_chat: int = 2,
+                 host: str = '127.0.0.1', port: int = 0):
+        self.latency = latency_ms / 1000
+        self.bookings_per_chat = bookings_per_chat
+        self.host = host
+        self.port = port
+        self.requests = Counter()
+        self.error_status = None
+        self.error_rate = 0.0
+        self.changes = []
+        self.changes_supported = True
+        self.runner = None
+
+        self.app = web.Application()
+        self.app.router.add_get('/schedule', self.handle_schedule)
+        self.app.router.add_post('/schedule/bulk', self.handle_schedule_bulk)
+        self.app.router.add_get('/booking/{booking_id}', self.handle_booking)
+        self.app.router.add_get('/bookings/changes', self.handle_changes)
+        self.app.router.add_post('/agent-token/confirm', self.handle_agent_token_confirm)
+
+    @property
+    def base_url(self) -> str:
+        return f'http://{self.host}:{self.port}'
+
+    async def start(self):
+        self.runner = web.AppRunner(self.app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, self.host, self.port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        if self.runner:
+            await self.runner.cleanup()
+
+    def injected_error(self) -> web.Response | None:
+        """Ответ с ошибкой, если она должна быть внедрена в этот запрос"""
+        status = self.error_status
+        if not status and self.error_rate and random.random() < self.error_rate:
+            status = 500
+        if status:
+            return web.json_response({'success': False, 'message': 'Injected error'}, status=status)
+        return None
+
+    def bookings_for_chat(self, chat_id: int) -> list[dict]:
+        start_date = (site_now() + timedelta(days=1)).strftime('%Y-%m-%d')
+        return [
+            make_booking(chat_id * 10 + i, agent_id=1, customer_id=chat_id, start_date=start_date)
+            for i in range(self.bookings_per_chat)
+        ]
+
+    def bookings_for_agent(self, agent_id: int) -> list[dict]:
+        start_date = (site_now() + timedelta(days=1)).strftime('%Y-%m-%d')
+        return [
+            make_booking(1_000_000 + agent_id * 10 + i, agent_id=agent_id, customer_id=0, start_date=start_date)
+            for i in range(self.bookings_per_chat)
+        ]
+
+    async def handle_schedule(self, request: web.Request) -> web.Response:
+        self.requests['schedule'] += 1
+        await asyncio.sleep(self.latency)
+        error = self.injected_error()
+        if error:
+            return error
+
+        chat_id = int(request.query['chat_id'])
+        date_from, date_to = request.query.get('date_from'), request.query.get('date_to')
+        period = request.query.get('period')
+        if period in ('today', 'week'):
+            # Как в плагине: сегодня или сегодня + 7 дней
+            today = site_now()
+            date_from = today.strftime('%Y-%m-%d')
+            date_to = (today + timedelta(days=7 if period == 'week' else 0)).strftime('%Y-%m-%d')
+
+        return web.json_response({
+            'success': True,
+            'bookings': self.bookings_for_chat(chat_id),
+            'period': {'from': date_from, 'to': date_to},
+        })
+
+    async def handle_schedule_bulk(self, request: web.Request) -> web.Response:
+        self.requests['schedule_bulk'] += 1
+        await asyncio.sleep(self.latency)
+        error = self.injected_error()
+        if error:
+            return error
+
+        data = await request.json()
+        page = int(data.get('page', 1))
+        per_page = int(data.get('per_page', 200))
+
+        bookings = []
+        for chat_id in data.get('chat_ids', []):
+            for booking in self.bookings_for_chat(int(chat_id)):
+                booking['chat_ids'] = [str(chat_id)]
+                bookings.append(booking)
+        for agent_id in data.get('agent_ids', []):
+            for booking in self.bookings_for_agent(int(agent_id)):
+                booking['chat_ids'] = []
+                bookings.append(booking)
+
+        total = len(bookings)
+        return web.json_response({
+            'success': True,
+            'bookings': bookings[(page - 1) * per_page:page * per_page],
+            'page': page,
+            'per_page': per_page,
+            'total': total,
+            'total_pages': -(-total // per_page),
+        })
+
+    async def handle_booking(self, request: web.Request) -> web.Response:
+        self.requests['booking'] += 1
+        await asyncio.sleep(self.latency)
+        error = self.injected_error()
+        if error:
+            return error
+
+        booking_id = int(request.match_info['booking_id'])
+        chat_id = int(request.query['chat_id'])
+        start_date = (site_now() + timedelta(days=1)).strftime('%Y-%m-%d')
+        return web.json_response({
+            'success': True,
+            'booking': make_booking(booking_id, agent_id=1, customer_id=chat_id, start_date=start_date),
+        })
+
+    async def handle_changes(self, request: web.Request) -> web.Response:
+        self.requests['changes'] += 1
+        await asyncio.sleep(self.latency)
+        error = self.injected_error()
+        if error:
+            return error
+        if not self.changes_supported:
+            return web.json_response({'code': 'rest_no_route'}, status=404)
+
+        since = request.query.get('since')
+        if not since:
+            return web.json_response({
+                'success': True, 'changes': [], 'next_cursor': str(len(self.changes)), 'has_more': False
+            })
+
+        start = int(since)
+        limit = int(request.query.get('limit', 200))
+        page = self.changes[start:start + limit]
+        return web.json_response({
+            'success': True,
+            'changes': page,
+            'next_cursor': str(start + len(page)),
+            'has_more': start + len(page) < len(self.changes),
+        })
+
+    async def handle_agent_token_confirm(self, request: web.Request) -> web.Response:
+        self.requests['agent_token_confirm'] += 1
+        await asyncio.sleep(self.latency)
+        error = self.injected_error()
+        if error:
+            return error
+
+        data = await request.json()
+        agent_id = int(data['token'].rsplit('-', 1)[-1]) if '-' in data['token'] else 1
+        return web.json_response({'success': True, 'agent_id': agent_id, 'agent_name': f'Учитель {agent_id}'})
+
+
+class TelegramStub:
+    """
+    Заглушка Telegram Bot API (POST /bot<token>/<method>)
+
+    sendMessage запоминает время получения, chat_id и booking_id из кнопки
+    «Детали» (callback_data booking_details_<id>). С error_rate доля запросов
+    получает error_status: 429 с retry_after или любую другую ошибку.
+    """
+
+    def __init__(self, latency_ms: float = 30.0, error_rate: float = 0.0, error_status: int = 429,
+                 retry_after: int = 1, host: str = '127.0.0.1', port: int = 0):
+        self.latency = latency_ms / 1000
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.retry_after = retry_after
+        self.host = host
+        self.port = port
+        self.requests = Counter()
+        self.messages = []  # (perf_counter, chat_id, booking_id или None)
+        self.message_id = 0
+        self.runner = None
+
+        self.app = web.Application()
+        self.app.router.add_post('/bot{token}/{method}', self.handle_method)
+
+    @property
+    def base_url(self) -> str:
+        return f'http://{self.host}:{self.port}'
+
+    async def start(self):
+        self.runner = web.AppRunner(self.app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, self.host, self.port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        if self.runner:
+            await self.runner.cleanup()
+
+    def session(self):
+        """AiohttpSession бота, направленная на заглушку"""
+        from aiogram.client.session.aiohttp import AiohttpSession
+        from aiogram.client.telegram import TelegramAPIServer
+
+        return AiohttpSession(api=TelegramAPIServer.from_base(self.base_url))
+
+    async def handle_method(self, request: web.Request) -> web.Response:
+        method = request.match_info['method']
+        self.requests[method] += 1
+        params = dict(await request.post())
+        await asyncio.sleep(self.latency)
+
+        if self.error_rate and random.random() < self.error_rate:
+            if self.error_status == 429:
+                return web.json_response({
+                    'ok': False, 'error_code': 429,
+                    'description': f'Too Many Requests: retry after {self.retry_after}',
+                    'parameters': {'retry_after': self.retry_after},
+                }, status=429)
+            return web.json_response({'ok': False, 'error_code': self.error_status,
+                                      'description': 'Injected error'}, status=self.error_status)
+
+        if method == 'getMe':
+            return web.json_response({'ok': True, 'result': {
+                'id': 1, 'is_bot': True, 'first_name': 'Bench', 'username': 'bench_bot'}})
+
+        if method in ('sendMessage', 'editMessageText'):
+            chat_id = int(params['chat_id'])
+            booking_id = None
+            if params.get('reply_markup'):
+                for row in json.loads(params['reply_markup']).get('inline_keyboard', []):
+                    for button in row:
+                        data = button.get('callback_data') or ''
+                        if data.startswith('booking_details_'):
+                            booking_id = int(data.rsplit('_', 1)[-1])
+            self.messages.append((time.perf_counter(), chat_id, booking_id))
+
+            self.message_id += 1
+            return web.json_response({'ok': True, 'result': {
+                'message_id': self.message_id,
+                'date': int(time.time()),
+                'chat': {'id': chat_id, 'type': 'private'},
+                'text': params.get('text', ''),
+            }})
+
+        return web.json_response({'ok': True, 'result': True})
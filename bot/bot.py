@@ -7,20 +7,35 @@ import logging
 import sys
 import signal
 import hmac
-from datetime import datetime
-import pytz
+import hashlib
+import time
+from datetime import datetime, timezone
+from urllib.parse import urlparse
 from aiohttp import web
 
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
 from aiogram.enums import ParseMode
+from aiogram.methods import TelegramMethod
+from apscheduler.triggers.interval import IntervalTrigger
 
 import config
 from database.db import db
 from services.wordpress_api import wp_api
+from services.http_client import http_client
+from services.booking_mirror import booking_mirror
 from services.scheduler import ReminderScheduler
+from services.change_feed import ChangeFeedSync, CHANGE_FEED_ENABLED
+from services.webhook_queue import WebhookQueue
+from services.outbound import OutboundDispatcher
+from services.tracing import tracer
+from services.health import HealthMonitor, HEALTH_MAX_QUEUE_LAG, HEALTH_MAX_REMINDER_DELAY
+from services.metrics import (
+    metrics, timed, METRICS_ENABLED, WEBHOOK_REQUEST_SECONDS, WEBHOOK_PROCESS_SECONDS, SCHEDULER_JOB_SECONDS
+)
 from handlers import commands, callbacks
 from handlers.notifications import NotificationHandler
+from utils.templates import templates
 
 # Настройка логирования с ротацией
 from logging.handlers import RotatingFileHandler
@@ -50,6 +65,25 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
+# Получение обновлений Telegram: 'polling' или 'webhook' (на тот же web сервер)
+TELEGRAM_UPDATES_MODE = getattr(config, 'TELEGRAM_UPDATES_MODE', 'polling')
+
+# URL, на который Telegram присылает обновления (путь маршрута берётся из него)
+WEBHOOK_URL = getattr(config, 'WEBHOOK_URL', '')
+
+# Секрет заголовка X-Telegram-Bot-Api-Secret-Token (по умолчанию - от WEBHOOK_SECRET)
+TELEGRAM_WEBHOOK_SECRET = (getattr(config, 'TELEGRAM_WEBHOOK_SECRET', '')
+                           or hashlib.sha256(config.WEBHOOK_SECRET.encode()).hexdigest())
+
+# Сколько одновременных запросов с обновлениями Telegram открывает к боту
+TELEGRAM_WEBHOOK_MAX_CONNECTIONS = getattr(config, 'TELEGRAM_WEBHOOK_MAX_CONNECTIONS', 40)
+
+# Сколько ждать обработки принятых обновлений при остановке (в секундах)
+TELEGRAM_UPDATES_DRAIN_TIMEOUT = 10
+
+# Как часто /health запрашивает getWebhookInfo (в секундах)
+TELEGRAM_WEBHOOK_INFO_INTERVAL = 60
+
 # Флаг для graceful shutdown
 shutdown_event = asyncio.Event()
 
@@ -81,9 +115,21 @@ class TelegramBotService:
         self.dp.include_router(commands.router)
         self.dp.include_router(callbacks.router)
 
-        # Инициализация компонентов
-        self.notification_handler = NotificationHandler(self.bot)
-        self.scheduler = ReminderScheduler(self.bot)
+        # Инициализация компонентов (общий лимит исходящих сообщений)
+        self.outbound = OutboundDispatcher(self.bot)
+        self.notification_handler = NotificationHandler(self.bot, self.outbound)
+        self.scheduler = ReminderScheduler(self.bot, self.outbound)
+        self.change_feed = ChangeFeedSync(self.scheduler, self.apply_feed_change)
+        self.webhook_queue = WebhookQueue(self.process_webhook_event)
+        self.polling_task = None
+        self.updates_mode = None  # фактический режим после запуска: 'polling' или 'webhook'
+        self.update_tasks = set()  # обновления из webhook в обработке
+        self.webhook_info = None
+        self.webhook_info_at = None
+
+        # Фоновые проверки компонентов для /health
+        self.health = HealthMonitor()
+        self.setup_health_checks()
 
         # Web сервер для webhook
         self.app = web.Application()
@@ -93,13 +139,72 @@ class TelegramBotService:
         """Настройка маршрутов web сервера"""
         self.app.router.add_post('/webhook/notification', self.handle_webhook)
         self.app.router.add_get('/health', self.health_check)
+        self.app.router.add_get('/health/live', self.health_live)
+        self.app.router.add_get('/health/ready', self.health_ready)
+        if METRICS_ENABLED:
+            self.app.router.add_get('/metrics', self.handle_metrics)
+
+        # Обновления Telegram в режиме webhook: ответ сразу, обработка в фоне
+        if TELEGRAM_UPDATES_MODE == 'webhook':
+            self.app.router.add_post(urlparse(WEBHOOK_URL).path, self.handle_telegram_update)
 
         # Agent token API endpoints
         self.app.router.add_post('/api/agent-token', self.handle_agent_token)
         self.app.router.add_delete('/api/unbind/{telegram_id}', self.handle_unbind)
 
+    async def handle_telegram_update(self, request: web.Request) -> web.Response:
+        """Обновление от Telegram (режим webhook): ответ сразу, обработка в фоне"""
+        if self.updates_mode == 'polling':
+            # Webhook не зарегистрировался, бот перешёл на polling
+            raise web.HTTPNotFound()
+
+        secret = request.headers.get('X-Telegram-Bot-Api-Secret-Token', '')
+        if not hmac.compare_digest(secret, TELEGRAM_WEBHOOK_SECRET):
+            logger.warning("Invalid secret token for Telegram update")
+            return web.Response(status=401, text='Unauthorized')
+
+        try:
+            update = await request.json()
+        except Exception:
+            return web.Response(status=400, text='Invalid JSON')
+
+        task = asyncio.create_task(self.feed_telegram_update(update))
+        self.update_tasks.add(task)
+        task.add_done_callback(self.update_tasks.discard)
+        return web.json_response({})
+
+    async def feed_telegram_update(self, update: dict):
+        """Обработать обновление из webhook (ошибка обработчика - только в лог, как при polling)"""
+        try:
+            result = await self.dp.feed_raw_update(self.bot, update)
+            if isinstance(result, TelegramMethod):
+                await self.dp.silent_call_request(self.bot, result)
+        except Exception as e:
+            logger.error(f"Error handling Telegram update {update.get('update_id')}: {e}")
+
+    async def get_webhook_info(self):
+        """getWebhookInfo не чаще раза в TELEGRAM_WEBHOOK_INFO_INTERVAL секунд"""
+        if self.webhook_info is None or time.monotonic() - self.webhook_info_at > TELEGRAM_WEBHOOK_INFO_INTERVAL:
+            self.webhook_info = await self.bot.get_webhook_info()
+            self.webhook_info_at = time.monotonic()
+        return self.webhook_info
+
     async def handle_webhook(self, request: web.Request) -> web.Response:
         """Обработка webhook от WordPress"""
+        started = time.perf_counter()
+
+        # Трасса продолжается воркером очереди по trace_id события
+        with tracer.trace('webhook.accept') as span:
+            response = await self.accept_webhook(request)
+            span.set(status=response.status)
+
+        WEBHOOK_REQUEST_SECONDS.observe(time.perf_counter() - started, response.status)
+        if span.trace_id:
+            response.headers['X-Trace-Id'] = span.trace_id
+        return response
+
+    async def accept_webhook(self, request: web.Request) -> web.Response:
+        """Проверить webhook от WordPress и поставить событие в очередь"""
         try:
             # Проверка секретного ключа
             webhook_secret = request.headers.get('X-Webhook-Secret', '')
@@ -109,57 +214,201 @@ class TelegramBotService:
                 return web.json_response({'success': False, 'message': 'Invalid secret'}, status=401)
 
             # Получение данных
-            data = await request.json()
+            with tracer.span('webhook.parse'):
+                data = await request.json()
 
             event_type = data.get('event_type')
             event_data = data.get('data')
 
-            if not event_type or not event_data:
+            if not event_type or not isinstance(event_data, dict) or not event_data:
                 return web.json_response({'success': False, 'message': 'Invalid data'}, status=400)
 
-            # Обработка уведомления
-            await self.notification_handler.handle_notification(event_type, event_data)
+            # Событие сохраняется в очередь, доставка выполняется воркерами
+            with tracer.span('webhook.enqueue', event_type=event_type, booking_id=event_data.get('booking_id')):
+                event_id = await self.webhook_queue.enqueue(event_type, event_data)
 
-            return web.json_response({'success': True})
+            return web.json_response({'success': True, 'queued': event_id}, status=202)
 
         except Exception as e:
             logger.error(f"Error handling webhook: {e}")
             return web.json_response({'success': False, 'message': str(e)}, status=500)
 
-    async def health_check(self, request: web.Request) -> web.Response:
-        """Health check endpoint с детальной информацией"""
-        health_status = {
+    async def process_webhook_event(self, event_type: str, event_data: dict):
+        """Обработка события из очереди вебхуков"""
+        started = time.perf_counter()
+        outcome = 'error'
+        try:
+            await self.deliver_webhook_event(event_type, event_data)
+            outcome = 'ok'
+        finally:
+            WEBHOOK_PROCESS_SECONDS.observe(time.perf_counter() - started, event_type, outcome)
+
+    async def deliver_webhook_event(self, event_type: str, event_data: dict):
+        """Кэш, локальная копия, уведомление и очередь напоминаний по событию"""
+        # Расписания участников и детали бронирования в кэше WordPressAPI устарели
+        with tracer.span('invalidate_cache'):
+            await self.invalidate_wordpress_cache(event_data)
+
+        # Обновление локальной копии бронирований
+        with tracer.span('booking_mirror'):
+            await booking_mirror.apply_event(event_type, event_data)
+
+        # Обработка уведомления
+        with tracer.span('notification'):
+            await self.notification_handler.handle_notification(event_type, event_data)
+
+        # Обновление очереди напоминаний
+        with tracer.span('reminders'):
+            await self.scheduler.handle_booking_event(event_type, event_data)
+
+    async def apply_feed_change(self, booking_data: dict):
+        """Изменение из ленты /bookings/changes: как вебхук, но без уведомления"""
+        await self.invalidate_wordpress_cache(booking_data)
+        await booking_mirror.apply_event('booking_updated', booking_data)
+        await self.scheduler.handle_booking_event('booking_updated', booking_data)
+
+    async def invalidate_wordpress_cache(self, event_data: dict):
+        """Сбросить кэш ответов WordPress для агента (с привязками) и клиента бронирования"""
+        agent = event_data.get('agent') if isinstance(event_data.get('agent'), dict) else {}
+        customer = event_data.get('customer') if isinstance(event_data.get('customer'), dict) else {}
+
+        recipients = await db.resolve_recipients(
+            event_data.get('agent_id'),
+            [agent.get('telegram_chat_id'), customer.get('telegram_chat_id')],
+            'booking_updated'
+        )
+        removed = wp_api.invalidate_cache([recipient.chat_id for recipient in recipients], event_data.get('booking_id'))
+
+        if removed:
+            logger.debug(f"Invalidated {removed} cached WordPress responses for booking {event_data.get('booking_id')}")
+
+    def setup_health_checks(self):
+        """Проверки компонентов (без БД и очереди вебхуков бот не принимает запросы)"""
+        self.health.register('database', self.check_database, critical=True)
+        self.health.register('webhook_queue', self.check_webhook_queue, critical=True)
+        self.health.register('wordpress', self.check_wordpress)
+        self.health.register('scheduler', self.check_scheduler)
+        self.health.register('telegram', self.check_telegram)
+        self.health.register('tracing', self.check_tracing)
+
+    async def check_database(self) -> dict:
+        """Запрос к БД и кэши поверх неё"""
+        started = time.perf_counter()
+        await db.ping()
+        return {
             'status': 'ok',
-            'service': 'telegram-bot',
-            'version': '1.0.0',
-            'timestamp': datetime.now(pytz.timezone(config.TIMEZONE)).isoformat(),
+            'latency_ms': round((time.perf_counter() - started) * 1000, 3),
+            'profile_cache': db.profile_cache.stats(),
+            'notification_log': db.log_writer.stats(),
         }
 
-        # Проверка БД
-        try:
-            async with db.get_session() as session:
-                await session.execute('SELECT 1')
-            health_status['database'] = 'ok'
-        except Exception as e:
-            health_status['database'] = f'error: {str(e)}'
-            health_status['status'] = 'degraded'
-
-        # Проверка WordPress API
-        try:
-            if wp_api.session and not wp_api.session.closed:
-                health_status['wordpress_api'] = 'connected'
-            else:
-                health_status['wordpress_api'] = 'disconnected'
-        except Exception as e:
-            health_status['wordpress_api'] = f'error: {str(e)}'
+    async def check_webhook_queue(self) -> dict:
+        """Воркеры очереди вебхуков и её отставание"""
+        stats = await self.webhook_queue.stats()
+        if not self.webhook_queue.running:
+            return {'status': 'down', 'error': 'workers stopped', **stats}
+        if stats['lag_seconds'] > HEALTH_MAX_QUEUE_LAG:
+            return {'status': 'degraded', 'error': f"oldest event waits {stats['lag_seconds']:.0f} s", **stats}
+        return {'status': 'ok', **stats}
+
+    async def check_wordpress(self) -> dict:
+        """Выключатели эндпоинтов WordPress (без запросов к WordPress)"""
+        breakers = wp_api.breaker_stats()
+        opened = [endpoint for endpoint, breaker in breakers.items() if breaker['state'] == 'open']
+        result = {
+            'status': 'degraded' if opened else 'ok',
+            'session': 'connected' if wp_api.session and not wp_api.session.closed else 'disconnected',
+            'breakers': breakers,
+            'http_client': http_client.stats(),
+            'cache': wp_api.cache_stats(),
+            'singleflight': wp_api.singleflight.stats(),
+            'booking_mirror': booking_mirror.stats(),
+            'booking_changes': self.change_feed.stats(),
+        }
+        if opened:
+            result['error'] = f"circuit open: {', '.join(opened)}"
+        return result
+
+    async def check_scheduler(self) -> dict:
+        """Планировщик задач и очередь напоминаний"""
+        reminders = self.scheduler.engine.stats()
+        result = {
+            'status': 'ok',
+            'scheduler': 'running' if self.scheduler.scheduler.running else 'stopped',
+            'reminders': reminders,
+            'sent_reminders': self.scheduler.sent_reminders.stats(),
+        }
+        if not self.scheduler.scheduler.running or not reminders['running']:
+            result['status'] = 'down'
+            result['error'] = 'scheduler stopped'
+        elif reminders['overdue_seconds'] > HEALTH_MAX_REMINDER_DELAY:
+            result['status'] = 'degraded'
+            result['error'] = f"reminders overdue by {reminders['overdue_seconds']:.0f} s"
+        return result
+
+    async def check_telegram(self) -> dict:
+        """Получение обновлений (polling или webhook) и исходящие сообщения"""
+        result = {
+            'status': 'ok',
+            'mode': self.updates_mode,
+            'outbound': self.outbound.stats(),
+            'notification_renders': self.notification_handler.render_stats,
+        }
 
-        # Проверка планировщика
-        try:
-            health_status['scheduler'] = 'running' if self.scheduler.scheduler.running else 'stopped'
-        except Exception as e:
-            health_status['scheduler'] = f'error: {str(e)}'
+        if self.updates_mode == 'webhook':
+            info = await self.get_webhook_info()
+            result['webhook'] = {
+                'registered': info.url == WEBHOOK_URL,
+                'pending_updates': info.pending_update_count,
+                'in_flight': len(self.update_tasks),
+                'last_error': info.last_error_message,
+                'last_error_at': info.last_error_date.isoformat() if info.last_error_date else None,
+            }
+            if info.url != WEBHOOK_URL:
+                # Webhook удалён или заменён (например, запуском бота в режиме polling)
+                result['status'] = 'down'
+                result['error'] = 'webhook is not registered'
+            elif info.last_error_date and (datetime.now(timezone.utc) - info.last_error_date).total_seconds() < 2 * TELEGRAM_WEBHOOK_INFO_INTERVAL:
+                result['status'] = 'degraded'
+                result['error'] = f'webhook delivery error: {info.last_error_message}'
+            return result
+
+        result['polling'] = 'running'
+        if self.polling_task is None:
+            result['polling'] = 'not started'
+            result['status'] = 'down'
+            result['error'] = 'polling not started'
+        elif self.polling_task.done():
+            result['polling'] = 'stopped'
+            result['status'] = 'down'
+            result['error'] = 'polling stopped'
+            if not self.polling_task.cancelled() and self.polling_task.exception():
+                result['error'] = f'polling stopped: {self.polling_task.exception()}'
+        return result
+
+    async def check_tracing(self) -> dict:
+        return {'status': 'ok', **tracer.stats()}
 
-        return web.json_response(health_status)
+    async def health_check(self, request: web.Request) -> web.Response:
+        """Снимок состояния компонентов (обновляется фоновым монитором)"""
+        if self.health.body is None:
+            return web.json_response({'status': 'starting', 'service': 'telegram-bot'})
+        return web.Response(body=self.health.body, content_type='application/json')
+
+    async def health_live(self, request: web.Request) -> web.Response:
+        """Liveness: процесс не завис (503 - перезапустить)"""
+        result = self.health.live()
+        return web.json_response(result, status=200 if result['status'] == 'ok' else 503)
+
+    async def health_ready(self, request: web.Request) -> web.Response:
+        """Readiness: критичные компоненты работают (503 - не направлять запросы)"""
+        result = self.health.readiness()
+        return web.json_response(result, status=200 if result['ready'] else 503)
+
+    async def handle_metrics(self, request: web.Request) -> web.Response:
+        """Метрики в текстовом формате Prometheus"""
+        return web.Response(body=metrics.render().encode(),
+                            headers={'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'})
 
     async def handle_agent_token(self, request: web.Request) -> web.Response:
         """Обработка нового agent token от WordPress"""
@@ -184,7 +433,7 @@ class TelegramBotService:
             from datetime import datetime
             from sqlalchemy import select
 
-            async with db.get_session() as session:
+            async with db.get_session('handle_agent_token') as session:
                 # Проверка существования токена
                 result = await session.execute(select(AgentToken).where(AgentToken.token == token))
                 existing_token = result.scalar_one_or_none()
@@ -226,12 +475,13 @@ class TelegramBotService:
             from database.models import AgentBinding
             from sqlalchemy import select, delete
 
-            async with db.get_session() as session:
+            async with db.get_session('handle_unbind') as session:
                 # Удаление всех привязок этого telegram_id
                 result = await session.execute(
                     delete(AgentBinding).where(AgentBinding.telegram_id == telegram_id)
                 )
                 await session.commit()
+                db.invalidate_recipient_profile(telegram_id)
 
                 deleted_count = result.rowcount
                 logger.info(f"Unbound telegram_id={telegram_id}, deleted {deleted_count} bindings")
@@ -252,30 +502,59 @@ class TelegramBotService:
         """Действия при запуске бота"""
         logger.info("Starting Telegram bot...")
 
+        # Компиляция шаблонов сообщений (ошибка в шаблоне остановит запуск)
+        templates.load()
+
         # Инициализация базы данных
         await db.init_db()
+        await db.log_writer.start()
         logger.info("Database initialized")
 
         # Инициализация WordPress API сессии
         await wp_api.init_session()
         logger.info("WordPress API session initialized")
 
-        # Запуск планировщика напоминаний
-        self.scheduler.start()
+        # Запуск планировщика напоминаний: очередь ведёт лента изменений
+        # бронирований, без неё - периодическая полная сверка
+        await self.scheduler.start(full_sync=not CHANGE_FEED_ENABLED)
+        if CHANGE_FEED_ENABLED:
+            self.change_feed.start()
         logger.info("Reminder scheduler started")
 
+        # Выгрузка трасс и запуск обработки очереди вебхуков
+        await tracer.start()
+        await self.webhook_queue.start()
+        self.scheduler.scheduler.add_job(
+            timed(SCHEDULER_JOB_SECONDS, 'expire_webhook_events')(self.webhook_queue.expire_failed),
+            trigger=IntervalTrigger(hours=1),
+            id='expire_webhook_events',
+            name='Delete old failed webhook events',
+            next_run_time=datetime.now(timezone.utc),
+            replace_existing=True
+        )
+
         logger.info("Telegram bot started successfully!")
 
     async def on_shutdown(self):
         """Действия при остановке бота"""
         logger.info("Shutting down Telegram bot...")
 
+        # /health/ready отвечает 503 на время остановки
+        await self.health.stop()
+
+        # Остановка обработки вебхуков (текущие события дообрабатываются)
+        await self.webhook_queue.stop()
+        await tracer.stop()
+
         # Остановка планировщика
-        self.scheduler.stop()
+        await self.scheduler.stop()
 
         # Закрытие WordPress API сессии
         await wp_api.close_session()
 
+        # Запись оставшихся строк лога уведомлений
+        await db.log_writer.stop()
+
         # Закрытие бота
         await self.bot.session.close()
 
@@ -306,24 +585,80 @@ class TelegramBotService:
         logger.info("Bot is running in webhook mode...")
 
         try:
-            # Создаём задачу polling
-            polling_task = asyncio.create_task(self.dp.start_polling(self.bot))
+            # Обновления Telegram: webhook на этом сервере, при ошибке - polling
+            if not await self.start_telegram_webhook():
+                await self.start_telegram_polling()
+
+            # Проверки компонентов для /health (после запуска всех компонентов)
+            await self.health.start()
 
             # Ждём сигнала завершения
             await shutdown_event.wait()
 
-            logger.info("Shutdown signal received, stopping polling...")
-            polling_task.cancel()
+            logger.info(f"Shutdown signal received, stopping {self.updates_mode}...")
+            await self.health.stop()
+
+            if self.polling_task:
+                self.polling_task.cancel()
 
-            try:
-                await polling_task
-            except asyncio.CancelledError:
-                logger.info("Polling task cancelled successfully")
+                try:
+                    await self.polling_task
+                except asyncio.CancelledError:
+                    logger.info("Polling task cancelled successfully")
 
         finally:
             await runner.cleanup()
+            await self.drain_telegram_updates()
             await self.on_shutdown()
 
+    async def start_telegram_webhook(self) -> bool:
+        """
+        Зарегистрировать webhook в Telegram (режим TELEGRAM_UPDATES_MODE = 'webhook')
+
+        Returns:
+            bool: True - обновления приходят на web сервер, False - нужен polling
+        """
+        if TELEGRAM_UPDATES_MODE != 'webhook':
+            return False
+
+        try:
+            await self.bot.set_webhook(
+                WEBHOOK_URL,
+                secret_token=TELEGRAM_WEBHOOK_SECRET,
+                max_connections=TELEGRAM_WEBHOOK_MAX_CONNECTIONS,
+                allowed_updates=self.dp.resolve_used_update_types()
+            )
+        except Exception as e:
+            logger.error(f"Error setting Telegram webhook, falling back to polling: {e}")
+            return False
+
+        self.updates_mode = 'webhook'
+        logger.info(f"Receiving Telegram updates via webhook (max connections: {TELEGRAM_WEBHOOK_MAX_CONNECTIONS})")
+        return True
+
+    async def start_telegram_polling(self):
+        """Запуск long polling (webhook в Telegram снимается, иначе getUpdates вернёт 409)"""
+        try:
+            await self.bot.delete_webhook()
+        except Exception as e:
+            logger.warning(f"Error deleting Telegram webhook before polling: {e}")
+
+        self.updates_mode = 'polling'
+        self.polling_task = asyncio.create_task(self.dp.start_polling(self.bot))
+        logger.info("Receiving Telegram updates via polling")
+
+    async def drain_telegram_updates(self):
+        """
+        Дождаться обработки обновлений, принятых через webhook
+
+        Сам webhook не удаляется: обновления, пришедшие во время перезапуска,
+        Telegram доставит повторно после запуска.
+        """
+        tasks = set(self.update_tasks)
+        if tasks:
+            logger.info(f"Waiting for {len(tasks)} Telegram updates in progress...")
+            await asyncio.wait(tasks, timeout=TELEGRAM_UPDATES_DRAIN_TIMEOUT)
+
 
 async def main():
     """Главная функция"""
@@ -71,6 +71,20 @@ DATABASE_URL = os.getenv(
     f'sqlite+aiosqlite:///{BASE_DIR}/bot_data.db'
 )
 
+# SQLite: база открывается в режиме WAL с synchronous=NORMAL.
+# Сколько миллисекунд ждать снятия блокировки записи
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', 5000))
+
+# SQLite: размер файла БД, отображаемого в память (байт, 0 - отключить)
+SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+
+# PostgreSQL: пул соединений
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 10))
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 20))
+DB_POOL_TIMEOUT = int(os.getenv('DB_POOL_TIMEOUT', 30))
+DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 1800))
+DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'true').lower() == 'true'
+
 # Автоматическое создание таблиц при старте
 AUTO_CREATE_TABLES = os.getenv('AUTO_CREATE_TABLES', 'true').lower() == 'true'
 
@@ -84,9 +98,35 @@ HOST = os.getenv('HOST', '0.0.0.0')
 # Port для веб-сервера
 PORT = int(os.getenv('PORT', '8000'))
 
-# Базовый URL бота для вебхуков (если используется Telegram webhook mode)
+# Получение обновлений Telegram: 'polling' (long polling) или 'webhook' -
+# Telegram присылает обновления на WEBHOOK_URL, их принимает этот же web
+# сервер. Если webhook не удалось зарегистрировать, бот переходит на polling.
+# В обоих режимах должен работать только один экземпляр бота (см. README)
+TELEGRAM_UPDATES_MODE = os.getenv('TELEGRAM_UPDATES_MODE', 'polling')
+
+# Публичный HTTPS URL для обновлений Telegram (режим webhook); путь из URL
+# становится маршрутом web сервера, прокси должен передавать его без изменений
 WEBHOOK_URL = os.getenv('WEBHOOK_URL', f'https://yourdomain.com/webhook/{BOT_TOKEN}')
 
+# Секрет, который Telegram передаёт в X-Telegram-Bot-Api-Secret-Token
+# (символы A-Z, a-z, 0-9, _ и -; пусто - вычисляется из WEBHOOK_SECRET)
+TELEGRAM_WEBHOOK_SECRET = os.getenv('TELEGRAM_WEBHOOK_SECRET', '')
+
+# Сколько одновременных запросов с обновлениями Telegram открывает к боту (1-100)
+TELEGRAM_WEBHOOK_MAX_CONNECTIONS = int(os.getenv('TELEGRAM_WEBHOOK_MAX_CONNECTIONS', 40))
+
+# Количество воркеров, обрабатывающих очередь входящих вебхуков
+WEBHOOK_WORKERS = int(os.getenv('WEBHOOK_WORKERS', 4))
+
+# Максимальное число попыток обработки вебхука
+WEBHOOK_MAX_ATTEMPTS = int(os.getenv('WEBHOOK_MAX_ATTEMPTS', 5))
+
+# Базовая задержка перед повторной обработкой (в секундах, растёт экспоненциально)
+WEBHOOK_RETRY_BASE_DELAY = int(os.getenv('WEBHOOK_RETRY_BASE_DELAY', 5))
+
+# Сколько дней хранить вебхуки с исчерпанными попытками (status='failed')
+WEBHOOK_FAILED_RETENTION_DAYS = int(os.getenv('WEBHOOK_FAILED_RETENTION_DAYS', 7))
+
 # ============================================================================
 # ЛОГИРОВАНИЕ
 # ============================================================================
@@ -120,8 +160,38 @@ REMINDER_TIMES = [
 # Интервал проверки предстоящих событий (в секундах)
 CHECK_INTERVAL = int(os.getenv('CHECK_INTERVAL', 60))
 
-# Интервал проверки напоминаний в минутах (для планировщика)
-REMINDER_CHECK_INTERVAL = int(os.getenv('REMINDER_CHECK_INTERVAL', 5))
+# Максимальное число одновременных отправок при рассылке уведомления
+NOTIFICATION_CONCURRENCY = int(os.getenv('NOTIFICATION_CONCURRENCY', 10))
+
+# Лог уведомлений пишется в БД пачками: по NOTIFICATION_LOG_BATCH_SIZE строк
+# или не реже, чем раз в NOTIFICATION_LOG_FLUSH_INTERVAL_MS миллисекунд
+NOTIFICATION_LOG_BATCH_SIZE = int(os.getenv('NOTIFICATION_LOG_BATCH_SIZE', 100))
+NOTIFICATION_LOG_FLUSH_INTERVAL_MS = int(os.getenv('NOTIFICATION_LOG_FLUSH_INTERVAL_MS', 500))
+
+# Размер буфера, при котором отправка ждёт записи лога в БД
+NOTIFICATION_LOG_MAX_BUFFER = int(os.getenv('NOTIFICATION_LOG_MAX_BUFFER', 5000))
+
+# Интервал полной сверки напоминаний с WordPress в минутах (если лента
+# изменений CHANGE_FEED_ENABLED выключена или не поддерживается плагином).
+# Между сверками напоминания планируются по вебхукам о бронированиях
+REMINDER_SYNC_INTERVAL = int(os.getenv('REMINDER_SYNC_INTERVAL', 30))
+
+# Максимальное число попыток отправки напоминания и базовая задержка
+# перед повтором в секундах (удваивается с каждой попыткой, не дольше 5 минут)
+REMINDER_MAX_ATTEMPTS = int(os.getenv('REMINDER_MAX_ATTEMPTS', 5))
+REMINDER_RETRY_BASE_DELAY = int(os.getenv('REMINDER_RETRY_BASE_DELAY', 30))
+
+# Отметки об отправленных напоминаниях хранятся столько часов после начала урока
+SENT_REMINDER_RETENTION_HOURS = int(os.getenv('SENT_REMINDER_RETENTION_HOURS', 24))
+
+# Интервал очистки устаревших отметок (в минутах)
+SENT_REMINDER_EXPIRY_INTERVAL = int(os.getenv('SENT_REMINDER_EXPIRY_INTERVAL', 60))
+
+# Количество chat_id в одном пакетном запросе расписаний (/schedule/bulk)
+SCHEDULE_BULK_CHUNK_SIZE = int(os.getenv('SCHEDULE_BULK_CHUNK_SIZE', 100))
+
+# Размер страницы ответа /schedule/bulk (бронирований на страницу, максимум 500)
+SCHEDULE_BULK_PAGE_SIZE = int(os.getenv('SCHEDULE_BULK_PAGE_SIZE', 200))
 
 # ============================================================================
 # ЛОКАЛИЗАЦИЯ
@@ -191,13 +261,34 @@ USE_REDIS = os.getenv('USE_REDIS', 'false').lower() == 'true'
 # URL Redis сервера
 REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
 
+# Кэш профилей получателей в памяти процесса (пользователь, настройки, часовой пояс)
+# Время жизни записи в секундах
+PROFILE_CACHE_TTL = int(os.getenv('PROFILE_CACHE_TTL', 300))
+
+# Максимальное количество chat_id в кэше
+PROFILE_CACHE_SIZE = int(os.getenv('PROFILE_CACHE_SIZE', 10000))
+
+# Кэш ответов WordPress для /today, /week и деталей бронирования
+# Время жизни записи в секундах (сбрасывается вебхуками о бронировании)
+WP_CACHE_TTL = int(os.getenv('WP_CACHE_TTL', 30))
+
+# Максимальное количество ответов в кэше
+WP_CACHE_SIZE = int(os.getenv('WP_CACHE_SIZE', 2000))
+
 # ============================================================================
 # RATE LIMITING
 # ============================================================================
 
 # Максимальное количество запросов в минуту на пользователя
+# (исходящие сообщения в один чат дополнительно ограничены 1 в секунду)
 RATE_LIMIT_PER_USER = int(os.getenv('RATE_LIMIT_PER_USER', 30))
 
+# Глобальный лимит исходящих сообщений бота в секунду (лимит Telegram ~30)
+TELEGRAM_GLOBAL_RATE = int(os.getenv('TELEGRAM_GLOBAL_RATE', 30))
+
+# Сколько раз повторять отправку после ответа 429 (RetryAfter) от Telegram
+TELEGRAM_MAX_RETRIES = int(os.getenv('TELEGRAM_MAX_RETRIES', 3))
+
 # ============================================================================
 # FEATURES FLAGS
 # ============================================================================
@@ -222,6 +313,88 @@ ALLOWED_IPS = os.getenv('ALLOWED_IPS', '').split(',') if os.getenv('ALLOWED_IPS'
 # Таймаут для HTTP запросов к WordPress (в секундах)
 HTTP_TIMEOUT = int(os.getenv('HTTP_TIMEOUT', 30))
 
+# Пул соединений общего HTTP клиента: всего и к одному хосту
+HTTP_POOL_LIMIT = int(os.getenv('HTTP_POOL_LIMIT', 100))
+HTTP_POOL_LIMIT_PER_HOST = int(os.getenv('HTTP_POOL_LIMIT_PER_HOST', 30))
+
+# Сколько секунд держать простаивающее соединение (keep-alive)
+HTTP_KEEPALIVE_TIMEOUT = int(os.getenv('HTTP_KEEPALIVE_TIMEOUT', 30))
+
+# Время жизни DNS кэша в секундах
+HTTP_DNS_CACHE_TTL = int(os.getenv('HTTP_DNS_CACHE_TTL', 300))
+
+# Запрашивать сжатые ответы (gzip/deflate)
+HTTP_COMPRESSION = os.getenv('HTTP_COMPRESSION', 'true').lower() == 'true'
+
+# Повторы идемпотентных запросов к WordPress (таймауты, ошибки соединения, 5xx):
+# попыток всего, базовая и максимальная задержка между ними в секундах
+WP_RETRY_ATTEMPTS = int(os.getenv('WP_RETRY_ATTEMPTS', 3))
+WP_RETRY_BASE_DELAY = float(os.getenv('WP_RETRY_BASE_DELAY', 0.5))
+WP_RETRY_MAX_DELAY = float(os.getenv('WP_RETRY_MAX_DELAY', 5))
+
+# Circuit breaker по эндпоинтам WordPress: сбоев подряд до размыкания
+# и секунд до пробного запроса
+WP_BREAKER_FAILURE_THRESHOLD = int(os.getenv('WP_BREAKER_FAILURE_THRESHOLD', 5))
+WP_BREAKER_RESET_TIMEOUT = int(os.getenv('WP_BREAKER_RESET_TIMEOUT', 30))
+
+# Локальная копия бронирований для /today, /week и деталей:
+# через сколько секунд после сверки с WordPress данные перезапрашиваются в фоне
+BOOKING_MIRROR_MAX_AGE = int(os.getenv('BOOKING_MIRROR_MAX_AGE', 300))
+
+# Сколько дней хранить в копии прошедшие бронирования
+BOOKING_MIRROR_RETENTION_DAYS = int(os.getenv('BOOKING_MIRROR_RETENTION_DAYS', 7))
+
+# Сколько прочитанных из копии расписаний и бронирований держать в памяти
+BOOKING_MIRROR_READ_CACHE_SIZE = int(os.getenv('BOOKING_MIRROR_READ_CACHE_SIZE', 5000))
+
+# Лента изменений бронирований (/bookings/changes): очередь напоминаний и
+# локальная копия обновляются по изменениям, а не полной сверкой каждые
+# REMINDER_SYNC_INTERVAL минут. Старый плагин без ленты - автоматически полная сверка
+CHANGE_FEED_ENABLED = os.getenv('CHANGE_FEED_ENABLED', 'true').lower() == 'true'
+
+# Интервал опроса ленты в секундах и размер страницы
+CHANGE_FEED_INTERVAL = int(os.getenv('CHANGE_FEED_INTERVAL', 60))
+CHANGE_FEED_PAGE_SIZE = int(os.getenv('CHANGE_FEED_PAGE_SIZE', 200))
+
+# На сколько дней вперёд выполняется полная сверка при первом запуске
+# (и для новых пользователей или после изменения настроек напоминаний)
+CHANGE_FEED_RESYNC_DAYS = int(os.getenv('CHANGE_FEED_RESYNC_DAYS', 180))
+
+# Метрики в формате Prometheus на GET /metrics (задержки вебхуков, отправки
+# в Telegram, запросов к WordPress, сессий БД и задач планировщика)
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+
+# Трассировка вебхуков: приём -> очередь -> получатели -> Telegram
+# (отчёт по трассам: python3 scripts/trace_report.py bot/logs/traces.jsonl)
+TRACING_ENABLED = os.getenv('TRACING_ENABLED', 'true').lower() == 'true'
+
+# Доля трассируемых вебхуков (0.0 - 1.0)
+TRACE_SAMPLE_RATE = float(os.getenv('TRACE_SAMPLE_RATE', 1.0))
+
+# Куда выгружать трассы: 'jsonl' (файл TRACE_FILE) или 'otlp' (коллектор TRACE_OTLP_URL)
+TRACE_EXPORTER = os.getenv('TRACE_EXPORTER', 'jsonl')
+
+# Файл трасс (одна трасса на строку) и его ротация
+TRACE_FILE = BASE_DIR / 'logs' / 'traces.jsonl'
+TRACE_FILE_MAX_BYTES = int(os.getenv('TRACE_FILE_MAX_BYTES', 10 * 1024 * 1024))  # 10 MB
+TRACE_FILE_BACKUP_COUNT = int(os.getenv('TRACE_FILE_BACKUP_COUNT', 3))
+
+# OTLP/HTTP коллектор в формате JSON, например http://localhost:4318/v1/traces,
+# и интервал отправки пачек в секундах
+TRACE_OTLP_URL = os.getenv('TRACE_OTLP_URL', '')
+TRACE_FLUSH_INTERVAL = int(os.getenv('TRACE_FLUSH_INTERVAL', 5))
+
+# Проверки компонентов для /health, /health/live и /health/ready: фоновый
+# монитор раз в HEALTH_CHECK_INTERVAL секунд, каждая проверка не дольше
+# HEALTH_CHECK_TIMEOUT секунд; /health отдаёт последний снимок без запросов к БД
+HEALTH_CHECK_INTERVAL = int(os.getenv('HEALTH_CHECK_INTERVAL', 15))
+HEALTH_CHECK_TIMEOUT = int(os.getenv('HEALTH_CHECK_TIMEOUT', 5))
+
+# Пороги состояния degraded (в секундах): ожидание самого старого вебхука
+# в очереди и опоздание ближайшего напоминания
+HEALTH_MAX_QUEUE_LAG = int(os.getenv('HEALTH_MAX_QUEUE_LAG', 300))
+HEALTH_MAX_REMINDER_DELAY = int(os.getenv('HEALTH_MAX_REMINDER_DELAY', 60))
+
 # ============================================================================
 # ПРОВЕРКА КОНФИГУРАЦИИ
 # ============================================================================
@@ -3,22 +3,99 @@
 """
 
 import logging
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
-from sqlalchemy import select, and_
-from database.models import Base, User, Settings, SentReminder, NotificationLog
+import time
+from datetime import datetime
+from typing import NamedTuple
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy import select, delete, update, func, and_, or_, exists, literal, union_all, text
+from sqlalchemy.orm import aliased
+from sqlalchemy.exc import IntegrityError
+from database.models import (
+    Base, User, Settings, SentReminder, ScheduledReminder, WebhookEvent, AgentBinding,
+    MirroredBooking, BookingMirrorSync, SyncState
+)
+from database.log_writer import NotificationLogWriter
+from database.profile import create_engine
+from services.metrics import DB_SESSION_SECONDS
+from utils.cache import TTLCache
 import config
 
 logger = logging.getLogger(__name__)
 
+# Время жизни (в секундах) и максимальный размер кэша профилей получателей
+PROFILE_CACHE_TTL = getattr(config, 'PROFILE_CACHE_TTL', 300)
+PROFILE_CACHE_SIZE = getattr(config, 'PROFILE_CACHE_SIZE', 10000)
+
+# Количество booking_id в одном запросе отправленных напоминаний
+SENT_REMINDER_QUERY_CHUNK = 500
+
+
+class RecipientProfile(NamedTuple):
+    """Всё, что нужно для отправки уведомления в chat_id (любое поле может быть None)"""
+    chat_id: int
+    user: User | None
+    settings: Settings | None
+    binding: AgentBinding | None
+    timezone: str
+
+
+class Recipient(NamedTuple):
+    """Получатель уведомления о событии бронирования"""
+    chat_id: int
+    user_type: str | None  # 'agent', 'customer' или None (только привязка)
+    via_binding: bool  # chat_id привязан к агенту через agent_bindings
+    timezone: str
+    notify: bool  # включено ли уведомление этого типа в настройках
+
+
+# Поля настроек, разрешающие уведомление о событии (достаточно любого)
+EVENT_OPT_IN_FIELDS = {
+    'booking_created': ('notify_on_create',),
+    'booking_updated': ('notify_on_update',),
+    'booking_status_changed': ('notify_on_update',),
+    'booking_cancelled': ('notify_on_cancel', 'notify_on_update'),
+    'reminder': ('notify_reminders',),
+}
+
+
+class TimedSession(AsyncSession):
+    """
+    AsyncSession, записывающая время жизни сессии в DB_SESSION_SECONDS
+
+    Метка operation передаётся явно при открытии сессии через
+    info={'operation': ...} (см. DatabaseManager.timed_session), например
+    get_settings_for_chats или flush.
+    """
+
+    async def __aenter__(self):
+        self.metrics_operation = self.info.get('operation', 'unknown')
+        self.metrics_started = time.perf_counter()
+        return await super().__aenter__()
+
+    async def __aexit__(self, exc_type, exc, traceback):
+        try:
+            await super().__aexit__(exc_type, exc, traceback)
+        finally:
+            DB_SESSION_SECONDS.observe(time.perf_counter() - self.metrics_started, self.metrics_operation)
+
 
 class DatabaseManager:
     """Менеджер для работы с базой данных"""
 
     def __init__(self):
-        self.engine = create_async_engine(config.DATABASE_URL, echo=False)
+        self.engine = create_engine(config.DATABASE_URL, echo=False)
         self.async_session = async_sessionmaker(
-            self.engine, class_=AsyncSession, expire_on_commit=False
+            self.engine, class_=TimedSession, expire_on_commit=False
         )
+        self.log_writer = NotificationLogWriter(self.async_session)
+        self.profile_cache = TTLCache(PROFILE_CACHE_SIZE, PROFILE_CACHE_TTL)
+        # Увеличивается при каждой инвалидации, чтобы загрузка, начатая
+        # до записи, не положила в кэш устаревший профиль
+        self.profile_generation = 0
+
+    def timed_session(self, operation: str) -> TimedSession:
+        """Новая сессия с меткой operation для DB_SESSION_SECONDS"""
+        return self.async_session(info={'operation': operation})
 
     async def init_db(self):
         """Инициализация базы данных"""
@@ -26,18 +103,137 @@ class DatabaseManager:
             await conn.run_sync(Base.metadata.create_all)
         logger.info("Database initialized successfully")
 
-    async def get_user_by_chat_id(self, chat_id: int) -> User | None:
-        """Получить пользователя по chat_id"""
-        async with self.async_session() as session:
-            result = await session.execute(
+    async def get_recipient_profile(self, chat_id: int) -> RecipientProfile:
+        """
+        Получить пользователя, настройки, привязку и часовой пояс chat_id
+
+        Профиль кэшируется (включая отсутствие пользователя), поэтому
+        повторные уведомления тому же получателю не обращаются к БД.
+        """
+        profile = self.profile_cache.get(chat_id)
+        if profile is not None:
+            return profile
+
+        generation = self.profile_generation
+
+        async with self.timed_session('get_recipient_profile') as session:
+            user = (await session.execute(
                 select(User).where(User.chat_id == chat_id)
+            )).scalar_one_or_none()
+            settings = (await session.execute(
+                select(Settings).where(Settings.chat_id == chat_id)
+            )).scalar_one_or_none()
+            binding = (await session.execute(
+                select(AgentBinding).where(AgentBinding.telegram_id == chat_id).limit(1)
+            )).scalar_one_or_none()
+
+        if user and user.timezone:
+            timezone = user.timezone
+        elif binding and binding.timezone:
+            timezone = binding.timezone
+        else:
+            timezone = config.TIMEZONE
+
+        profile = RecipientProfile(chat_id, user, settings, binding, timezone)
+
+        if generation == self.profile_generation:
+            self.profile_cache.set(chat_id, profile)
+
+        return profile
+
+    async def resolve_recipients(self, agent_id: int | None, chat_ids, event_type: str) -> list[Recipient]:
+        """
+        Получатели события бронирования одним запросом
+
+        Объединяет Telegram аккаунты, привязанные к агенту, и явно указанные
+        chat_id (telegram_chat_id агента и клиента из вебхука), убирает дубли
+        и подтягивает часовой пояс и настройки из users, settings и agent_bindings.
+
+        Args:
+            agent_id: ID агента в LatePoint (None - без привязок)
+            chat_ids: chat_id из данных вебхука (None и пустые значения пропускаются)
+            event_type: Ключ EVENT_OPT_IN_FIELDS
+
+        Returns:
+            list[Recipient]: Получатели в порядке chat_id. Привязанный аккаунт без
+            настроек получает уведомление, явный chat_id без настроек - нет.
+        """
+        opt_in_fields = EVENT_OPT_IN_FIELDS[event_type]
+        chat_ids = {int(chat_id) for chat_id in chat_ids if chat_id}
+
+        sources = []
+        if agent_id:
+            sources.append(
+                select(AgentBinding.telegram_id.label('chat_id'), literal(1).label('via_binding'))
+                .where(AgentBinding.agent_id == int(agent_id))
             )
-            return result.scalar_one_or_none()
+        for chat_id in chat_ids:
+            sources.append(select(literal(chat_id).label('chat_id'), literal(0).label('via_binding')))
+
+        if not sources:
+            return []
+
+        candidates = union_all(*sources).subquery()
+        grouped = (
+            select(candidates.c.chat_id, func.max(candidates.c.via_binding).label('via_binding'))
+            .group_by(candidates.c.chat_id)
+            .subquery()
+        )
+        binding_timezone = (
+            select(AgentBinding.timezone)
+            .where(AgentBinding.telegram_id == grouped.c.chat_id)
+            .limit(1)
+            .scalar_subquery()
+        )
+
+        query = (
+            select(
+                grouped.c.chat_id,
+                grouped.c.via_binding,
+                User.user_type,
+                User.timezone,
+                binding_timezone,
+                Settings.id,
+                *(getattr(Settings, field) for field in opt_in_fields)
+            )
+            .outerjoin(User, User.chat_id == grouped.c.chat_id)
+            .outerjoin(Settings, Settings.chat_id == grouped.c.chat_id)
+            .order_by(grouped.c.chat_id)
+        )
+
+        async with self.timed_session('resolve_recipients') as session:
+            rows = (await session.execute(query)).all()
+
+        recipients = []
+        for chat_id, via_binding, user_type, user_timezone, bound_timezone, settings_id, *flags in rows:
+            if settings_id is None:
+                notify = bool(via_binding)
+            else:
+                notify = any(flags)
+
+            recipients.append(Recipient(
+                chat_id=chat_id,
+                user_type=user_type,
+                via_binding=bool(via_binding),
+                timezone=user_timezone or bound_timezone or config.TIMEZONE,
+                notify=notify
+            ))
+
+        return recipients
+
+    def invalidate_recipient_profile(self, chat_id: int):
+        """Сбросить кэшированный профиль после изменения пользователя или привязки"""
+        self.profile_generation += 1
+        self.profile_cache.invalidate(chat_id)
+
+    async def get_user_by_chat_id(self, chat_id: int) -> User | None:
+        """Получить пользователя по chat_id"""
+        return (await self.get_recipient_profile(chat_id)).user
 
     async def create_user(self, chat_id: int, username: str, user_type: str,
                          wp_user_id: int, latepoint_id: int, name: str, email: str) -> User:
         """Создать нового пользователя"""
-        async with self.async_session() as session:
+        async with self.timed_session('create_user') as session:
             user = User(
                 chat_id=chat_id,
                 username=username,
@@ -55,20 +251,28 @@ class DatabaseManager:
 
             await session.commit()
             await session.refresh(user)
+            self.invalidate_recipient_profile(chat_id)
             logger.info(f"User created: {user}")
             return user
 
     async def get_settings(self, chat_id: int) -> Settings | None:
         """Получить настройки пользователя"""
-        async with self.async_session() as session:
+        return (await self.get_recipient_profile(chat_id)).settings
+
+    async def get_settings_for_chats(self, chat_ids: list[int]) -> dict[int, Settings]:
+        """Получить настройки нескольких пользователей одним запросом"""
+        if not chat_ids:
+            return {}
+
+        async with self.timed_session('get_settings_for_chats') as session:
             result = await session.execute(
-                select(Settings).where(Settings.chat_id == chat_id)
+                select(Settings).where(Settings.chat_id.in_(chat_ids))
             )
-            return result.scalar_one_or_none()
+            return {settings.chat_id: settings for settings in result.scalars().all()}
 
     async def update_settings(self, chat_id: int, **kwargs) -> Settings:
         """Обновить настройки пользователя"""
-        async with self.async_session() as session:
+        async with self.timed_session('update_settings') as session:
             result = await session.execute(
                 select(Settings).where(Settings.chat_id == chat_id)
             )
@@ -84,54 +288,568 @@ class DatabaseManager:
 
             await session.commit()
             await session.refresh(settings)
+
+            # Запись в кэш вместо сброса: следующее чтение не пойдёт в БД
+            self.profile_generation += 1
+            profile = self.profile_cache.peek(chat_id)
+            if profile is not None:
+                self.profile_cache.set(chat_id, profile._replace(settings=settings))
+
             logger.info(f"Settings updated for chat_id={chat_id}")
             return settings
 
-    async def check_reminder_sent(self, booking_id: int, chat_id: int) -> bool:
-        """Проверить, было ли отправлено напоминание"""
-        async with self.async_session() as session:
+    async def check_reminder_sent(self, booking_id: int, chat_id: int, minutes_before: int | None = None) -> bool:
+        """Проверить, было ли отправлено напоминание (None - с любым смещением)"""
+        async with self.timed_session('check_reminder_sent') as session:
+            query = select(SentReminder.id).where(
+                and_(
+                    SentReminder.booking_id == booking_id,
+                    SentReminder.chat_id == chat_id
+                )
+            )
+            if minutes_before is not None:
+                query = query.where(SentReminder.minutes_before == minutes_before)
+
+            result = await session.execute(query.limit(1))
+            return result.scalar_one_or_none() is not None
+
+    async def get_sent_reminder_keys(self, keys) -> set[tuple[int, int, int]]:
+        """
+        Какие из напоминаний уже отправлены - одним запросом на пачку
+
+        Args:
+            keys: Тройки (booking_id, chat_id, minutes_before)
+
+        Returns:
+            set: Отправленные тройки из keys
+        """
+        keys = set(keys)
+        if not keys:
+            return set()
+
+        sent = set()
+        keys_list = list(keys)
+
+        async with self.timed_session('get_sent_reminder_keys') as session:
+            for i in range(0, len(keys_list), SENT_REMINDER_QUERY_CHUNK):
+                chunk = keys_list[i:i + SENT_REMINDER_QUERY_CHUNK]
+                result = await session.execute(
+                    select(SentReminder.booking_id, SentReminder.chat_id, SentReminder.minutes_before)
+                    .where(SentReminder.booking_id.in_({key[0] for key in chunk}))
+                )
+                sent.update(tuple(row) for row in result.all() if tuple(row) in keys)
+
+        return sent
+
+    async def get_active_sent_reminders(self, now: datetime) -> list[tuple[int, int, int, datetime | None]]:
+        """Отправленные напоминания об уроках, которые ещё не начались (для прогрева кэша)"""
+        async with self.timed_session('get_active_sent_reminders') as session:
+            result = await session.execute(
+                select(SentReminder.booking_id, SentReminder.chat_id,
+                       SentReminder.minutes_before, SentReminder.lesson_start)
+                .where((SentReminder.lesson_start >= now) | (SentReminder.lesson_start.is_(None)))
+            )
+            return [tuple(row) for row in result.all()]
+
+    async def mark_reminder_sent(self, booking_id: int, chat_id: int, minutes_before: int = 0,
+                                 lesson_start: datetime | None = None):
+        """Отметить напоминание как отправленное (повторная отметка игнорируется)"""
+        async with self.timed_session('mark_reminder_sent') as session:
+            reminder = SentReminder(
+                booking_id=booking_id,
+                chat_id=chat_id,
+                minutes_before=minutes_before,
+                lesson_start=lesson_start
+            )
+            session.add(reminder)
+            try:
+                await session.commit()
+            except IntegrityError:
+                await session.rollback()
+                return
+            logger.info(f"Reminder marked as sent: booking_id={booking_id}, chat_id={chat_id}, "
+                        f"minutes_before={minutes_before}")
+
+    async def delete_expired_sent_reminders(self, lesson_before: datetime, legacy_sent_before: datetime) -> int:
+        """
+        Удалить отметки о напоминаниях для прошедших уроков
+
+        Args:
+            lesson_before: Удалить отметки уроков, начавшихся раньше (UTC)
+            legacy_sent_before: Для старых отметок без lesson_start - отправленных раньше (UTC)
+
+        Returns:
+            int: Количество удалённых строк
+        """
+        async with self.timed_session('delete_expired_sent_reminders') as session:
+            result = await session.execute(
+                delete(SentReminder).where(
+                    (SentReminder.lesson_start < lesson_before)
+                    | (SentReminder.lesson_start.is_(None) & (SentReminder.sent_at < legacy_sent_before))
+                )
+            )
+            await session.commit()
+            return result.rowcount
+
+    async def get_scheduled_reminders(self) -> list[ScheduledReminder]:
+        """Получить все запланированные напоминания"""
+        async with self.timed_session('get_scheduled_reminders') as session:
+            result = await session.execute(select(ScheduledReminder))
+            return result.scalars().all()
+
+    async def save_scheduled_reminder(self, booking_id: int, chat_id: int, minutes_before: int,
+                                      fire_at, start_at, booking: str):
+        """Сохранить (или обновить) запланированное напоминание"""
+        async with self.timed_session('save_scheduled_reminder') as session:
             result = await session.execute(
-                select(SentReminder).where(
+                select(ScheduledReminder).where(
                     and_(
-                        SentReminder.booking_id == booking_id,
-                        SentReminder.chat_id == chat_id
+                        ScheduledReminder.booking_id == booking_id,
+                        ScheduledReminder.chat_id == chat_id,
+                        ScheduledReminder.minutes_before == minutes_before
                     )
                 )
             )
-            return result.scalar_one_or_none() is not None
+            reminder = result.scalar_one_or_none()
 
-    async def mark_reminder_sent(self, booking_id: int, chat_id: int):
-        """Отметить напоминание как отправленное"""
-        async with self.async_session() as session:
-            reminder = SentReminder(booking_id=booking_id, chat_id=chat_id)
-            session.add(reminder)
+            if not reminder:
+                reminder = ScheduledReminder(booking_id=booking_id, chat_id=chat_id, minutes_before=minutes_before)
+                session.add(reminder)
+
+            reminder.fire_at = fire_at
+            reminder.start_at = start_at
+            reminder.booking = booking
+            await session.commit()
+
+    async def delete_scheduled_reminders(self, booking_id: int, chat_id: int | None = None,
+                                         minutes_before: int | None = None):
+        """Удалить запланированные напоминания бронирования (всех, одного получателя или одно смещение)"""
+        async with self.timed_session('delete_scheduled_reminders') as session:
+            query = delete(ScheduledReminder).where(ScheduledReminder.booking_id == booking_id)
+            if chat_id is not None:
+                query = query.where(ScheduledReminder.chat_id == chat_id)
+            if minutes_before is not None:
+                query = query.where(ScheduledReminder.minutes_before == minutes_before)
+            await session.execute(query)
+            await session.commit()
+
+    async def get_sync_state(self, key: str) -> str | None:
+        """Значение состояния синхронизации или None"""
+        async with self.timed_session('get_sync_state') as session:
+            result = await session.execute(select(SyncState.value).where(SyncState.key == key))
+            return result.scalar_one_or_none()
+
+    async def set_sync_state(self, key: str, value: str):
+        """Сохранить значение состояния синхронизации"""
+        async with self.timed_session('set_sync_state') as session:
+            result = await session.execute(select(SyncState).where(SyncState.key == key))
+            state = result.scalar_one_or_none()
+
+            if not state:
+                state = SyncState(key=key)
+                session.add(state)
+
+            state.value = value
             await session.commit()
-            logger.info(f"Reminder marked as sent: booking_id={booking_id}, chat_id={chat_id}")
+
+    async def get_mirrored_bookings(self, party: str, party_id: int,
+                                    date_from: str, date_to: str) -> list[MirroredBooking]:
+        """
+        Активные бронирования из локальной копии за период
+
+        Args:
+            party: 'agent' или 'customer'
+            party_id: LatePoint ID учителя или студента
+            date_from: Первый день периода (YYYY-MM-DD)
+            date_to: Последний день периода (YYYY-MM-DD)
+        """
+        column = MirroredBooking.agent_id if party == 'agent' else MirroredBooking.customer_id
+        async with self.timed_session('get_mirrored_bookings') as session:
+            result = await session.execute(
+                select(MirroredBooking)
+                .where(
+                    column == party_id,
+                    MirroredBooking.start_date >= date_from,
+                    MirroredBooking.start_date <= date_to,
+                    MirroredBooking.status.in_(('approved', 'pending'))
+                )
+                .order_by(MirroredBooking.start_date, MirroredBooking.start_time)
+            )
+            return result.scalars().all()
+
+    async def get_mirrored_booking(self, booking_id: int) -> MirroredBooking | None:
+        """Бронирование из локальной копии"""
+        async with self.timed_session('get_mirrored_booking') as session:
+            result = await session.execute(
+                select(MirroredBooking).where(MirroredBooking.booking_id == booking_id)
+            )
+            return result.scalar_one_or_none()
+
+    async def save_mirrored_bookings(self, rows: list[dict], synced_at: datetime) -> set[tuple]:
+        """
+        Сохранить (или обновить) бронирования в локальной копии
+
+        Args:
+            rows: Словари с полями MirroredBooking (booking - JSON строка)
+            synced_at: Время получения данных из WordPress (UTC)
+
+        Returns:
+            set: Участники ('agent' или 'customer', LatePoint ID) изменённых
+            бронирований, прежние и новые
+        """
+        if not rows:
+            return set()
+
+        async with self.timed_session('save_mirrored_bookings') as session:
+            parties = await self._upsert_mirrored_bookings(session, rows, synced_at)
+            await session.commit()
+            return parties
+
+    async def replace_mirrored_ranges(self, date_from: str, date_to: str, ranges: list[tuple],
+                                      synced_at: datetime) -> tuple[set, set]:
+        """
+        Заменить бронирования участников за период ответом WordPress и отметить сверку
+
+        Бронирования, которых нет в ответе, удаляются, кроме изменённых после
+        synced_at (вебхук пришёл, пока запрос к WordPress выполнялся).
+        Все участники обновляются одной транзакцией.
+
+        Args:
+            date_from: Первый день периода (YYYY-MM-DD)
+            date_to: Последний день периода (YYYY-MM-DD)
+            ranges: Четвёрки (party, party_id, chat_id, rows): 'agent' или 'customer',
+                LatePoint ID, чат, для которого сверялось расписание, и словари
+                с полями MirroredBooking (booking - JSON строка)
+            synced_at: Время начала запроса к WordPress (UTC)
+
+        Returns:
+            tuple: (ID удалённых бронирований, участники ('agent' или 'customer',
+            LatePoint ID), чьи расписания изменились)
+        """
+        if not ranges:
+            return set(), set()
+
+        deleted_ids = set()
+        parties = set()
+
+        async with self.timed_session('replace_mirrored_ranges') as session:
+            for party, party_id, chat_id, rows in ranges:
+                parties.add((party, party_id))
+
+                column = MirroredBooking.agent_id if party == 'agent' else MirroredBooking.customer_id
+                query = select(
+                    MirroredBooking.booking_id, MirroredBooking.agent_id, MirroredBooking.customer_id
+                ).where(
+                    column == party_id,
+                    MirroredBooking.start_date >= date_from,
+                    MirroredBooking.start_date <= date_to,
+                    MirroredBooking.updated_at < synced_at
+                )
+                booking_ids = [row['booking_id'] for row in rows]
+                if booking_ids:
+                    query = query.where(MirroredBooking.booking_id.not_in(booking_ids))
+
+                # Удалённое бронирование пропадает и из расписания второго участника
+                removed = (await session.execute(query)).all()
+                if removed:
+                    await session.execute(
+                        delete(MirroredBooking).where(MirroredBooking.booking_id.in_([row[0] for row in removed]))
+                    )
+                for booking_id, agent_id, customer_id in removed:
+                    deleted_ids.add(booking_id)
+                    parties.update((('agent', agent_id), ('customer', customer_id)))
+
+            parties |= await self._upsert_mirrored_bookings(
+                session, [row for _, _, _, rows in ranges for row in rows], synced_at
+            )
+
+            chat_ids = [chat_id for _, _, chat_id, _ in ranges]
+            result = await session.execute(
+                select(BookingMirrorSync).where(
+                    BookingMirrorSync.chat_id.in_(chat_ids),
+                    BookingMirrorSync.date_from == date_from,
+                    BookingMirrorSync.date_to == date_to
+                )
+            )
+            markers = {marker.chat_id: marker for marker in result.scalars().all()}
+
+            for chat_id in chat_ids:
+                marker = markers.get(chat_id)
+                if not marker:
+                    marker = BookingMirrorSync(chat_id=chat_id, date_from=date_from, date_to=date_to)
+                    session.add(marker)
+                    markers[chat_id] = marker
+                marker.synced_at = synced_at
+
+            await session.commit()
+
+        return deleted_ids, parties
+
+    async def _upsert_mirrored_bookings(self, session: AsyncSession, rows: list[dict],
+                                        synced_at: datetime) -> set[tuple]:
+        """
+        Вставить или обновить строки; более свежие (updated_at > synced_at) не трогаются
+
+        Returns:
+            set: Участники изменённых строк до и после изменения (бронирование
+            могло перейти к другому агенту)
+        """
+        parties = set()
+        rows_by_id = {row['booking_id']: row for row in rows}
+        result = await session.execute(
+            select(MirroredBooking).where(MirroredBooking.booking_id.in_(rows_by_id))
+        )
+        existing = {mirrored.booking_id: mirrored for mirrored in result.scalars().all()}
+
+        for booking_id, row in rows_by_id.items():
+            mirrored = existing.get(booking_id)
+            if mirrored is None:
+                mirrored = MirroredBooking(booking_id=booking_id)
+                session.add(mirrored)
+            elif mirrored.updated_at and mirrored.updated_at > synced_at:
+                continue
+            else:
+                parties.update((('agent', mirrored.agent_id), ('customer', mirrored.customer_id)))
+
+            for field, value in row.items():
+                setattr(mirrored, field, value)
+            mirrored.updated_at = synced_at
+            parties.update((('agent', mirrored.agent_id), ('customer', mirrored.customer_id)))
+
+        return parties
+
+    async def get_mirror_synced_at(self, chat_id: int, date_from: str, date_to: str) -> datetime | None:
+        """Время последней сверки расписания чата, покрывающей весь период (UTC), или None"""
+        async with self.timed_session('get_mirror_synced_at') as session:
+            result = await session.execute(
+                select(func.max(BookingMirrorSync.synced_at)).where(
+                    BookingMirrorSync.chat_id == chat_id,
+                    BookingMirrorSync.date_from <= date_from,
+                    BookingMirrorSync.date_to >= date_to
+                )
+            )
+            return result.scalar_one_or_none()
+
+    async def delete_expired_mirror(self, before_date: str) -> int:
+        """
+        Удалить из локальной копии прошедшие бронирования и отметки о сверке
+
+        Args:
+            before_date: Удалить всё, что закончилось раньше этого дня (YYYY-MM-DD)
+
+        Returns:
+            int: Количество удалённых бронирований
+        """
+        async with self.timed_session('delete_expired_mirror') as session:
+            result = await session.execute(
+                delete(MirroredBooking).where(MirroredBooking.start_date < before_date)
+            )
+            await session.execute(
+                delete(BookingMirrorSync).where(BookingMirrorSync.date_to < before_date)
+            )
+            await session.commit()
+            return result.rowcount
+
+    async def enqueue_webhook_event(self, event_type: str, booking_id: int | None, payload: str,
+                                    trace_id: str | None = None) -> int:
+        """Сохранить входящий вебхук в очередь"""
+        async with self.timed_session('enqueue_webhook_event') as session:
+            event = WebhookEvent(event_type=event_type, booking_id=booking_id, payload=payload, trace_id=trace_id)
+            session.add(event)
+            await session.commit()
+            return event.id
+
+    async def claim_webhook_event(self, now: datetime, limit: int) -> WebhookEvent | None:
+        """
+        Взять в обработку самое старое готовое событие очереди
+
+        Событие бронирования готово, только если более ранних необработанных
+        (pending или processing) событий этого бронирования нет, поэтому
+        события одного бронирования обрабатываются строго по порядку, а
+        всплеск событий одного бронирования не закрывает выборку остальным.
+        Захват - условный UPDATE (status='pending'), событие, которое успел
+        взять другой воркер, пропускается.
+
+        Args:
+            now: Текущее время (UTC) для событий, ожидающих повтора
+            limit: Сколько кандидатов проверить за вызов
+
+        Returns:
+            WebhookEvent или None, если готовых событий нет
+        """
+        earlier = aliased(WebhookEvent)
+        blocked = exists().where(
+            earlier.booking_id == WebhookEvent.booking_id,
+            earlier.id < WebhookEvent.id,
+            earlier.status.in_(('pending', 'processing'))
+        )
+
+        async with self.timed_session('claim_webhook_event') as session:
+            result = await session.execute(
+                select(WebhookEvent)
+                .where(
+                    WebhookEvent.status == 'pending',
+                    or_(WebhookEvent.next_attempt_at.is_(None), WebhookEvent.next_attempt_at <= now),
+                    ~blocked
+                )
+                .order_by(WebhookEvent.id)
+                .limit(limit)
+            )
+
+            for event in result.scalars().all():
+                claimed = await session.execute(
+                    update(WebhookEvent)
+                    .where(WebhookEvent.id == event.id, WebhookEvent.status == 'pending')
+                    .values(status='processing', attempts=WebhookEvent.attempts + 1)
+                )
+                await session.commit()
+                if claimed.rowcount == 1:
+                    return event
+
+            return None
+
+    async def get_next_webhook_retry_at(self, now: datetime) -> datetime | None:
+        """Ближайшее время повтора среди событий, ожидающих повтора"""
+        async with self.timed_session('get_next_webhook_retry_at') as session:
+            result = await session.execute(
+                select(func.min(WebhookEvent.next_attempt_at))
+                .where(WebhookEvent.status == 'pending', WebhookEvent.next_attempt_at > now)
+            )
+            return result.scalar()
+
+    async def complete_webhook_event(self, event_id: int):
+        """Удалить успешно обработанный вебхук из очереди"""
+        async with self.timed_session('complete_webhook_event') as session:
+            await session.execute(delete(WebhookEvent).where(WebhookEvent.id == event_id))
+            await session.commit()
+
+    async def fail_webhook_event(self, event_id: int, error: str, next_attempt_at: datetime | None,
+                                 delivered_chat_ids: str | None = None):
+        """
+        Вернуть вебхук в очередь для повтора или окончательно пометить как failed
+
+        Args:
+            event_id: ID события
+            error: Текст ошибки
+            next_attempt_at: Время следующей попытки (UTC) или None, если попытки исчерпаны
+            delivered_chat_ids: JSON список чатов, которым уведомление уже доставлено
+                (повтор им не отправляет)
+        """
+        async with self.timed_session('fail_webhook_event') as session:
+            await session.execute(
+                update(WebhookEvent)
+                .where(WebhookEvent.id == event_id)
+                .values(
+                    status='pending' if next_attempt_at else 'failed',
+                    next_attempt_at=next_attempt_at,
+                    last_error=error[:500],
+                    delivered_chat_ids=delivered_chat_ids
+                )
+            )
+            await session.commit()
+
+    async def delete_failed_webhook_events(self, before: datetime) -> int:
+        """Удалить события с исчерпанными попытками, созданные раньше before (UTC)"""
+        async with self.timed_session('delete_failed_webhook_events') as session:
+            result = await session.execute(
+                delete(WebhookEvent)
+                .where(WebhookEvent.status == 'failed', WebhookEvent.created_at < before)
+            )
+            await session.commit()
+            return result.rowcount
+
+    async def reset_processing_webhook_events(self) -> int:
+        """Вернуть в очередь вебхуки, обработка которых прервалась остановкой бота"""
+        async with self.timed_session('reset_processing_webhook_events') as session:
+            result = await session.execute(
+                update(WebhookEvent)
+                .where(WebhookEvent.status == 'processing')
+                .values(status='pending')
+            )
+            await session.commit()
+            return result.rowcount
+
+    async def get_webhook_queue_stats(self) -> dict:
+        """Статистика очереди вебхуков: глубина, число ошибок и самое старое событие"""
+        async with self.timed_session('get_webhook_queue_stats') as session:
+            result = await session.execute(
+                select(WebhookEvent.status, func.count(), func.min(WebhookEvent.created_at))
+                .group_by(WebhookEvent.status)
+            )
+            stats = {'pending': 0, 'processing': 0, 'failed': 0, 'oldest_pending_at': None}
+
+            for status, count, oldest in result.all():
+                stats[status] = count
+                if status in ('pending', 'processing') and oldest:
+                    if not stats['oldest_pending_at'] or oldest < stats['oldest_pending_at']:
+                        stats['oldest_pending_at'] = oldest
+
+            return stats
 
     async def log_notification(self, chat_id: int, notification_type: str,
                                booking_id: int | None, success: bool,
                                error_message: str | None = None):
-        """Логировать отправленное уведомление"""
-        async with self.async_session() as session:
-            log = NotificationLog(
-                chat_id=chat_id,
-                notification_type=notification_type,
-                booking_id=booking_id,
-                success=success,
-                error_message=error_message
-            )
-            session.add(log)
-            await session.commit()
+        """Логировать отправленное уведомление (запись в БД выполняется пачками)"""
+        await self.log_writer.write(chat_id, notification_type, booking_id, success, error_message)
 
     async def get_all_users(self) -> list[User]:
         """Получить всех пользователей"""
-        async with self.async_session() as session:
+        async with self.timed_session('get_all_users') as session:
             result = await session.execute(select(User))
             return result.scalars().all()
 
+    async def get_users_changed_since(self, since: datetime) -> list[User]:
+        """Пользователи, зарегистрированные или изменившие настройки после since (UTC)"""
+        async with self.timed_session('get_users_changed_since') as session:
+            result = await session.execute(
+                select(User)
+                .outerjoin(Settings, Settings.chat_id == User.chat_id)
+                .where((User.registered_at > since) | (Settings.updated_at > since))
+            )
+            return result.scalars().unique().all()
+
+    async def get_binding_only_chat_ids(self, since: datetime | None = None) -> list[int]:
+        """
+        chat_id, привязанные к агентам через agent_bindings, но без записи в users
+
+        Args:
+            since: Только привязанные или изменившие настройки после since (UTC)
+        """
+        query = (
+            select(AgentBinding.telegram_id)
+            .outerjoin(User, User.chat_id == AgentBinding.telegram_id)
+            .where(User.id.is_(None))
+        )
+        if since is not None:
+            query = (
+                query.outerjoin(Settings, Settings.chat_id == AgentBinding.telegram_id)
+                .where((AgentBinding.created_at > since) | (Settings.updated_at > since))
+            )
+
+        async with self.timed_session('get_binding_only_chat_ids') as session:
+            result = await session.execute(query.distinct().order_by(AgentBinding.telegram_id))
+            return list(result.scalars().all())
+
+    async def get_agent_ids_for_chats(self, chat_ids: list[int]) -> dict[int, set[int]]:
+        """Агенты LatePoint, к которым привязаны chat_id: chat_id -> {agent_id}"""
+        if not chat_ids:
+            return {}
+
+        async with self.timed_session('get_agent_ids_for_chats') as session:
+            result = await session.execute(
+                select(AgentBinding.telegram_id, AgentBinding.agent_id)
+                .where(AgentBinding.telegram_id.in_(chat_ids))
+            )
+            rows = result.all()
+
+        agent_ids = {}
+        for chat_id, agent_id in rows:
+            agent_ids.setdefault(chat_id, set()).add(agent_id)
+        return agent_ids
+
     async def get_users_by_type(self, user_type: str) -> list[User]:
         """Получить пользователей по типу"""
-        async with self.async_session() as session:
+        async with self.timed_session('get_users_by_type') as session:
             result = await session.execute(
                 select(User).where(User.user_type == user_type)
             )
@@ -139,9 +857,9 @@ class DatabaseManager:
 
     async def update_user_timezone(self, chat_id: int, timezone: str) -> User | None:
         """Обновить часовой пояс пользователя"""
-        from database.models import AgentBinding
+        self.invalidate_recipient_profile(chat_id)
 
-        async with self.async_session() as session:
+        async with self.timed_session('update_user_timezone') as session:
             # Сначала пробуем найти в таблице users
             result = await session.execute(
                 select(User).where(User.chat_id == chat_id)
@@ -152,6 +870,7 @@ class DatabaseManager:
                 user.timezone = timezone
                 await session.commit()
                 await session.refresh(user)
+                self.invalidate_recipient_profile(chat_id)
                 logger.info(f"Timezone updated for chat_id={chat_id} to {timezone}")
                 return user
 
@@ -165,6 +884,7 @@ class DatabaseManager:
                 binding.timezone = timezone
                 await session.commit()
                 await session.refresh(binding)
+                self.invalidate_recipient_profile(chat_id)
                 logger.info(f"Timezone updated for telegram_id={chat_id} (AgentBinding) to {timezone}")
                 # Возвращаем None, т.к. это не User объект
                 return None
@@ -174,34 +894,16 @@ class DatabaseManager:
 
     async def get_user_timezone(self, chat_id: int) -> str | None:
         """Получить часовой пояс пользователя из users или agent_bindings"""
-        from database.models import AgentBinding
-        import config
-
-        async with self.async_session() as session:
-            # Сначала пробуем найти в таблице users
-            result = await session.execute(
-                select(User).where(User.chat_id == chat_id)
-            )
-            user = result.scalar_one_or_none()
-
-            if user and user.timezone:
-                return user.timezone
-
-            # Если пользователя нет, пробуем найти в agent_bindings
-            result = await session.execute(
-                select(AgentBinding).where(AgentBinding.telegram_id == chat_id)
-            )
-            binding = result.scalar_one_or_none()
-
-            if binding and binding.timezone:
-                return binding.timezone
+        return (await self.get_recipient_profile(chat_id)).timezone
 
-            # Возвращаем дефолтный timezone из конфига
-            return config.TIMEZONE
+    def get_session(self, operation: str = 'get_session'):
+        """Получить новую сессию базы данных (operation - метка для DB_SESSION_SECONDS)"""
+        return self.timed_session(operation)
 
-    def get_session(self):
-        """Получить новую сессию базы данных"""
-        return self.async_session()
+    async def ping(self):
+        """Проверка соединения с БД (бросает исключение при ошибке)"""
+        async with self.get_session('ping') as session:
+            await session.execute(text('SELECT 1'))
 
 
 # Глобальный экземпляр
@@ -0,0 +1,128 @@
+"""
+Буферизованная запись лога уведомлений
+"""
+
+import asyncio
+import logging
+from datetime import datetime
+
+from sqlalchemy import insert
+
+from database.models import NotificationLog
+from services.metrics import NOTIFICATIONS_TOTAL
+import config
+
+logger = logging.getLogger(__name__)
+
+# Сбросить буфер, как только в нём накопится столько строк
+BATCH_SIZE = getattr(config, 'NOTIFICATION_LOG_BATCH_SIZE', 100)
+
+# Максимальная задержка записи строки в БД (в миллисекундах)
+FLUSH_INTERVAL_MS = getattr(config, 'NOTIFICATION_LOG_FLUSH_INTERVAL_MS', 500)
+
+# При таком размере буфера запись становится синхронной
+MAX_BUFFER = getattr(config, 'NOTIFICATION_LOG_MAX_BUFFER', 5000)
+
+
+class NotificationLogWriter:
+    """
+    Запись NotificationLog пачками
+
+    write() только кладёт строку в буфер, фоновая задача вставляет
+    накопленные строки одним INSERT каждые FLUSH_INTERVAL_MS или при
+    наборе BATCH_SIZE строк. Если БД не успевает и буфер заполнен,
+    write() ждёт сброса. До start() и после stop() строки пишутся сразу.
+    """
+
+    def __init__(self, session_factory):
+        """
+        Args:
+            session_factory: Фабрика AsyncSession (DatabaseManager.async_session)
+        """
+        self.session_factory = session_factory
+        self.buffer = []
+        self.flush_lock = asyncio.Lock()
+        self.wakeup = asyncio.Event()
+        self.task = None
+        self.running = False
+        self.counters = {
+            'written': 0,
+            'flushes': 0,
+            'sync_flushes': 0,
+            'dropped': 0,
+        }
+
+    async def start(self):
+        """Запуск фоновой записи"""
+        self.running = True
+        self.task = asyncio.create_task(self._run())
+        logger.info(f"Notification log writer started (batch {BATCH_SIZE}, interval {FLUSH_INTERVAL_MS} ms)")
+
+    async def stop(self):
+        """Остановка фоновой записи с сохранением всего буфера"""
+        self.running = False
+        self.wakeup.set()
+
+        if self.task:
+            # Без отмены: прерванная вставка потеряла бы уже извлечённые строки
+            await self.task
+            self.task = None
+
+        await self.flush()
+        logger.info("Notification log writer stopped")
+
+    async def write(self, chat_id: int, notification_type: str, booking_id: int | None,
+                    success: bool, error_message: str | None = None):
+        """Добавить строку лога"""
+        NOTIFICATIONS_TOTAL.inc(notification_type, 'sent' if success else 'failed')
+        self.buffer.append({
+            'chat_id': chat_id,
+            'notification_type': notification_type,
+            'booking_id': booking_id,
+            'success': success,
+            'error_message': error_message[:500] if error_message else None,
+            'created_at': datetime.utcnow(),
+        })
+
+        if self.task is None:
+            await self.flush()
+        elif len(self.buffer) >= MAX_BUFFER:
+            self.counters['sync_flushes'] += 1
+            await self.flush()
+        elif len(self.buffer) >= BATCH_SIZE:
+            self.wakeup.set()
+
+    async def flush(self):
+        """Записать буфер в БД"""
+        async with self.flush_lock:
+            if not self.buffer:
+                return
+
+            rows, self.buffer = self.buffer, []
+
+            try:
+                async with self.session_factory(info={'operation': 'flush'}) as session:
+                    await session.execute(insert(NotificationLog), rows)
+                    await session.commit()
+            except Exception as e:
+                # Лог уведомлений не должен останавливать доставку
+                logger.error(f"Error writing {len(rows)} notification log rows: {e}")
+                self.counters['dropped'] += len(rows)
+                return
+
+            self.counters['written'] += len(rows)
+            self.counters['flushes'] += 1
+
+    async def _run(self):
+        """Цикл фоновой записи"""
+        while self.running:
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), timeout=FLUSH_INTERVAL_MS / 1000)
+            except asyncio.TimeoutError:
+                pass
+            self.wakeup.clear()
+            await self.flush()
+
+    def stats(self) -> dict:
+        """Счётчики записи и текущий размер буфера"""
+        return dict(self.counters, buffered=len(self.buffer))
@@ -3,7 +3,7 @@
 """
 
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, BigInteger
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, BigInteger, Text, UniqueConstraint, Index
 from sqlalchemy.ext.declarative import declarative_base
 
 Base = declarative_base()
@@ -38,7 +38,8 @@ class Settings(Base):
     notify_on_update = Column(Boolean, default=True)
     notify_on_cancel = Column(Boolean, default=True)
     notify_reminders = Column(Boolean, default=True)
-    reminder_minutes_before = Column(Integer, default=60)
+    reminder_minutes_before = Column(Integer, default=60)  # Устарело, см. reminder_offsets
+    reminder_offsets = Column(String(100), nullable=True)  # Минуты через запятую, None - config.REMINDER_TIMES
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     def __repr__(self):
@@ -46,16 +47,114 @@ class Settings(Base):
 
 
 class SentReminder(Base):
-    """Отправленные напоминания (чтобы не дублировать)"""
+    """Отправленные напоминания (чтобы не дублировать, удаляются после урока)"""
     __tablename__ = 'sent_reminders'
+    __table_args__ = (
+        UniqueConstraint('booking_id', 'chat_id', 'minutes_before', name='uq_sent_reminder_booking_chat_offset'),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    booking_id = Column(Integer, nullable=False, index=True)
+    booking_id = Column(Integer, nullable=False)
     chat_id = Column(BigInteger, nullable=False)
+    minutes_before = Column(Integer, nullable=False, default=0)  # За сколько минут до урока
+    lesson_start = Column(DateTime, nullable=True, index=True)  # UTC, для очистки
     sent_at = Column(DateTime, default=datetime.utcnow)
 
     def __repr__(self):
-        return f"<SentReminder(booking_id={self.booking_id}, chat_id={self.chat_id})>"
+        return f"<SentReminder(booking_id={self.booking_id}, chat_id={self.chat_id}, minutes_before={self.minutes_before})>"
+
+
+class ScheduledReminder(Base):
+    """Запланированные напоминания (очередь таймеров ReminderEngine)"""
+    __tablename__ = 'scheduled_reminders'
+    __table_args__ = (
+        UniqueConstraint('booking_id', 'chat_id', 'minutes_before', name='uq_scheduled_reminder_booking_chat_offset'),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    booking_id = Column(Integer, nullable=False, index=True)
+    chat_id = Column(BigInteger, nullable=False)
+    minutes_before = Column(Integer, nullable=False)
+    fire_at = Column(DateTime, nullable=False, index=True)  # UTC
+    start_at = Column(DateTime, nullable=False)  # UTC
+    booking = Column(Text, nullable=False)  # JSON данных бронирования
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return (f"<ScheduledReminder(booking_id={self.booking_id}, chat_id={self.chat_id}, "
+                f"minutes_before={self.minutes_before}, fire_at={self.fire_at})>")
+
+
+class WebhookEvent(Base):
+    """Очередь входящих вебхуков от WordPress (удаляются после обработки)"""
+    __tablename__ = 'webhook_events'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    event_type = Column(String(50), nullable=False)
+    booking_id = Column(Integer, nullable=True, index=True)
+    payload = Column(Text, nullable=False)  # JSON данных события
+    status = Column(String(20), default='pending', index=True)  # 'pending', 'processing', 'failed'
+    attempts = Column(Integer, default=0)
+    next_attempt_at = Column(DateTime, default=datetime.utcnow)
+    last_error = Column(String(500), nullable=True)
+    trace_id = Column(String(32), nullable=True)  # трасса приёма вебхука (services/tracing.py)
+    delivered_chat_ids = Column(Text, nullable=True)  # JSON чатов, получивших уведомление (до повтора)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<WebhookEvent(id={self.id}, type='{self.event_type}', status='{self.status}')>"
+
+
+class MirroredBooking(Base):
+    """Локальная копия бронирования (из вебхуков и сверок с WordPress)"""
+    __tablename__ = 'mirrored_bookings'
+    __table_args__ = (
+        Index('ix_mirrored_bookings_agent_date', 'agent_id', 'start_date'),
+        Index('ix_mirrored_bookings_customer_date', 'customer_id', 'start_date'),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    booking_id = Column(Integer, unique=True, nullable=False)
+    agent_id = Column(Integer, nullable=False)
+    customer_id = Column(Integer, nullable=False)
+    status = Column(String(20), nullable=False)
+    start_date = Column(String(10), nullable=False)  # YYYY-MM-DD (часовой пояс WordPress)
+    start_time = Column(String(5), nullable=False)  # HH:MM
+    booking = Column(Text, nullable=False)  # JSON в формате /schedule
+    updated_at = Column(DateTime, default=datetime.utcnow)  # последнее подтверждение из WordPress (UTC)
+
+    def __repr__(self):
+        return f"<MirroredBooking(booking_id={self.booking_id}, start={self.start_date} {self.start_time}, status='{self.status}')>"
+
+
+class BookingMirrorSync(Base):
+    """Когда расписание чата за период последний раз сверялось с WordPress"""
+    __tablename__ = 'booking_mirror_syncs'
+    __table_args__ = (
+        UniqueConstraint('chat_id', 'date_from', 'date_to', name='uq_booking_mirror_sync_range'),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    chat_id = Column(BigInteger, nullable=False, index=True)
+    date_from = Column(String(10), nullable=False)
+    date_to = Column(String(10), nullable=False)
+    synced_at = Column(DateTime, nullable=False)  # UTC
+
+    def __repr__(self):
+        return f"<BookingMirrorSync(chat_id={self.chat_id}, {self.date_from}..{self.date_to}, synced_at={self.synced_at})>"
+
+
+class SyncState(Base):
+    """Состояние фоновой синхронизации с WordPress (например, курсор ленты изменений)"""
+    __tablename__ = 'sync_state'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    key = Column(String(50), unique=True, nullable=False)
+    value = Column(Text, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<SyncState(key='{self.key}', value='{self.value}')>"
 
 
 class NotificationLog(Base):
@@ -0,0 +1,110 @@
+"""
+Профиль производительности движка БД: pragma для SQLite и пул соединений для PostgreSQL
+"""
+
+import logging
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# SQLite: ожидание блокировки вместо немедленной ошибки "database is locked"
+SQLITE_BUSY_TIMEOUT_MS = getattr(config, 'SQLITE_BUSY_TIMEOUT_MS', 5000)
+
+# SQLite: размер области файла БД, отображаемой в память (байт)
+SQLITE_MMAP_SIZE = getattr(config, 'SQLITE_MMAP_SIZE', 256 * 1024 * 1024)
+
+# SQLite: размер кэша страниц (отрицательное значение - в КиБ)
+SQLITE_CACHE_SIZE = getattr(config, 'SQLITE_CACHE_SIZE', -16000)
+
+# PostgreSQL и другие серверные БД: параметры пула соединений
+DB_POOL_SIZE = getattr(config, 'DB_POOL_SIZE', 10)
+DB_MAX_OVERFLOW = getattr(config, 'DB_MAX_OVERFLOW', 20)
+DB_POOL_TIMEOUT = getattr(config, 'DB_POOL_TIMEOUT', 30)
+DB_POOL_RECYCLE = getattr(config, 'DB_POOL_RECYCLE', 1800)
+DB_POOL_PRE_PING = getattr(config, 'DB_POOL_PRE_PING', True)
+
+
+def is_sqlite(url: str) -> bool:
+    """URL указывает на SQLite"""
+    return make_url(url).get_backend_name() == 'sqlite'
+
+
+def is_memory_sqlite(url: str) -> bool:
+    """URL указывает на SQLite в памяти (WAL и mmap неприменимы)"""
+    database = make_url(url).database
+    return not database or database == ':memory:' or 'mode=memory' in database
+
+
+def sqlite_pragmas(url: str) -> list[str]:
+    """Pragma, выполняемые для каждого нового соединения SQLite"""
+    pragmas = [
+        f'PRAGMA busy_timeout={int(SQLITE_BUSY_TIMEOUT_MS)}',
+        f'PRAGMA cache_size={int(SQLITE_CACHE_SIZE)}',
+        'PRAGMA temp_store=MEMORY',
+    ]
+
+    if not is_memory_sqlite(url):
+        # WAL: читатели не блокируют писателя; с WAL synchronous=NORMAL
+        # не теряет целостность, а fsync выполняется только на checkpoint
+        pragmas += [
+            'PRAGMA journal_mode=WAL',
+            'PRAGMA synchronous=NORMAL',
+            f'PRAGMA mmap_size={int(SQLITE_MMAP_SIZE)}',
+        ]
+
+    return pragmas
+
+
+def engine_options(url: str) -> dict:
+    """Параметры create_async_engine для URL"""
+    if is_sqlite(url):
+        # Пул по умолчанию для файловой SQLite подходит: соединения дешёвые,
+        # а параллелизм записи ограничен самой SQLite
+        return {}
+
+    return {
+        'pool_size': DB_POOL_SIZE,
+        'max_overflow': DB_MAX_OVERFLOW,
+        'pool_timeout': DB_POOL_TIMEOUT,
+        'pool_recycle': DB_POOL_RECYCLE,
+        'pool_pre_ping': DB_POOL_PRE_PING,
+    }
+
+
+def install_sqlite_pragmas(engine: AsyncEngine, url: str):
+    """Выполнять sqlite_pragmas() при открытии каждого соединения"""
+    pragmas = sqlite_pragmas(url)
+
+    @event.listens_for(engine.sync_engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+
+
+def create_engine(url: str, **kwargs) -> AsyncEngine:
+    """
+    Создать async движок с профилем производительности для его диалекта
+
+    Args:
+        url: URL базы данных
+        kwargs: Дополнительные параметры create_async_engine
+
+    Returns:
+        AsyncEngine
+    """
+    engine = create_async_engine(url, **{**engine_options(url), **kwargs})
+
+    if is_sqlite(url):
+        install_sqlite_pragmas(engine, url)
+        logger.debug(f"SQLite profile: {', '.join(sqlite_pragmas(url))}")
+
+    return engine
@@ -9,8 +9,13 @@ from aiogram.utils.keyboard import InlineKeyboardBuilder
 
 from database.db import db
 from services.wordpress_api import wp_api
-from utils.formatters import format_datetime_with_timezone
+from services.booking_mirror import booking_mirror
+from utils.templates import render_booking
+from utils.formatters import format_synced_marker
 from utils.timezones import TIMEZONES, get_timezone_short_name
+from utils.reminders import (
+    REMINDER_OFFSET_CHOICES, get_reminder_offsets, serialize_reminder_offsets, format_reminder_offset
+)
 import config
 
 logger = logging.getLogger(__name__)
@@ -23,8 +28,9 @@ async def callback_toggle_setting(callback: CallbackQuery):
     """Переключение настройки уведомлений"""
     setting_name = callback.data.replace('setting_toggle_', '')
 
-    # Получение текущих настроек
-    settings = await db.get_settings(callback.message.chat.id)
+    # Пользователь и текущие настройки - одним обращением к профилю
+    profile = await db.get_recipient_profile(callback.message.chat.id)
+    settings = profile.settings
 
     if not settings:
         await callback.answer("Настройки не найдены", show_alert=True)
@@ -48,12 +54,10 @@ async def callback_toggle_setting(callback: CallbackQuery):
     new_value = not current_value
 
     # Обновление в БД
-    await db.update_settings(callback.message.chat.id, **{db_field: new_value})
+    settings = await db.update_settings(callback.message.chat.id, **{db_field: new_value})
 
     # Обновление клавиатуры
-    user = await db.get_user_by_chat_id(callback.message.chat.id)
-    settings = await db.get_settings(callback.message.chat.id)
-    builder = create_settings_keyboard(settings, user)
+    builder = create_settings_keyboard(settings, profile.user)
 
     await callback.message.edit_reply_markup(reply_markup=builder.as_markup())
     await callback.answer("✅ Настройка обновлена")
@@ -68,52 +72,73 @@ async def callback_reminder_time(callback: CallbackQuery):
         await callback.answer("Настройки не найдены", show_alert=True)
         return
 
-    # Клавиатура для выбора времени
-    builder = InlineKeyboardBuilder()
-    times = [15, 30, 60, 120, 180]
+    message_text = ("⏰ <b>Выберите, за сколько до начала урока присылать напоминания</b>\n\n"
+                    "Можно выбрать несколько вариантов.")
 
-    for time_minutes in times:
-        text = f"{'✅ ' if settings.reminder_minutes_before == time_minutes else ''}"
+    await callback.message.edit_text(
+        message_text,
+        reply_markup=create_reminder_offsets_keyboard(settings).as_markup(),
+        parse_mode='HTML'
+    )
+    await callback.answer()
 
-        if time_minutes < 60:
-            text += f"{time_minutes} мин"
-        else:
-            hours = time_minutes // 60
-            text += f"{hours} час{'а' if hours == 2 else ''}"
 
-        builder.button(
-            text=text,
-            callback_data=f"set_reminder_{time_minutes}"
-        )
+@router.callback_query(F.data.startswith('toggle_reminder_'))
+async def callback_toggle_reminder_offset(callback: CallbackQuery):
+    """Включение/выключение одного из времён напоминания"""
+    minutes = int(callback.data.replace('toggle_reminder_', ''))
 
-    builder.button(text="« Назад", callback_data="back_to_settings")
-    builder.adjust(1)
+    settings = await db.get_settings(callback.message.chat.id)
 
-    message_text = "⏰ <b>Выберите за сколько минут до начала урока присылать напоминание:</b>"
+    if not settings:
+        await callback.answer("Настройки не найдены", show_alert=True)
+        return
 
-    await callback.message.edit_text(message_text, reply_markup=builder.as_markup(), parse_mode='HTML')
-    await callback.answer()
+    offsets = set(get_reminder_offsets(settings))
+    if minutes in offsets:
+        if len(offsets) == 1:
+            await callback.answer("Нужно оставить хотя бы одно напоминание. "
+                                  "Отключить напоминания можно в настройках.", show_alert=True)
+            return
+        offsets.discard(minutes)
+    else:
+        offsets.add(minutes)
+
+    # Обновление настроек
+    settings = await db.update_settings(
+        callback.message.chat.id,
+        reminder_offsets=serialize_reminder_offsets(offsets)
+    )
+
+    await callback.message.edit_reply_markup(reply_markup=create_reminder_offsets_keyboard(settings).as_markup())
+    await callback.answer("✅ Время напоминаний обновлено")
 
 
 @router.callback_query(F.data.startswith('set_reminder_'))
 async def callback_set_reminder_time(callback: CallbackQuery):
-    """Установка времени напоминания"""
-    minutes = int(callback.data.replace('set_reminder_', ''))
+    """
+    Кнопка одиночного выбора времени из старых сообщений с настройками
 
-    # Обновление настроек
-    await db.update_settings(callback.message.chat.id, reminder_minutes_before=minutes)
-
-    # Возврат к настройкам
-    user = await db.get_user_by_chat_id(callback.message.chat.id)
-    settings = await db.get_settings(callback.message.chat.id)
-    builder = create_settings_keyboard(settings, user)
+    Выбранное время становится единственным напоминанием (как и раньше),
+    после чего открывается клавиатура с несколькими вариантами.
+    """
+    minutes = int(callback.data.replace('set_reminder_', ''))
 
-    message_text = """⚙️ <b>Настройки уведомлений</b>
+    settings = await db.update_settings(
+        callback.message.chat.id,
+        reminder_minutes_before=minutes,
+        reminder_offsets=serialize_reminder_offsets([minutes])
+    )
 
-Выберите типы уведомлений, которые хотите получать:"""
+    message_text = ("⏰ <b>Выберите, за сколько до начала урока присылать напоминания</b>\n\n"
+                    "Можно выбрать несколько вариантов.")
 
-    await callback.message.edit_text(message_text, reply_markup=builder.as_markup(), parse_mode='HTML')
-    await callback.answer("✅ Время напоминания обновлено")
+    await callback.message.edit_text(
+        message_text,
+        reply_markup=create_reminder_offsets_keyboard(settings).as_markup(),
+        parse_mode='HTML'
+    )
+    await callback.answer("✅ Время напоминаний обновлено")
 
 
 @router.callback_query(F.data == 'back_to_settings')
@@ -229,8 +254,8 @@ async def callback_booking_action(callback: CallbackQuery):
         return
 
     if action == 'details':
-        # Показать детали бронирования
-        result = await wp_api.get_booking(booking_id, callback.message.chat.id)
+        # Показать детали бронирования (из локальной копии, сверяется с WordPress в фоне)
+        result = await booking_mirror.get_booking(user, booking_id)
 
         if not result.get('success'):
             await callback.answer("Не удалось получить детали", show_alert=True)
@@ -240,6 +265,8 @@ async def callback_booking_action(callback: CallbackQuery):
         # Получение timezone пользователя
         user_timezone = user.timezone if user else None
         details_text = format_booking_details(booking, user.user_type, user_timezone)
+        if result.get('stale'):
+            details_text += "\n\n" + format_synced_marker(result.get('synced_at'), user_timezone)
 
         await callback.answer()
         await callback.message.answer(details_text, parse_mode='HTML')
@@ -277,6 +304,22 @@ async def callback_booking_action(callback: CallbackQuery):
             await callback.answer("❌ Не удалось отменить бронирование", show_alert=True)
 
 
+def create_reminder_offsets_keyboard(settings):
+    """Клавиатура выбора времён напоминаний (несколько вариантов)"""
+    builder = InlineKeyboardBuilder()
+    offsets = get_reminder_offsets(settings)
+
+    for minutes in REMINDER_OFFSET_CHOICES:
+        builder.button(
+            text=f"{'✅' if minutes in offsets else '⬜️'} За {format_reminder_offset(minutes)}",
+            callback_data=f"toggle_reminder_{minutes}"
+        )
+
+    builder.button(text="« Назад", callback_data="back_to_settings")
+    builder.adjust(1)
+    return builder
+
+
 def create_settings_keyboard(settings, user=None, user_timezone=None):
     """Создание клавиатуры настроек"""
     builder = InlineKeyboardBuilder()
@@ -310,8 +353,9 @@ def create_settings_keyboard(settings, user=None, user_timezone=None):
     )
 
     # Время напоминаний
+    offsets = ', '.join(format_reminder_offset(offset) for offset in get_reminder_offsets(settings))
     builder.button(
-        text=f"⏰ За {settings.reminder_minutes_before} мин до начала",
+        text=f"⏰ За {offsets} до начала",
         callback_data="setting_reminder_time"
     )
 
@@ -330,57 +374,5 @@ def create_settings_keyboard(settings, user=None, user_timezone=None):
 
 def format_booking_details(booking: dict, user_type: str, user_timezone: str = None) -> str:
     """Форматирование деталей бронирования"""
-    # Конвертация времени в часовой пояс пользователя
-    start_date = booking['start_date']
-    start_time = booking['start_time']
-    end_time = booking['end_time']
-
-    if user_timezone:
-        start_date, start_time = format_datetime_with_timezone(
-            booking['start_date'], booking['start_time'], user_timezone
-        )
-        _, end_time = format_datetime_with_timezone(
-            booking['start_date'], booking['end_time'], user_timezone
-        )
-
-    if user_type == 'agent':
-        customer = booking['customer']
-        text = f"""📋 <b>Детали бронирования</b>
-
-🆔 Код: {booking['booking_code']}
-📊 Статус: {booking['status']}
-
-👤 <b>Ученик:</b>
-Имя: {customer['name']}
-📧 Email: {customer['email']}
-📱 Телефон: {customer['phone']}
-
-🎵 <b>Урок:</b>
-Инструмент: {booking['service']['name']}
-📅 Дата: {start_date}
-🕐 Время: {start_time} - {end_time}
-⏱ Длительность: {booking['duration']} мин
-"""
-    else:
-        agent = booking['agent']
-        text = f"""📋 <b>Детали бронирования</b>
-
-🆔 Код: {booking['booking_code']}
-📊 Статус: {booking['status']}
-
-👨‍🏫 <b>Учитель:</b>
-Имя: {agent['name']}
-📧 Email: {agent['email']}
-📱 Телефон: {agent['phone']}
-
-🎵 <b>Урок:</b>
-Инструмент: {booking['service']['name']}
-📅 Дата: {start_date}
-🕐 Время: {start_time} - {end_time}
-⏱ Длительность: {booking['duration']} мин
-"""
-
-    if booking.get('google_meet_url'):
-        text += f"\n🎥 Google Meet:\n{booking['google_meet_url']}"
-
-    return text
+    template = 'booking_details_agent' if user_type == 'agent' else 'booking_details_customer'
+    return render_booking(template, booking, user_timezone)
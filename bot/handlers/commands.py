@@ -11,8 +11,16 @@ from aiogram.utils.keyboard import InlineKeyboardBuilder
 import config
 from database.db import db
 from services.wordpress_api import wp_api
-from utils.formatters import format_datetime_with_timezone
-from utils.timezones import get_timezone_short_name
+from services.booking_mirror import booking_mirror
+from utils.formatters import (
+    format_booking_for_agent,
+    format_booking_for_customer,
+    format_booking_for_agent_short,
+    format_booking_for_customer_short,
+    format_synced_marker,
+)
+from utils.timezones import convert_bookings_to_timezone, get_timezone_short_name
+from utils.reminders import get_reminder_offsets, format_reminder_offset
 
 logger = logging.getLogger(__name__)
 
@@ -31,7 +39,7 @@ async def cmd_start(message: Message):
         from database.models import AgentBinding
         from sqlalchemy import select
 
-        async with db.get_session() as session:
+        async with db.get_session('cmd_start') as session:
             result = await session.execute(
                 select(AgentBinding).where(AgentBinding.telegram_id == message.chat.id)
             )
@@ -183,11 +191,10 @@ async def handle_agent_token(token: str, telegram_id: int, username: str,
     from database.models import AgentToken, AgentBinding
     from sqlalchemy import select, delete
     from datetime import datetime, timezone
-    import aiohttp
 
     try:
         # Проверяем токен в локальной БД
-        async with db.get_session() as session:
+        async with db.get_session('handle_agent_token') as session:
             result = await session.execute(
                 select(AgentToken).where(AgentToken.token == token)
             )
@@ -223,42 +230,19 @@ async def handle_agent_token(token: str, telegram_id: int, username: str,
             agent_token.status = 'used'
 
             await session.commit()
+            db.invalidate_recipient_profile(telegram_id)
 
             agent_id = agent_token.agent_id
 
-        # Уведомить WordPress об использовании токена
-        async with aiohttp.ClientSession() as http_session:
-            try:
-                async with http_session.post(
-                    f"{config.WP_API_URL}/agent-token/confirm",
-                    json={
-                        'token': token,
-                        'telegram_id': telegram_id,
-                        'telegram_data': {
-                            'username': username,
-                            'first_name': first_name,
-                            'last_name': last_name
-                        }
-                    },
-                    headers={'X-Webhook-Secret': config.WEBHOOK_SECRET},
-                    timeout=aiohttp.ClientTimeout(total=10)
-                ) as response:
-                    wp_result = await response.json()
-                    logger.info(f"WordPress confirmation: {wp_result}")
-
-                    return {
-                        'success': True,
-                        'agent_id': agent_id,
-                        'agent_name': wp_result.get('agent_name', f'Agent {agent_id}')
-                    }
-            except Exception as e:
-                logger.error(f"Error notifying WordPress: {e}")
-                # Всё равно возвращаем успех, т.к. локально сохранили
-                return {
-                    'success': True,
-                    'agent_id': agent_id,
-                    'agent_name': f'Agent {agent_id}'
-                }
+        # Уведомить WordPress об использовании токена.
+        # При ошибке всё равно возвращаем успех, т.к. локально сохранили
+        wp_result = await wp_api.confirm_agent_token(token, telegram_id, username, first_name, last_name)
+
+        return {
+            'success': True,
+            'agent_id': agent_id,
+            'agent_name': wp_result.get('agent_name', f'Agent {agent_id}')
+        }
 
     except Exception as e:
         logger.error(f"Error handling agent token: {e}")
@@ -271,6 +255,13 @@ async def cmd_help(message: Message):
     await message.answer(config.MESSAGES['help'])
 
 
+def stale_marker(result: dict, user) -> str:
+    """Отметка о последней сверке, если расписание отдано из устаревшей копии"""
+    if not result.get('stale'):
+        return ""
+    return "\n\n" + format_synced_marker(result.get('synced_at'), user.timezone)
+
+
 @router.message(Command('today'))
 async def cmd_today(message: Message):
     """Обработка команды /today - уроки на сегодня"""
@@ -280,8 +271,8 @@ async def cmd_today(message: Message):
         await message.answer(config.MESSAGES['not_registered'])
         return
 
-    # Получение расписания
-    result = await wp_api.get_schedule(message.chat.id, period='today')
+    # Расписание из локальной копии (сверяется с WordPress в фоне)
+    result = await booking_mirror.get_schedule(user, 'today')
 
     if not result.get('success'):
         await message.answer("❌ Не удалось получить расписание. Попробуйте позже.")
@@ -290,22 +281,23 @@ async def cmd_today(message: Message):
     bookings = result.get('bookings', [])
 
     if not bookings:
-        await message.answer("📅 На сегодня уроков нет.")
+        await message.answer("📅 На сегодня уроков нет." + stale_marker(result, user), parse_mode='HTML')
         return
 
-    # Получение timezone пользователя
-    user_timezone = user.timezone if user else None
+    # Время всех уроков - в часовой пояс пользователя за один проход
+    bookings = convert_bookings_to_timezone(bookings, user.timezone if user else None)
 
     # Формирование сообщения
     message_text = f"📅 <b>Уроки на сегодня ({result['period']['from']}):</b>\n\n"
 
     for booking in bookings:
         if user.user_type == 'agent':
-            message_text += format_booking_for_agent(booking, user_timezone)
+            message_text += format_booking_for_agent(booking)
         else:
-            message_text += format_booking_for_customer(booking, user_timezone)
+            message_text += format_booking_for_customer(booking)
         message_text += "\n---\n\n"
 
+    message_text += stale_marker(result, user)
     await message.answer(message_text, parse_mode='HTML')
 
 
@@ -318,8 +310,8 @@ async def cmd_week(message: Message):
         await message.answer(config.MESSAGES['not_registered'])
         return
 
-    # Получение расписания
-    result = await wp_api.get_schedule(message.chat.id, period='week')
+    # Расписание из локальной копии (сверяется с WordPress в фоне)
+    result = await booking_mirror.get_schedule(user, 'week')
 
     if not result.get('success'):
         await message.answer("❌ Не удалось получить расписание. Попробуйте позже.")
@@ -328,11 +320,12 @@ async def cmd_week(message: Message):
     bookings = result.get('bookings', [])
 
     if not bookings:
-        await message.answer("📅 На ближайшую неделю уроков нет.")
+        await message.answer("📅 На ближайшую неделю уроков нет." + stale_marker(result, user), parse_mode='HTML')
         return
 
-    # Получение timezone пользователя
-    user_timezone = user.timezone if user else None
+    # Время всех уроков - в часовой пояс пользователя за один проход,
+    # группировка по дате в этом же часовом поясе
+    bookings = convert_bookings_to_timezone(bookings, user.timezone if user else None)
 
     # Группировка по датам
     bookings_by_date = {}
@@ -350,13 +343,14 @@ async def cmd_week(message: Message):
 
         for booking in day_bookings:
             if user.user_type == 'agent':
-                message_text += format_booking_for_agent_short(booking, user_timezone)
+                message_text += format_booking_for_agent_short(booking)
             else:
-                message_text += format_booking_for_customer_short(booking, user_timezone)
+                message_text += format_booking_for_customer_short(booking)
             message_text += "\n"
 
         message_text += "\n"
 
+    message_text += stale_marker(result, user)
     await message.answer(message_text, parse_mode='HTML')
 
 
@@ -412,8 +406,9 @@ async def cmd_settings(message: Message):
     )
 
     # Время напоминаний
+    offsets = ', '.join(format_reminder_offset(offset) for offset in get_reminder_offsets(settings))
     builder.button(
-        text=f"⏰ За {settings.reminder_minutes_before} мин до начала",
+        text=f"⏰ За {offsets} до начала",
         callback_data=f"setting_reminder_time"
     )
 
@@ -431,88 +426,3 @@ async def cmd_settings(message: Message):
 
     await message.answer(message_text, reply_markup=builder.as_markup(), parse_mode='HTML')
 
-
-def format_booking_for_agent(booking: dict, user_timezone: str = None) -> str:
-    """Форматирование бронирования для учителя (подробно)"""
-    customer = booking['customer']
-    service = booking['service']
-
-    # Конвертация времени в часовой пояс пользователя
-    start_time = booking['start_time']
-    end_time = booking['end_time']
-
-    if user_timezone:
-        _, start_time = format_datetime_with_timezone(
-            booking['start_date'], booking['start_time'], user_timezone
-        )
-        _, end_time = format_datetime_with_timezone(
-            booking['start_date'], booking['end_time'], user_timezone
-        )
-
-    text = f"""🕐 <b>{start_time} - {end_time}</b>
-👤 Ученик: {customer['name']}
-🎵 Инструмент: {service['name']}
-📧 Email: {customer['email']}
-📱 Телефон: {customer['phone']}"""
-
-    if booking.get('google_meet_url'):
-        text += f"\n🎥 Google Meet: {booking['google_meet_url']}"
-
-    return text
-
-
-def format_booking_for_customer(booking: dict, user_timezone: str = None) -> str:
-    """Форматирование бронирования для ученика (подробно)"""
-    agent = booking['agent']
-    service = booking['service']
-
-    # Конвертация времени в часовой пояс пользователя
-    start_time = booking['start_time']
-    end_time = booking['end_time']
-
-    if user_timezone:
-        _, start_time = format_datetime_with_timezone(
-            booking['start_date'], booking['start_time'], user_timezone
-        )
-        _, end_time = format_datetime_with_timezone(
-            booking['start_date'], booking['end_time'], user_timezone
-        )
-
-    text = f"""🕐 <b>{start_time} - {end_time}</b>
-👨‍🏫 Учитель: {agent['name']}
-🎵 Инструмент: {service['name']}"""
-
-    if booking.get('google_meet_url'):
-        text += f"\n🎥 Google Meet: {booking['google_meet_url']}"
-
-    return text
-
-
-def format_booking_for_agent_short(booking: dict, user_timezone: str = None) -> str:
-    """Форматирование бронирования для учителя (кратко)"""
-    customer = booking['customer']
-
-    # Конвертация времени в часовой пояс пользователя
-    start_time = booking['start_time']
-
-    if user_timezone:
-        _, start_time = format_datetime_with_timezone(
-            booking['start_date'], booking['start_time'], user_timezone
-        )
-
-    return f"  • {start_time} - {customer['name']} ({booking['service']['name']})"
-
-
-def format_booking_for_customer_short(booking: dict, user_timezone: str = None) -> str:
-    """Форматирование бронирования для ученика (кратко)"""
-    agent = booking['agent']
-
-    # Конвертация времени в часовой пояс пользователя
-    start_time = booking['start_time']
-
-    if user_timezone:
-        _, start_time = format_datetime_with_timezone(
-            booking['start_date'], booking['start_time'], user_timezone
-        )
-
-    return f"  • {start_time} - {agent['name']} ({booking['service']['name']})"
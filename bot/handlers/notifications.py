@@ -2,24 +2,84 @@
 Обработчик уведомлений от WordPress
 """
 
+import asyncio
 import logging
 import hmac
 import hashlib
+import weakref
 from aiogram import Bot
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
 import config
 from database.db import db
-from utils.formatters import format_datetime_with_timezone
+from services.outbound import OutboundDispatcher, is_retryable
+from services.tracing import tracer
+from services.webhook_queue import already_delivered, record_delivery
+from utils.templates import templates, render_booking, booking_update_context
 
 logger = logging.getLogger(__name__)
 
+# Максимальное число одновременных отправок в Telegram
+SEND_CONCURRENCY = getattr(config, 'NOTIFICATION_CONCURRENCY', 10)
+
+
+class EventRenderer:
+    """
+    Рендер уведомления об одном событии
+
+    Текст и разметка клавиатуры строятся не чаще одного раза на
+    (шаблон, часовой пояс, тип получателя) и переиспользуются для всех
+    получателей с тем же ключом.
+    """
+
+    def __init__(self, stats: dict):
+        """
+        Args:
+            stats: Общие счётчики renders / renders_saved
+        """
+        self.stats = stats
+        self.rendered = {}
+
+    def render(self, template: str, user_timezone: str | None, user_type: str,
+               message_formatter, keyboard_creator=None) -> tuple:
+        """
+        Args:
+            template: Имя шаблона (тип уведомления)
+            user_timezone: Часовой пояс получателя (None - config.TIMEZONE)
+            user_type: Вариант сообщения ('agent' или 'customer')
+            message_formatter: Функция (user_timezone) -> str или готовый текст
+            keyboard_creator: Функция, возвращающая InlineKeyboardBuilder (опционально)
+
+        Returns:
+            tuple: (текст, InlineKeyboardMarkup или None)
+        """
+        key = (template, user_timezone or config.TIMEZONE, user_type)
+
+        rendered = self.rendered.get(key)
+        if rendered is not None:
+            self.stats['renders_saved'] += 1
+            return rendered
+
+        message = message_formatter(key[1]) if callable(message_formatter) else message_formatter
+        keyboard = keyboard_creator() if keyboard_creator else None
+
+        rendered = self.rendered[key] = (message, keyboard.as_markup() if keyboard else None)
+        self.stats['renders'] += 1
+        return rendered
+
 
 class NotificationHandler:
     """Обработчик уведомлений"""
 
-    def __init__(self, bot: Bot):
+    def __init__(self, bot: Bot, outbound: OutboundDispatcher = None):
         self.bot = bot
+        self.outbound = outbound or OutboundDispatcher(bot)
+        # Ограничение числа одновременных отправок
+        self.send_semaphore = asyncio.Semaphore(SEND_CONCURRENCY)
+        # Блокировки по chat_id: сообщения в один чат уходят в порядке постановки
+        self.chat_locks = weakref.WeakValueDictionary()
+        # Сколько раз сообщение было отрендерено и сколько рендеров сэкономил EventRenderer
+        self.render_stats = {'renders': 0, 'renders_saved': 0}
 
     def verify_signature(self, data: dict, signature: str) -> bool:
         """Проверка подписи webhook"""
@@ -53,109 +113,182 @@ class NotificationHandler:
 
         except Exception as e:
             logger.error(f"Error handling notification: {e}")
+            # Ошибка возвращается в очередь вебхуков для повторной попытки
+            raise
 
-    async def handle_booking_created(self, data: dict):
-        """Обработка создания бронирования"""
-        # Валидация обязательных полей
-        required_fields = ['booking_id', 'agent', 'customer', 'service']
-        missing_fields = [field for field in required_fields if field not in data]
+    async def deliver(self, chat_id: int, message: str, notification_type: str,
+                      booking_id: int | None, reply_markup=None) -> dict:
+        """
+        Отправить сообщение одному получателю и записать результат в лог
 
-        if missing_fields:
-            logger.error(f"Missing required fields in booking_created: {missing_fields}")
-            return
+        Отправки ограничены семафором, а сообщения в один чат отправляются
+        строго по очереди в порядке вызова. При повторе события из очереди
+        вебхуков чаты, уже получившие уведомление, пропускаются.
 
-        # Дополнительная валидация вложенных полей
-        if not isinstance(data.get('agent'), dict) or not isinstance(data.get('customer'), dict):
-            logger.error("Invalid data structure: agent and customer must be dictionaries")
-            return
+        Постоянная ошибка Telegram (бот заблокирован, чат не найден) пишется
+        в лог как неудачная отправка; временная (is_retryable) после записи в
+        лог пробрасывается, чтобы событие вернулось в очередь на повтор.
 
-        sent_telegram_ids = set()
-
-        # Отправка уведомлений всем привязанным Telegram аккаунтам агента
-        agent_id = data.get('agent_id')
-        if agent_id:
-            sent_telegram_ids = await self.send_to_agent_bindings(
-                agent_id=agent_id,
-                notification_type='booking_created',
-                booking_id=data['booking_id'],
-                message_formatter=lambda tz=None: self.format_booking_created_for_agent(data, tz),
-                keyboard_creator=lambda: self.create_booking_keyboard(data['booking_id'], user_type='agent', include_actions=False)
-            )
+        Args:
+            chat_id: Telegram chat ID
+            message: Текст сообщения (HTML)
+            notification_type: Тип уведомления для лога
+            booking_id: ID бронирования
+            reply_markup: InlineKeyboardMarkup (опционально)
 
-        # Fallback: старая система с telegram_chat_id (только если еще не отправили)
-        agent_chat_id = data['agent'].get('telegram_chat_id')
-        if agent_chat_id and int(agent_chat_id) not in sent_telegram_ids:
-            # Проверка настроек
-            settings = await db.get_settings(int(agent_chat_id))
-            if settings and settings.notify_on_create:
-                # Получение timezone пользователя
-                user = await db.get_user_by_chat_id(int(agent_chat_id))
-                user_timezone = user.timezone if user else None
+        Returns:
+            dict: {'chat_id': ..., 'success': bool, 'error': str | None}
+        """
+        if already_delivered(chat_id):
+            logger.info(f"Skipping {notification_type} to chat_id={chat_id}: delivered in a previous attempt")
+            return {'chat_id': chat_id, 'success': True, 'error': None}
 
-                message = self.format_booking_created_for_agent(data, user_timezone)
-                keyboard = self.create_booking_keyboard(data['booking_id'], user_type='agent', include_actions=False)
+        lock = self.chat_locks.get(chat_id)
+        if lock is None:
+            lock = asyncio.Lock()
+            self.chat_locks[chat_id] = lock
 
-                try:
-                    await self.bot.send_message(
-                        int(agent_chat_id),
-                        message,
-                        parse_mode='HTML',
-                        reply_markup=keyboard.as_markup() if keyboard else None
-                    )
+        with tracer.span('deliver', chat_id=chat_id, notification_type=notification_type) as span:
+            with tracer.span('wait_chat_lock'):
+                await lock.acquire()
 
-                    await db.log_notification(
-                        chat_id=int(agent_chat_id),
-                        notification_type='booking_created',
-                        booking_id=data['booking_id'],
-                        success=True
-                    )
+            try:
+                with tracer.span('wait_send_slot'):
+                    await self.send_semaphore.acquire()
+
+                try:
+                    with tracer.span('telegram.send'):
+                        await self.outbound.send_message(
+                            chat_id,
+                            message,
+                            parse_mode='HTML',
+                            reply_markup=reply_markup
+                        )
+                    error = None
+                    retry_error = None
+                    record_delivery(chat_id)
                 except Exception as e:
-                    logger.error(f"Error sending notification to agent: {e}")
+                    logger.error(f"Error sending {notification_type} to chat_id={chat_id}: {e}")
+                    error = str(e)
+                    retry_error = e if is_retryable(e) else None
+                finally:
+                    self.send_semaphore.release()
+
+                with tracer.span('log_notification'):
                     await db.log_notification(
-                        chat_id=int(agent_chat_id),
-                        notification_type='booking_created',
-                        booking_id=data['booking_id'],
-                        success=False,
-                        error_message=str(e)
+                        chat_id=chat_id,
+                        notification_type=notification_type,
+                        booking_id=booking_id,
+                        success=error is None,
+                        error_message=error
                     )
+            finally:
+                lock.release()
 
-        # Отправка уведомления клиенту
-        customer_chat_id = data['customer'].get('telegram_chat_id')
-        if customer_chat_id:
-            # Проверка настроек
-            settings = await db.get_settings(int(customer_chat_id))
-            if settings and settings.notify_on_create:
-                # Получение timezone пользователя
-                user = await db.get_user_by_chat_id(int(customer_chat_id))
-                user_timezone = user.timezone if user else None
+            span.set(success=error is None)
 
-                message = self.format_booking_created_for_customer(data, user_timezone)
-                keyboard = self.create_booking_keyboard(data['booking_id'], user_type='customer', include_actions=False)
+        if retry_error is not None:
+            raise retry_error
 
-                try:
-                    await self.bot.send_message(
-                        int(customer_chat_id),
-                        message,
-                        parse_mode='HTML',
-                        reply_markup=keyboard.as_markup() if keyboard else None
-                    )
+        return {'chat_id': chat_id, 'success': error is None, 'error': error}
 
-                    await db.log_notification(
-                        chat_id=int(customer_chat_id),
-                        notification_type='booking_created',
-                        booking_id=data['booking_id'],
-                        success=True
+    @staticmethod
+    async def gather_deliveries(deliveries: list) -> list[dict]:
+        """
+        Дождаться всех отправок и только потом пробросить временную ошибку
+
+        Иначе событие вернулось бы в очередь, пока остальные отправки ещё
+        идут, и их доставка не попала бы в отметки для повтора.
+        """
+        results = await asyncio.gather(*deliveries, return_exceptions=True)
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+        return results
+
+    async def notify_recipients(self, data: dict, event_type: str, notification_type: str,
+                                agent_formatter, customer_formatter,
+                                agent_keyboard=None, customer_keyboard=None,
+                                include_bindings: bool = False) -> dict:
+        """
+        Отправить уведомление агенту и клиенту бронирования с учётом их настроек
+
+        Получатели (включая аккаунты, привязанные к агенту) определяются одним
+        запросом db.resolve_recipients, дубли отбрасываются.
+
+        Args:
+            data: Данные бронирования из вебхука
+            event_type: Ключ настроек для db.resolve_recipients
+            notification_type: Тип уведомления для лога
+            agent_formatter: Функция (user_timezone) -> str для стороны агента
+            customer_formatter: Функция (user_timezone) -> str для клиента
+            agent_keyboard: Функция -> InlineKeyboardBuilder для агента (опционально)
+            customer_keyboard: Функция -> InlineKeyboardBuilder для клиента (опционально)
+            include_bindings: Добавить аккаунты, привязанные к agent_id
+
+        Returns:
+            dict: chat_id -> {'chat_id', 'success', 'error'} для каждой отправки
+        """
+        agent_chat_id = data['agent'].get('telegram_chat_id')
+        customer_chat_id = data['customer'].get('telegram_chat_id')
+
+        with tracer.span('resolve_recipients') as span:
+            recipients = await db.resolve_recipients(
+                data.get('agent_id') if include_bindings else None,
+                [agent_chat_id, customer_chat_id],
+                event_type
+            )
+            span.set(recipients=len(recipients))
+
+        renderer = EventRenderer(self.render_stats)
+        deliveries = []
+        with tracer.span('render') as span:
+            for recipient in recipients:
+                if not recipient.notify:
+                    continue
+
+                if customer_chat_id and recipient.chat_id == int(customer_chat_id):
+                    message, reply_markup = renderer.render(
+                        notification_type, recipient.timezone, 'customer', customer_formatter, customer_keyboard
                     )
-                except Exception as e:
-                    logger.error(f"Error sending notification to customer: {e}")
-                    await db.log_notification(
-                        chat_id=int(customer_chat_id),
-                        notification_type='booking_created',
-                        booking_id=data['booking_id'],
-                        success=False,
-                        error_message=str(e)
+                else:
+                    message, reply_markup = renderer.render(
+                        notification_type, recipient.timezone, 'agent', agent_formatter, agent_keyboard
                     )
 
+                deliveries.append(self.deliver(recipient.chat_id, message, notification_type, data['booking_id'], reply_markup))
+            span.set(messages=len(deliveries), renders=len(renderer.rendered))
+
+        results = await self.gather_deliveries(deliveries)
+        return {result['chat_id']: result for result in results}
+
+    async def handle_booking_created(self, data: dict):
+        """Обработка создания бронирования"""
+        # Валидация обязательных полей
+        required_fields = ['booking_id', 'agent', 'customer', 'service']
+        missing_fields = [field for field in required_fields if field not in data]
+
+        if missing_fields:
+            logger.error(f"Missing required fields in booking_created: {missing_fields}")
+            return
+
+        # Дополнительная валидация вложенных полей
+        if not isinstance(data.get('agent'), dict) or not isinstance(data.get('customer'), dict):
+            logger.error("Invalid data structure: agent and customer must be dictionaries")
+            return
+
+        # Привязанные аккаунты агента, агент (старая система) и клиент - параллельно
+        await self.notify_recipients(
+            data,
+            event_type='booking_created',
+            notification_type='booking_created',
+            agent_formatter=lambda tz: self.format_booking_created_for_agent(data, tz),
+            customer_formatter=lambda tz: self.format_booking_created_for_customer(data, tz),
+            agent_keyboard=lambda: self.create_booking_keyboard(data['booking_id'], user_type='agent', include_actions=False),
+            customer_keyboard=lambda: self.create_booking_keyboard(data['booking_id'], user_type='customer', include_actions=False),
+            include_bindings=True
+        )
+
     async def handle_booking_updated(self, data: dict):
         """Обработка обновления бронирования"""
         # Валидация обязательных полей
@@ -171,57 +304,13 @@ class NotificationHandler:
         if not changes:
             return
 
-        # Отправка уведомления агенту
-        agent_chat_id = data['agent'].get('telegram_chat_id')
-        if agent_chat_id:
-            settings = await db.get_settings(int(agent_chat_id))
-            if settings and settings.notify_on_update:
-                # Получение timezone пользователя
-                user = await db.get_user_by_chat_id(int(agent_chat_id))
-                user_timezone = user.timezone if user else None
-
-                message = self.format_booking_updated_for_agent(data, changes, user_timezone)
-
-                try:
-                    await self.bot.send_message(
-                        int(agent_chat_id),
-                        message,
-                        parse_mode='HTML'
-                    )
-                    await db.log_notification(
-                        chat_id=int(agent_chat_id),
-                        notification_type='booking_updated',
-                        booking_id=data['booking_id'],
-                        success=True
-                    )
-                except Exception as e:
-                    logger.error(f"Error sending update notification to agent: {e}")
-
-        # Отправка уведомления клиенту
-        customer_chat_id = data['customer'].get('telegram_chat_id')
-        if customer_chat_id:
-            settings = await db.get_settings(int(customer_chat_id))
-            if settings and settings.notify_on_update:
-                # Получение timezone пользователя
-                user = await db.get_user_by_chat_id(int(customer_chat_id))
-                user_timezone = user.timezone if user else None
-
-                message = self.format_booking_updated_for_customer(data, changes, user_timezone)
-
-                try:
-                    await self.bot.send_message(
-                        int(customer_chat_id),
-                        message,
-                        parse_mode='HTML'
-                    )
-                    await db.log_notification(
-                        chat_id=int(customer_chat_id),
-                        notification_type='booking_updated',
-                        booking_id=data['booking_id'],
-                        success=True
-                    )
-                except Exception as e:
-                    logger.error(f"Error sending update notification to customer: {e}")
+        await self.notify_recipients(
+            data,
+            event_type='booking_updated',
+            notification_type='booking_updated',
+            agent_formatter=lambda tz: self.format_booking_updated_for_agent(data, changes, tz),
+            customer_formatter=lambda tz: self.format_booking_updated_for_customer(data, changes, tz)
+        )
 
     async def handle_booking_status_changed(self, data: dict):
         """Обработка изменения статуса бронирования"""
@@ -236,273 +325,38 @@ class NotificationHandler:
         old_status = data.get('old_status')
         new_status = data.get('new_status')
 
-        # Отправка уведомления агенту
-        agent_chat_id = data['agent'].get('telegram_chat_id')
-        if agent_chat_id:
-            settings = await db.get_settings(int(agent_chat_id))
-
-            # Проверка настроек в зависимости от статуса
-            should_notify = False
-            if new_status == 'cancelled' and settings and settings.notify_on_cancel:
-                should_notify = True
-            elif settings and settings.notify_on_update:
-                should_notify = True
-
-            if should_notify:
-                # Получение timezone пользователя
-                user = await db.get_user_by_chat_id(int(agent_chat_id))
-                user_timezone = user.timezone if user else None
-
-                message = self.format_status_changed_for_agent(data, old_status, new_status, user_timezone)
-
-                try:
-                    await self.bot.send_message(
-                        int(agent_chat_id),
-                        message,
-                        parse_mode='HTML'
-                    )
-                except Exception as e:
-                    logger.error(f"Error sending status notification to agent: {e}")
-
-        # Отправка уведомления клиенту
-        customer_chat_id = data['customer'].get('telegram_chat_id')
-        if customer_chat_id:
-            settings = await db.get_settings(int(customer_chat_id))
-
-            should_notify = False
-            if new_status == 'cancelled' and settings and settings.notify_on_cancel:
-                should_notify = True
-            elif settings and settings.notify_on_update:
-                should_notify = True
-
-            if should_notify:
-                # Получение timezone пользователя
-                user = await db.get_user_by_chat_id(int(customer_chat_id))
-                user_timezone = user.timezone if user else None
-
-                message = self.format_status_changed_for_customer(data, old_status, new_status, user_timezone)
-
-                try:
-                    await self.bot.send_message(
-                        int(customer_chat_id),
-                        message,
-                        parse_mode='HTML'
-                    )
-                except Exception as e:
-                    logger.error(f"Error sending status notification to customer: {e}")
+        # Об отмене уведомляем, если включены уведомления об отмене или об изменениях
+        await self.notify_recipients(
+            data,
+            event_type='booking_cancelled' if new_status == 'cancelled' else 'booking_status_changed',
+            notification_type='booking_status_changed',
+            agent_formatter=lambda tz: self.format_status_changed_for_agent(data, old_status, new_status, tz),
+            customer_formatter=lambda tz: self.format_status_changed_for_customer(data, old_status, new_status, tz)
+        )
 
     def format_booking_created_for_agent(self, data: dict, user_timezone: str = None) -> str:
         """Форматирование уведомления о новом бронировании для учителя"""
-        customer = data['customer']
-        service = data['service']
-
-        # Конвертация времени в часовой пояс пользователя
-        start_date = data['start_date']
-        start_time = data['start_time']
-        end_time = data['end_time']
-
-        if user_timezone:
-            start_date, start_time = format_datetime_with_timezone(
-                data['start_date'], data['start_time'], user_timezone
-            )
-            _, end_time = format_datetime_with_timezone(
-                data['start_date'], data['end_time'], user_timezone
-            )
-
-        message = f"""🎵 <b>Новый урок!</b>
-
-👤 <b>Ученик:</b> {customer['name']}
-📧 Email: {customer['email']}
-📱 Телефон: {customer['phone']}
-
-🎵 <b>Инструмент:</b> {service['name']}
-📅 <b>Дата:</b> {start_date}
-🕐 <b>Время:</b> {start_time} - {end_time}
-"""
-
-        if data.get('google_meet_url'):
-            message += f"\n🎥 <b>Google Meet:</b>\n{data['google_meet_url']}"
-
-        message += f"\n\n🆔 Код бронирования: <code>{data['booking_code']}</code>"
-
-        return message
+        return render_booking('booking_created_agent', data, user_timezone)
 
     def format_booking_created_for_customer(self, data: dict, user_timezone: str = None) -> str:
         """Форматирование уведомления о новом бронировании для ученика"""
-        agent = data['agent']
-        service = data['service']
-
-        # Конвертация времени в часовой пояс пользователя
-        start_date = data['start_date']
-        start_time = data['start_time']
-        end_time = data['end_time']
-
-        if user_timezone:
-            start_date, start_time = format_datetime_with_timezone(
-                data['start_date'], data['start_time'], user_timezone
-            )
-            _, end_time = format_datetime_with_timezone(
-                data['start_date'], data['end_time'], user_timezone
-            )
-
-        message = f"""🎵 <b>Урок подтвержден!</b>
-
-👨‍🏫 <b>Учитель:</b> {agent['name']}
-🎵 <b>Инструмент:</b> {service['name']}
-
-📅 <b>Дата:</b> {start_date}
-🕐 <b>Время:</b> {start_time} - {end_time}
-"""
-
-        if data.get('google_meet_url'):
-            message += f"\n🎥 <b>Ссылка на урок:</b>\n{data['google_meet_url']}"
-
-        message += "\n\nЖелаем хорошего урока! 🎶"
-
-        return message
+        return render_booking('booking_created_customer', data, user_timezone)
 
     def format_booking_updated_for_agent(self, data: dict, changes: dict, user_timezone: str = None) -> str:
         """Форматирование уведомления об изменении для учителя"""
-        customer = data['customer']
-
-        message = f"""📝 <b>Изменение в бронировании</b>
-
-👤 <b>Ученик:</b> {customer['name']}
-🎵 <b>Инструмент:</b> {data['service']['name']}
-
-<b>Изменения:</b>
-"""
-
-        if 'start_date' in changes:
-            old_date = changes['start_date']['old']
-            new_date = changes['start_date']['new']
-
-            if user_timezone:
-                # Конвертируем старую и новую даты
-                old_time = changes.get('start_time', {}).get('old', '00:00')
-                new_time = changes.get('start_time', {}).get('new', '00:00')
-                old_date, _ = format_datetime_with_timezone(old_date, old_time, user_timezone)
-                new_date, _ = format_datetime_with_timezone(new_date, new_time, user_timezone)
-
-            message += f"📅 Дата: {old_date} → {new_date}\n"
-
-        if 'start_time' in changes:
-            old_time = changes['start_time']['old']
-            new_time = changes['start_time']['new']
-
-            if user_timezone:
-                # Используем текущую дату или дату из изменений
-                date_for_conversion = changes.get('start_date', {}).get('new', data.get('start_date', '2025-01-01'))
-                _, old_time = format_datetime_with_timezone(date_for_conversion, old_time, user_timezone)
-                _, new_time = format_datetime_with_timezone(date_for_conversion, new_time, user_timezone)
-
-            message += f"🕐 Время начала: {old_time} → {new_time}\n"
-
-        return message
+        return templates.render('booking_updated_agent', booking_update_context(data, changes), user_timezone)
 
     def format_booking_updated_for_customer(self, data: dict, changes: dict, user_timezone: str = None) -> str:
         """Форматирование уведомления об изменении для ученика"""
-        agent = data['agent']
-
-        message = f"""📝 <b>Изменение в бронировании</b>
-
-👨‍🏫 <b>Учитель:</b> {agent['name']}
-🎵 <b>Инструмент:</b> {data['service']['name']}
-
-<b>Изменения:</b>
-"""
-
-        if 'start_date' in changes:
-            old_date = changes['start_date']['old']
-            new_date = changes['start_date']['new']
-
-            if user_timezone:
-                # Конвертируем старую и новую даты
-                old_time = changes.get('start_time', {}).get('old', '00:00')
-                new_time = changes.get('start_time', {}).get('new', '00:00')
-                old_date, _ = format_datetime_with_timezone(old_date, old_time, user_timezone)
-                new_date, _ = format_datetime_with_timezone(new_date, new_time, user_timezone)
-
-            message += f"📅 Дата: {old_date} → {new_date}\n"
-
-        if 'start_time' in changes:
-            old_time = changes['start_time']['old']
-            new_time = changes['start_time']['new']
-
-            if user_timezone:
-                # Используем текущую дату или дату из изменений
-                date_for_conversion = changes.get('start_date', {}).get('new', data.get('start_date', '2025-01-01'))
-                _, old_time = format_datetime_with_timezone(date_for_conversion, old_time, user_timezone)
-                _, new_time = format_datetime_with_timezone(date_for_conversion, new_time, user_timezone)
-
-            message += f"🕐 Время начала: {old_time} → {new_time}\n"
-
-        if data.get('google_meet_url'):
-            message += f"\n🎥 <b>Ссылка на урок:</b>\n{data['google_meet_url']}"
-
-        return message
+        return templates.render('booking_updated_customer', booking_update_context(data, changes), user_timezone)
 
     def format_status_changed_for_agent(self, data: dict, old_status: str, new_status: str, user_timezone: str = None) -> str:
         """Форматирование уведомления об изменении статуса для учителя"""
-        customer = data['customer']
-
-        status_emoji = {
-            'approved': '✅',
-            'cancelled': '❌',
-            'pending': '⏳',
-        }
-
-        # Конвертация времени в часовой пояс пользователя
-        start_date = data['start_date']
-        start_time = data['start_time']
-
-        if user_timezone:
-            start_date, start_time = format_datetime_with_timezone(
-                data['start_date'], data['start_time'], user_timezone
-            )
-
-        message = f"""{status_emoji.get(new_status, '📝')} <b>Статус бронирования изменен</b>
-
-👤 <b>Ученик:</b> {customer['name']}
-🎵 <b>Инструмент:</b> {data['service']['name']}
-📅 <b>Дата:</b> {start_date}
-🕐 <b>Время:</b> {start_time}
-
-<b>Статус:</b> {old_status} → {new_status}
-"""
-
-        return message
+        return render_booking('status_changed_agent', {**data, 'old_status': old_status, 'new_status': new_status}, user_timezone)
 
     def format_status_changed_for_customer(self, data: dict, old_status: str, new_status: str, user_timezone: str = None) -> str:
         """Форматирование уведомления об изменении статуса для ученика"""
-        agent = data['agent']
-
-        status_emoji = {
-            'approved': '✅',
-            'cancelled': '❌',
-            'pending': '⏳',
-        }
-
-        # Конвертация времени в часовой пояс пользователя
-        start_date = data['start_date']
-        start_time = data['start_time']
-
-        if user_timezone:
-            start_date, start_time = format_datetime_with_timezone(
-                data['start_date'], data['start_time'], user_timezone
-            )
-
-        message = f"""{status_emoji.get(new_status, '📝')} <b>Статус бронирования изменен</b>
-
-👨‍🏫 <b>Учитель:</b> {agent['name']}
-🎵 <b>Инструмент:</b> {data['service']['name']}
-📅 <b>Дата:</b> {start_date}
-🕐 <b>Время:</b> {start_time}
-
-<b>Статус:</b> {old_status} → {new_status}
-"""
-
-        return message
+        return render_booking('status_changed_customer', {**data, 'old_status': old_status, 'new_status': new_status}, user_timezone)
 
     def create_booking_keyboard(self, booking_id: int, user_type: str, include_actions: bool = True):
         """
@@ -524,80 +378,59 @@ class NotificationHandler:
         return builder
 
     async def send_to_agent_bindings(self, agent_id: int, notification_type: str,
-                                     booking_id: int, message_formatter, keyboard_creator=None):
+                                     booking_id: int, message_formatter, keyboard_creator=None) -> dict:
         """
         Отправка уведомления всем Telegram аккаунтам, привязанным к агенту
 
+        Отправки выполняются параллельно (не более NOTIFICATION_CONCURRENCY
+        одновременно), поэтому время обработки вебхука не растёт линейно
+        с числом привязок.
+
         Args:
             agent_id: ID агента в LatePoint
-            notification_type: Тип уведомления
+            notification_type: Тип уведомления (ключ настроек db.resolve_recipients)
             booking_id: ID бронирования
             message_formatter: Функция для форматирования сообщения
             keyboard_creator: Функция для создания клавиатуры (опционально)
 
         Returns:
-            set: Множество telegram_id, которым были отправлены уведомления
+            dict: telegram_id -> {'chat_id', 'success', 'error'} для каждой привязки
         """
-        from database.models import AgentBinding
-        from sqlalchemy import select
-
-        sent_telegram_ids = set()
-
         try:
-            # Получить все привязки для данного агента
-            async with db.get_session() as session:
-                result = await session.execute(
-                    select(AgentBinding).where(AgentBinding.agent_id == agent_id)
-                )
-                bindings = result.scalars().all()
+            # Привязки, часовые пояса и настройки - одним запросом
+            with tracer.span('resolve_recipients', agent_id=agent_id) as span:
+                recipients = await db.resolve_recipients(agent_id, [], notification_type)
+                span.set(recipients=len(recipients))
 
-            if not bindings:
+            if not recipients:
                 logger.info(f"No telegram bindings found for agent_id={agent_id}")
-                return sent_telegram_ids
+                return {}
 
-            logger.info(f"Found {len(bindings)} telegram bindings for agent_id={agent_id}")
+            logger.info(f"Found {len(recipients)} telegram bindings for agent_id={agent_id}")
 
-            # Отправить уведомление каждому привязанному аккаунту
-            for binding in bindings:
-                telegram_id = binding.telegram_id
+            # Одно сообщение на каждый часовой пояс среди привязок
+            renderer = EventRenderer(self.render_stats)
+            deliveries = []
+            for recipient in recipients:
+                if not recipient.notify:
+                    continue
 
-                try:
-                    # Получение timezone пользователя
-                    user = await db.get_user_by_chat_id(telegram_id)
-                    user_timezone = user.timezone if user else None
-
-                    # Передаем timezone в message_formatter (если поддерживается)
-                    message = message_formatter(user_timezone) if callable(message_formatter) else message_formatter
-                    keyboard = keyboard_creator() if keyboard_creator else None
-
-                    await self.bot.send_message(
-                        telegram_id,
-                        message,
-                        parse_mode='HTML',
-                        reply_markup=keyboard.as_markup() if keyboard else None
-                    )
+                message, reply_markup = renderer.render(
+                    notification_type, recipient.timezone, 'agent', message_formatter, keyboard_creator
+                )
+                deliveries.append(self.deliver(recipient.chat_id, message, notification_type, booking_id, reply_markup))
 
-                    await db.log_notification(
-                        chat_id=telegram_id,
-                        notification_type=notification_type,
-                        booking_id=booking_id,
-                        success=True
-                    )
+            # Отправить уведомление каждому привязанному аккаунту
+            results = await self.gather_deliveries(deliveries)
 
-                    sent_telegram_ids.add(telegram_id)
-                    logger.info(f"Notification sent to telegram_id={telegram_id} for agent_id={agent_id}")
+            sent_count = sum(1 for result in results if result['success'])
+            logger.info(f"Notification sent to {sent_count}/{len(recipients)} bindings of agent_id={agent_id}")
 
-                except Exception as e:
-                    logger.error(f"Error sending notification to telegram_id={telegram_id}: {e}")
-                    await db.log_notification(
-                        chat_id=telegram_id,
-                        notification_type=notification_type,
-                        booking_id=booking_id,
-                        success=False,
-                        error_message=str(e)
-                    )
+            return {result['chat_id']: result for result in results}
 
         except Exception as e:
             logger.error(f"Error in send_to_agent_bindings: {e}")
-
-        return sent_telegram_ids
+            if is_retryable(e):
+                # Событие вернётся в очередь вебхуков
+                raise
+            return {}
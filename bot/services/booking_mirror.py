@@ -0,0 +1,348 @@
+"""
+Локальная копия бронирований (stale-while-revalidate)
+
+/today, /week и «Детали» отвечают из локальной таблицы, которая обновляется
+вебхуками о бронированиях и сверками с WordPress. Если последняя сверка
+старше BOOKING_MIRROR_MAX_AGE, ответ отдаётся сразу, а расписание
+перезапрашивается в фоне. Прочитанные из таблицы данные держатся в памяти
+до изменения затронутых бронирований и расписаний их участников.
+"""
+
+import asyncio
+import json
+import logging
+from datetime import datetime, timedelta
+
+import pytz
+
+import config
+from database.db import db
+from services.wordpress_api import wp_api
+from utils.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Через сколько секунд после сверки данные считаются устаревшими
+MIRROR_MAX_AGE = getattr(config, 'BOOKING_MIRROR_MAX_AGE', 300)
+
+# Сколько дней хранить прошедшие бронирования
+MIRROR_RETENTION_DAYS = getattr(config, 'BOOKING_MIRROR_RETENTION_DAYS', 7)
+
+# Сколько прочитанных расписаний и бронирований держать в памяти
+MIRROR_READ_CACHE_SIZE = getattr(config, 'BOOKING_MIRROR_READ_CACHE_SIZE', 5000)
+
+# Поля бронирования в формате /schedule (format_booking_data в плагине)
+BOOKING_FIELDS = (
+    'id', 'booking_code', 'status', 'start_date', 'start_time', 'end_time', 'duration',
+    'customer', 'agent', 'service', 'google_meet_url', 'timezone'
+)
+PERSON_FIELDS = ('id', 'name', 'email', 'phone')
+
+
+def booking_from_webhook(data: dict) -> dict:
+    """Привести данные бронирования из вебхука к формату /schedule"""
+    booking = {key: data[key] for key in BOOKING_FIELDS if key in data}
+    booking['id'] = int(data['booking_id'])
+    booking['status'] = data.get('new_status') or data.get('status')
+
+    for party in ('customer', 'agent'):
+        person = data.get(party) or {}
+        booking[party] = {key: person.get(key) for key in PERSON_FIELDS}
+
+    service = data.get('service') or {}
+    booking['service'] = {'id': service.get('id'), 'name': service.get('name')}
+    booking['timezone'] = (data.get('customer') or {}).get('timezone')
+    return booking
+
+
+def mirror_row(booking: dict, agent_id=None, customer_id=None) -> dict:
+    """Строка MirroredBooking для бронирования в формате /schedule"""
+    return {
+        'booking_id': int(booking['id']),
+        'agent_id': int(agent_id or booking['agent']['id']),
+        'customer_id': int(customer_id or booking['customer']['id']),
+        'status': booking['status'],
+        'start_date': booking['start_date'],
+        'start_time': booking['start_time'],
+        'booking': json.dumps(booking, ensure_ascii=False),
+    }
+
+
+def period_range(period: str) -> tuple[str, str]:
+    """
+    Даты периода 'today' или 'week' так же, как их считает плагин
+
+    Оба конца - в config.TIMEZONE (должен совпадать с часовым поясом сайта
+    WordPress): week - с сегодняшнего дня сайта по тот же день через неделю.
+    """
+    today = datetime.now(pytz.timezone(config.TIMEZONE)).date()
+    date_to = today if period == 'today' else today + timedelta(days=7)
+    return today.strftime('%Y-%m-%d'), date_to.strftime('%Y-%m-%d')
+
+
+class BookingMirror:
+    """Чтение расписаний из локальной копии и её обновление"""
+
+    def __init__(self):
+        self.revalidating: dict[tuple, asyncio.Task] = {}
+        # Записи живут не дольше MIRROR_MAX_AGE и сбрасываются при изменении
+        # бронирования (('booking', id)) или расписания участника
+        # (('schedule', 'agent' или 'customer', LatePoint ID, chat_id, даты))
+        self.reads = TTLCache(maxsize=MIRROR_READ_CACHE_SIZE, ttl=MIRROR_MAX_AGE)
+        # Все изменения из ленты до этого момента (UTC) применены к копии
+        self.feed_synced_at = None
+        self.counters = {
+            'served': 0,
+            'served_stale': 0,
+            'misses': 0,
+            'revalidations': 0,
+            'revalidation_errors': 0,
+        }
+
+    async def get_schedule(self, user, period: str) -> dict:
+        """
+        Расписание пользователя за 'today' или 'week'
+
+        Returns:
+            Dict как у wp_api.get_schedule и дополнительно synced_at (UTC) и stale
+        """
+        party_id = user.latepoint_id
+        if user.user_type not in ('agent', 'customer') or not party_id:
+            return await wp_api.get_schedule(user.chat_id, period=period)
+
+        date_from, date_to = period_range(period)
+        key = ('schedule', user.user_type, party_id, user.chat_id, date_from, date_to)
+        cached = self.reads.get(key)
+
+        if cached is None:
+            synced_at = await db.get_mirror_synced_at(user.chat_id, date_from, date_to)
+
+            if synced_at is None:
+                # Период ещё не сверялся - ждём WordPress, копия только запасной вариант
+                self.counters['misses'] += 1
+                result = await self.revalidate_schedule(user, period)
+                if result.get('success'):
+                    # Ответ может быть общим объектом из кэша wp_api - не изменяем его
+                    return {**result, 'synced_at': datetime.utcnow(), 'stale': False}
+
+                rows = await db.get_mirrored_bookings(user.user_type, party_id, date_from, date_to)
+                if not rows:
+                    return result
+            else:
+                rows = await db.get_mirrored_bookings(user.user_type, party_id, date_from, date_to)
+
+            cached = (synced_at, [row.booking for row in rows])
+            if synced_at is not None:
+                self.reads.set(key, cached)
+
+        synced_at, payloads = cached
+        synced_at = self.fresher(synced_at)
+        stale = self.is_stale(synced_at)
+        if stale and synced_at is not None:
+            self.revalidate_in_background(('schedule', user.chat_id, period),
+                                          lambda: self.revalidate_schedule(user, period))
+
+        self.counters['served'] += 1
+        if stale:
+            self.counters['served_stale'] += 1
+
+        return {
+            'success': True,
+            'bookings': [json.loads(payload) for payload in payloads],
+            'period': {'from': date_from, 'to': date_to},
+            'synced_at': synced_at,
+            'stale': stale,
+        }
+
+    async def get_booking(self, user, booking_id: int) -> dict:
+        """
+        Детали бронирования, доступного пользователю
+
+        Returns:
+            Dict как у wp_api.get_booking и дополнительно synced_at (UTC) и stale
+        """
+        key = ('booking', booking_id)
+        cached = self.reads.get(key)
+
+        if cached is None:
+            row = await db.get_mirrored_booking(booking_id)
+            if row is not None:
+                cached = (row.updated_at, {'agent': row.agent_id, 'customer': row.customer_id}, row.booking)
+                self.reads.set(key, cached)
+
+        if cached is None or not user.latepoint_id or cached[1].get(user.user_type) != user.latepoint_id:
+            self.counters['misses'] += 1
+            return await self.revalidate_booking(user.chat_id, booking_id)
+
+        synced_at, _, payload = cached
+        synced_at = self.fresher(synced_at)
+        stale = self.is_stale(synced_at)
+        if stale:
+            self.revalidate_in_background(('booking', user.chat_id, booking_id),
+                                          lambda: self.revalidate_booking(user.chat_id, booking_id))
+
+        self.counters['served'] += 1
+        if stale:
+            self.counters['served_stale'] += 1
+
+        return {
+            'success': True,
+            'booking': json.loads(payload),
+            'synced_at': synced_at,
+            'stale': stale,
+        }
+
+    async def revalidate_schedule(self, user, period: str) -> dict:
+        """Запросить расписание из WordPress и заменить им копию за период"""
+        self.counters['revalidations'] += 1
+        started_at = datetime.utcnow()
+        result = await wp_api.get_schedule(user.chat_id, period=period)
+
+        if not result.get('success'):
+            self.counters['revalidation_errors'] += 1
+            return result
+
+        try:
+            rows = [mirror_row(booking) for booking in result.get('bookings', [])]
+            deleted_ids, parties = await db.replace_mirrored_ranges(
+                result['period']['from'], result['period']['to'],
+                [(user.user_type, user.latepoint_id, user.chat_id, rows)],
+                started_at
+            )
+            self.invalidate_reads(deleted_ids | {row['booking_id'] for row in rows}, parties)
+        except Exception as e:
+            self.counters['revalidation_errors'] += 1
+            logger.error(f"Error updating booking mirror for chat {user.chat_id}: {e}")
+
+        return result
+
+    async def revalidate_booking(self, chat_id: int, booking_id: int) -> dict:
+        """Запросить бронирование из WordPress и обновить его в копии"""
+        self.counters['revalidations'] += 1
+        started_at = datetime.utcnow()
+        result = await wp_api.get_booking(booking_id, chat_id)
+
+        if not result.get('success'):
+            self.counters['revalidation_errors'] += 1
+            return result
+
+        try:
+            parties = await db.save_mirrored_bookings([mirror_row(result['booking'])], started_at)
+            self.invalidate_reads({booking_id}, parties)
+        except Exception as e:
+            self.counters['revalidation_errors'] += 1
+            logger.error(f"Error updating booking mirror for booking {booking_id}: {e}")
+
+        return result
+
+    def invalidate_reads(self, booking_ids, parties):
+        """
+        Сбросить прочитанные данные изменённых бронирований и расписания их участников
+
+        Args:
+            booking_ids: ID изменённых или удалённых бронирований
+            parties: Пары ('agent' или 'customer', LatePoint ID)
+        """
+        for booking_id in booking_ids:
+            self.reads.invalidate(('booking', int(booking_id)))
+
+        if parties:
+            self.reads.invalidate_where(lambda key: key[0] == 'schedule' and key[1:3] in parties)
+
+    def revalidate_in_background(self, key: tuple, function):
+        """Запустить фоновую сверку, если такая же ещё не выполняется"""
+        if key in self.revalidating:
+            return
+
+        async def run():
+            try:
+                await function()
+            except Exception as e:
+                self.counters['revalidation_errors'] += 1
+                logger.error(f"Background booking mirror revalidation {key} failed: {e}")
+            finally:
+                self.revalidating.pop(key, None)
+
+        self.revalidating[key] = asyncio.create_task(run())
+
+    def fresher(self, synced_at: datetime | None) -> datetime | None:
+        """
+        Время актуальности данных с учётом ленты изменений
+
+        Сверенные данные после сверки обновляются лентой, поэтому они
+        актуальны на момент последнего опроса ленты, если он был позже.
+        """
+        if synced_at is None or self.feed_synced_at is None:
+            return synced_at
+        return max(synced_at, self.feed_synced_at)
+
+    def is_stale(self, synced_at: datetime | None) -> bool:
+        """Сверка старше MIRROR_MAX_AGE секунд"""
+        return synced_at is None or (datetime.utcnow() - synced_at).total_seconds() > MIRROR_MAX_AGE
+
+    async def apply_event(self, event_type: str, data: dict):
+        """Обновить копию по вебхуку о бронировании"""
+        if event_type not in ('booking_created', 'booking_updated', 'booking_status_changed'):
+            return
+        if not data.get('booking_id') or not data.get('start_date'):
+            return
+
+        try:
+            booking = booking_from_webhook(data)
+            row = mirror_row(booking, data.get('agent_id'), data.get('customer_id'))
+            parties = await db.save_mirrored_bookings([row], datetime.utcnow())
+            self.invalidate_reads({row['booking_id']}, parties)
+        except Exception as e:
+            logger.error(f"Error applying {event_type} to booking mirror: {e}")
+
+    async def apply_schedules(self, users: list, schedules: dict, date_from: str, date_to: str,
+                              synced_at: datetime):
+        """
+        Обновить копию расписаниями, полученными при сверке напоминаний
+
+        Args:
+            users: Пользователи из БД
+            schedules: chat_id -> бронирования в формате /schedule
+            date_from: Первый день периода (YYYY-MM-DD)
+            date_to: Последний день периода (YYYY-MM-DD)
+            synced_at: Время начала запроса к WordPress (UTC)
+        """
+        ranges = [
+            (user.user_type, user.latepoint_id, user.chat_id,
+             [mirror_row(booking) for booking in schedules[user.chat_id]])
+            for user in users
+            if user.chat_id in schedules and user.user_type in ('agent', 'customer') and user.latepoint_id
+        ]
+
+        try:
+            deleted_ids, parties = await db.replace_mirrored_ranges(date_from, date_to, ranges, synced_at)
+            self.invalidate_reads(deleted_ids | {row['booking_id'] for *_, rows in ranges for row in rows}, parties)
+        except Exception as e:
+            logger.error(f"Error updating booking mirror for {len(ranges)} chats: {e}")
+
+    async def expire(self):
+        """Удалить прошедшие бронирования старше MIRROR_RETENTION_DAYS дней"""
+        today = datetime.now(pytz.timezone(config.TIMEZONE)).date()
+        before_date = (today - timedelta(days=MIRROR_RETENTION_DAYS)).strftime('%Y-%m-%d')
+
+        try:
+            # Кэш не сбрасывается: удаляются бронирования раньше любого периода
+            # /today и /week, а детали давно прошедших уроков доживут до TTL
+            deleted = await db.delete_expired_mirror(before_date)
+            if deleted:
+                logger.info(f"Deleted {deleted} past bookings from booking mirror")
+        except Exception as e:
+            logger.error(f"Error expiring booking mirror: {e}")
+
+    def stats(self) -> dict:
+        """Счётчики для /health"""
+        return {
+            **self.counters,
+            'revalidating': len(self.revalidating),
+            'read_cache': self.reads.stats(),
+            'max_age': MIRROR_MAX_AGE,
+        }
+
+
+# Глобальный экземпляр
+booking_mirror = BookingMirror()
@@ -0,0 +1,175 @@
+"""
+Синхронизация с WordPress по ленте изменений бронирований
+
+Вместо периодического запроса расписаний всех пользователей бот раз в
+CHANGE_FEED_INTERVAL секунд забирает из /bookings/changes бронирования,
+изменённые после сохранённого курсора, и применяет их так же, как вебхуки.
+Полная сверка нужна только при первом запуске (курсора ещё нет).
+"""
+
+import asyncio
+import logging
+from datetime import datetime, timezone
+
+from apscheduler.triggers.interval import IntervalTrigger
+
+import config
+from database.db import db
+from services.wordpress_api import wp_api
+from services.booking_mirror import booking_mirror
+from services.scheduler import BULK_CHUNK_SIZE
+from services.metrics import SCHEDULER_JOB_SECONDS, timed
+
+logger = logging.getLogger(__name__)
+
+# Вести очередь напоминаний по ленте изменений (False - периодическая полная сверка)
+CHANGE_FEED_ENABLED = getattr(config, 'CHANGE_FEED_ENABLED', True)
+
+# Интервал опроса ленты изменений (в секундах)
+CHANGE_FEED_INTERVAL = getattr(config, 'CHANGE_FEED_INTERVAL', 60)
+
+# На сколько дней вперёд выполняется полная сверка (при первом запуске,
+# а также для новых пользователей и после изменения настроек напоминаний)
+RESYNC_DAYS = getattr(config, 'CHANGE_FEED_RESYNC_DAYS', 180)
+
+# Ключ курсора в таблице sync_state
+CURSOR_KEY = 'booking_changes_cursor'
+
+
+class ChangeFeedSync:
+    """Опрос ленты изменений бронирований с сохранением курсора в БД"""
+
+    def __init__(self, scheduler, handler):
+        """
+        Args:
+            scheduler: ReminderScheduler (полная сверка и APScheduler для опроса)
+            handler: async функция (data), применяет изменённое бронирование
+                (данные в формате вебхука)
+        """
+        self.scheduler = scheduler
+        self.handler = handler
+        self.lock = asyncio.Lock()
+        self.unsupported = False
+        self.local_checked_at = datetime.utcnow()
+        self.last_synced_at = None
+        self.counters = {
+            'polls': 0,
+            'changes': 0,
+            'errors': 0,
+            'full_resyncs': 0,
+        }
+
+    def start(self):
+        """Опрос сейчас и затем каждые CHANGE_FEED_INTERVAL секунд"""
+        self.scheduler.scheduler.add_job(
+            timed(SCHEDULER_JOB_SECONDS, 'booking_changes')(self.poll),
+            trigger=IntervalTrigger(seconds=CHANGE_FEED_INTERVAL),
+            id='booking_changes',
+            name='Apply booking changes feed',
+            next_run_time=datetime.now(timezone.utc),
+            max_instances=1,
+            replace_existing=True
+        )
+        logger.info(f"Booking changes feed started (interval: {CHANGE_FEED_INTERVAL} s)")
+
+    async def poll(self):
+        """Применить изменения после курсора (при первом запуске - полная сверка)"""
+        if self.unsupported:
+            return
+
+        async with self.lock:
+            try:
+                cursor = await db.get_sync_state(CURSOR_KEY)
+                if cursor is None:
+                    await self.full_resync()
+                else:
+                    await self.apply_changes(cursor)
+
+                await self.sync_changed_users()
+
+            except Exception as e:
+                self.counters['errors'] += 1
+                logger.error(f"Error polling booking changes: {e}")
+
+    async def apply_changes(self, cursor: str):
+        """Пройти ленту от cursor, сохраняя курсор после каждой страницы"""
+        started_at = datetime.utcnow()
+        self.counters['polls'] += 1
+
+        async for page in wp_api.iter_changes(cursor):
+            if page.get('unsupported'):
+                self.fall_back()
+                return
+
+            if not page.get('success'):
+                self.counters['errors'] += 1
+                logger.warning(f"Booking changes fetch failed: {page.get('message')}")
+                return
+
+            for data in page.get('changes', []):
+                await self.handler(data)
+
+            self.counters['changes'] += len(page.get('changes', []))
+            cursor = page['next_cursor']
+            await db.set_sync_state(CURSOR_KEY, cursor)
+
+        # Все изменения до started_at применены - локальная копия актуальна
+        self.last_synced_at = started_at
+        booking_mirror.feed_synced_at = started_at
+
+    async def full_resync(self):
+        """Полная сверка, затем лента продолжается с момента её начала"""
+        head = None
+        async for page in wp_api.iter_changes(None):
+            if page.get('unsupported'):
+                self.fall_back()
+                return
+            head = page.get('next_cursor') if page.get('success') else None
+
+        if head is None:
+            logger.warning("Cannot get booking changes cursor, full resync postponed")
+            return
+
+        # Курсор взят до сверки: изменения во время сверки придут из ленты
+        logger.info(f"No booking changes cursor, running full resync for {RESYNC_DAYS} days")
+        self.counters['full_resyncs'] += 1
+        if await self.scheduler.sync_reminders(horizon_days=RESYNC_DAYS):
+            await db.set_sync_state(CURSOR_KEY, head)
+            self.last_synced_at = datetime.utcnow()
+
+    async def sync_changed_users(self):
+        """Сверить напоминания новых пользователей и сменивших настройки"""
+        checked_at = datetime.utcnow()
+        users = await db.get_users_changed_since(self.local_checked_at)
+        bound_chat_ids = await db.get_binding_only_chat_ids(since=self.local_checked_at)
+        if not users and not bound_chat_ids:
+            self.local_checked_at = checked_at
+            return
+
+        now = datetime.now(timezone.utc)
+        synced = True
+        for i in range(0, len(users), BULK_CHUNK_SIZE):
+            synced = await self.scheduler.sync_reminders_chunk(users[i:i + BULK_CHUNK_SIZE], now, RESYNC_DAYS) and synced
+        for i in range(0, len(bound_chat_ids), BULK_CHUNK_SIZE):
+            synced = await self.scheduler.sync_reminders_chunk(
+                [], now, RESYNC_DAYS, bound_chat_ids=bound_chat_ids[i:i + BULK_CHUNK_SIZE]
+            ) and synced
+
+        if synced:
+            self.local_checked_at = checked_at
+
+    def fall_back(self):
+        """Плагин без ленты изменений: вернуться к периодической полной сверке"""
+        self.unsupported = True
+        if self.scheduler.scheduler.get_job('booking_changes'):
+            self.scheduler.scheduler.remove_job('booking_changes')
+        self.scheduler.start_full_sync()
+        logger.warning("Booking changes feed is not supported by the plugin, using periodic full sync")
+
+    def stats(self) -> dict:
+        """Счётчики для /health"""
+        return {
+            **self.counters,
+            'unsupported': self.unsupported,
+            'last_synced_at': self.last_synced_at.isoformat() if self.last_synced_at else None,
+        }
@@ -0,0 +1,181 @@
+"""
+Состояние компонентов бота для /health, /health/live и /health/ready
+
+Проверки (БД, выключатели WordPress, планировщик, получение обновлений
+Telegram, очередь вебхуков) выполняет фоновый монитор раз в
+HEALTH_CHECK_INTERVAL секунд и публикует результат в снимок. Запрос к
+/health отдаёт заранее сериализованный снимок и не обращается к БД,
+поэтому частые пробы оркестратора не создают нагрузки.
+"""
+
+import asyncio
+import json
+import logging
+import time
+from datetime import datetime
+
+import pytz
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# Интервал проверок (в секундах)
+HEALTH_CHECK_INTERVAL = getattr(config, 'HEALTH_CHECK_INTERVAL', 15)
+
+# Предельное время одной проверки (в секундах)
+HEALTH_CHECK_TIMEOUT = getattr(config, 'HEALTH_CHECK_TIMEOUT', 5)
+
+# Отставание самого старого вебхука в очереди (в секундах), после которого состояние degraded
+HEALTH_MAX_QUEUE_LAG = getattr(config, 'HEALTH_MAX_QUEUE_LAG', 300)
+
+# Опоздание ближайшего напоминания (в секундах), после которого состояние degraded
+HEALTH_MAX_REMINDER_DELAY = getattr(config, 'HEALTH_MAX_REMINDER_DELAY', 60)
+
+# Сколько пропущенных циклов проверок означает зависание процесса (/health/live)
+HEALTH_STALE_CYCLES = 3
+
+SERVICE_INFO = {'service': 'telegram-bot', 'version': '1.0.0'}
+
+# Состояния: ok - работает, degraded - работает с ограничениями, down - не работает
+STATUS_ORDER = {'ok': 0, 'degraded': 1, 'down': 2}
+
+
+class HealthMonitor:
+    """Фоновые проверки компонентов и снимок их состояния"""
+
+    def __init__(self, interval: float = HEALTH_CHECK_INTERVAL, timeout: float = HEALTH_CHECK_TIMEOUT):
+        self.interval = interval
+        self.timeout = timeout
+        self.checks = {}  # имя -> (async функция, critical)
+        self.snapshot = None
+        self.body = None
+        self.ready = False
+        self.task = None
+        self.last_run_at = None
+        self.counters = {'runs': 0, 'failed_checks': 0, 'timeouts': 0}
+
+    def register(self, name: str, check, critical: bool = False):
+        """
+        Зарегистрировать проверку компонента
+
+        Args:
+            name: Имя компонента в снимке
+            check: async функция без аргументов, возвращает dict со
+                'status' ('ok', 'degraded' или 'down') и подробностями
+            critical: Без компонента бот не может принимать запросы
+                (down - /health/ready отвечает 503)
+        """
+        self.checks[name] = (check, critical)
+
+    async def start(self):
+        """Первая проверка сразу (готовность после запуска) и затем фоном"""
+        await self.run_checks()
+        self.task = asyncio.create_task(self._run())
+        logger.info(f"Health monitor started (interval: {self.interval} s, status: {self.snapshot['status']})")
+
+    async def stop(self):
+        """Остановка монитора: /health/ready отвечает 503 на время остановки"""
+        self.ready = False
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.run_checks()
+            except Exception as e:
+                logger.error(f"Error running health checks: {e}")
+
+    async def _check(self, name: str, check) -> dict:
+        """Выполнить одну проверку; исключение или таймаут - состояние down"""
+        started = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(check(), self.timeout)
+        except asyncio.TimeoutError:
+            self.counters['timeouts'] += 1
+            result = {'status': 'down', 'error': f'timeout after {self.timeout} s'}
+        except Exception as e:
+            result = {'status': 'down', 'error': str(e)}
+
+        if result['status'] != 'ok':
+            self.counters['failed_checks'] += 1
+
+        # В лог - только смена состояния, а не каждая проверка
+        previous = self.snapshot['components'][name]['status'] if self.snapshot else 'ok'
+        if result['status'] != previous:
+            level = logging.INFO if result['status'] == 'ok' else logging.WARNING
+            logger.log(level, f"Health check {name}: {previous} -> {result['status']} {result.get('error', '')}")
+
+        result['check_ms'] = round((time.perf_counter() - started) * 1000, 3)
+        return result
+
+    async def run_checks(self):
+        """Выполнить все проверки параллельно и опубликовать снимок"""
+        started = time.perf_counter()
+        names = list(self.checks)
+        results = await asyncio.gather(*(self._check(name, self.checks[name][0]) for name in names))
+        components = dict(zip(names, results))
+
+        status = max((result['status'] for result in results), key=STATUS_ORDER.get, default='ok')
+        failing = [name for name in names if self.checks[name][1] and components[name]['status'] == 'down']
+        if status == 'down' and not failing:
+            # Отказ некритичного компонента: бот работает с ограничениями
+            status = 'degraded'
+
+        self.counters['runs'] += 1
+        self.last_run_at = time.monotonic()
+        self.ready = not failing
+        self.snapshot = {
+            'status': status,
+            **SERVICE_INFO,
+            'timestamp': datetime.now(pytz.timezone(config.TIMEZONE)).isoformat(),
+            'ready': self.ready,
+            'check_ms': round((time.perf_counter() - started) * 1000, 3),
+            'components': components,
+            'monitor': dict(self.counters, interval=self.interval),
+        }
+        self.body = json.dumps(self.snapshot, ensure_ascii=False, default=str).encode()
+
+    def live(self) -> dict:
+        """
+        Жив ли процесс: цикл событий не завис и монитор выполняет проверки
+
+        Returns:
+            dict со 'status' ('ok' или 'down') и возрастом снимка
+        """
+        if self.task is None or self.last_run_at is None:
+            # Монитор ещё не запущен (идёт запуск) или уже остановлен
+            return {'status': 'ok'}
+
+        age = time.monotonic() - self.last_run_at
+        result = {'status': 'ok', 'snapshot_age_seconds': round(age, 3)}
+
+        if self.task.done():
+            result['status'] = 'down'
+            result['error'] = 'health monitor stopped'
+        elif age > self.interval * HEALTH_STALE_CYCLES + self.timeout:
+            result['status'] = 'down'
+            result['error'] = f'no health checks for {age:.0f} s'
+        return result
+
+    def readiness(self) -> dict:
+        """Готов ли бот принимать запросы: все критичные компоненты не в состоянии down"""
+        if self.snapshot is None:
+            return {'status': 'down', 'ready': False, 'error': 'starting'}
+
+        failing = {
+            name: component for name, component in self.snapshot['components'].items()
+            if self.checks[name][1] and component['status'] == 'down'
+        }
+        if not self.ready and not failing:
+            return {'status': 'down', 'ready': False, 'error': 'shutting down'}
+
+        return {'status': 'down' if failing else 'ok', 'ready': not failing, 'failing': failing}
+
@@ -0,0 +1,98 @@
+"""
+Общий HTTP клиент для исходящих запросов к WordPress
+
+Одна aiohttp.ClientSession с настроенным пулом соединений: keep-alive
+переиспользует TCP/TLS соединения между запросами, DNS-ответы кэшируются.
+"""
+
+import logging
+from typing import Optional
+
+import aiohttp
+import config
+
+logger = logging.getLogger(__name__)
+
+# Пул соединений: всего и к одному хосту
+POOL_LIMIT = getattr(config, 'HTTP_POOL_LIMIT', 100)
+POOL_LIMIT_PER_HOST = getattr(config, 'HTTP_POOL_LIMIT_PER_HOST', 30)
+
+# Сколько секунд держать простаивающее соединение открытым
+KEEPALIVE_TIMEOUT = getattr(config, 'HTTP_KEEPALIVE_TIMEOUT', 30)
+
+# Время жизни записи DNS кэша в секундах
+DNS_CACHE_TTL = getattr(config, 'HTTP_DNS_CACHE_TTL', 300)
+
+# Запрашивать сжатые ответы (gzip/deflate)
+COMPRESSION = getattr(config, 'HTTP_COMPRESSION', True)
+
+
+class HttpClient:
+    """Общая HTTP сессия с настроенным TCPConnector и счётчиками соединений"""
+
+    def __init__(self):
+        self.session: Optional[aiohttp.ClientSession] = None
+        self.counters = {
+            'requests': 0,
+            'connections_created': 0,
+            'connections_reused': 0,
+            'dns_cache_hits': 0,
+            'dns_cache_misses': 0,
+        }
+
+    def _trace_config(self) -> aiohttp.TraceConfig:
+        """Подсчёт новых и переиспользованных соединений и обращений к DNS кэшу"""
+        trace_config = aiohttp.TraceConfig()
+
+        def count(name):
+            async def handler(session, context, params):
+                self.counters[name] += 1
+            return handler
+
+        trace_config.on_request_start.append(count('requests'))
+        trace_config.on_connection_create_end.append(count('connections_created'))
+        trace_config.on_connection_reuseconn.append(count('connections_reused'))
+        trace_config.on_dns_cache_hit.append(count('dns_cache_hits'))
+        trace_config.on_dns_cache_miss.append(count('dns_cache_misses'))
+        return trace_config
+
+    async def get_session(self) -> aiohttp.ClientSession:
+        """Общая сессия (создаётся при первом обращении)"""
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=POOL_LIMIT,
+                limit_per_host=POOL_LIMIT_PER_HOST,
+                keepalive_timeout=KEEPALIVE_TIMEOUT,
+                use_dns_cache=True,
+                ttl_dns_cache=DNS_CACHE_TTL,
+            )
+            self.session = aiohttp.ClientSession(
+                connector=connector,
+                headers={} if COMPRESSION else {'Accept-Encoding': 'identity'},
+                trace_configs=[self._trace_config()],
+            )
+            logger.info(
+                f"HTTP client initialized (pool {POOL_LIMIT}/{POOL_LIMIT_PER_HOST} per host, "
+                f"keep-alive {KEEPALIVE_TIMEOUT}s, DNS cache {DNS_CACHE_TTL}s)"
+            )
+
+        return self.session
+
+    async def close(self):
+        """Закрыть сессию и все соединения пула"""
+        if self.session and not self.session.closed:
+            await self.session.close()
+            logger.info("HTTP client closed")
+
+    def stats(self) -> dict:
+        """Настройки пула и счётчики соединений"""
+        return {
+            'open': bool(self.session and not self.session.closed),
+            'limit': POOL_LIMIT,
+            'limit_per_host': POOL_LIMIT_PER_HOST,
+            **self.counters,
+        }
+
+
+# Глобальный экземпляр
+http_client = HttpClient()
@@ -0,0 +1,187 @@
+"""
+Метрики в формате Prometheus (GET /metrics)
+
+Гистограммы и счётчики хранятся в памяти процесса. Запись значения -
+поиск корзины bisect и несколько сложений (около микросекунды), поэтому
+замеры стоят прямо на горячих путях: вебхуки, отправка в Telegram,
+запросы к WordPress, сессии БД и задачи планировщика.
+"""
+
+import time
+from bisect import bisect_left
+from functools import wraps
+
+import config
+
+# Отдавать /metrics
+METRICS_ENABLED = getattr(config, 'METRICS_ENABLED', True)
+
+# Префикс имён метрик
+PREFIX = 'latepoint_bot_'
+
+# Границы корзин по умолчанию (в секундах): от 1 мс до 30 с
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value) -> str:
+    """Экранирование значения метки"""
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names: tuple, values: tuple, extra: str = '') -> str:
+    """Метки в формате {name="value",...}"""
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value: float) -> str:
+    """Число в формате Prometheus"""
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Timer:
+    """Замер длительности блока: with histogram.time(*labels): ..."""
+
+    __slots__ = ('histogram', 'labels', 'started')
+
+    def __init__(self, histogram: 'Histogram', labels: tuple):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.histogram.observe(time.perf_counter() - self.started, *self.labels)
+        return False
+
+
+class Counter:
+    """Монотонный счётчик с метками"""
+
+    kind = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.values = {}  # значения меток -> число
+
+    def inc(self, *labels, value: float = 1):
+        """Увеличить счётчик для значений меток labels"""
+        self.values[labels] = self.values.get(labels, 0) + value
+
+    def render(self) -> list[str]:
+        return [
+            f'{self.name}{_labels(self.labelnames, labels)} {_number(value)}'
+            for labels, value in sorted(self.values.items())
+        ]
+
+
+class Histogram:
+    """Гистограмма с фиксированными корзинами и метками"""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets))
+        self.series = {}  # значения меток -> [счётчики корзин (последняя +Inf), сумма]
+
+    def observe(self, value: float, *labels):
+        """Записать значение для значений меток labels"""
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def time(self, *labels) -> Timer:
+        """Контекстный менеджер, записывающий длительность блока"""
+        return Timer(self, labels)
+
+    def render(self) -> list[str]:
+        lines = []
+        bounds = self.buckets + (float('inf'),)
+
+        for labels, (counts, total) in sorted(self.series.items()):
+            cumulative = 0
+            for bound, count in zip(bounds, counts):
+                cumulative += count
+                le = f'le="{_number(bound)}"'
+                lines.append(f'{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}')
+            lines.append(f'{self.name}_sum{_labels(self.labelnames, labels)} {_number(total)}')
+            lines.append(f'{self.name}_count{_labels(self.labelnames, labels)} {cumulative}')
+
+        return lines
+
+
+class MetricsRegistry:
+    """Набор метрик процесса"""
+
+    def __init__(self):
+        self.metrics = {}
+
+    def counter(self, name: str, documentation: str, labelnames: tuple = ()) -> Counter:
+        return self._register(Counter(PREFIX + name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: tuple = (),
+                  buckets: tuple = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(PREFIX + name, documentation, labelnames, buckets))
+
+    def _register(self, metric):
+        if metric.name in self.metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self.metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        """Текстовый формат Prometheus 0.0.4"""
+        lines = []
+        for metric in self.metrics.values():
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+def timed(histogram: Histogram, *labels):
+    """Декоратор async функции: записывать длительность каждого вызова"""
+    def decorator(function):
+        @wraps(function)
+        async def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await function(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - started, *labels)
+        return wrapper
+    return decorator
+
+
+# Глобальный экземпляр
+metrics = MetricsRegistry()
+
+WEBHOOK_REQUEST_SECONDS = metrics.histogram(
+    'webhook_request_seconds', 'Time to accept a WordPress webhook into the queue', ('status',))
+WEBHOOK_PROCESS_SECONDS = metrics.histogram(
+    'webhook_process_seconds', 'Time to process a queued webhook event', ('event_type', 'outcome'))
+TELEGRAM_SEND_SECONDS = metrics.histogram(
+    'telegram_send_seconds', 'Telegram sendMessage latency (without rate limit waits)', ('outcome',))
+WORDPRESS_REQUEST_SECONDS = metrics.histogram(
+    'wordpress_request_seconds', 'WordPress REST request latency per attempt', ('endpoint', 'outcome'))
+DB_SESSION_SECONDS = metrics.histogram(
+    'db_session_seconds', 'Database session lifetime', ('operation',))
+SCHEDULER_JOB_SECONDS = metrics.histogram(
+    'scheduler_job_seconds', 'Scheduler job and reminder firing duration', ('job',),
+    buckets=DEFAULT_BUCKETS + (60.0, 120.0, 300.0))
+NOTIFICATIONS_TOTAL = metrics.counter(
+    'notifications_total', 'Notifications recorded in notification_logs', ('type', 'outcome'))
@@ -0,0 +1,175 @@
+"""
+Исходящая отправка сообщений в Telegram с учётом лимитов Bot API
+"""
+
+import asyncio
+import logging
+import time
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramNetworkError, TelegramRetryAfter, TelegramServerError
+
+import config
+from services.metrics import TELEGRAM_SEND_SECONDS
+from services.tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+# Глобальный лимит Telegram: ~30 сообщений в секунду на бота
+GLOBAL_RATE = getattr(config, 'TELEGRAM_GLOBAL_RATE', 30)
+
+# Лимит на один чат: не чаще 1 сообщения в секунду и не больше RATE_LIMIT_PER_USER в минуту
+CHAT_RATE = min(1.0, getattr(config, 'RATE_LIMIT_PER_USER', 30) / 60)
+
+# Сколько раз повторять отправку после 429 RetryAfter
+MAX_RETRIES = getattr(config, 'TELEGRAM_MAX_RETRIES', 3)
+
+# При каком числе корзин чатов удалять неиспользуемые
+CHAT_BUCKETS_PRUNE_SIZE = 10000
+
+
+def is_retryable(error: Exception) -> bool:
+    """
+    Временная ли ошибка отправки: сеть, 5xx Telegram, таймаут или 429,
+    оставшийся после MAX_RETRIES повторов. Постоянные ошибки (бот
+    заблокирован, чат не найден, неверный запрос) повторять бессмысленно.
+    """
+    return isinstance(error, (TelegramNetworkError, TelegramServerError, TelegramRetryAfter, asyncio.TimeoutError))
+
+
+class TokenBucket:
+    """
+    Корзина токенов с резервированием
+
+    reserve() всегда выдаёт токен, уходя в минус, и возвращает время
+    ожидания до момента, когда этот токен действительно доступен. Так
+    ожидающие отправки выстраиваются в очередь без повторных проверок.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self) -> float:
+        """Забрать токен и вернуть задержку (в секундах) до его доступности"""
+        now = time.monotonic()
+        self._refill(now)
+        self.tokens -= 1
+        return max(0.0, -self.tokens / self.rate)
+
+    def penalize(self, seconds: float):
+        """Запретить выдачу токенов на seconds секунд (после 429 от Telegram)"""
+        now = time.monotonic()
+        self._refill(now)
+        self.tokens = min(self.tokens, -seconds * self.rate)
+
+    def is_idle(self) -> bool:
+        """Корзина полна - её можно удалить без потери состояния"""
+        self._refill(time.monotonic())
+        return self.tokens >= self.capacity
+
+
+class OutboundDispatcher:
+    """
+    Единая точка отправки уведомлений и напоминаний
+
+    Ограничивает скорость глобально и по каждому chat_id и повторяет
+    отправку после TelegramRetryAfter, вместо того чтобы сразу считать
+    сообщение неотправленным.
+    """
+
+    def __init__(self, bot: Bot):
+        self.bot = bot
+        self.global_bucket = TokenBucket(GLOBAL_RATE, GLOBAL_RATE)
+        self.chat_buckets = {}
+        self.counters = {
+            'sent': 0,
+            'failed': 0,
+            'throttled': 0,
+            'retried': 0,
+        }
+
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self.chat_buckets.get(chat_id)
+
+        if bucket is None:
+            if len(self.chat_buckets) >= CHAT_BUCKETS_PRUNE_SIZE:
+                self.chat_buckets = {
+                    key: value for key, value in self.chat_buckets.items() if not value.is_idle()
+                }
+            bucket = TokenBucket(CHAT_RATE, 1)
+            self.chat_buckets[chat_id] = bucket
+
+        return bucket
+
+    async def _throttle(self, chat_id: int):
+        """Дождаться своей очереди в корзинах чата и бота"""
+        delay = self._chat_bucket(chat_id).reserve()
+        if delay > 0:
+            self.counters['throttled'] += 1
+            with tracer.span('throttle_chat', delay_ms=round(delay * 1000, 3)):
+                await asyncio.sleep(delay)
+
+        delay = self.global_bucket.reserve()
+        if delay > 0:
+            self.counters['throttled'] += 1
+            with tracer.span('throttle_global', delay_ms=round(delay * 1000, 3)):
+                await asyncio.sleep(delay)
+
+    async def send_message(self, chat_id: int, text: str, **kwargs):
+        """
+        Отправить сообщение с соблюдением лимитов
+
+        Args:
+            chat_id: Telegram chat ID
+            text: Текст сообщения
+            kwargs: Параметры Bot.send_message (parse_mode, reply_markup, ...)
+
+        Returns:
+            Message от Telegram
+
+        Raises:
+            Исключение aiogram, если отправка не удалась
+        """
+        attempt = 0
+
+        while True:
+            await self._throttle(chat_id)
+            started = time.perf_counter()
+
+            try:
+                with tracer.span('telegram.api', attempt=attempt + 1):
+                    message = await self.bot.send_message(chat_id, text, **kwargs)
+                TELEGRAM_SEND_SECONDS.observe(time.perf_counter() - started, 'ok')
+                self.counters['sent'] += 1
+                return message
+
+            except TelegramRetryAfter as e:
+                TELEGRAM_SEND_SECONDS.observe(time.perf_counter() - started, 'retry_after')
+                if attempt >= MAX_RETRIES:
+                    self.counters['failed'] += 1
+                    raise
+
+                attempt += 1
+                self.counters['retried'] += 1
+                logger.warning(f"Telegram flood control for chat_id={chat_id}, retry in {e.retry_after}s")
+                self._chat_bucket(chat_id).penalize(e.retry_after)
+                # Ответ 429 не говорит, чат это или лимит всего бота (например,
+                # при массовом импорте) - притормаживаем все отправки, иначе
+                # другие чаты продолжат упираться в тот же лимит
+                self.global_bucket.penalize(e.retry_after)
+
+            except Exception:
+                TELEGRAM_SEND_SECONDS.observe(time.perf_counter() - started, 'error')
+                self.counters['failed'] += 1
+                raise
+
+    def stats(self) -> dict:
+        """Счётчики отправок"""
+        return dict(self.counters, tracked_chats=len(self.chat_buckets))
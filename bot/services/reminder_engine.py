@@ -0,0 +1,285 @@
+"""
+Событийный движок напоминаний: очередь таймеров с приоритетом по времени срабатывания
+"""
+
+import asyncio
+import heapq
+import itertools
+import json
+import logging
+from datetime import datetime, timedelta, timezone
+
+import pytz
+
+import config
+from database.db import db
+from services.metrics import SCHEDULER_JOB_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Максимальное число попыток отправки одного напоминания
+MAX_ATTEMPTS = getattr(config, 'REMINDER_MAX_ATTEMPTS', 5)
+
+# Базовая и максимальная задержка перед повтором отправки (в секундах)
+RETRY_BASE_DELAY = getattr(config, 'REMINDER_RETRY_BASE_DELAY', 30)
+RETRY_MAX_DELAY = 300
+
+
+def parse_booking_start(booking: dict) -> datetime:
+    """
+    Время начала бронирования в UTC
+
+    Args:
+        booking: Данные бронирования (start_date, start_time в config.TIMEZONE)
+
+    Returns:
+        datetime с tzinfo=UTC
+    """
+    naive_datetime = datetime.strptime(f"{booking['start_date']} {booking['start_time']}", "%Y-%m-%d %H:%M")
+    return pytz.timezone(config.TIMEZONE).localize(naive_datetime).astimezone(timezone.utc)
+
+
+class ReminderEngine:
+    """
+    Очередь напоминаний
+
+    Хранит напоминания с ключом (booking_id, chat_id, minutes_before) в куче,
+    упорядоченной по времени срабатывания, и дублирует её в таблицу
+    scheduled_reminders, чтобы очередь переживала перезапуск бота.
+    Фоновая задача спит до ближайшего срабатывания и вызывает fire_callback.
+    """
+
+    def __init__(self, fire_callback):
+        """
+        Args:
+            fire_callback: async функция (entry: dict), отправляющая напоминание
+        """
+        self.fire_callback = fire_callback
+        self.entries = {}  # (booking_id, chat_id, minutes_before) -> entry
+        self.heap = []  # (fire_at timestamp, seq, key)
+        self.counter = itertools.count()
+        self.wakeup = asyncio.Event()
+        self.task = None
+        self.firing = set()
+
+    async def start(self):
+        """Загрузка очереди из БД и запуск таймера"""
+        now = datetime.now(timezone.utc)
+
+        for row in await db.get_scheduled_reminders():
+            start_at = row.start_at.replace(tzinfo=timezone.utc)
+
+            if start_at <= now:
+                # Урок уже начался, пока бот был остановлен
+                await db.delete_scheduled_reminders(row.booking_id, row.chat_id, row.minutes_before)
+                continue
+
+            self._push({
+                'booking_id': row.booking_id,
+                'chat_id': row.chat_id,
+                'minutes_before': row.minutes_before,
+                'fire_at': row.fire_at.replace(tzinfo=timezone.utc),
+                'start_at': start_at,
+                'booking': json.loads(row.booking),
+            })
+
+        self.task = asyncio.create_task(self._run())
+        logger.info(f"Reminder engine started ({len(self.entries)} pending reminders)")
+
+    async def stop(self):
+        """Остановка таймера"""
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+        if self.firing:
+            await asyncio.gather(*self.firing, return_exceptions=True)
+
+        logger.info("Reminder engine stopped")
+
+    async def schedule(self, booking: dict, chat_id: int, minutes_before: int,
+                       start_at: datetime | None = None) -> bool:
+        """
+        Запланировать (или перепланировать) напоминание о бронировании
+
+        Args:
+            booking: Данные бронирования в формате /schedule (ключ 'id')
+            chat_id: Telegram chat ID получателя
+            minutes_before: За сколько минут до начала отправить напоминание
+            start_at: Уже вычисленное parse_booking_start(booking)
+
+        Returns:
+            bool: True если напоминание стоит в очереди
+        """
+        key = (int(booking['id']), int(chat_id), int(minutes_before))
+
+        if start_at is None:
+            try:
+                start_at = parse_booking_start(booking)
+            except (KeyError, ValueError) as e:
+                logger.error(f"Cannot schedule reminder for booking {booking.get('id')}: {e}")
+                return False
+
+        if start_at <= datetime.now(timezone.utc):
+            await self.cancel(*key)
+            return False
+
+        fire_at = start_at - timedelta(minutes=minutes_before)
+        existing = self.entries.get(key)
+
+        # Сравнение по началу урока: у повтора после ошибки fire_at сдвинут
+        if existing and existing['start_at'] == start_at and existing['booking'] == booking:
+            return True
+
+        entry = {
+            'booking_id': key[0],
+            'chat_id': key[1],
+            'minutes_before': key[2],
+            'fire_at': fire_at,
+            'start_at': start_at,
+            'booking': booking,
+        }
+
+        await db.save_scheduled_reminder(
+            booking_id=key[0],
+            chat_id=key[1],
+            minutes_before=key[2],
+            fire_at=fire_at.replace(tzinfo=None),
+            start_at=start_at.replace(tzinfo=None),
+            booking=json.dumps(booking, ensure_ascii=False)
+        )
+        self._push(entry)
+        return True
+
+    async def cancel(self, booking_id: int, chat_id: int | None = None, minutes_before: int | None = None):
+        """Отменить напоминания о бронировании (все, одного получателя или одно смещение)"""
+        keys = [
+            key for key in self.entries
+            if key[0] == booking_id
+            and (chat_id is None or key[1] == chat_id)
+            and (minutes_before is None or key[2] == minutes_before)
+        ]
+
+        if not keys:
+            return
+
+        for key in keys:
+            del self.entries[key]
+
+        await db.delete_scheduled_reminders(booking_id, chat_id, minutes_before)
+
+    async def reconcile(self, chat_ids, seen_keys: set, until: datetime):
+        """
+        Удалить напоминания, которых больше нет в расписании WordPress
+
+        Args:
+            chat_ids: chat_id, для которых получено полное расписание
+            seen_keys: Тройки (booking_id, chat_id, minutes_before), которые должны остаться
+            until: Конец окна сверки (уроки позже не трогаются)
+        """
+        chat_ids = set(chat_ids)
+        stale = [
+            key for key, entry in self.entries.items()
+            if key[1] in chat_ids and key not in seen_keys and entry['start_at'] <= until
+        ]
+
+        for booking_id, chat_id, minutes_before in stale:
+            await self.cancel(booking_id, chat_id, minutes_before)
+
+        if stale:
+            logger.info(f"Removed {len(stale)} stale reminders during sync")
+
+    def stats(self) -> dict:
+        """Размер очереди и отставание ближайшего срабатывания для /health"""
+        self._prune()
+        overdue = max(0.0, datetime.now(timezone.utc).timestamp() - self.heap[0][0]) if self.heap else 0.0
+        return {
+            'pending': len(self.entries),
+            'firing': len(self.firing),
+            'running': self.task is not None and not self.task.done(),
+            'overdue_seconds': round(overdue, 3),
+        }
+
+    def _push(self, entry: dict):
+        """Добавить запись в кучу и разбудить таймер, если она стала ближайшей"""
+        key = (entry['booking_id'], entry['chat_id'], entry['minutes_before'])
+        entry['seq'] = next(self.counter)
+        self.entries[key] = entry
+        heapq.heappush(self.heap, (entry['fire_at'].timestamp(), entry['seq'], key))
+
+        if self.heap[0][1] == entry['seq']:
+            self.wakeup.set()
+
+    def _prune(self):
+        """Убрать с вершины кучи устаревшие записи (отменены или перепланированы)"""
+        while self.heap:
+            _, seq, key = self.heap[0]
+            entry = self.entries.get(key)
+            if entry and entry['seq'] == seq:
+                break
+            heapq.heappop(self.heap)
+
+    async def _run(self):
+        """Цикл таймера: спать до ближайшего срабатывания"""
+        while True:
+            self.wakeup.clear()
+            self._prune()
+
+            if not self.heap:
+                await self.wakeup.wait()
+                continue
+
+            fire_ts, _, key = self.heap[0]
+            delay = fire_ts - datetime.now(timezone.utc).timestamp()
+
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            heapq.heappop(self.heap)
+            entry = self.entries.pop(key)
+
+            task = asyncio.create_task(self._fire(entry))
+            self.firing.add(task)
+            task.add_done_callback(self.firing.discard)
+
+    async def _fire(self, entry: dict):
+        """
+        Отправить напоминание и убрать его из БД
+
+        При ошибке отправки напоминание возвращается в очередь с растущей
+        задержкой (пока урок не начался и не исчерпаны MAX_ATTEMPTS попыток);
+        запись в БД остаётся, поэтому после перезапуска отправка повторится.
+        """
+        key = (entry['booking_id'], entry['chat_id'], entry['minutes_before'])
+
+        try:
+            if entry['start_at'] > datetime.now(timezone.utc):
+                with SCHEDULER_JOB_SECONDS.time('fire_reminder'):
+                    await self.fire_callback(entry)
+        except Exception as e:
+            attempts = entry.get('attempts', 0) + 1
+            delay = min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** (attempts - 1))
+            retry_at = datetime.now(timezone.utc) + timedelta(seconds=delay)
+
+            # Запись могла быть перепланирована во время отправки - повтор не нужен
+            if key not in self.entries and attempts < MAX_ATTEMPTS and retry_at < entry['start_at']:
+                logger.warning(
+                    f"Reminder for booking {entry['booking_id']} (chat_id={entry['chat_id']}) "
+                    f"attempt {attempts} failed, retrying in {delay}s: {e}"
+                )
+                self._push({**entry, 'fire_at': retry_at, 'attempts': attempts})
+                return
+
+            logger.error(f"Error firing reminder for booking {entry['booking_id']}: {e}")
+
+        # Запись могла быть перепланирована во время отправки
+        if key not in self.entries:
+            await db.delete_scheduled_reminders(entry['booking_id'], entry['chat_id'], entry['minutes_before'])
@@ -0,0 +1,111 @@
+"""
+Повторы с экспоненциальной задержкой и автоматический выключатель (circuit breaker)
+для запросов к WordPress
+"""
+
+import logging
+import random
+import time
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# Попыток идемпотентного запроса (включая первую)
+RETRY_ATTEMPTS = getattr(config, 'WP_RETRY_ATTEMPTS', 3)
+
+# Базовая и максимальная задержка между попытками в секундах
+RETRY_BASE_DELAY = getattr(config, 'WP_RETRY_BASE_DELAY', 0.5)
+RETRY_MAX_DELAY = getattr(config, 'WP_RETRY_MAX_DELAY', 5.0)
+
+# Подряд неудачных запросов до размыкания и время до пробного запроса
+BREAKER_FAILURE_THRESHOLD = getattr(config, 'WP_BREAKER_FAILURE_THRESHOLD', 5)
+BREAKER_RESET_TIMEOUT = getattr(config, 'WP_BREAKER_RESET_TIMEOUT', 30)
+
+
+def backoff_delay(attempt: int, base: float = RETRY_BASE_DELAY, cap: float = RETRY_MAX_DELAY) -> float:
+    """
+    Задержка перед повтором: случайная в [0, min(cap, base * 2^(attempt-1))]
+
+    Случайная задержка (full jitter) разносит повторы клиентов во времени,
+    чтобы они не приходили в WordPress одновременно.
+
+    Args:
+        attempt: Номер неудачной попытки, начиная с 1
+    """
+    return random.uniform(0, min(cap, base * 2 ** (attempt - 1)))
+
+
+class CircuitBreaker:
+    """
+    Выключатель запросов к одному эндпоинту
+
+    closed    - запросы проходят; после failure_threshold ошибок подряд размыкается
+    open      - запросы сразу отклоняются в течение reset_timeout секунд
+    half_open - пропускается один пробный запрос: успех замыкает, ошибка снова размыкает
+    """
+
+    def __init__(self, name: str, failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+                 reset_timeout: float = BREAKER_RESET_TIMEOUT):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trial_started_at = None
+        self.rejected = 0
+        self.opened_count = 0
+
+    def allow(self) -> bool:
+        """Можно ли выполнить запрос сейчас"""
+        now = time.monotonic()
+
+        if self.state == 'open':
+            if now - self.opened_at < self.reset_timeout:
+                self.rejected += 1
+                return False
+            self.state = 'half_open'
+            self.trial_started_at = None
+            logger.info(f"Circuit breaker {self.name}: half-open, trying one request")
+
+        if self.state == 'half_open':
+            # Пробный запрос, который не завершился (отменён), не блокирует навсегда
+            if self.trial_started_at is not None and now - self.trial_started_at < self.reset_timeout:
+                self.rejected += 1
+                return False
+            self.trial_started_at = now
+
+        return True
+
+    def record_success(self):
+        """Запрос выполнен (в том числе с ответом 4xx - WordPress доступен)"""
+        if self.state != 'closed':
+            logger.info(f"Circuit breaker {self.name}: closed")
+        self.state = 'closed'
+        self.failures = 0
+        self.trial_started_at = None
+
+    def record_failure(self):
+        """Таймаут, ошибка соединения или ответ 5xx"""
+        self.failures += 1
+
+        if self.state == 'half_open' or self.failures >= self.failure_threshold:
+            if self.state != 'open':
+                self.opened_count += 1
+                logger.warning(f"Circuit breaker {self.name}: open for {self.reset_timeout}s after {self.failures} failures")
+            self.state = 'open'
+            self.opened_at = time.monotonic()
+            self.trial_started_at = None
+
+    def stats(self) -> dict:
+        """Состояние для /health"""
+        stats = {
+            'state': self.state,
+            'failures': self.failures,
+            'rejected': self.rejected,
+            'opened': self.opened_count,
+        }
+        if self.state == 'open':
+            stats['retry_in'] = round(max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at)), 1)
+        return stats
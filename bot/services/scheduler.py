@@ -3,7 +3,7 @@
 """
 
 import logging
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.interval import IntervalTrigger
 import pytz
@@ -12,226 +12,436 @@ from aiogram import Bot
 import config
 from database.db import db
 from services.wordpress_api import wp_api
-from utils.formatters import format_datetime_with_timezone
+from services.booking_mirror import booking_mirror, booking_from_webhook
+from services.reminder_engine import ReminderEngine, parse_booking_start
+from services.outbound import OutboundDispatcher
+from services.sent_reminders import SentReminderStore
+from services.metrics import SCHEDULER_JOB_SECONDS, timed
+from utils.templates import render_booking
+from utils.reminders import get_reminder_offsets
 
 logger = logging.getLogger(__name__)
 
+# Количество пользователей в одном пакетном запросе расписаний
+BULK_CHUNK_SIZE = getattr(config, 'SCHEDULE_BULK_CHUNK_SIZE', 100)
+
+# Интервал полной сверки очереди напоминаний (в минутах)
+SYNC_INTERVAL = getattr(config, 'REMINDER_SYNC_INTERVAL', 30)
+
+# Интервал очистки отметок об отправленных напоминаниях (в минутах)
+SENT_REMINDER_EXPIRY_INTERVAL = getattr(config, 'SENT_REMINDER_EXPIRY_INTERVAL', 60)
+
+# Статусы бронирований, о которых напоминаем
+ACTIVE_STATUSES = ('approved', 'pending')
+
+
+def plan_reminders(schedules: dict, offsets_by_chat: dict, now: datetime) -> list[tuple]:
+    """
+    Все напоминания (бронирование, получатель, смещение) за один проход
+
+    Время начала каждого бронирования разбирается один раз, даже если
+    оно есть в расписании и агента, и клиента. Из смещений, время которых
+    уже прошло, остаётся только ближайшее к уроку: бронирование, созданное
+    за 30 минут до начала, получит одно напоминание, а не три сразу.
+
+    Args:
+        schedules: chat_id -> список бронирований в формате /schedule
+        offsets_by_chat: chat_id -> смещения в минутах по убыванию
+        now: Текущий момент (UTC)
+
+    Returns:
+        list: Кортежи (booking, chat_id, minutes_before, start_at)
+    """
+    starts = {}
+    planned = []
+
+    for chat_id, bookings in schedules.items():
+        offsets = offsets_by_chat.get(chat_id)
+        if not offsets:
+            continue
+
+        for booking in bookings:
+            booking_id = booking.get('id')
+            start_at = starts.get(booking_id)
+
+            if start_at is None:
+                try:
+                    start_at = starts[booking_id] = parse_booking_start(booking)
+                except (KeyError, ValueError) as e:
+                    logger.error(f"Cannot plan reminders for booking {booking_id}: {e}")
+                    continue
+
+            time_left = start_at - now
+            if time_left <= timedelta(0):
+                continue
+
+            # Смещения по убыванию: прошедшие идут первыми, последнее из них - ближайшее к уроку
+            overdue = [offset for offset in offsets if timedelta(minutes=offset) >= time_left]
+            skipped = set(overdue[:-1])
+
+            for offset in offsets:
+                if offset not in skipped:
+                    planned.append((booking, chat_id, offset, start_at))
+
+    return planned
+
 
 class ReminderScheduler:
-    """Планировщик напоминаний"""
+    """
+    Планировщик напоминаний
+
+    Напоминания отправляет ReminderEngine в момент срабатывания. Очередь
+    пополняется вебхуками и лентой изменений бронирований (handle_booking_event,
+    см. services/change_feed.py). Полная сверка с WordPress (sync_reminders)
+    выполняется при первом запуске, а периодически - только если плагин
+    не поддерживает ленту изменений.
+    """
 
-    def __init__(self, bot: Bot):
+    def __init__(self, bot: Bot, outbound: OutboundDispatcher = None):
         self.bot = bot
+        self.outbound = outbound or OutboundDispatcher(bot)
         self.scheduler = AsyncIOScheduler(timezone=pytz.timezone(config.TIMEZONE))
+        self.engine = ReminderEngine(self.fire_reminder)
+        self.sent_reminders = SentReminderStore()
+
+    async def start(self, full_sync: bool = True):
+        """
+        Запуск планировщика
+
+        Args:
+            full_sync: Периодическая полная сверка (False - очередь ведёт лента изменений)
+        """
+        await self.sent_reminders.warm()
+        await self.engine.start()
 
-    def start(self):
-        """Запуск планировщика"""
-        # Проверка напоминаний каждые N минут
+        if full_sync:
+            self.start_full_sync()
         self.scheduler.add_job(
-            self.check_reminders,
-            trigger=IntervalTrigger(minutes=config.REMINDER_CHECK_INTERVAL),
-            id='check_reminders',
-            name='Check upcoming bookings for reminders',
+            timed(SCHEDULER_JOB_SECONDS, 'expire_sent_reminders')(self.sent_reminders.expire),
+            trigger=IntervalTrigger(minutes=SENT_REMINDER_EXPIRY_INTERVAL),
+            id='expire_sent_reminders',
+            name='Delete sent reminder marks for past lessons',
+            replace_existing=True
+        )
+        self.scheduler.add_job(
+            timed(SCHEDULER_JOB_SECONDS, 'expire_booking_mirror')(booking_mirror.expire),
+            trigger=IntervalTrigger(minutes=SENT_REMINDER_EXPIRY_INTERVAL),
+            id='expire_booking_mirror',
+            name='Delete past bookings from booking mirror',
             replace_existing=True
         )
         self.scheduler.start()
-        logger.info(f"Reminder scheduler started (check interval: {config.REMINDER_CHECK_INTERVAL} min)")
+        logger.info("Reminder scheduler started")
+
+    def start_full_sync(self):
+        """Полная сверка сейчас и затем каждые SYNC_INTERVAL минут"""
+        self.scheduler.add_job(
+            timed(SCHEDULER_JOB_SECONDS, 'sync_reminders')(self.sync_reminders),
+            trigger=IntervalTrigger(minutes=SYNC_INTERVAL),
+            id='sync_reminders',
+            name='Sync upcoming bookings into reminder queue',
+            next_run_time=datetime.now(pytz.timezone(config.TIMEZONE)),
+            replace_existing=True
+        )
+        logger.info(f"Periodic reminder sync enabled (interval: {SYNC_INTERVAL} min)")
 
-    def stop(self):
+    async def stop(self):
         """Остановка планировщика"""
         self.scheduler.shutdown()
+        await self.engine.stop()
         logger.info("Reminder scheduler stopped")
 
-    async def check_reminders(self):
-        """Проверка предстоящих уроков и отправка напоминаний"""
-        logger.info("Checking for upcoming bookings...")
+    async def sync_reminders(self, horizon_days: int = None) -> bool:
+        """
+        Полная сверка очереди напоминаний с расписанием WordPress
+
+        Args:
+            horizon_days: Сверить уроки на столько дней вперёд
+                (None - до ближайшего напоминания после следующей сверки)
+
+        Returns:
+            bool: Расписания всех пользователей получены
+        """
+        logger.info("Syncing upcoming bookings into reminder queue...")
 
         try:
-            # Получить всех пользователей
+            # Получить всех пользователей и аккаунты, привязанные к агентам без регистрации
             users = await db.get_all_users()
+            bound_chat_ids = await db.get_binding_only_chat_ids()
+            now = datetime.now(timezone.utc)
+            synced = True
 
-            # Расчёт временного диапазона (сегодня + завтра для учёта всех напоминаний)
-            tz = pytz.timezone(config.TIMEZONE)
-            now = datetime.now(tz)
-            today = now.strftime('%Y-%m-%d')
-            tomorrow = (now + timedelta(days=1)).strftime('%Y-%m-%d')
+            # Расписания запрашиваются пачками, а не по одному запросу на пользователя
+            for i in range(0, len(users), BULK_CHUNK_SIZE):
+                chunk = users[i:i + BULK_CHUNK_SIZE]
+                synced = await self.sync_reminders_chunk(chunk, now, horizon_days) and synced
 
-            for user in users:
-                # Проверить настройки
-                settings = await db.get_settings(user.chat_id)
+            for i in range(0, len(bound_chat_ids), BULK_CHUNK_SIZE):
+                chunk = bound_chat_ids[i:i + BULK_CHUNK_SIZE]
+                synced = await self.sync_reminders_chunk([], now, horizon_days, bound_chat_ids=chunk) and synced
 
-                if not settings or not settings.notify_reminders:
-                    continue
+            return synced
 
-                # Получить расписание на сегодня и завтра
-                schedule_result = await wp_api.get_schedule(
-                    user.chat_id,
-                    date_from=today,
-                    date_to=tomorrow
-                )
+        except Exception as e:
+            logger.error(f"Error syncing reminders: {e}")
+            return False
 
-                if not schedule_result.get('success'):
-                    continue
+    async def sync_reminders_chunk(self, users: list, now: datetime, horizon_days: int = None,
+                                   bound_chat_ids: list[int] = ()) -> bool:
+        """
+        Сверить напоминания для пачки пользователей
 
-                bookings = schedule_result.get('bookings', [])
+        Получатели - те же, что у handle_booking_event (db.resolve_recipients):
+        чат получает напоминания о своих уроках и об уроках агентов, к которым
+        он привязан через agent_bindings.
 
-                # Проверить каждое бронирование
-                for booking in bookings:
-                    await self.check_and_send_reminder(user, booking, settings.reminder_minutes_before)
+        Args:
+            users: Пользователи из БД
+            now: Момент сверки (UTC)
+            horizon_days: Сверить уроки на столько дней вперёд
+                (None - до ближайшего напоминания после следующей сверки)
+            bound_chat_ids: chat_id, привязанные к агентам, без записи в users
+
+        Returns:
+            bool: Расписания получены и очередь сверена
+        """
+        chat_ids = [user.chat_id for user in users] + list(bound_chat_ids)
+        agents_by_chat = await db.get_agent_ids_for_chats(chat_ids)
+
+        # Проверить настройки: без настроек напоминания получает только привязанный аккаунт
+        settings_by_chat = await db.get_settings_for_chats(chat_ids)
+        offsets_by_chat = {}
+        for chat_id in chat_ids:
+            settings = settings_by_chat.get(chat_id)
+            if settings is None and chat_id not in agents_by_chat:
+                continue
+            if settings is not None and not settings.notify_reminders:
+                continue
+            offsets = get_reminder_offsets(settings)
+            if offsets:
+                offsets_by_chat[chat_id] = offsets
+
+        # Окно покрывает самое раннее напоминание до следующей сверки
+        tz = pytz.timezone(config.TIMEZONE)
+        if horizon_days is not None:
+            window_end = (now + timedelta(days=horizon_days)).astimezone(tz)
+        else:
+            largest_offset = max((offsets[0] for offsets in offsets_by_chat.values()), default=0)
+            window_end = (now + timedelta(minutes=largest_offset + SYNC_INTERVAL)).astimezone(tz)
+        date_from = now.astimezone(tz).strftime('%Y-%m-%d')
+        date_to = window_end.strftime('%Y-%m-%d')
+        until = tz.localize(datetime.strptime(date_to, '%Y-%m-%d') + timedelta(days=1))
+
+        # Чаты, для которых получены все расписания - только их очередь сверяется
+        reconciled = set(chat_ids)
+
+        schedules = {}
+        if offsets_by_chat:
+            synced_at = datetime.utcnow()
+            own_chat_ids = [user.chat_id for user in users if user.chat_id in offsets_by_chat]
+            agent_ids = sorted({
+                agent_id for chat_id in offsets_by_chat for agent_id in agents_by_chat.get(chat_id, ())
+            })
+
+            # Получить расписание на всё окно для всей пачки
+            schedule_result = await wp_api.get_schedules_bulk(
+                own_chat_ids,
+                date_from=date_from,
+                date_to=date_to,
+                agent_ids=agent_ids
+            )
 
-        except Exception as e:
-            logger.error(f"Error checking reminders: {e}")
+            if schedule_result.get('unsupported'):
+                # Старая версия плагина без /schedule/bulk - запрашиваем по одному;
+                # ошибка одного пользователя (например, удалён в WordPress) не
+                # останавливает сверку остальных, его очередь остаётся как есть
+                own_schedules = {}
+                for chat_id in own_chat_ids:
+                    result = await wp_api.get_schedule(chat_id, date_from=date_from, date_to=date_to)
+                    if not result.get('success'):
+                        logger.warning(f"Schedule fetch failed for chat_id={chat_id}: {result.get('message')}")
+                        reconciled.discard(chat_id)
+                        continue
+                    own_schedules[chat_id] = result.get('bookings', [])
+
+                # Расписаний агентов старый плагин не отдаёт - очередь привязанных
+                # аккаунтов ведут только вебхуки
+                agent_schedules = {}
+                reconciled -= set(agents_by_chat)
+            elif schedule_result.get('success'):
+                own_schedules = schedule_result['schedules']
+                agent_schedules = schedule_result['agents']
+            else:
+                logger.warning(f"Bulk schedule fetch failed: {schedule_result.get('message')}")
+                return False
+
+            # Сверка заодно обновляет локальную копию бронирований
+            await booking_mirror.apply_schedules(users, own_schedules, date_from, date_to, synced_at)
+
+            # Свои уроки чата и уроки агентов, к которым он привязан, без повторов
+            for chat_id in offsets_by_chat:
+                bookings = {booking['id']: booking for booking in own_schedules.get(chat_id, [])}
+                for agent_id in agents_by_chat.get(chat_id, ()):
+                    for booking in agent_schedules.get(agent_id, []):
+                        bookings.setdefault(booking['id'], booking)
+                schedules[chat_id] = list(bookings.values())
 
-    async def check_and_send_reminder(self, user, booking: dict, minutes_before: int):
+        planned = plan_reminders(schedules, offsets_by_chat, now)
+
+        # Уже отправленные напоминания - одной проверкой на пачку
+        sent = await self.sent_reminders.sent_keys(
+            (int(booking['id']), chat_id, minutes_before) for booking, chat_id, minutes_before, _ in planned
+        )
+
+        # Поставить в очередь каждое напоминание
+        seen_keys = set()
+        for booking, chat_id, minutes_before, start_at in planned:
+            key = (int(booking['id']), chat_id, minutes_before)
+
+            if key in sent:
+                # Напоминание уже ушло, урок ещё не начался - не удаляется сверкой
+                seen_keys.add(key)
+                continue
+
+            if await self.engine.schedule(booking, chat_id, minutes_before, start_at):
+                seen_keys.add(key)
+
+        await self.engine.reconcile(reconciled, seen_keys, until)
+        return True
+
+    async def handle_booking_event(self, event_type: str, data: dict):
         """
-        Проверить и отправить напоминание о конкретном бронировании
+        Обновить очередь напоминаний по вебхуку о бронировании
 
         Args:
-            user: Пользователь из БД
-            booking: Данные бронирования
-            minutes_before: За сколько минут до начала отправлять напоминание
+            event_type: booking_created, booking_updated или booking_status_changed
+            data: Данные бронирования из вебхука
         """
+        if event_type not in ('booking_created', 'booking_updated', 'booking_status_changed'):
+            return
+
         try:
-            # Проверить, было ли уже отправлено напоминание
-            booking_id = booking['id']
-            already_sent = await db.check_reminder_sent(booking_id, user.chat_id)
+            booking_id = int(data['booking_id'])
+            status = data.get('new_status') or data.get('status')
 
-            if already_sent:
+            # Получатели могли смениться (например, другой агент) - планируем заново
+            await self.engine.cancel(booking_id)
+
+            if status not in ACTIVE_STATUSES:
                 return
 
-            # Парсинг времени начала с учетом timezone
-            start_date = booking['start_date']
-            start_time = booking['start_time']
+            # Приведение к формату /schedule
+            booking = booking_from_webhook(data)
 
-            # Формирование datetime
-            start_datetime_str = f"{start_date} {start_time}"
-            tz = pytz.timezone(config.TIMEZONE)
+            # Получатели - как у уведомлений: агент, клиент и аккаунты, привязанные к агенту
+            recipients = await db.resolve_recipients(
+                data.get('agent_id'),
+                [(data.get(party) or {}).get('telegram_chat_id') for party in ('agent', 'customer')],
+                'reminder'
+            )
+            chat_ids = [recipient.chat_id for recipient in recipients if recipient.notify]
+            settings_by_chat = await db.get_settings_for_chats(chat_ids)
 
-            # Парсим как naive datetime и затем локализуем
-            naive_datetime = datetime.strptime(start_datetime_str, "%Y-%m-%d %H:%M")
-            start_datetime = tz.localize(naive_datetime)
+            # Привязанный аккаунт без настроек получает смещения по умолчанию
+            offsets_by_chat = {chat_id: get_reminder_offsets(settings_by_chat.get(chat_id)) for chat_id in chat_ids}
+            offsets_by_chat = {chat_id: offsets for chat_id, offsets in offsets_by_chat.items() if offsets}
 
-            # Текущее время с timezone
-            now = datetime.now(tz)
+            schedules = {chat_id: [booking] for chat_id in offsets_by_chat}
+            for booking, chat_id, minutes_before, start_at in plan_reminders(
+                    schedules, offsets_by_chat, datetime.now(timezone.utc)):
+                await self.engine.schedule(booking, chat_id, minutes_before, start_at)
 
-            # Время когда нужно отправить напоминание
-            reminder_time = start_datetime - timedelta(minutes=minutes_before)
+        except Exception as e:
+            logger.error(f"Error updating reminders for {event_type}: {e}")
 
-            # Если время напоминания прошло, но урок еще не начался
-            if reminder_time <= now < start_datetime:
-                # Отправить напоминание
-                await self.send_reminder(user, booking)
+    async def fire_reminder(self, entry: dict):
+        """
+        Отправить напоминание из очереди
+
+        Args:
+            entry: Запись ReminderEngine (booking, chat_id, minutes_before, ...)
+        """
+        chat_id = entry['chat_id']
+        booking = entry['booking']
 
-                # Отметить как отправленное
-                await db.mark_reminder_sent(booking_id, user.chat_id)
+        profile = await db.get_recipient_profile(chat_id)
+        if not profile.user and not profile.binding:
+            return
 
-        except Exception as e:
-            logger.error(f"Error processing reminder for booking {booking.get('id')}: {e}")
+        # Без настроек напоминания получает только привязанный к агенту аккаунт
+        settings = profile.settings
+        if settings is None and not profile.binding:
+            return
+        if settings is not None and not settings.notify_reminders:
+            return
+
+        # Пользователь мог убрать это время напоминания после постановки в очередь
+        offsets = get_reminder_offsets(settings)
+        if entry['minutes_before'] not in offsets:
+            return
 
-    async def send_reminder(self, user, booking: dict):
+        # Если подошло и более позднее напоминание (бот был остановлен) - отправится только оно
+        time_left = entry['start_at'] - datetime.now(timezone.utc)
+        if any(offset < entry['minutes_before'] and timedelta(minutes=offset) >= time_left for offset in offsets):
+            return
+
+        # Проверить, было ли уже отправлено напоминание
+        if await self.sent_reminders.is_sent(entry['booking_id'], chat_id, entry['minutes_before']):
+            return
+
+        await self.send_reminder(profile, booking)
+
+        # Отметить как отправленное
+        await self.sent_reminders.mark_sent(entry['booking_id'], chat_id, entry['minutes_before'], entry['start_at'])
+
+    async def send_reminder(self, profile, booking: dict):
         """
-        Отправить напоминание пользователю
+        Отправить напоминание получателю
 
         Args:
-            user: Пользователь из БД
+            profile: RecipientProfile получателя (пользователь и/или привязка к агенту)
             booking: Данные бронирования
         """
-        try:
-            # Получение timezone пользователя
-            user_timezone = user.timezone if user else None
+        user = profile.user
+        chat_id = profile.chat_id
 
-            # Формирование сообщения в зависимости от типа пользователя
-            if user.user_type == 'agent':
-                message = self.format_reminder_for_agent(booking, user_timezone)
+        try:
+            # Формирование сообщения в зависимости от типа пользователя;
+            # аккаунт, привязанный к агенту, получает напоминание агента
+            if user is None or user.user_type != 'customer':
+                message = self.format_reminder_for_agent(booking, profile.timezone)
             else:
-                message = self.format_reminder_for_customer(booking, user_timezone)
+                message = self.format_reminder_for_customer(booking, profile.timezone)
 
             # Отправка сообщения
-            await self.bot.send_message(user.chat_id, message, parse_mode='HTML')
+            await self.outbound.send_message(chat_id, message, parse_mode='HTML')
 
             # Логирование
             await db.log_notification(
-                chat_id=user.chat_id,
+                chat_id=chat_id,
                 notification_type='reminder',
                 booking_id=booking['id'],
                 success=True
             )
 
-            logger.info(f"Reminder sent to {user.name} (chat_id={user.chat_id}) for booking #{booking['id']}")
+            logger.info(f"Reminder sent to chat_id={chat_id} for booking #{booking['id']}")
 
         except Exception as e:
             logger.error(f"Error sending reminder: {e}")
             await db.log_notification(
-                chat_id=user.chat_id,
+                chat_id=chat_id,
                 notification_type='reminder',
                 booking_id=booking['id'],
                 success=False,
                 error_message=str(e)
             )
+            # ReminderEngine повторит отправку
+            raise
 
     def format_reminder_for_agent(self, booking: dict, user_timezone: str = None) -> str:
         """Форматирование напоминания для учителя"""
-        customer = booking['customer']
-        service = booking['service']
-
-        # Конвертация времени в часовой пояс пользователя
-        start_date = booking['start_date']
-        start_time = booking['start_time']
-        end_time = booking['end_time']
-
-        if user_timezone:
-            start_date, start_time = format_datetime_with_timezone(
-                booking['start_date'], booking['start_time'], user_timezone
-            )
-            _, end_time = format_datetime_with_timezone(
-                booking['start_date'], booking['end_time'], user_timezone
-            )
-
-        message = f"""⏰ <b>Напоминание о предстоящем уроке!</b>
-
-👤 Ученик: {customer['name']}
-🎵 Инструмент: {service['name']}
-
-📅 Дата: {start_date}
-🕐 Время: {start_time} - {end_time}
-
-📧 Email: {customer['email']}
-📱 Телефон: {customer['phone']}
-"""
-
-        if booking.get('google_meet_url'):
-            message += f"\n🎥 Ссылка на урок:\n{booking['google_meet_url']}"
-
-        return message
+        return render_booking('reminder_agent', booking, user_timezone)
 
     def format_reminder_for_customer(self, booking: dict, user_timezone: str = None) -> str:
         """Форматирование напоминания для ученика"""
-        agent = booking['agent']
-        service = booking['service']
-
-        # Конвертация времени в часовой пояс пользователя
-        start_date = booking['start_date']
-        start_time = booking['start_time']
-        end_time = booking['end_time']
-
-        if user_timezone:
-            start_date, start_time = format_datetime_with_timezone(
-                booking['start_date'], booking['start_time'], user_timezone
-            )
-            _, end_time = format_datetime_with_timezone(
-                booking['start_date'], booking['end_time'], user_timezone
-            )
-
-        message = f"""⏰ <b>Напоминание о предстоящем уроке!</b>
-
-👨‍🏫 Учитель: {agent['name']}
-🎵 Инструмент: {service['name']}
-
-📅 Дата: {start_date}
-🕐 Время: {start_time} - {end_time}
-"""
-
-        if booking.get('google_meet_url'):
-            message += f"\n🎥 Ссылка на урок:\n{booking['google_meet_url']}\n\nЖелаем хорошего урока!"
-
-        return message
+        return render_booking('reminder_customer', booking, user_timezone)
@@ -0,0 +1,108 @@
+"""
+Хранилище отметок об отправленных напоминаниях с кэшем в памяти
+"""
+
+import logging
+from datetime import datetime, timedelta, timezone
+
+import config
+from database.db import db
+
+logger = logging.getLogger(__name__)
+
+# Сколько часов хранить отметку после начала урока
+RETENTION_HOURS = getattr(config, 'SENT_REMINDER_RETENTION_HOURS', 24)
+
+# Отметки старого формата (без времени урока) хранятся столько дней после отправки
+LEGACY_RETENTION_DAYS = 7
+
+
+class SentReminderStore:
+    """
+    Отметки об отправленных напоминаниях
+
+    Ключ - (booking_id, chat_id, minutes_before). Таблица sent_reminders
+    остаётся источником истины (уникальный ключ защищает от дублей),
+    а после warm() все проверки отвечает множество в памяти: отметки
+    добавляются только через mark_sent(), поэтому промах кэша означает,
+    что напоминание не отправлялось, и запрос к БД не нужен.
+    """
+
+    def __init__(self):
+        self.sent = {}  # (booking_id, chat_id, minutes_before) -> lesson_start (UTC) или None
+        self.warmed = False
+        self.counters = {
+            'cache_checks': 0,
+            'db_checks': 0,
+            'expired': 0,
+        }
+
+    async def warm(self):
+        """Загрузить отметки о предстоящих уроках"""
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+
+        self.sent = {
+            (booking_id, chat_id, minutes_before): lesson_start
+            for booking_id, chat_id, minutes_before, lesson_start in await db.get_active_sent_reminders(now)
+        }
+        self.warmed = True
+        logger.info(f"Sent reminder cache warmed ({len(self.sent)} entries)")
+
+    async def sent_keys(self, keys) -> set[tuple[int, int, int]]:
+        """
+        Какие из напоминаний уже отправлены
+
+        Args:
+            keys: Тройки (booking_id, chat_id, minutes_before)
+
+        Returns:
+            set: Отправленные тройки
+        """
+        keys = set(keys)
+
+        if self.warmed:
+            self.counters['cache_checks'] += len(keys)
+            return {key for key in keys if key in self.sent}
+
+        self.counters['db_checks'] += len(keys)
+        return await db.get_sent_reminder_keys(keys)
+
+    async def is_sent(self, booking_id: int, chat_id: int, minutes_before: int) -> bool:
+        """Было ли отправлено напоминание"""
+        key = (booking_id, chat_id, minutes_before)
+        return key in await self.sent_keys([key])
+
+    async def mark_sent(self, booking_id: int, chat_id: int, minutes_before: int, lesson_start: datetime | None):
+        """
+        Отметить напоминание как отправленное
+
+        Args:
+            lesson_start: Время начала урока (aware или naive UTC)
+        """
+        if lesson_start is not None and lesson_start.tzinfo is not None:
+            lesson_start = lesson_start.astimezone(timezone.utc).replace(tzinfo=None)
+
+        self.sent[(booking_id, chat_id, minutes_before)] = lesson_start
+        await db.mark_reminder_sent(booking_id, chat_id, minutes_before, lesson_start)
+
+    async def expire(self) -> int:
+        """Удалить отметки о прошедших уроках из БД и кэша"""
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        lesson_before = now - timedelta(hours=RETENTION_HOURS)
+        legacy_sent_before = now - timedelta(days=LEGACY_RETENTION_DAYS)
+
+        deleted = await db.delete_expired_sent_reminders(lesson_before, legacy_sent_before)
+
+        self.sent = {
+            key: lesson_start for key, lesson_start in self.sent.items()
+            if lesson_start is None or lesson_start >= lesson_before
+        }
+        self.counters['expired'] += deleted
+
+        if deleted:
+            logger.info(f"Expired {deleted} sent reminder marks")
+        return deleted
+
+    def stats(self) -> dict:
+        """Размер кэша и число проверок"""
+        return dict(self.counters, cached=len(self.sent), warmed=self.warmed)
@@ -0,0 +1,368 @@
+"""
+Трассировка обработки вебхуков: webhook -> очередь -> получатели -> Telegram
+
+Трасса начинается в handle_webhook, её trace_id сохраняется вместе с
+событием в webhook_events и продолжается воркером очереди. Текущий span
+хранится в contextvars, поэтому вложенные span (в том числе в задачах
+asyncio.gather) автоматически становятся дочерними.
+
+Завершённая трасса целиком пишется одной строкой в JSONL файл
+(TRACE_FILE, с ротацией как у лога бота) или отправляется пачками в
+OTLP/HTTP коллектор (TRACE_OTLP_URL). Отчёт по файлу: scripts/trace_report.py.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+from contextvars import ContextVar
+from logging.handlers import RotatingFileHandler
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# Трассировать вебхуки
+TRACING_ENABLED = getattr(config, 'TRACING_ENABLED', True)
+
+# Доля трассируемых вебхуков (0.0 - 1.0)
+TRACE_SAMPLE_RATE = getattr(config, 'TRACE_SAMPLE_RATE', 1.0)
+
+# Куда выгружать трассы: 'jsonl' или 'otlp'
+TRACE_EXPORTER = getattr(config, 'TRACE_EXPORTER', 'jsonl')
+
+# JSONL файл трасс и его ротация
+TRACE_FILE = getattr(config, 'TRACE_FILE', config.LOG_FILE.parent / 'traces.jsonl')
+TRACE_FILE_MAX_BYTES = getattr(config, 'TRACE_FILE_MAX_BYTES', 10 * 1024 * 1024)
+TRACE_FILE_BACKUP_COUNT = getattr(config, 'TRACE_FILE_BACKUP_COUNT', 3)
+
+# OTLP/HTTP коллектор (JSON), например http://localhost:4318/v1/traces
+TRACE_OTLP_URL = getattr(config, 'TRACE_OTLP_URL', '')
+
+# Интервал отправки пачки в коллектор (в секундах) и предел буфера трасс
+TRACE_FLUSH_INTERVAL = getattr(config, 'TRACE_FLUSH_INTERVAL', 5)
+TRACE_MAX_BUFFER = 1000
+
+SERVICE_NAME = 'latepoint-telegram-bot'
+
+_current_span: ContextVar['Span | None'] = ContextVar('current_span', default=None)
+
+
+def new_trace_id() -> str:
+    return os.urandom(16).hex()
+
+
+def new_span_id() -> str:
+    return os.urandom(8).hex()
+
+
+class Span:
+    """Этап обработки внутри трассы"""
+
+    __slots__ = ('trace', 'span_id', 'parent_id', 'name', 'attributes',
+                 'started_at', 'started', 'duration', 'error')
+
+    def __init__(self, trace: 'Trace', name: str, parent_id: str | None, attributes: dict):
+        self.trace = trace
+        self.span_id = new_span_id()
+        self.parent_id = parent_id
+        self.name = name
+        self.attributes = attributes
+        self.started_at = time.time()
+        self.started = time.perf_counter()
+        self.duration = None
+        self.error = None
+
+    @property
+    def trace_id(self) -> str:
+        return self.trace.trace_id
+
+    def set(self, **attributes):
+        """Добавить атрибуты span"""
+        self.attributes.update(attributes)
+
+    def to_dict(self) -> dict:
+        return {
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'name': self.name,
+            'offset_ms': round((self.started - self.trace.root.started) * 1000, 3),
+            'duration_ms': round(self.duration * 1000, 3) if self.duration is not None else None,
+            'attributes': self.attributes,
+            'error': self.error,
+        }
+
+
+class Trace:
+    """Все span одной трассы; выгружается после завершения корневого span"""
+
+    __slots__ = ('trace_id', 'root', 'spans', 'exported')
+
+    def __init__(self, trace_id: str):
+        self.trace_id = trace_id
+        self.root = None
+        self.spans = []
+        self.exported = False
+
+    def to_dict(self) -> dict:
+        return {
+            'trace_id': self.trace_id,
+            'name': self.root.name,
+            'started_at': self.root.started_at,
+            'duration_ms': round(self.root.duration * 1000, 3),
+            'attributes': self.root.attributes,
+            'error': self.root.error,
+            'spans': [span.to_dict() for span in self.spans],
+        }
+
+
+class SpanScope:
+    """Контекстный менеджер span: делает его текущим и закрывает при выходе"""
+
+    __slots__ = ('tracer', 'span', 'token')
+
+    def __init__(self, tracer: 'Tracer', span: Span):
+        self.tracer = tracer
+        self.span = span
+
+    def __enter__(self) -> Span:
+        self.token = _current_span.set(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc, traceback):
+        span = self.span
+        span.duration = time.perf_counter() - span.started
+        if exc_type is not None:
+            span.error = f'{exc_type.__name__}: {exc}'
+        _current_span.reset(self.token)
+
+        if span is span.trace.root:
+            self.tracer.finish(span.trace)
+        return False
+
+
+class _NoopSpan:
+    """Span, когда трассировка выключена или трасса не выбрана"""
+
+    trace_id = None
+
+    def set(self, **attributes):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        return False
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class JsonlExporter:
+    """Трасса - одна строка JSON в TRACE_FILE с ротацией"""
+
+    def __init__(self, path=TRACE_FILE):
+        os.makedirs(os.path.dirname(os.fspath(path)) or '.', exist_ok=True)
+        self.handler = RotatingFileHandler(path, maxBytes=TRACE_FILE_MAX_BYTES, backupCount=TRACE_FILE_BACKUP_COUNT)
+        self.handler.setFormatter(logging.Formatter('%(message)s'))
+
+    def export(self, trace: Trace):
+        record = logging.LogRecord('traces', logging.INFO, __file__, 0,
+                                   json.dumps(trace.to_dict(), ensure_ascii=False, default=str), None, None)
+        self.handler.handle(record)
+
+    async def flush(self):
+        pass
+
+    def close(self):
+        self.handler.close()
+
+
+def otlp_value(value) -> dict:
+    """Значение атрибута в формате OTLP/JSON"""
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+
+def otlp_span(span: Span) -> dict:
+    """Span в формате OTLP/JSON (opentelemetry-proto)"""
+    start_ns = int(span.started_at * 1e9)
+    result = {
+        'traceId': span.trace_id,
+        'spanId': span.span_id,
+        'name': span.name,
+        'kind': 1,
+        'startTimeUnixNano': str(start_ns),
+        'endTimeUnixNano': str(start_ns + int((span.duration or 0) * 1e9)),
+        'attributes': [{'key': key, 'value': otlp_value(value)} for key, value in span.attributes.items()],
+        'status': {'code': 2, 'message': span.error} if span.error else {'code': 1},
+    }
+    if span.parent_id:
+        result['parentSpanId'] = span.parent_id
+    return result
+
+
+class OtlpExporter:
+    """Пачки трасс в OTLP/HTTP коллектор (JSON) раз в TRACE_FLUSH_INTERVAL секунд"""
+
+    def __init__(self, url: str = TRACE_OTLP_URL):
+        self.url = url
+        self.buffer = []
+        self.counters = {'sent': 0, 'dropped': 0, 'errors': 0}
+
+    def export(self, trace: Trace):
+        if len(self.buffer) >= TRACE_MAX_BUFFER:
+            self.counters['dropped'] += 1
+            return
+        self.buffer.append(trace)
+
+    async def flush(self):
+        if not self.buffer:
+            return
+
+        traces, self.buffer = self.buffer, []
+        payload = {
+            'resourceSpans': [{
+                'resource': {'attributes': [{'key': 'service.name', 'value': {'stringValue': SERVICE_NAME}}]},
+                'scopeSpans': [{
+                    'scope': {'name': __name__},
+                    'spans': [otlp_span(span) for trace in traces for span in trace.spans],
+                }],
+            }]
+        }
+
+        from services.http_client import http_client
+
+        try:
+            session = await http_client.get_session()
+            async with session.post(self.url, json=payload, timeout=10) as response:
+                if response.status >= 400:
+                    raise RuntimeError(f'HTTP {response.status}')
+            self.counters['sent'] += len(traces)
+        except Exception as e:
+            self.counters['errors'] += 1
+            self.counters['dropped'] += len(traces)
+            logger.warning(f"Error exporting {len(traces)} traces to {self.url}: {e}")
+
+    def close(self):
+        pass
+
+
+class Tracer:
+    """Создание трасс и span и их выгрузка"""
+
+    def __init__(self, enabled: bool = TRACING_ENABLED, sample_rate: float = TRACE_SAMPLE_RATE):
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.exporter = None
+        self.task = None
+        self.counters = {'traces': 0, 'spans': 0, 'late_spans': 0}
+
+    def get_exporter(self):
+        if self.exporter is None:
+            self.exporter = OtlpExporter() if TRACE_EXPORTER == 'otlp' and TRACE_OTLP_URL else JsonlExporter()
+        return self.exporter
+
+    async def start(self):
+        """Фоновая выгрузка пачек (для OTLP)"""
+        if not self.enabled:
+            return
+
+        exporter = self.get_exporter()
+        if isinstance(exporter, OtlpExporter):
+            self.task = asyncio.create_task(self._run())
+        logger.info(f"Tracing enabled ({type(exporter).__name__}, sample rate {self.sample_rate})")
+
+    async def stop(self):
+        """Выгрузить оставшиеся трассы"""
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+        if self.exporter:
+            await self.exporter.flush()
+            self.exporter.close()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(TRACE_FLUSH_INTERVAL)
+            await self.exporter.flush()
+
+    def trace(self, name: str, trace_id: str | None = None, **attributes):
+        """
+        Начать трассу (корневой span)
+
+        Args:
+            name: Имя корневого span
+            trace_id: Продолжить трассу с этим ID (например, из очереди вебхуков);
+                None - новая трасса с вероятностью TRACE_SAMPLE_RATE
+
+        Returns:
+            Контекстный менеджер, возвращающий Span (или пустой span без трассы)
+        """
+        if not self.enabled:
+            return NOOP_SPAN
+        if trace_id is None:
+            if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+                return NOOP_SPAN
+            trace_id = new_trace_id()
+
+        trace = Trace(trace_id)
+        trace.root = Span(trace, name, None, attributes)
+        trace.spans.append(trace.root)
+        return SpanScope(self, trace.root)
+
+    def span(self, name: str, **attributes):
+        """Дочерний span текущего (вне трассы ничего не записывает)"""
+        parent = _current_span.get()
+        if parent is None:
+            return NOOP_SPAN
+
+        trace = parent.trace
+        if trace.exported:
+            # Фоновая задача пережила трассу
+            self.counters['late_spans'] += 1
+            return NOOP_SPAN
+
+        span = Span(trace, name, parent.span_id, attributes)
+        trace.spans.append(span)
+        return SpanScope(self, span)
+
+    def current_trace_id(self) -> str | None:
+        """trace_id текущей трассы"""
+        span = _current_span.get()
+        return span.trace_id if span else None
+
+    def finish(self, trace: Trace):
+        """Корневой span завершён - выгрузить трассу"""
+        trace.exported = True
+        self.counters['traces'] += 1
+        self.counters['spans'] += len(trace.spans)
+
+        try:
+            self.get_exporter().export(trace)
+        except Exception as e:
+            logger.error(f"Error exporting trace {trace.trace_id}: {e}")
+
+    def stats(self) -> dict:
+        """Счётчики для /health"""
+        stats = {'enabled': self.enabled, **self.counters}
+        if isinstance(self.exporter, OtlpExporter):
+            stats['otlp'] = dict(self.exporter.counters, buffered=len(self.exporter.buffer))
+        return stats
+
+
+# Глобальный экземпляр
+tracer = Tracer()
@@ -0,0 +1,210 @@
+"""
+Очередь входящих вебхуков: приём отделён от доставки уведомлений
+"""
+
+import asyncio
+import json
+import logging
+import random
+from contextvars import ContextVar
+from datetime import datetime, timedelta
+
+import config
+from database.db import db
+from services.tracing import tracer, NOOP_SPAN
+
+logger = logging.getLogger(__name__)
+
+# Количество воркеров, обрабатывающих очередь
+WORKERS = getattr(config, 'WEBHOOK_WORKERS', 4)
+
+# Максимальное число попыток обработки события
+MAX_ATTEMPTS = getattr(config, 'WEBHOOK_MAX_ATTEMPTS', 5)
+
+# Базовая и максимальная задержка перед повтором (в секундах)
+RETRY_BASE_DELAY = getattr(config, 'WEBHOOK_RETRY_BASE_DELAY', 5)
+RETRY_MAX_DELAY = 300
+
+# Сколько готовых событий проверить за один захват (на случай, если
+# событие успел взять другой воркер)
+CLAIM_SCAN_LIMIT = 10
+
+# Сколько дней хранить события с исчерпанными попытками
+FAILED_RETENTION_DAYS = getattr(config, 'WEBHOOK_FAILED_RETENTION_DAYS', 7)
+
+# Чаты, которым уведомление обрабатываемого события уже доставлено
+# (в том числе в прошлых попытках): повтор не отправляет им сообщение снова
+_delivered_chat_ids: ContextVar[set | None] = ContextVar('delivered_chat_ids', default=None)
+
+
+def already_delivered(chat_id: int) -> bool:
+    """Получил ли chat_id уведомление текущего события в прошлой попытке"""
+    delivered = _delivered_chat_ids.get()
+    return delivered is not None and chat_id in delivered
+
+
+def record_delivery(chat_id: int):
+    """Отметить доставку уведомления текущего события в chat_id"""
+    delivered = _delivered_chat_ids.get()
+    if delivered is not None:
+        delivered.add(chat_id)
+
+
+class WebhookQueue:
+    """
+    Персистентная очередь вебхуков в таблице webhook_events
+
+    enqueue() только сохраняет событие и сразу возвращает управление,
+    обработку выполняют воркеры. События одного бронирования обрабатываются
+    строго по порядку и никогда параллельно (выборка в db.claim_webhook_event).
+    При повторе после ошибки уведомление получают только те, кому оно ещё
+    не доставлено.
+    """
+
+    def __init__(self, handler, workers: int = WORKERS):
+        """
+        Args:
+            handler: async функция (event_type, data), бросает исключение при ошибке
+            workers: Количество воркеров
+        """
+        self.handler = handler
+        self.workers_count = workers
+        self.workers = []
+        self.claim_lock = asyncio.Lock()
+        self.wakeup = asyncio.Event()
+        self.next_retry_at = None
+        self.running = False
+
+    async def start(self):
+        """Запуск воркеров"""
+        restored = await db.reset_processing_webhook_events()
+        if restored:
+            logger.warning(f"Re-queued {restored} webhook events interrupted by shutdown")
+
+        self.running = True
+        self.workers = [asyncio.create_task(self._worker(i)) for i in range(self.workers_count)]
+        self.wakeup.set()
+        logger.info(f"Webhook queue started ({self.workers_count} workers)")
+
+    async def stop(self):
+        """Остановка воркеров (текущие события дообрабатываются)"""
+        self.running = False
+        self.wakeup.set()
+
+        if self.workers:
+            await asyncio.gather(*self.workers, return_exceptions=True)
+            self.workers = []
+
+        logger.info("Webhook queue stopped")
+
+    async def enqueue(self, event_type: str, data: dict) -> int:
+        """
+        Сохранить событие в очередь (вместе с trace_id текущей трассы)
+
+        Returns:
+            int: ID события
+        """
+        booking_id = data.get('booking_id')
+        event_id = await db.enqueue_webhook_event(
+            event_type=event_type,
+            booking_id=int(booking_id) if booking_id else None,
+            payload=json.dumps(data, ensure_ascii=False),
+            trace_id=tracer.current_trace_id()
+        )
+        self.wakeup.set()
+        return event_id
+
+    async def stats(self) -> dict:
+        """Глубина очереди и задержка самого старого события"""
+        stats = await db.get_webhook_queue_stats()
+        oldest = stats.pop('oldest_pending_at')
+
+        stats['depth'] = stats['pending'] + stats['processing']
+        stats['lag_seconds'] = round((datetime.utcnow() - oldest).total_seconds(), 3) if oldest else 0.0
+        return stats
+
+    async def _claim(self):
+        """Взять следующее готовое событие"""
+        async with self.claim_lock:
+            if not self.running:
+                # Остановка: не сбрасывать сигнал, ожидающие воркеры должны выйти
+                return None
+
+            # Сброс до выборки: enqueue во время выборки снова разбудит воркеры
+            self.wakeup.clear()
+
+            now = datetime.utcnow()
+            event = await db.claim_webhook_event(now, CLAIM_SCAN_LIMIT)
+            self.next_retry_at = None if event else await db.get_next_webhook_retry_at(now)
+            return event
+
+    async def expire_failed(self):
+        """Удалить события с исчерпанными попытками старше FAILED_RETENTION_DAYS дней"""
+        try:
+            deleted = await db.delete_failed_webhook_events(datetime.utcnow() - timedelta(days=FAILED_RETENTION_DAYS))
+            if deleted:
+                logger.info(f"Deleted {deleted} failed webhook events")
+        except Exception as e:
+            logger.error(f"Error deleting failed webhook events: {e}")
+
+    async def _worker(self, number: int):
+        """Цикл воркера"""
+        while self.running:
+            try:
+                event = await self._claim()
+            except Exception as e:
+                logger.error(f"Webhook worker {number}: error claiming event: {e}")
+                event = None
+
+            if event is None:
+                # Ждать нового события или ближайшего повтора
+                timeout = None
+                if self.next_retry_at:
+                    timeout = max((self.next_retry_at - datetime.utcnow()).total_seconds(), 0)
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            try:
+                await self._process(event)
+            except Exception as e:
+                logger.error(f"Webhook worker {number}: error processing event {event.id}: {e}")
+            finally:
+                # Следующее событие этого бронирования стало готовым
+                self.wakeup.set()
+
+    async def _process(self, event):
+        """Обработать событие с повтором при ошибке"""
+        attempt = (event.attempts or 0) + 1
+
+        # Трасса приёма продолжается здесь; события без trace_id не трассируются
+        span = NOOP_SPAN
+        if event.trace_id:
+            span = tracer.trace('webhook.process', event.trace_id, event_type=event.event_type,
+                                event_id=event.id, booking_id=event.booking_id, attempt=attempt)
+
+        delivered = set(json.loads(event.delivered_chat_ids)) if event.delivered_chat_ids else set()
+        token = _delivered_chat_ids.set(delivered)
+
+        try:
+            with span:
+                await self.handler(event.event_type, json.loads(event.payload))
+        except Exception as e:
+            delivered_json = json.dumps(sorted(delivered)) if delivered else None
+            if attempt >= MAX_ATTEMPTS:
+                logger.error(f"Webhook event {event.id} ({event.event_type}) failed after {attempt} attempts: {e}")
+                await db.fail_webhook_event(event.id, str(e), None, delivered_json)
+                return
+
+            delay = min(RETRY_BASE_DELAY * 2 ** (attempt - 1), RETRY_MAX_DELAY)
+            delay *= random.uniform(0.5, 1.0)
+            logger.warning(f"Webhook event {event.id} ({event.event_type}) attempt {attempt} failed, "
+                           f"retrying in {delay:.1f}s: {e}")
+            await db.fail_webhook_event(event.id, str(e), datetime.utcnow() + timedelta(seconds=delay), delivered_json)
+            return
+        finally:
+            _delivered_chat_ids.reset(token)
+
+        await db.complete_webhook_event(event.id)
@@ -4,15 +4,34 @@
 
 import asyncio
 import logging
+import time
 import aiohttp
-from typing import Dict, List, Optional
+from typing import AsyncIterator, Dict, List, Optional
 import config
+from services.http_client import http_client
+from services.metrics import WORDPRESS_REQUEST_SECONDS
+from services.resilience import CircuitBreaker, RETRY_ATTEMPTS, backoff_delay
+from utils.cache import TTLCache
+from utils.singleflight import SingleFlight
 
 logger = logging.getLogger(__name__)
 
 # Константа для таймаута запросов
 REQUEST_TIMEOUT = aiohttp.ClientTimeout(total=config.HTTP_TIMEOUT)
 
+# Таймаут подтверждения agent token
+AGENT_TOKEN_TIMEOUT = aiohttp.ClientTimeout(total=10)
+
+# Размер страницы пакетного запроса расписаний
+BULK_PAGE_SIZE = getattr(config, 'SCHEDULE_BULK_PAGE_SIZE', 200)
+
+# Размер страницы ленты изменений бронирований
+CHANGES_PAGE_SIZE = getattr(config, 'CHANGE_FEED_PAGE_SIZE', 200)
+
+# Кэш ответов /schedule и /booking/{id}
+CACHE_TTL = getattr(config, 'WP_CACHE_TTL', 30)
+CACHE_SIZE = getattr(config, 'WP_CACHE_SIZE', 2000)
+
 
 class WordPressAPI:
     """Клиент для работы с WordPress REST API"""
@@ -20,19 +39,85 @@ class WordPressAPI:
     def __init__(self):
         self.base_url = config.WP_API_URL
         self.session: Optional[aiohttp.ClientSession] = None
+        # Успешные ответы /schedule и /booking/{id}:
+        # ('schedule', chat_id, period, date_from, date_to) и ('booking', booking_id, chat_id)
+        self.cache = TTLCache(CACHE_SIZE, CACHE_TTL)
+        # Одновременные одинаковые GET-запросы выполняются один раз
+        self.singleflight = SingleFlight()
+        # Увеличивается при сбросе кэша: ответ, запрошенный до сброса, не кэшируется
+        self.cache_generation = 0
+        # Выключатели по эндпоинтам: endpoint -> CircuitBreaker
+        self.breakers: Dict[str, CircuitBreaker] = {}
 
     async def init_session(self):
-        """Инициализация HTTP сессии"""
-        if not self.session:
-            self.session = aiohttp.ClientSession()
+        """Инициализация HTTP сессии (общий клиент services/http_client.py)"""
+        if not self.session or self.session.closed:
+            self.session = await http_client.get_session()
             logger.info("WordPress API session initialized")
 
     async def close_session(self):
         """Закрытие HTTP сессии"""
         if self.session:
-            await self.session.close()
+            await http_client.close()
             logger.info("WordPress API session closed")
 
+    async def _cached(self, key: tuple, fetch) -> Dict:
+        """
+        Ответ из кэша или единственный запрос для всех одновременных вызовов с ключом key
+
+        Args:
+            key: Ключ кэша
+            fetch: Корутинная функция выполнения запроса
+
+        Returns:
+            Dict с результатом (кэшируются только успешные ответы)
+        """
+        result = self.cache.get(key)
+        if result is not None:
+            return result
+
+        return await self.singleflight.do(key[0], key[1:], lambda: self._fetch_and_cache(key, fetch))
+
+    async def _fetch_and_cache(self, key: tuple, fetch) -> Dict:
+        generation = self.cache_generation
+        result = await fetch()
+
+        if result.get('success') and generation == self.cache_generation:
+            self.cache.set(key, result)
+
+        return result
+
+    def invalidate_cache(self, chat_ids=(), booking_id: int = None) -> int:
+        """
+        Сбросить закэшированные расписания чатов chat_ids и детали бронирования booking_id
+
+        Returns:
+            int: Количество удалённых записей
+        """
+        chat_ids = {int(chat_id) for chat_id in chat_ids if chat_id}
+        booking_id = int(booking_id) if booking_id else None
+
+        self.cache_generation += 1
+        return self.cache.invalidate_where(
+            lambda key: (key[0] == 'schedule' and key[1] in chat_ids)
+            or (key[0] == 'booking' and key[1] == booking_id)
+        )
+
+    def cache_stats(self) -> dict:
+        """Статистика кэша ответов"""
+        return self.cache.stats()
+
+    def get_breaker(self, endpoint: str) -> CircuitBreaker:
+        """Выключатель эндпоинта (создаётся при первом обращении)"""
+        breaker = self.breakers.get(endpoint)
+        if breaker is None:
+            breaker = self.breakers[endpoint] = CircuitBreaker(endpoint)
+        return breaker
+
+    def breaker_stats(self) -> dict:
+        """Состояние выключателей по эндпоинтам"""
+        return {endpoint: breaker.stats() for endpoint, breaker in self.breakers.items()}
+
     async def _handle_response(self, response: aiohttp.ClientResponse, operation: str) -> Dict:
         """
         Обработка HTTP ответа с проверкой статус кодов
@@ -42,21 +127,25 @@ class WordPressAPI:
             operation: Название операции для логирования
 
         Returns:
-            Dict с результатом
+            Dict с результатом (при ошибке HTTP - с кодом ответа в 'status')
         """
         try:
             # Проверка статуса
             if response.status >= 500:
                 logger.error(f"{operation}: Server error {response.status}")
-                return {'success': False, 'message': f'Server error: {response.status}'}
+                return {'success': False, 'message': f'Server error: {response.status}', 'status': response.status}
 
             if response.status >= 400:
                 logger.warning(f"{operation}: Client error {response.status}")
                 try:
                     error_data = await response.json()
-                    return {'success': False, 'message': error_data.get('message', f'Client error: {response.status}')}
+                    return {
+                        'success': False,
+                        'message': error_data.get('message', f'Client error: {response.status}'),
+                        'status': response.status
+                    }
                 except:
-                    return {'success': False, 'message': f'Client error: {response.status}'}
+                    return {'success': False, 'message': f'Client error: {response.status}', 'status': response.status}
 
             # Парсинг JSON
             try:
@@ -70,6 +159,77 @@ class WordPressAPI:
             logger.error(f"{operation}: Error handling response: {e}")
             return {'success': False, 'message': str(e)}
 
+    async def _request(self, method: str, endpoint: str, path: str, operation: str,
+                       idempotent: bool = None, timeout: aiohttp.ClientTimeout = REQUEST_TIMEOUT,
+                       **kwargs) -> Dict:
+        """
+        HTTP запрос к WordPress через выключатель эндпоинта с повторами
+
+        Таймауты, ошибки соединения и ответы 5xx считаются сбоями: идемпотентный
+        запрос повторяется до RETRY_ATTEMPTS раз со случайной экспоненциальной
+        задержкой, а после серии сбоев выключатель эндпоинта временно отклоняет
+        запросы без обращения к WordPress.
+
+        Args:
+            method: HTTP метод
+            endpoint: Имя эндпоинта для выключателя
+            path: Путь относительно base_url
+            operation: Название операции для логирования
+            idempotent: Можно ли повторять запрос (по умолчанию - для GET)
+            timeout: Таймаут одной попытки
+            kwargs: params, json, headers для aiohttp
+
+        Returns:
+            Dict с результатом
+        """
+        await self.init_session()
+
+        breaker = self.get_breaker(endpoint)
+        if idempotent is None:
+            idempotent = method == 'GET'
+        attempts = RETRY_ATTEMPTS if idempotent else 1
+
+        url = f"{self.base_url}{path}"
+        result = {'success': False, 'message': 'Service temporarily unavailable', 'circuit_open': True}
+
+        for attempt in range(1, attempts + 1):
+            if not breaker.allow():
+                logger.warning(f"{operation}: circuit breaker {endpoint} is open, request skipped")
+                return result
+
+            started = time.perf_counter()
+            try:
+                async with self.session.request(method, url, timeout=timeout, **kwargs) as response:
+                    result = await self._handle_response(response, operation)
+                    failed = response.status >= 500
+                outcome = f'{response.status // 100}xx'
+            except asyncio.TimeoutError:
+                logger.error(f"{operation}: Request timeout (attempt {attempt}/{attempts})")
+                result = {'success': False, 'message': 'Request timeout'}
+                failed = True
+                outcome = 'timeout'
+            except aiohttp.ClientError as e:
+                logger.error(f"{operation}: {e} (attempt {attempt}/{attempts})")
+                result = {'success': False, 'message': str(e)}
+                failed = True
+                outcome = 'connection_error'
+            except Exception as e:
+                logger.error(f"{operation}: {e}")
+                WORDPRESS_REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint, 'error')
+                return {'success': False, 'message': str(e)}
+
+            WORDPRESS_REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint, outcome)
+
+            if not failed:
+                breaker.record_success()
+                return result
+
+            breaker.record_failure()
+            if attempt < attempts:
+                await asyncio.sleep(backoff_delay(attempt))
+
+        return result
+
     async def register_user(self, token: str, chat_id: int, username: str) -> Dict:
         """
         Регистрация пользователя в WordPress
@@ -82,35 +242,26 @@ class WordPressAPI:
         Returns:
             Dict с данными пользователя
         """
-        await self.init_session()
-
-        url = f"{self.base_url}/register"
         data = {
             'token': token,
             'chat_id': str(chat_id),
             'username': username
         }
 
-        try:
-            async with self.session.post(url, json=data, timeout=REQUEST_TIMEOUT) as response:
-                result = await self._handle_response(response, "User registration")
+        result = await self._request('POST', 'register', '/register', "User registration", json=data)
 
-                if result.get('success'):
-                    logger.info(f"User registered successfully: chat_id={chat_id}")
+        if result.get('success'):
+            logger.info(f"User registered successfully: chat_id={chat_id}")
 
-                return result
-
-        except asyncio.TimeoutError:
-            logger.error(f"Timeout registering user: chat_id={chat_id}")
-            return {'success': False, 'message': 'Request timeout'}
-        except Exception as e:
-            logger.error(f"Error registering user: {e}")
-            return {'success': False, 'message': str(e)}
+        return result
 
     async def get_schedule(self, chat_id: int, period: str = None, date_from: str = None, date_to: str = None) -> Dict:
         """
         Получить расписание пользователя
 
+        Ответ кэшируется на WP_CACHE_TTL секунд, одновременные одинаковые
+        вызовы выполняют один запрос.
+
         Args:
             chat_id: Telegram chat ID
             period: 'today' или 'week' (опционально)
@@ -120,9 +271,11 @@ class WordPressAPI:
         Returns:
             Dict с расписанием
         """
-        await self.init_session()
+        key = ('schedule', int(chat_id), period, date_from, date_to)
+        return await self._cached(key, lambda: self._fetch_schedule(chat_id, period, date_from, date_to))
 
-        url = f"{self.base_url}/schedule"
+    async def _fetch_schedule(self, chat_id: int, period: str = None, date_from: str = None, date_to: str = None) -> Dict:
+        """Запрос /schedule без кэша"""
         params = {'chat_id': str(chat_id)}
 
         if period:
@@ -132,26 +285,114 @@ class WordPressAPI:
         if date_to:
             params['date_to'] = date_to
 
-        try:
-            async with self.session.get(url, params=params, timeout=REQUEST_TIMEOUT) as response:
-                result = await self._handle_response(response, "Get schedule")
+        result = await self._request('GET', 'schedule', '/schedule', "Get schedule", params=params)
 
-                if result.get('success'):
-                    logger.info(f"Schedule fetched for chat_id={chat_id}")
+        if result.get('success'):
+            logger.info(f"Schedule fetched for chat_id={chat_id}")
+
+        return result
+
+    async def get_schedules_bulk(self, chat_ids: List[int], date_from: str, date_to: str,
+                                 agent_ids: List[int] = None) -> Dict:
+        """
+        Получить расписания нескольких пользователей одним пакетным запросом
 
+        Обходит все страницы ответа /schedule/bulk и группирует бронирования
+        по chat_id и по agent_id.
+
+        Args:
+            chat_ids: Список Telegram chat ID
+            date_from: Начальная дата в формате YYYY-MM-DD
+            date_to: Конечная дата в формате YYYY-MM-DD
+            agent_ids: Список ID агентов LatePoint (опционально)
+
+        Returns:
+            Dict вида {'success': True, 'schedules': {chat_id: [...]}, 'agents': {agent_id: [...]}}.
+            Если плагин не поддерживает пакетный запрос, 'unsupported' = True.
+        """
+        headers = {'X-Webhook-Secret': config.WEBHOOK_SECRET}
+
+        schedules = {int(chat_id): [] for chat_id in chat_ids}
+        agents = {int(agent_id): [] for agent_id in agent_ids or []}
+        page = 1
+
+        while True:
+            data = {
+                'chat_ids': [str(chat_id) for chat_id in chat_ids],
+                'agent_ids': list(agents),
+                'date_from': date_from,
+                'date_to': date_to,
+                'page': page,
+                'per_page': BULK_PAGE_SIZE,
+            }
+
+            # POST только читает расписание, поэтому его можно повторять
+            result = await self._request('POST', 'schedule_bulk', '/schedule/bulk', "Get bulk schedule",
+                                         idempotent=True, json=data, headers=headers)
+
+            if not result.get('success') and result.get('status') == 404:
+                logger.warning("Bulk schedule endpoint is not available")
+                return {'success': False, 'message': 'Bulk schedule not supported', 'unsupported': True}
+
+            if not result.get('success'):
                 return result
 
-        except asyncio.TimeoutError:
-            logger.error(f"Timeout fetching schedule for chat_id={chat_id}")
-            return {'success': False, 'message': 'Request timeout'}
-        except Exception as e:
-            logger.error(f"Error fetching schedule: {e}")
-            return {'success': False, 'message': str(e)}
+            for booking in result.get('bookings', []):
+                for chat_id in booking.pop('chat_ids', []):
+                    schedules.setdefault(int(chat_id), []).append(booking)
+
+                agent_id = int(booking.get('agent', {}).get('id') or 0)
+                if agent_id in agents:
+                    agents[agent_id].append(booking)
+
+            if page >= result.get('total_pages', 0):
+                break
+            page += 1
+
+        logger.info(f"Bulk schedule fetched for {len(chat_ids)} chats, {len(agents)} agents ({page} pages)")
+        return {'success': True, 'schedules': schedules, 'agents': agents}
+
+    async def iter_changes(self, since: Optional[str], limit: int = CHANGES_PAGE_SIZE) -> AsyncIterator[Dict]:
+        """
+        Лента изменений бронирований постранично, начиная с курсора since
+
+        Args:
+            since: Курсор последнего полученного изменения (None - только курсор конца ленты)
+            limit: Изменений на странице
+
+        Yields:
+            Dict страницы {'success': True, 'changes': [...], 'next_cursor': ..., 'has_more': ...}.
+            Ответ с ошибкой отдаётся последним; если плагин не поддерживает
+            ленту, в нём 'unsupported' = True.
+        """
+        headers = {'X-Webhook-Secret': config.WEBHOOK_SECRET}
+
+        while True:
+            params = {'limit': str(limit)}
+            if since:
+                params['since'] = since
+
+            result = await self._request('GET', 'booking_changes', '/bookings/changes', "Get booking changes",
+                                         params=params, headers=headers)
+
+            if not result.get('success') and result.get('status') == 404:
+                logger.warning("Booking changes endpoint is not available")
+                yield {'success': False, 'message': 'Booking changes not supported', 'unsupported': True}
+                return
+
+            yield result
+
+            if not result.get('success') or not result.get('has_more') or not since:
+                return
+            since = result['next_cursor']
 
     async def get_booking(self, booking_id: int, chat_id: int) -> Dict:
         """
         Получить детали бронирования
 
+        Ответ кэшируется на WP_CACHE_TTL секунд, одновременные одинаковые
+        вызовы выполняют один запрос.
+
         Args:
             booking_id: ID бронирования
             chat_id: Telegram chat ID
@@ -159,26 +400,20 @@ class WordPressAPI:
         Returns:
             Dict с деталями бронирования
         """
-        await self.init_session()
+        key = ('booking', int(booking_id), int(chat_id))
+        return await self._cached(key, lambda: self._fetch_booking(booking_id, chat_id))
 
-        url = f"{self.base_url}/booking/{booking_id}"
+    async def _fetch_booking(self, booking_id: int, chat_id: int) -> Dict:
+        """Запрос /booking/{id} без кэша"""
         params = {'chat_id': str(chat_id)}
 
-        try:
-            async with self.session.get(url, params=params, timeout=REQUEST_TIMEOUT) as response:
-                result = await self._handle_response(response, f"Get booking {booking_id}")
+        result = await self._request('GET', 'booking', f'/booking/{booking_id}', f"Get booking {booking_id}",
+                                     params=params)
 
-                if result.get('success'):
-                    logger.info(f"Booking {booking_id} fetched for chat_id={chat_id}")
+        if result.get('success'):
+            logger.info(f"Booking {booking_id} fetched for chat_id={chat_id}")
 
-                return result
-
-        except asyncio.TimeoutError:
-            logger.error(f"Timeout fetching booking {booking_id}")
-            return {'success': False, 'message': 'Request timeout'}
-        except Exception as e:
-            logger.error(f"Error fetching booking: {e}")
-            return {'success': False, 'message': str(e)}
+        return result
 
     async def update_booking_status(self, booking_id: int, chat_id: int, new_status: str) -> Dict:
         """
@@ -192,60 +427,76 @@ class WordPressAPI:
         Returns:
             Dict с результатом
         """
-        await self.init_session()
-
-        url = f"{self.base_url}/booking/{booking_id}/status"
         data = {
             'chat_id': str(chat_id),
             'status': new_status
         }
 
-        try:
-            async with self.session.post(url, json=data, timeout=REQUEST_TIMEOUT) as response:
-                result = await self._handle_response(response, f"Update booking {booking_id} status")
+        result = await self._request('POST', 'booking_status', f'/booking/{booking_id}/status',
+                                     f"Update booking {booking_id} status", json=data)
 
-                if result.get('success'):
-                    logger.info(f"Booking {booking_id} status updated to {new_status}")
+        if result.get('success'):
+            logger.info(f"Booking {booking_id} status updated to {new_status}")
+            self.invalidate_cache([chat_id], booking_id)
 
-                return result
-
-        except asyncio.TimeoutError:
-            logger.error(f"Timeout updating booking {booking_id} status")
-            return {'success': False, 'message': 'Request timeout'}
-        except Exception as e:
-            logger.error(f"Error updating booking status: {e}")
-            return {'success': False, 'message': str(e)}
+        return result
 
     async def get_user_info(self, chat_id: int) -> Dict:
         """
         Получить информацию о пользователе
 
+        Одновременные вызовы для одного chat_id выполняют один запрос.
+
         Args:
             chat_id: Telegram chat ID
 
         Returns:
             Dict с информацией о пользователе
         """
-        await self.init_session()
+        return await self.singleflight.do('user_info', int(chat_id), lambda: self._fetch_user_info(chat_id))
 
-        url = f"{self.base_url}/user-info"
+    async def _fetch_user_info(self, chat_id: int) -> Dict:
+        """Запрос /user-info"""
         params = {'chat_id': str(chat_id)}
 
-        try:
-            async with self.session.get(url, params=params, timeout=REQUEST_TIMEOUT) as response:
-                result = await self._handle_response(response, "Get user info")
+        result = await self._request('GET', 'user_info', '/user-info', "Get user info", params=params)
 
-                if result.get('success'):
-                    logger.info(f"User info fetched for chat_id={chat_id}")
+        if result.get('success'):
+            logger.info(f"User info fetched for chat_id={chat_id}")
 
-                return result
+        return result
 
-        except asyncio.TimeoutError:
-            logger.error(f"Timeout fetching user info for chat_id={chat_id}")
-            return {'success': False, 'message': 'Request timeout'}
-        except Exception as e:
-            logger.error(f"Error fetching user info: {e}")
-            return {'success': False, 'message': str(e)}
+    async def confirm_agent_token(self, token: str, telegram_id: int, username: str,
+                                  first_name: str, last_name: str) -> Dict:
+        """
+        Подтвердить WordPress использование agent token
+
+        Args:
+            token: Agent token
+            telegram_id: Telegram ID привязанного аккаунта
+            username: Telegram username
+            first_name: Имя в Telegram
+            last_name: Фамилия в Telegram
+
+        Returns:
+            Dict с результатом (agent_name - имя агента в LatePoint)
+        """
+        data = {
+            'token': token,
+            'telegram_id': telegram_id,
+            'telegram_data': {
+                'username': username,
+                'first_name': first_name,
+                'last_name': last_name
+            }
+        }
+        headers = {'X-Webhook-Secret': config.WEBHOOK_SECRET}
+
+        result = await self._request('POST', 'agent_token_confirm', '/agent-token/confirm', "Confirm agent token",
+                                     timeout=AGENT_TOKEN_TIMEOUT, json=data, headers=headers)
+        logger.info(f"WordPress confirmation: {result}")
+
+        return result
 
 
 # Глобальный экземпляр
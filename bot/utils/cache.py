@@ -0,0 +1,86 @@
+"""
+Кэш в памяти процесса с ограничением по времени жизни и размеру
+"""
+
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    LRU-кэш с TTL
+
+    Запись живёт ttl секунд; при превышении maxsize вытесняется
+    запись, к которой дольше всего не обращались.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.data = OrderedDict()  # key -> (expires_at, value)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        """Получить значение (default, если записи нет или она устарела)"""
+        item = self.data.get(key, _MISSING)
+
+        if item is _MISSING:
+            self.misses += 1
+            return default
+
+        expires_at, value = item
+        if expires_at <= time.monotonic():
+            del self.data[key]
+            self.misses += 1
+            return default
+
+        self.data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def peek(self, key, default=None):
+        """Получить значение без учёта в статистике и без продления LRU"""
+        item = self.data.get(key, _MISSING)
+        if item is _MISSING or item[0] <= time.monotonic():
+            return default
+        return item[1]
+
+    def set(self, key, value):
+        """Сохранить значение"""
+        self.data[key] = (time.monotonic() + self.ttl, value)
+        self.data.move_to_end(key)
+
+        while len(self.data) > self.maxsize:
+            self.data.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key):
+        """Удалить запись"""
+        self.data.pop(key, None)
+
+    def invalidate_where(self, predicate) -> int:
+        """Удалить записи, ключи которых удовлетворяют predicate; вернуть их количество"""
+        keys = [key for key in self.data if predicate(key)]
+        for key in keys:
+            del self.data[key]
+        return len(keys)
+
+    def clear(self):
+        """Очистить кэш"""
+        self.data.clear()
+
+    def stats(self) -> dict:
+        """Размер кэша и доля попаданий"""
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self.data),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+        }
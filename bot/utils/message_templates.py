@@ -0,0 +1,170 @@
+"""
+Тексты сообщений бота (синтаксис - в utils/templates.py)
+
+Поля start и end - моменты (дата, время) в часовом поясе сервера,
+фильтры date и time переводят их в часовой пояс пользователя.
+"""
+
+TEMPLATES = {
+    'ru': {
+        # Уведомления о бронированиях (handlers/notifications.py)
+        'booking_created_agent': """🎵 <b>Новый урок!</b>
+
+👤 <b>Ученик:</b> {customer.name}
+📧 Email: {customer.email}
+📱 Телефон: {customer.phone}
+
+🎵 <b>Инструмент:</b> {service.name}
+📅 <b>Дата:</b> {start|date}
+🕐 <b>Время:</b> {start|time} - {end|time}
+{?google_meet_url}
+🎥 <b>Google Meet:</b>
+{google_meet_url}{/google_meet_url}
+
+🆔 Код бронирования: <code>{booking_code}</code>""",
+
+        'booking_created_customer': """🎵 <b>Урок подтвержден!</b>
+
+👨‍🏫 <b>Учитель:</b> {agent.name}
+🎵 <b>Инструмент:</b> {service.name}
+
+📅 <b>Дата:</b> {start|date}
+🕐 <b>Время:</b> {start|time} - {end|time}
+{?google_meet_url}
+🎥 <b>Ссылка на урок:</b>
+{google_meet_url}{/google_meet_url}
+
+Желаем хорошего урока! 🎶""",
+
+        'booking_updated_agent': """📝 <b>Изменение в бронировании</b>
+
+👤 <b>Ученик:</b> {customer.name}
+🎵 <b>Инструмент:</b> {service.name}
+
+<b>Изменения:</b>
+{?date_change}📅 Дата: {date_change.old|date} → {date_change.new|date}
+{/date_change}{?time_change}🕐 Время начала: {time_change.old|time} → {time_change.new|time}
+{/time_change}""",
+
+        'booking_updated_customer': """📝 <b>Изменение в бронировании</b>
+
+👨‍🏫 <b>Учитель:</b> {agent.name}
+🎵 <b>Инструмент:</b> {service.name}
+
+<b>Изменения:</b>
+{?date_change}📅 Дата: {date_change.old|date} → {date_change.new|date}
+{/date_change}{?time_change}🕐 Время начала: {time_change.old|time} → {time_change.new|time}
+{/time_change}{?google_meet_url}
+🎥 <b>Ссылка на урок:</b>
+{google_meet_url}{/google_meet_url}""",
+
+        'status_changed_agent': """{new_status|status_emoji} <b>Статус бронирования изменен</b>
+
+👤 <b>Ученик:</b> {customer.name}
+🎵 <b>Инструмент:</b> {service.name}
+📅 <b>Дата:</b> {start|date}
+🕐 <b>Время:</b> {start|time}
+
+<b>Статус:</b> {old_status} → {new_status}
+""",
+
+        'status_changed_customer': """{new_status|status_emoji} <b>Статус бронирования изменен</b>
+
+👨‍🏫 <b>Учитель:</b> {agent.name}
+🎵 <b>Инструмент:</b> {service.name}
+📅 <b>Дата:</b> {start|date}
+🕐 <b>Время:</b> {start|time}
+
+<b>Статус:</b> {old_status} → {new_status}
+""",
+
+        # Напоминания (services/scheduler.py)
+        'reminder_agent': """⏰ <b>Напоминание о предстоящем уроке!</b>
+
+👤 Ученик: {customer.name}
+🎵 Инструмент: {service.name}
+
+📅 Дата: {start|date}
+🕐 Время: {start|time} - {end|time}
+
+📧 Email: {customer.email}
+📱 Телефон: {customer.phone}
+{?google_meet_url}
+🎥 Ссылка на урок:
+{google_meet_url}{/google_meet_url}""",
+
+        'reminder_customer': """⏰ <b>Напоминание о предстоящем уроке!</b>
+
+👨‍🏫 Учитель: {agent.name}
+🎵 Инструмент: {service.name}
+
+📅 Дата: {start|date}
+🕐 Время: {start|time} - {end|time}
+{?google_meet_url}
+🎥 Ссылка на урок:
+{google_meet_url}
+
+Желаем хорошего урока!{/google_meet_url}""",
+
+        # Расписание (/today, /week)
+        'schedule_agent': """🕐 <b>{start|time} - {end|time}</b>
+👤 Ученик: {customer.name}
+🎵 Инструмент: {service.name}
+📧 Email: {customer.email}
+📱 Телефон: {customer.phone}{?google_meet_url}
+🎥 Google Meet: {google_meet_url}{/google_meet_url}""",
+
+        'schedule_customer': """🕐 <b>{start|time} - {end|time}</b>
+👨‍🏫 Учитель: {agent.name}
+🎵 Инструмент: {service.name}{?google_meet_url}
+🎥 Google Meet: {google_meet_url}{/google_meet_url}""",
+
+        'schedule_agent_short': "  • {start|time} - {customer.name} ({service.name})",
+
+        'schedule_customer_short': "  • {start|time} - {agent.name} ({service.name})",
+
+        # Отметка о последней сверке, если расписание отдано из устаревшей локальной копии
+        'synced_marker': "🕓 <i>Данные на {synced|date} {synced|time}, обновляются</i>",
+
+        'synced_marker_unknown': "🕓 <i>Сайт не ответил, данные могут быть неполными</i>",
+
+        # Детали бронирования (кнопка «Детали»)
+        'booking_details_agent': """📋 <b>Детали бронирования</b>
+
+🆔 Код: {booking_code}
+📊 Статус: {status}
+
+👤 <b>Ученик:</b>
+Имя: {customer.name}
+📧 Email: {customer.email}
+📱 Телефон: {customer.phone}
+
+🎵 <b>Урок:</b>
+Инструмент: {service.name}
+📅 Дата: {start|date}
+🕐 Время: {start|time} - {end|time}
+⏱ Длительность: {duration} мин
+{?google_meet_url}
+🎥 Google Meet:
+{google_meet_url}{/google_meet_url}""",
+
+        'booking_details_customer': """📋 <b>Детали бронирования</b>
+
+🆔 Код: {booking_code}
+📊 Статус: {status}
+
+👨‍🏫 <b>Учитель:</b>
+Имя: {agent.name}
+📧 Email: {agent.email}
+📱 Телефон: {agent.phone}
+
+🎵 <b>Урок:</b>
+Инструмент: {service.name}
+📅 Дата: {start|date}
+🕐 Время: {start|time} - {end|time}
+⏱ Длительность: {duration} мин
+{?google_meet_url}
+🎥 Google Meet:
+{google_meet_url}{/google_meet_url}""",
+    },
+}
@@ -0,0 +1,41 @@
+"""
+Смещения напоминаний: за сколько минут до урока их отправлять
+"""
+
+import config
+
+# Смещения по умолчанию (для пользователей, которые их не выбирали)
+DEFAULT_REMINDER_OFFSETS = sorted(set(config.REMINDER_TIMES), reverse=True)
+
+# Варианты, доступные в настройках
+REMINDER_OFFSET_CHOICES = sorted(set([15, 30, 60, 120, 180] + DEFAULT_REMINDER_OFFSETS), reverse=True)
+
+
+def get_reminder_offsets(settings) -> list[int]:
+    """
+    Смещения напоминаний пользователя
+
+    Args:
+        settings: Settings пользователя
+
+    Returns:
+        list[int]: Минуты до начала урока, по убыванию
+    """
+    if settings is None or settings.reminder_offsets is None:
+        return DEFAULT_REMINDER_OFFSETS
+
+    return sorted({int(value) for value in settings.reminder_offsets.split(',') if value.strip()}, reverse=True)
+
+
+def serialize_reminder_offsets(offsets) -> str:
+    """Строка для Settings.reminder_offsets"""
+    return ','.join(str(offset) for offset in sorted(set(offsets), reverse=True))
+
+
+def format_reminder_offset(minutes: int) -> str:
+    """Человекочитаемое смещение: 15 мин, 1 ч, 24 ч"""
+    if minutes < 60:
+        return f"{minutes} мин"
+    if minutes % 60:
+        return f"{minutes // 60} ч {minutes % 60} мин"
+    return f"{minutes // 60} ч"
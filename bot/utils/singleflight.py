@@ -0,0 +1,64 @@
+"""
+Объединение одновременных одинаковых запросов (single-flight)
+"""
+
+import asyncio
+from collections import defaultdict
+
+
+class SingleFlight:
+    """
+    Один запрос на ключ для всех одновременных вызовов
+
+    Пока запрос с ключом (endpoint, key) выполняется, повторные вызовы
+    не запускают новый, а ждут результат первого. Счётчики ведутся
+    по endpoint: вызовы, реально выполненные запросы и объединённые вызовы.
+    """
+
+    def __init__(self):
+        self.inflight: dict[tuple, asyncio.Future] = {}
+        self.counters = defaultdict(lambda: {'calls': 0, 'executed': 0, 'collapsed': 0})
+
+    async def do(self, endpoint: str, key, function):
+        """
+        Выполнить function() или дождаться уже выполняющегося вызова с тем же ключом
+
+        Args:
+            endpoint: Имя эндпоинта для метрик
+            key: Ключ запроса (хэшируемый)
+            function: Корутинная функция без аргументов
+
+        Returns:
+            Результат function()
+        """
+        counters = self.counters[endpoint]
+        counters['calls'] += 1
+
+        flight_key = (endpoint, key)
+        task = self.inflight.get(flight_key)
+
+        if task is None:
+            counters['executed'] += 1
+            task = asyncio.ensure_future(function())
+            self.inflight[flight_key] = task
+            task.add_done_callback(lambda done: self._forget(flight_key, done))
+        else:
+            counters['collapsed'] += 1
+
+        # shield: отмена одного ожидающего не отменяет общий запрос
+        return await asyncio.shield(task)
+
+    def _forget(self, flight_key: tuple, task: asyncio.Future):
+        if self.inflight.get(flight_key) is task:
+            del self.inflight[flight_key]
+
+    def stats(self) -> dict:
+        """Счётчики по эндпоинтам и доля объединённых вызовов"""
+        endpoints = {}
+        for endpoint, counters in self.counters.items():
+            endpoints[endpoint] = {
+                **counters,
+                'collapse_rate': round(counters['collapsed'] / counters['calls'], 4) if counters['calls'] else 0.0,
+            }
+
+        return {'inflight': len(self.inflight), 'endpoints': endpoints}
@@ -0,0 +1,265 @@
+"""
+Шаблоны сообщений бота
+
+Шаблоны из utils/message_templates.py компилируются один раз при старте
+(TemplateRegistry.load) в функции Python, поэтому рендер - это
+подстановка значений без разбора текста. Каждый шаблон компилируется в
+два варианта: без перевода времени (пояс пользователя не задан или равен
+config.TIMEZONE - фильтры date/time сводятся к индексу) и с переводом.
+
+Рендер остаётся медленнее прежних f-строк (см. bench/bench_templates.py):
+каждое поле проходит HTML-экранирование, которого f-строки не делали.
+Это плата за безопасную подстановку имён и ссылок из WordPress; на фоне
+отправки в Telegram (десятки миллисекунд) разница в микросекунды незаметна.
+
+Синтаксис:
+    {customer.name}                - значение поля (экранируется для HTML)
+    {start|date}, {start|time}     - дата/время в часовом поясе пользователя
+    {new_status|status_emoji}      - значение через фильтр
+    {google_meet_url|raw}          - без экранирования
+    {?google_meet_url}...{/google_meet_url} - блок, если поле заполнено
+"""
+
+import html
+import re
+import logging
+
+import config
+from utils.timezones import convert_datetime_to_timezone, format_datetime_with_timezone
+from utils.message_templates import TEMPLATES
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LANGUAGE = getattr(config, 'DEFAULT_LANGUAGE', 'ru')
+
+# Язык, на котором есть все шаблоны
+FALLBACK_LANGUAGE = 'ru'
+
+STATUS_EMOJI = {
+    'approved': '✅',
+    'cancelled': '❌',
+    'pending': '⏳',
+}
+
+TOKEN_PATTERN = re.compile(r'\{([?/]?)([a-z_][a-z0-9_.]*)((?:\|[a-z_]+)*)\}')
+
+# Моменты бронирования (поле даты, поле времени) для фильтров date/time:
+# {start|time} читает start_time прямо из данных бронирования
+MOMENTS = {
+    'start': ("data['start_date']", "data['start_time']"),
+    'end': ("data['start_date']", "data.get('end_time')"),
+}
+
+# Фильтры, которые выбирают элемент момента (дата, время): без перевода
+# часового пояса - индекс, с переводом - элемент convert_datetime_to_timezone
+MOMENT_PARTS = {'date': 0, 'time': 1}
+
+
+def _local_date(value, user_timezone):
+    """Дата момента (дата, время) в часовом поясе пользователя"""
+    if not user_timezone or user_timezone == config.TIMEZONE:
+        return value[0]
+    return format_datetime_with_timezone(value[0], value[1], user_timezone)[0]
+
+
+def _local_time(value, user_timezone):
+    """Время момента (дата, время) в часовом поясе пользователя"""
+    if not user_timezone or user_timezone == config.TIMEZONE:
+        return value[1]
+    return format_datetime_with_timezone(value[0], value[1], user_timezone)[1]
+
+
+def _status_emoji(value, user_timezone):
+    return STATUS_EMOJI.get(value, '📝')
+
+
+FILTERS = {
+    'date': _local_date,
+    'time': _local_time,
+    'status_emoji': _status_emoji,
+}
+
+
+def _escape(value) -> str:
+    """HTML-экранирование значения поля (без копирования строк без спецсимволов)"""
+    value = str(value)
+    if '&' in value or '<' in value or '>' in value:
+        return html.escape(value, quote=False)
+    return value
+
+
+def _lookup(data: dict, keys: tuple):
+    """Значение по пути для блока {?...}: None, если какого-то ключа нет"""
+    for key in keys:
+        data = data.get(key) if isinstance(data, dict) else None
+    return data
+
+
+class Template:
+    """Скомпилированный шаблон сообщения"""
+
+    def __init__(self, name: str, source: str):
+        self.name = name
+        self.source = source
+        self.render_local = self._compile(source, local=True)
+        self.render_converted = self._compile(source, local=False)
+
+    def _compile(self, source: str, local: bool):
+        """
+        Разбор шаблона в функцию Python (data, user_timezone) -> str
+
+        Каждое поле превращается в выражение вида _escape(data['customer']['name']),
+        блок {?...} - в условное выражение, весь шаблон - в один ''.join(...).
+        В варианте local фильтры date/time не переводят время, в другом -
+        вызывают кэшированный convert_datetime_to_timezone напрямую.
+        """
+        stack = [(None, [])]
+        position = 0
+
+        for match in TOKEN_PATTERN.finditer(source):
+            parts = stack[-1][1]
+            if match.start() > position:
+                parts.append(repr(source[position:match.start()]))
+            position = match.end()
+
+            kind, path, filters = match.groups()
+            if kind == '?':
+                stack.append((path, []))
+            elif kind == '/':
+                section, section_parts = stack.pop()
+                if section != path:
+                    raise ValueError(f"Template {self.name}: unexpected {{/{path}}}")
+                stack[-1][1].append(
+                    f"({self._join(section_parts)} if _lookup(data, {tuple(path.split('.'))!r}) else '')"
+                )
+            else:
+                parts.append(self._compile_field(path, filters.split('|')[1:], local))
+
+        if len(stack) > 1:
+            raise ValueError(f"Template {self.name}: unclosed {{?{stack[-1][0]}}}")
+
+        if position < len(source):
+            stack[0][1].append(repr(source[position:]))
+
+        code = f"def render(data, user_timezone):\n    return {self._join(stack[0][1])}\n"
+        namespace = {'_escape': _escape, '_lookup': _lookup, '_filters': FILTERS, '_convert': convert_datetime_to_timezone}
+        exec(compile(code, f'<template {self.name}>', 'exec'), namespace)
+        return namespace['render']
+
+    def _compile_field(self, path: str, filter_names: list[str], local: bool) -> str:
+        """Выражение Python для поля {path|filter|...}"""
+        moment = MOMENTS.get(path)
+        if moment:
+            expression = f"({moment[0]}, {moment[1]})"
+        else:
+            expression = 'data' + ''.join(f"[{key!r}]" for key in path.split('.'))
+
+        for name in filter_names:
+            if name == 'raw':
+                continue
+            if name not in FILTERS:
+                raise ValueError(f"Template {self.name}: unknown filter {name}")
+            if name in MOMENT_PARTS:
+                part = MOMENT_PARTS[name]
+                if local:
+                    expression = moment[part] if moment else f"{expression}[{part}]"
+                else:
+                    arguments = f"{moment[0]}, {moment[1]}" if moment else f"*{expression}"
+                    expression = f"_convert({arguments}, user_timezone)[{part}]"
+            else:
+                expression = f"_filters[{name!r}]({expression}, user_timezone)"
+            moment = None
+
+        if 'raw' in filter_names:
+            return f"str({expression})"
+        return f"_escape({expression})"
+
+    @staticmethod
+    def _join(parts: list[str]) -> str:
+        if not parts:
+            return "''"
+        if len(parts) == 1:
+            return parts[0]
+        return f"''.join(({', '.join(parts)},))"
+
+    def render(self, data: dict, user_timezone: str = None) -> str:
+        """
+        Args:
+            data: Значения полей
+            user_timezone: Часовой пояс для фильтров date/time
+
+        Returns:
+            str: Текст сообщения (HTML)
+        """
+        if not user_timezone or user_timezone == config.TIMEZONE:
+            return self.render_local(data, user_timezone)
+        return self.render_converted(data, user_timezone)
+
+
+class TemplateRegistry:
+    """Реестр скомпилированных шаблонов по языкам"""
+
+    def __init__(self, sources: dict):
+        """
+        Args:
+            sources: {язык: {имя шаблона: текст}}
+        """
+        self.sources = sources
+        self.compiled = {}
+
+    def load(self) -> int:
+        """Скомпилировать все шаблоны, вернуть их количество"""
+        compiled = {}
+        for language, templates in self.sources.items():
+            for name, source in templates.items():
+                compiled[(language, name)] = Template(name, source)
+
+        self.compiled = compiled
+        logger.info(f"Loaded {len(compiled)} message templates")
+        return len(compiled)
+
+    def get(self, name: str, language: str = None) -> Template:
+        """Шаблон на языке language (DEFAULT_LANGUAGE, затем FALLBACK_LANGUAGE)"""
+        if not self.compiled:
+            self.load()
+
+        template = self.compiled.get((language or DEFAULT_LANGUAGE, name))
+        if template is None:
+            template = self.compiled[(FALLBACK_LANGUAGE, name)]
+        return template
+
+    def render(self, name: str, data: dict, user_timezone: str = None, language: str = None) -> str:
+        """Рендер шаблона name"""
+        template = self.compiled.get((language or DEFAULT_LANGUAGE, name)) or self.get(name, language)
+        return template.render(data, user_timezone)
+
+
+# Глобальный экземпляр реестра
+templates = TemplateRegistry(TEMPLATES)
+
+
+def booking_update_context(data: dict, changes: dict) -> dict:
+    """Данные уведомления об изменении: старые и новые моменты date_change и time_change"""
+    context = dict(data)
+
+    if 'start_date' in changes:
+        # Дата переводится вместе со временем начала (или с полуночью)
+        context['date_change'] = {
+            'old': (changes['start_date']['old'], changes.get('start_time', {}).get('old', '00:00')),
+            'new': (changes['start_date']['new'], changes.get('start_time', {}).get('new', '00:00')),
+        }
+
+    if 'start_time' in changes:
+        # Время переводится на новую дату урока
+        date_for_conversion = changes.get('start_date', {}).get('new', data.get('start_date', '2025-01-01'))
+        context['time_change'] = {
+            'old': (date_for_conversion, changes['start_time']['old']),
+            'new': (date_for_conversion, changes['start_time']['new']),
+        }
+
+    return context
+
+
+def render_booking(name: str, booking: dict, user_timezone: str = None, language: str = None) -> str:
+    """Рендер шаблона name для бронирования"""
+    return templates.render(name, booking, user_timezone, language)
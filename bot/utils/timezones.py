@@ -1,7 +1,15 @@
 """
-Константы часовых поясов для выбора пользователем
+Часовые пояса: список для выбора пользователем и перевод времени бронирований
 """
 
+from datetime import datetime
+from functools import lru_cache
+import pytz
+import config
+
+# Количество запомненных конвертаций (дата, время, пояса)
+CONVERSION_CACHE_SIZE = 4096
+
 # Словарь с часовыми поясами по регионам
 TIMEZONES = {
     'russia': {
@@ -99,3 +107,115 @@ def get_timezone_short_name(timezone: str) -> str:
     full_name = get_timezone_display_name(timezone)
     # Берём часть до первой скобки
     return full_name.split('(')[0].strip()
+
+
+@lru_cache(maxsize=None)
+def get_timezone(name: str):
+    """Объект часового пояса pytz (создаётся один раз на имя)"""
+    return pytz.timezone(name)
+
+
+@lru_cache(maxsize=CONVERSION_CACHE_SIZE)
+def _convert_datetime(date_str: str, time_str: str, target_timezone: str, source_timezone: str) -> tuple:
+    """Конвертация с кэшем по (дата, время, целевой пояс, исходный пояс)"""
+    try:
+        # Создаем naive datetime из строк
+        naive_dt = datetime.strptime(f"{date_str} {time_str}", "%Y-%m-%d %H:%M")
+
+        # Локализуем в исходном часовом поясе
+        aware_dt = get_timezone(source_timezone).localize(naive_dt)
+
+        # Конвертируем в целевой часовой пояс
+        converted_dt = aware_dt.astimezone(get_timezone(target_timezone))
+
+        # Форматируем результат
+        formatted_date = converted_dt.strftime("%Y-%m-%d")
+        formatted_time = converted_dt.strftime("%H:%M")
+        timezone_abbr = converted_dt.strftime("%Z")
+
+        return formatted_date, formatted_time, timezone_abbr
+    except Exception as e:
+        # В случае ошибки возвращаем исходные значения
+        return date_str, time_str, ""
+
+
+def convert_datetime_to_timezone(date_str: str, time_str: str, target_timezone: str = None,
+                                 source_timezone: str = None) -> tuple:
+    """
+    Конвертирует дату и время в указанный часовой пояс
+
+    Args:
+        date_str: Дата в формате YYYY-MM-DD
+        time_str: Время в формате HH:MM
+        target_timezone: Целевой часовой пояс (например, 'America/New_York', 'Europe/Moscow')
+        source_timezone: Исходный часовой пояс (по умолчанию из config.TIMEZONE)
+
+    Returns:
+        tuple: (formatted_date, formatted_time, timezone_abbr)
+    """
+    # Если целевой часовой пояс не указан, используем дефолтный
+    if not target_timezone:
+        target_timezone = config.TIMEZONE
+
+    # Если исходный часовой пояс не указан, используем дефолтный из конфига
+    if not source_timezone:
+        source_timezone = config.TIMEZONE
+
+    return _convert_datetime(date_str, time_str, target_timezone, source_timezone)
+
+
+def conversion_cache_info() -> dict:
+    """Статистика кэша конвертаций (hits, misses, currsize, maxsize)"""
+    return _convert_datetime.cache_info()._asdict()
+
+
+def format_datetime_with_timezone(date_str: str, time_str: str, user_timezone: str = None) -> str:
+    """
+    Форматирует дату и время с учетом часового пояса пользователя
+
+    Args:
+        date_str: Дата в формате YYYY-MM-DD
+        time_str: Время в формате HH:MM
+        user_timezone: Часовой пояс пользователя
+
+    Returns:
+        str: Отформатированная строка даты и времени
+    """
+    if not user_timezone or user_timezone == config.TIMEZONE:
+        # Если часовой пояс не указан или совпадает с дефолтным, просто возвращаем исходные значения
+        return date_str, time_str
+
+    # Конвертируем в часовой пояс пользователя
+    converted_date, converted_time, tz_abbr = convert_datetime_to_timezone(
+        date_str, time_str, user_timezone
+    )
+
+    return converted_date, converted_time
+
+
+def convert_bookings_to_timezone(bookings: list, user_timezone: str = None) -> list:
+    """
+    Перевести время списка бронирований в часовой пояс пользователя за один проход
+
+    Args:
+        bookings: Бронирования в формате /schedule (start_date, start_time, end_time)
+        user_timezone: Часовой пояс пользователя
+
+    Returns:
+        list: Копии бронирований с start_date, start_time и end_time в часовом
+        поясе пользователя (исходный список, если конвертация не нужна)
+    """
+    if not user_timezone or user_timezone == config.TIMEZONE:
+        return bookings
+
+    converted = []
+    for booking in bookings:
+        start_date, start_time, _ = _convert_datetime(
+            booking['start_date'], booking['start_time'], user_timezone, config.TIMEZONE
+        )
+        _, end_time, _ = _convert_datetime(
+            booking['start_date'], booking['end_time'], user_timezone, config.TIMEZONE
+        )
+        converted.append({**booking, 'start_date': start_date, 'start_time': start_time, 'end_time': end_time})
+
+    return converted
@@ -12,6 +12,9 @@ class LatePoint_Telegram_API {
     private static $instance = null;
     private $namespace = 'latepoint-telegram/v1';
 
+    // Сколько секунд изменение бронирования «оседает», прежде чем попасть в ленту
+    const CHANGES_SETTLE_SECONDS = 2;
+
     /**
      * Получить экземпляр класса (Singleton)
      */
@@ -54,6 +57,20 @@ class LatePoint_Telegram_API {
             'permission_callback' => array($this, 'verify_bot_request_permission'),
         ));
 
+        // Пакетное получение расписаний (для планировщика напоминаний)
+        register_rest_route($this->namespace, '/schedule/bulk', array(
+            'methods' => 'POST',
+            'callback' => array($this, 'get_schedule_bulk'),
+            'permission_callback' => array($this, 'verify_webhook_secret'),
+        ));
+
+        // Лента изменений бронирований (для синхронизации бота)
+        register_rest_route($this->namespace, '/bookings/changes', array(
+            'methods' => 'GET',
+            'callback' => array($this, 'get_booking_changes'),
+            'permission_callback' => array($this, 'verify_webhook_secret'),
+        ));
+
         // Получение деталей бронирования
         register_rest_route($this->namespace, '/booking/(?P<id>\d+)', array(
             'methods' => 'GET',
@@ -254,8 +271,9 @@ class LatePoint_Telegram_API {
             $date_from = current_time('Y-m-d');
             $date_to = $date_from;
         } elseif ($period === 'week') {
+            // Оба конца - в часовом поясе сайта (date() без пояса считает в UTC)
             $date_from = current_time('Y-m-d');
-            $date_to = date('Y-m-d', strtotime('+7 days'));
+            $date_to = date('Y-m-d', strtotime($date_from . ' +7 days'));
         }
 
         // Получение бронирований
@@ -271,6 +289,236 @@ class LatePoint_Telegram_API {
         ), 200);
     }
 
+    /**
+     * Пакетное получение расписаний для нескольких пользователей
+     * POST /schedule/bulk
+     * Body: { "chat_ids": [...], "agent_ids": [...], "date_from": "Y-m-d", "date_to": "Y-m-d", "page": 1, "per_page": 200 }
+     *
+     * Каждое бронирование в ответе содержит chat_ids - список запрошенных chat_id,
+     * в расписание которых оно входит.
+     */
+    public function get_schedule_bulk($request) {
+        global $wpdb;
+
+        $chat_ids = array_values(array_filter(array_map('strval', (array) $request->get_param('chat_ids'))));
+        $agent_ids = array_values(array_filter(array_map('intval', (array) $request->get_param('agent_ids'))));
+        $date_from = $request->get_param('date_from');
+        $date_to = $request->get_param('date_to');
+        $page = max(1, intval($request->get_param('page') ?: 1));
+        $per_page = min(500, max(1, intval($request->get_param('per_page') ?: 200)));
+
+        if (empty($date_from) || empty($date_to)) {
+            return new WP_REST_Response(array('success' => false, 'message' => 'date_from and date_to required'), 400);
+        }
+
+        // chat_id => агент/клиент LatePoint (одним запросом на каждую таблицу)
+        $agent_chats = array();
+        $customer_chats = array();
+
+        if (!empty($chat_ids)) {
+            $placeholders = implode(',', array_fill(0, count($chat_ids), '%s'));
+            $meta_rows = $wpdb->get_results($wpdb->prepare(
+                "SELECT user_id, meta_value FROM {$wpdb->usermeta}
+                WHERE meta_key = 'telegram_chat_id' AND meta_value IN ({$placeholders})",
+                $chat_ids
+            ));
+
+            $chats_by_wp_user = array();
+            foreach ($meta_rows as $row) {
+                $chats_by_wp_user[intval($row->user_id)][] = $row->meta_value;
+            }
+
+            if (!empty($chats_by_wp_user)) {
+                $wp_user_ids = array_keys($chats_by_wp_user);
+                $placeholders = implode(',', array_fill(0, count($wp_user_ids), '%d'));
+
+                $agents = $wpdb->get_results($wpdb->prepare(
+                    "SELECT id, wp_user_id FROM {$wpdb->prefix}latepoint_agents WHERE wp_user_id IN ({$placeholders})",
+                    $wp_user_ids
+                ));
+                foreach ($agents as $agent) {
+                    $agent_chats[intval($agent->id)] = $chats_by_wp_user[intval($agent->wp_user_id)];
+                    // Как и в get_user_type: агент имеет приоритет над клиентом
+                    unset($chats_by_wp_user[intval($agent->wp_user_id)]);
+                }
+
+                if (!empty($chats_by_wp_user)) {
+                    $wp_user_ids = array_keys($chats_by_wp_user);
+                    $placeholders = implode(',', array_fill(0, count($wp_user_ids), '%d'));
+
+                    $customers = $wpdb->get_results($wpdb->prepare(
+                        "SELECT id, wordpress_user_id FROM {$wpdb->prefix}latepoint_customers WHERE wordpress_user_id IN ({$placeholders})",
+                        $wp_user_ids
+                    ));
+                    foreach ($customers as $customer) {
+                        $customer_chats[intval($customer->id)] = $chats_by_wp_user[intval($customer->wordpress_user_id)];
+                    }
+                }
+            }
+        }
+
+        $booking_agent_ids = array_values(array_unique(array_merge(array_keys($agent_chats), $agent_ids)));
+        $booking_customer_ids = array_keys($customer_chats);
+
+        if (empty($booking_agent_ids) && empty($booking_customer_ids)) {
+            return new WP_REST_Response(array(
+                'success' => true,
+                'bookings' => array(),
+                'page' => $page,
+                'per_page' => $per_page,
+                'total' => 0,
+                'total_pages' => 0,
+            ), 200);
+        }
+
+        $conditions = array();
+        $args = array();
+        if (!empty($booking_agent_ids)) {
+            $conditions[] = 'agent_id IN (' . implode(',', array_fill(0, count($booking_agent_ids), '%d')) . ')';
+            $args = array_merge($args, $booking_agent_ids);
+        }
+        if (!empty($booking_customer_ids)) {
+            $conditions[] = 'customer_id IN (' . implode(',', array_fill(0, count($booking_customer_ids), '%d')) . ')';
+            $args = array_merge($args, $booking_customer_ids);
+        }
+        $args[] = $date_from;
+        $args[] = $date_to;
+
+        $bookings_table = $wpdb->prefix . 'latepoint_bookings';
+        $where = "(" . implode(' OR ', $conditions) . ")
+            AND start_date >= %s
+            AND start_date <= %s
+            AND status IN ('approved', 'pending')";
+
+        $total = intval($wpdb->get_var($wpdb->prepare(
+            "SELECT COUNT(*) FROM {$bookings_table} WHERE {$where}",
+            $args
+        )));
+
+        $results = $wpdb->get_results($wpdb->prepare(
+            "SELECT id, agent_id, customer_id FROM {$bookings_table}
+            WHERE {$where}
+            ORDER BY start_date, start_time, id
+            LIMIT %d OFFSET %d",
+            array_merge($args, array($per_page, ($page - 1) * $per_page))
+        ));
+
+        $bookings = array();
+        foreach ($results as $result) {
+            $booking = new OsBookingModel($result->id);
+            $booking_data = $this->format_booking_data($booking);
+
+            $booking_chat_ids = array();
+            if (isset($agent_chats[intval($result->agent_id)])) {
+                $booking_chat_ids = array_merge($booking_chat_ids, $agent_chats[intval($result->agent_id)]);
+            }
+            if (isset($customer_chats[intval($result->customer_id)])) {
+                $booking_chat_ids = array_merge($booking_chat_ids, $customer_chats[intval($result->customer_id)]);
+            }
+            $booking_data['chat_ids'] = array_values(array_unique($booking_chat_ids));
+
+            $bookings[] = $booking_data;
+        }
+
+        return new WP_REST_Response(array(
+            'success' => true,
+            'bookings' => $bookings,
+            'page' => $page,
+            'per_page' => $per_page,
+            'total' => $total,
+            'total_pages' => intval(ceil($total / $per_page)),
+        ), 200);
+    }
+
+    /**
+     * Текущее время в формате и поясе столбца updated_at бронирований LatePoint
+     *
+     * LatePoint проставляет updated_at своим OsTimeHelper (время сайта);
+     * без него - current_time('mysql'), тоже время сайта.
+     */
+    private function bookings_now() {
+        if (class_exists('OsTimeHelper') && method_exists('OsTimeHelper', 'now_datetime_in_db_format')) {
+            return OsTimeHelper::now_datetime_in_db_format();
+        }
+        return current_time('mysql');
+    }
+
+    /**
+     * Лента изменений бронирований
+     * GET /bookings/changes?since=<cursor>&limit=200
+     *
+     * Курсор - "updated_at|id" последнего отданного бронирования; бронирования
+     * идут по возрастанию (updated_at, id), в формате данных вебхука и с любым
+     * статусом. Без since возвращается только курсор текущего конца ленты.
+     *
+     * Бронирования, изменённые в последние CHANGES_SETTLE_SECONDS секунд, не отдаются:
+     * иначе бронирование с меньшим id, сохранённое в ту же секунду, оказалось бы
+     * позади курсора и было бы пропущено.
+     */
+    public function get_booking_changes($request) {
+        global $wpdb;
+        $bookings_table = $wpdb->prefix . 'latepoint_bookings';
+
+        $since = (string) $request->get_param('since');
+        $limit = min(500, max(1, intval($request->get_param('limit') ?: 200)));
+
+        // Граница «оседания» - в том же поясе, в котором LatePoint пишет updated_at
+        $settled_before = date('Y-m-d H:i:s', strtotime($this->bookings_now()) - self::CHANGES_SETTLE_SECONDS);
+
+        if ($since === '') {
+            $head = $wpdb->get_row($wpdb->prepare(
+                "SELECT id, updated_at FROM {$bookings_table}
+                WHERE updated_at < %s
+                ORDER BY updated_at DESC, id DESC
+                LIMIT 1",
+                $settled_before
+            ));
+
+            return new WP_REST_Response(array(
+                'success' => true,
+                'changes' => array(),
+                'next_cursor' => $head ? $head->updated_at . '|' . $head->id : '1970-01-01 00:00:00|0',
+                'has_more' => false,
+            ), 200);
+        }
+
+        $parts = explode('|', $since);
+        if (count($parts) !== 2 || !preg_match('/^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}$/', $parts[0])) {
+            return new WP_REST_Response(array('success' => false, 'message' => 'Invalid cursor'), 400);
+        }
+        list($since_updated_at, $since_id) = array($parts[0], intval($parts[1]));
+
+        // limit + 1 строка - признак следующей страницы
+        $results = $wpdb->get_results($wpdb->prepare(
+            "SELECT id, updated_at FROM {$bookings_table}
+            WHERE (updated_at > %s OR (updated_at = %s AND id > %d))
+            AND updated_at < %s
+            ORDER BY updated_at, id
+            LIMIT %d",
+            $since_updated_at, $since_updated_at, $since_id, $settled_before, $limit + 1
+        ));
+
+        $has_more = count($results) > $limit;
+        $results = array_slice($results, 0, $limit);
+
+        $hooks = LatePoint_Telegram_Hooks::get_instance();
+        $changes = array();
+        foreach ($results as $result) {
+            $booking_data = $hooks->get_booking_data(new OsBookingModel($result->id));
+            if ($booking_data) {
+                $changes[] = $booking_data;
+            }
+        }
+
+        $last = end($results);
+        return new WP_REST_Response(array(
+            'success' => true,
+            'changes' => $changes,
+            'next_cursor' => $last ? $last->updated_at . '|' . $last->id : $since,
+            'has_more' => $has_more,
+        ), 200);
+    }
+
     /**
      * Получение деталей бронирования
      */
@@ -461,7 +709,7 @@ class LatePoint_Telegram_API {
         if ($user_type === 'agent') {
             $agent = $this->get_agent_by_wp_user_id($user_id);
             $sql = $wpdb->prepare(
-                "SELECT * FROM {$bookings_table}
+                "SELECT id FROM {$bookings_table}
                 WHERE agent_id = %d
                 AND start_date >= %s
                 AND start_date <= %s
@@ -472,7 +720,7 @@ class LatePoint_Telegram_API {
         } elseif ($user_type === 'customer') {
             $customer = $this->get_customer_by_wp_user_id($user_id);
             $sql = $wpdb->prepare(
-                "SELECT * FROM {$bookings_table}
+                "SELECT id FROM {$bookings_table}
                 WHERE customer_id = %d
                 AND start_date >= %s
                 AND start_date <= %s
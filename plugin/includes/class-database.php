@@ -62,6 +62,29 @@ class LatePoint_Telegram_Database {
         dbDelta($sql);
     }
 
+    /**
+     * Индекс (updated_at, id) на таблице бронирований LatePoint для ленты изменений
+     *
+     * @return bool Индекс есть (false - таблицы LatePoint ещё нет или ALTER не удался)
+     */
+    public function create_booking_changes_index() {
+        global $wpdb;
+        $bookings_table = $wpdb->prefix . 'latepoint_bookings';
+
+        if ($wpdb->get_var($wpdb->prepare("SHOW TABLES LIKE %s", $bookings_table)) !== $bookings_table) {
+            return false;
+        }
+
+        $exists = $wpdb->get_var($wpdb->prepare(
+            "SHOW INDEX FROM {$bookings_table} WHERE Key_name = %s",
+            'latepoint_telegram_updated_at'
+        ));
+        if (!$exists) {
+            return $wpdb->query("ALTER TABLE {$bookings_table} ADD INDEX latepoint_telegram_updated_at (updated_at, id)") !== false;
+        }
+        return true;
+    }
+
     /**
      * Generate a new token for agent
      *
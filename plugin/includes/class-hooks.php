@@ -109,9 +109,9 @@ class LatePoint_Telegram_Hooks {
     }
 
     /**
-     * Получение данных бронирования
+     * Получение данных бронирования (формат вебхука; используется и лентой изменений API)
      */
-    private function get_booking_data($booking) {
+    public function get_booking_data($booking) {
         try {
             // Загрузка связанных объектов
             $customer = new OsCustomerModel($booking->customer_id);
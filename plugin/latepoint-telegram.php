@@ -18,6 +18,8 @@ if (!defined('ABSPATH')) {
 
 // Константы плагина
 define('LATEPOINT_TELEGRAM_VERSION', '1.0.0');
+// Версия схемы БД: увеличивается при каждом изменении таблиц или индексов
+define('LATEPOINT_TELEGRAM_DB_VERSION', '2');
 define('LATEPOINT_TELEGRAM_PLUGIN_DIR', plugin_dir_path(__FILE__));
 define('LATEPOINT_TELEGRAM_PLUGIN_URL', plugin_dir_url(__FILE__));
 
@@ -86,11 +88,34 @@ class LatePoint_Telegram {
             return;
         }
 
+        // Обновление схемы БД после обновления плагина без повторной активации
+        $this->maybe_upgrade_db();
+
         // Инициализация компонентов
         LatePoint_Telegram_Hooks::get_instance();
         LatePoint_Telegram_API::get_instance();
     }
 
+    /**
+     * Обновление схемы БД, если сохранённая версия отстаёт от LATEPOINT_TELEGRAM_DB_VERSION
+     *
+     * Хук активации не вызывается при обновлении плагина, поэтому таблицы и
+     * индексы новых версий создаются здесь. Версия сохраняется, только когда
+     * все шаги выполнены (например, таблица бронирований LatePoint уже есть).
+     */
+    public function maybe_upgrade_db() {
+        if (get_option('latepoint_telegram_db_version') === LATEPOINT_TELEGRAM_DB_VERSION) {
+            return;
+        }
+
+        $database = LatePoint_Telegram_Database::get_instance();
+        $database->create_table();
+
+        if ($database->create_booking_changes_index()) {
+            update_option('latepoint_telegram_db_version', LATEPOINT_TELEGRAM_DB_VERSION);
+        }
+    }
+
     /**
      * Уведомление об отсутствии LatePoint
      */
@@ -123,6 +148,11 @@ class LatePoint_Telegram {
         // Создание таблицы для токенов
         LatePoint_Telegram_Database::get_instance()->create_table();
 
+        // Индекс для ленты изменений бронирований
+        if (LatePoint_Telegram_Database::get_instance()->create_booking_changes_index()) {
+            update_option('latepoint_telegram_db_version', LATEPOINT_TELEGRAM_DB_VERSION);
+        }
+
         // Очистка rewrite rules
         flush_rewrite_rules();
     }
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Database migration script: several reminder offsets per user
+"""
+import sqlite3
+import sys
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).parent.parent
+
+
+def migrate_database(db_path: Path) -> int:
+    """Add settings.reminder_offsets and rebuild scheduled_reminders with the offset in its key"""
+    conn = sqlite3.connect(str(db_path))
+    cursor = conn.cursor()
+
+    print(f'🔄 Миграция времён напоминаний в {db_path}...')
+
+    try:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='settings'")
+        if cursor.fetchone():
+            cursor.execute('PRAGMA table_info(settings)')
+            columns = [col[1] for col in cursor.fetchall()]
+
+            if 'reminder_offsets' not in columns:
+                print('  ✅ Добавляем поле reminder_offsets в таблицу settings...')
+                cursor.execute('ALTER TABLE settings ADD COLUMN reminder_offsets VARCHAR(100)')
+
+                # Пользователи сохраняют выбранное ранее единственное время напоминания
+                cursor.execute('''
+                    UPDATE settings
+                    SET reminder_offsets = CAST(reminder_minutes_before AS TEXT)
+                    WHERE reminder_minutes_before IS NOT NULL
+                ''')
+            else:
+                print('  ℹ️  Поле reminder_offsets уже существует в таблице settings')
+
+        # Очередь напоминаний восстанавливается ботом при старте (полная сверка),
+        # поэтому таблицу со старым уникальным ключом проще пересоздать
+        cursor.execute("SELECT sql FROM sqlite_master WHERE type='table' AND name='scheduled_reminders'")
+        row = cursor.fetchone()
+        if row and 'uq_scheduled_reminder_booking_chat_offset' not in row[0]:
+            print('  ✅ Пересоздаём таблицу scheduled_reminders...')
+            cursor.execute('DROP TABLE scheduled_reminders')
+        elif row:
+            print('  ℹ️  Таблица scheduled_reminders уже в новом формате')
+
+        conn.commit()
+        print('✅ Миграция завершена успешно!')
+        return 0
+
+    except Exception as e:
+        conn.rollback()
+        print(f'❌ Ошибка миграции: {e}')
+        return 1
+
+    finally:
+        conn.close()
+
+
+def migrate():
+    """Migrate every copy of the database kept by the deployment"""
+    if len(sys.argv) > 1:
+        db_paths = [Path(arg) for arg in sys.argv[1:]]
+    else:
+        db_paths = [ROOT_DIR / 'bot' / 'bot_data.db', ROOT_DIR / 'bot_data.db']
+
+    existing = [db_path for db_path in db_paths if db_path.exists()]
+    if not existing:
+        print('ℹ️  Database not found, skipping migration')
+        return 0
+
+    return max(migrate_database(db_path) for db_path in existing)
+
+
+if __name__ == '__main__':
+    try:
+        sys.exit(migrate())
+    except Exception as e:
+        print(f'❌ Критическая ошибка: {e}')
+        sys.exit(1)
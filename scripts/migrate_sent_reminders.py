@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Database migration script: sent_reminders keyed by (booking_id, chat_id, minutes_before)
+"""
+import sqlite3
+import sys
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).parent.parent
+
+
+def migrate_database(db_path: Path) -> int:
+    """Add minutes_before/lesson_start columns and the composite unique key"""
+    conn = sqlite3.connect(str(db_path))
+    cursor = conn.cursor()
+
+    print(f'🔄 Миграция sent_reminders в {db_path}...')
+
+    try:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='sent_reminders'")
+        if not cursor.fetchone():
+            print('  ℹ️  Таблицы sent_reminders нет, она будет создана ботом')
+            return 0
+
+        cursor.execute('PRAGMA table_info(sent_reminders)')
+        columns = [col[1] for col in cursor.fetchall()]
+
+        if 'minutes_before' not in columns:
+            print('  ✅ Добавляем поле minutes_before...')
+            cursor.execute('ALTER TABLE sent_reminders ADD COLUMN minutes_before INTEGER NOT NULL DEFAULT 0')
+
+            # Старые отметки относятся к единственному напоминанию пользователя
+            cursor.execute('''
+                UPDATE sent_reminders
+                SET minutes_before = COALESCE(
+                    (SELECT reminder_minutes_before FROM settings WHERE settings.chat_id = sent_reminders.chat_id),
+                    60
+                )
+            ''')
+        else:
+            print('  ℹ️  Поле minutes_before уже существует')
+
+        if 'lesson_start' not in columns:
+            print('  ✅ Добавляем поле lesson_start...')
+            cursor.execute('ALTER TABLE sent_reminders ADD COLUMN lesson_start DATETIME')
+        else:
+            print('  ℹ️  Поле lesson_start уже существует')
+
+        # Дубли мешают созданию уникального индекса
+        cursor.execute('''
+            DELETE FROM sent_reminders
+            WHERE id NOT IN (
+                SELECT MIN(id) FROM sent_reminders GROUP BY booking_id, chat_id, minutes_before
+            )
+        ''')
+        if cursor.rowcount:
+            print(f'  🧹 Удалено дублей: {cursor.rowcount}')
+
+        print('  ✅ Создаём индексы...')
+        cursor.execute('''
+            CREATE UNIQUE INDEX IF NOT EXISTS uq_sent_reminder_booking_chat_offset
+            ON sent_reminders (booking_id, chat_id, minutes_before)
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS ix_sent_reminders_lesson_start ON sent_reminders (lesson_start)')
+
+        # Покрывается уникальным индексом
+        cursor.execute('DROP INDEX IF EXISTS ix_sent_reminders_booking_id')
+
+        conn.commit()
+        print('✅ Миграция завершена успешно!')
+        return 0
+
+    except Exception as e:
+        conn.rollback()
+        print(f'❌ Ошибка миграции: {e}')
+        return 1
+
+    finally:
+        conn.close()
+
+
+def migrate():
+    """Migrate every copy of the database kept by the deployment"""
+    if len(sys.argv) > 1:
+        db_paths = [Path(arg) for arg in sys.argv[1:]]
+    else:
+        db_paths = [ROOT_DIR / 'bot' / 'bot_data.db', ROOT_DIR / 'bot_data.db']
+
+    existing = [db_path for db_path in db_paths if db_path.exists()]
+    if not existing:
+        print('ℹ️  Database not found, skipping migration')
+        return 0
+
+    return max(migrate_database(db_path) for db_path in existing)
+
+
+if __name__ == '__main__':
+    try:
+        sys.exit(migrate())
+    except Exception as e:
+        print(f'❌ Критическая ошибка: {e}')
+        sys.exit(1)
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Database migration script: recipients already notified for queued webhook events
+"""
+import sqlite3
+import sys
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).parent.parent
+
+
+def migrate_database(db_path: Path) -> int:
+    """Add webhook_events.delivered_chat_ids"""
+    conn = sqlite3.connect(str(db_path))
+    cursor = conn.cursor()
+
+    print(f'🔄 Миграция очереди вебхуков в {db_path}...')
+
+    try:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='webhook_events'")
+        if cursor.fetchone():
+            cursor.execute('PRAGMA table_info(webhook_events)')
+            columns = [col[1] for col in cursor.fetchall()]
+
+            if 'delivered_chat_ids' not in columns:
+                print('  ✅ Добавляем поле delivered_chat_ids в таблицу webhook_events...')
+                cursor.execute('ALTER TABLE webhook_events ADD COLUMN delivered_chat_ids TEXT')
+            else:
+                print('  ℹ️  Поле delivered_chat_ids уже существует в таблице webhook_events')
+        else:
+            print('  ℹ️  Таблица webhook_events ещё не создана, бот создаст её при запуске')
+
+        conn.commit()
+        print('✅ Миграция завершена успешно!')
+        return 0
+
+    except Exception as e:
+        conn.rollback()
+        print(f'❌ Ошибка миграции: {e}')
+        return 1
+
+    finally:
+        conn.close()
+
+
+def migrate():
+    """Migrate every copy of the database kept by the deployment"""
+    if len(sys.argv) > 1:
+        db_paths = [Path(arg) for arg in sys.argv[1:]]
+    else:
+        db_paths = [ROOT_DIR / 'bot' / 'bot_data.db', ROOT_DIR / 'bot_data.db']
+
+    existing = [db_path for db_path in db_paths if db_path.exists()]
+    if not existing:
+        print('ℹ️  Database not found, skipping migration')
+        return 0
+
+    return max(migrate_database(db_path) for db_path in existing)
+
+
+if __name__ == '__main__':
+    try:
+        sys.exit(migrate())
+    except Exception as e:
+        print(f'❌ Критическая ошибка: {e}')
+        sys.exit(1)
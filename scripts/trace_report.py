@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Report on webhook traces written by the bot (services/tracing.py)
+
+Prints the slowest traces and a per-stage latency breakdown. The accept
+and process parts of one webhook share a trace_id and are merged; the time
+between them is reported as the queue_wait stage.
+
+Usage:
+    python3 scripts/trace_report.py bot/logs/traces.jsonl
+    python3 scripts/trace_report.py bot/logs/traces.jsonl* --slowest 20
+    python3 scripts/trace_report.py bot/logs/traces.jsonl --trace <trace_id>
+"""
+import argparse
+import json
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).parent.parent
+
+
+def load_traces(paths: list[Path]) -> dict:
+    """trace_id -> exported parts (webhook.accept, webhook.process attempts) ordered by start"""
+    traces = defaultdict(list)
+
+    for path in paths:
+        with open(path, encoding='utf-8') as file:
+            for line in file:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                traces[record['trace_id']].append(record)
+
+    for parts in traces.values():
+        parts.sort(key=lambda part: part['started_at'])
+    return traces
+
+
+def summarize_trace(trace_id: str, parts: list[dict]) -> dict:
+    """Total time from the first accept to the end of the last processing attempt"""
+    started = parts[0]['started_at']
+    finished = max(part['started_at'] + part['duration_ms'] / 1000 for part in parts)
+    accept = next((part for part in parts if part['name'] == 'webhook.accept'), None)
+    processes = [part for part in parts if part['name'] == 'webhook.process']
+
+    queue_wait = None
+    if accept and processes:
+        queue_wait = (processes[0]['started_at'] - accept['started_at']) * 1000 - accept['duration_ms']
+
+    stages = [span for part in parts for span in part['spans'] if span['parent_id']]
+    slowest = max(stages, key=lambda span: span['duration_ms'] or 0, default=None)
+
+    return {
+        'trace_id': trace_id,
+        'event_type': next((part['attributes'].get('event_type') for part in processes), None),
+        'booking_id': next((part['attributes'].get('booking_id') for part in processes), None),
+        'total_ms': round((finished - started) * 1000, 3),
+        'accept_ms': accept['duration_ms'] if accept else None,
+        'queue_wait_ms': round(queue_wait, 3) if queue_wait is not None else None,
+        'process_ms': round(sum(part['duration_ms'] for part in processes), 3) if processes else None,
+        'attempts': len(processes),
+        'error': next((part['error'] for part in reversed(processes) if part['error']), None),
+        'slowest_stage': f"{slowest['name']} ({slowest['duration_ms']} ms)" if slowest else None,
+    }
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def stage_breakdown(traces: dict) -> list[dict]:
+    """Latency of every span name across all traces"""
+    durations = defaultdict(list)
+
+    for parts in traces.values():
+        summary = summarize_trace(parts[0]['trace_id'], parts)
+        if summary['queue_wait_ms'] is not None:
+            durations['queue_wait'].append(summary['queue_wait_ms'])
+
+        for part in parts:
+            for span in part['spans']:
+                if span['duration_ms'] is not None:
+                    durations[span['name']].append(span['duration_ms'])
+
+    rows = []
+    for name, values in durations.items():
+        values.sort()
+        rows.append({
+            'stage': name,
+            'count': len(values),
+            'p50_ms': round(percentile(values, 0.5), 3),
+            'p95_ms': round(percentile(values, 0.95), 3),
+            'p99_ms': round(percentile(values, 0.99), 3),
+            'max_ms': round(values[-1], 3),
+            'total_ms': round(sum(values), 3),
+        })
+
+    return sorted(rows, key=lambda row: row['total_ms'], reverse=True)
+
+
+def print_tree(parts: list[dict]):
+    """Span tree of one trace"""
+    for part in parts:
+        children = defaultdict(list)
+        for span in part['spans']:
+            children[span['parent_id']].append(span)
+
+        def walk(span, depth):
+            attributes = ' '.join(f'{key}={value}' for key, value in span['attributes'].items())
+            error = f"  ❌ {span['error']}" if span['error'] else ''
+            print(f"{'  ' * depth}{span['name']:<{40 - 2 * depth}} +{span['offset_ms']:>9.3f} ms "
+                  f"{span['duration_ms']:>10.3f} ms  {attributes}{error}")
+            for child in sorted(children[span['span_id']], key=lambda child: child['offset_ms']):
+                walk(child, depth + 1)
+
+        for root in children[None]:
+            walk(root, 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('files', nargs='*', type=Path, default=[ROOT_DIR / 'bot' / 'logs' / 'traces.jsonl'],
+                        help='JSONL files with traces (rotated files can be passed too)')
+    parser.add_argument('--slowest', type=int, default=10, help='How many slowest traces to print')
+    parser.add_argument('--trace', help='Print the span tree of one trace')
+    parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+    args = parser.parse_args()
+
+    existing = [path for path in args.files if path.exists()]
+    if not existing:
+        print('ℹ️  Trace files not found')
+        return 1
+
+    traces = load_traces(existing)
+    if not traces:
+        print('ℹ️  No traces recorded yet')
+        return 0
+
+    if args.trace:
+        if args.trace not in traces:
+            print(f'❌ Trace {args.trace} not found')
+            return 1
+        print_tree(traces[args.trace])
+        return 0
+
+    summaries = sorted(
+        (summarize_trace(trace_id, parts) for trace_id, parts in traces.items()),
+        key=lambda summary: summary['total_ms'], reverse=True
+    )
+    stages = stage_breakdown(traces)
+
+    if args.json:
+        print(json.dumps({'traces': len(summaries), 'slowest': summaries[:args.slowest], 'stages': stages}, indent=2))
+        return 0
+
+    print(f'{len(summaries)} traces\n')
+    print(f"Slowest {min(args.slowest, len(summaries))}:")
+    print(f"{'trace_id':<34}{'event':<24}{'total ms':>10}{'accept':>9}{'queue':>10}{'process':>10}  slowest stage")
+    for summary in summaries[:args.slowest]:
+        def ms(value):
+            return '-' if value is None else f'{value:.1f}'
+        print(f"{summary['trace_id']:<34}{summary['event_type'] or '-':<24}{summary['total_ms']:>10.1f}"
+              f"{ms(summary['accept_ms']):>9}{ms(summary['queue_wait_ms']):>10}{ms(summary['process_ms']):>10}"
+              f"  {summary['slowest_stage'] or '-'}{'  ❌ ' + summary['error'] if summary['error'] else ''}")
+
+    print('\nStages:')
+    print(f"{'stage':<24}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}{'total ms':>12}")
+    for row in stages:
+        print(f"{row['stage']:<24}{row['count']:>8}{row['p50_ms']:>10}{row['p95_ms']:>10}{row['p99_ms']:>10}"
+              f"{row['max_ms']:>10}{row['total_ms']:>12}")
+    return 0
+
+
+if __name__ == '__main__':
+    try:
+        sys.exit(main())
+    except Exception as e:
+        print(f'❌ Критическая ошибка: {e}')
+        sys.exit(1)